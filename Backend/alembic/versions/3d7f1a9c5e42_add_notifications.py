@@ -0,0 +1,54 @@
+"""add_notifications
+
+Durable user notifications and per-user unread counters.
+
+Revision ID: 3d7f1a9c5e42
+Revises: 9b5e3f7a2c18
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "3d7f1a9c5e42"
+down_revision = "9b5e3f7a2c18"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "notifications",
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("user_id", sa.String(length=255), nullable=False),
+        sa.Column("tenant_id", sa.String(length=50), nullable=True),
+        sa.Column("title", sa.String(length=200), nullable=False),
+        sa.Column("message", sa.String(length=1000), nullable=False),
+        sa.Column("type", sa.String(length=20), nullable=False),
+        sa.Column("action_url", sa.String(length=500), nullable=True),
+        sa.Column("is_read", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("read_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column("expires_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_notifications_user_created", "notifications", ["user_id", "created_at", "id"])
+    op.create_index(
+        "ix_notifications_user_read_created", "notifications", ["user_id", "is_read", "created_at", "id"]
+    )
+
+    op.create_table(
+        "notification_counters",
+        sa.Column("user_id", sa.String(length=255), nullable=False),
+        sa.Column("total_count", sa.Integer(), nullable=False),
+        sa.Column("unread_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("notification_counters")
+    op.drop_index("ix_notifications_user_read_created", table_name="notifications")
+    op.drop_index("ix_notifications_user_created", table_name="notifications")
+    op.drop_table("notifications")
@@ -0,0 +1,34 @@
+"""add_offline_transaction_spill
+
+Disk-backed overflow segment for the POS offline transaction queue.
+
+Revision ID: 7e3f1a2b9c40
+Revises: 6d2a4f8c9b01
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "7e3f1a2b9c40"
+down_revision = "6d2a4f8c9b01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "offline_transaction_spill",
+        sa.Column("tenant_id", sa.String(length=50), nullable=False),
+        sa.Column("sequence", sa.BigInteger(), nullable=False),
+        sa.Column("transaction_id", sa.String(length=36), nullable=False),
+        sa.Column("payload", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("tenant_id", "sequence"),
+        sa.UniqueConstraint("transaction_id", name="unique_offline_spill_transaction"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("offline_transaction_spill")
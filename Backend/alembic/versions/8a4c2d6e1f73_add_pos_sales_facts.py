@@ -0,0 +1,71 @@
+"""add_pos_sales_facts
+
+Local sales fact table, hourly rollups and backfill watermark for POS analytics.
+
+Revision ID: 8a4c2d6e1f73
+Revises: 7e3f1a2b9c40
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "8a4c2d6e1f73"
+down_revision = "7e3f1a2b9c40"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "pos_sales_facts",
+        sa.Column("tenant_id", sa.String(length=50), nullable=False),
+        sa.Column("invoice", sa.String(length=140), nullable=False),
+        sa.Column("posting_date", sa.Date(), nullable=False),
+        sa.Column("posting_hour", sa.Integer(), nullable=False),
+        sa.Column("pos_profile", sa.String(length=140), nullable=False),
+        sa.Column("customer", sa.String(length=140), nullable=True),
+        sa.Column("cashier", sa.String(length=140), nullable=False),
+        sa.Column("net_total", sa.Float(), nullable=False),
+        sa.Column("tax_total", sa.Float(), nullable=False),
+        sa.Column("grand_total", sa.Float(), nullable=False),
+        sa.Column("docstatus", sa.Integer(), nullable=False),
+        sa.Column("modified", sa.String(length=32), nullable=False),
+        sa.Column("lines", sa.Text(), nullable=False),
+        sa.Column("payments", sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint("tenant_id", "invoice"),
+    )
+    op.create_index("ix_pos_sales_facts_tenant_date", "pos_sales_facts", ["tenant_id", "posting_date"])
+
+    op.create_table(
+        "pos_sales_rollups",
+        sa.Column("tenant_id", sa.String(length=50), nullable=False),
+        sa.Column("bucket_date", sa.Date(), nullable=False),
+        sa.Column("bucket_hour", sa.Integer(), nullable=False),
+        sa.Column("pos_profile", sa.String(length=140), nullable=False),
+        sa.Column("dimension", sa.String(length=20), nullable=False),
+        sa.Column("dimension_key", sa.String(length=140), nullable=False),
+        sa.Column("label", sa.String(length=140), nullable=True),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("quantity", sa.Float(), nullable=False),
+        sa.Column("transactions", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("tenant_id", "bucket_date", "bucket_hour", "pos_profile", "dimension", "dimension_key"),
+    )
+    op.create_index("ix_pos_sales_rollups_lookup", "pos_sales_rollups", ["tenant_id", "dimension", "bucket_date"])
+
+    op.create_table(
+        "pos_sales_sync_state",
+        sa.Column("tenant_id", sa.String(length=50), nullable=False),
+        sa.Column("watermark", sa.String(length=32), nullable=False),
+        sa.Column("synced_at", sa.TIMESTAMP(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("tenant_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("pos_sales_sync_state")
+    op.drop_index("ix_pos_sales_rollups_lookup", table_name="pos_sales_rollups")
+    op.drop_table("pos_sales_rollups")
+    op.drop_index("ix_pos_sales_facts_tenant_date", table_name="pos_sales_facts")
+    op.drop_table("pos_sales_facts")
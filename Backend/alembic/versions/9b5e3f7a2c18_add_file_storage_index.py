@@ -0,0 +1,57 @@
+"""add_file_storage_index
+
+Per-tenant file metadata index and deduplicated content blobs.
+
+Revision ID: 9b5e3f7a2c18
+Revises: 8a4c2d6e1f73
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "9b5e3f7a2c18"
+down_revision = "8a4c2d6e1f73"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stored_blobs",
+        sa.Column("tenant_id", sa.String(length=50), nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column("size_bytes", sa.BigInteger(), nullable=False),
+        sa.Column("ref_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("tenant_id", "content_hash"),
+    )
+
+    op.create_table(
+        "stored_files",
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("tenant_id", sa.String(length=50), nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column("original_filename", sa.String(length=255), nullable=False),
+        sa.Column("extension", sa.String(length=16), nullable=False),
+        sa.Column("mime_type", sa.String(length=127), nullable=False),
+        sa.Column("size_bytes", sa.BigInteger(), nullable=False),
+        sa.Column("category", sa.String(length=32), nullable=False),
+        sa.Column("uploaded_by", sa.String(length=255), nullable=False),
+        sa.Column("uploaded_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_stored_files_tenant_uploaded", "stored_files", ["tenant_id", "uploaded_at", "id"])
+    op.create_index(
+        "ix_stored_files_tenant_category_uploaded", "stored_files", ["tenant_id", "category", "uploaded_at", "id"]
+    )
+    op.create_index("ix_stored_files_tenant_hash", "stored_files", ["tenant_id", "content_hash"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_stored_files_tenant_hash", table_name="stored_files")
+    op.drop_index("ix_stored_files_tenant_category_uploaded", table_name="stored_files")
+    op.drop_index("ix_stored_files_tenant_uploaded", table_name="stored_files")
+    op.drop_table("stored_files")
+    op.drop_table("stored_blobs")
@@ -405,6 +405,7 @@ async def health_check_v2(
                 },
                 "event_bus": {
                     "registered_events": registered_events,
+                    **event_bus.stats(),
                     "status": "operational"
                 }
             },
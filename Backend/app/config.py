@@ -12,6 +12,13 @@ class Settings(BaseSettings):
     POSTGRES_PORT: int = 5432
     # Password can be loaded from env var OR secret file
     POSTGRES_PASSWORD: str = ""
+    # Connection pool (per process, per engine) and server-side statement timeout
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
 
     # Odoo
     ODOO_DB_HOST: str = "odoo"
@@ -28,6 +35,17 @@ class Settings(BaseSettings):
     ERPNEXT_SITE: str = "moran.localhost"
     ERPNEXT_API_KEY: str = "admin"
     ERPNEXT_API_SECRET: str = "12345678"
+    # Send "Authorization: token key:secret" instead of logging in per site
+    ERPNEXT_USE_API_TOKEN: bool = False
+    # How long a cached per-site login session is reused before logging in again (seconds)
+    ERPNEXT_SESSION_TTL: int = 3600
+    # ERPNext transport: connection pool and timeouts (seconds)
+    ERPNEXT_POOL_MAX_CONNECTIONS: int = 100
+    ERPNEXT_POOL_MAX_KEEPALIVE: int = 20
+    ERPNEXT_POOL_KEEPALIVE_EXPIRY: float = 30.0
+    ERPNEXT_POOL_TIMEOUT: float = 5.0
+    ERPNEXT_CONNECT_TIMEOUT: float = 5.0
+    ERPNEXT_TIMEOUT: float = 30.0
     
     # M-Pesa (Optional - for POS payments)
     MPESA_CONSUMER_KEY: str = ""
@@ -36,9 +54,105 @@ class Settings(BaseSettings):
     MPESA_SHORTCODE: str = ""
     MPESA_ENVIRONMENT: str = "sandbox"  # sandbox or production
     
+    # POS invoice preparation: how long resolved profile/account context is reused (seconds)
+    POS_PROFILE_CONTEXT_TTL: int = 300
+
+    # POS service registry: evict tenants idle this long (seconds) / cap on live instances
+    POS_SERVICE_IDLE_TTL: int = 900
+    POS_SERVICE_MAX_INSTANCES: int = 1000
+
+    # POS item catalogue mirror (seconds between delta syncs / forced full resyncs)
+    POS_CATALOG_SYNC_INTERVAL: int = 30
+    POS_CATALOG_FULL_SYNC_INTERVAL: int = 3600
+    POS_CATALOG_PAGE_SIZE: int = 500
+
+    # POS response cache: stale-while-revalidate window (fraction of TTL) and TTL jitter (+/- fraction)
+    POS_CACHE_STALE_FACTOR: float = 1.0
+    POS_CACHE_TTL_JITTER: float = 0.1
+    # Responses larger than this are streamed through without being cached
+    POS_CACHE_MAX_BODY_BYTES: int = 1048576
+
+    # POS offline sync: POS profiles synced in parallel / per-transaction sync lock (seconds)
+    OFFLINE_SYNC_CONCURRENCY: int = 4
+    OFFLINE_SYNC_LOCK_TTL: int = 300
+    # Offline transactions kept in Redis per tenant; beyond this they spill to Postgres
+    OFFLINE_QUEUE_HOT_LIMIT: int = 1000
+
+    # POS analytics fact store: seconds between ERPNext backfills, first-backfill window (days), paging
+    POS_ANALYTICS_SYNC_INTERVAL: int = 60
+    POS_ANALYTICS_BACKFILL_DAYS: int = 400
+    POS_ANALYTICS_PAGE_SIZE: int = 200
+    POS_ANALYTICS_FETCH_CONCURRENCY: int = 8
+
+    # Dashboard metrics: per-module collector timeout (seconds) and stale window (multiple of module TTL)
+    DASHBOARD_MODULE_TIMEOUT: float = 5.0
+    DASHBOARD_METRICS_STALE_FACTOR: float = 4.0
+
+    # Reports: keyset page size for row exports, background export jobs (concurrency, directory, retention seconds)
+    REPORT_PAGE_SIZE: int = 500
+    REPORT_JOB_CONCURRENCY: int = 2
+    REPORT_EXPORT_DIR: str = "/tmp/moran_reports"
+    REPORT_JOB_TTL: int = 86400
+    REPORT_LOW_STOCK_THRESHOLD: float = 10
+
+    # Bulk receipts: invoices per batched fetch, concurrent fetches, render processes (0 = render in a thread)
+    RECEIPT_BULK_BATCH_SIZE: int = 100
+    RECEIPT_BULK_FETCH_CONCURRENCY: int = 4
+    RECEIPT_RENDER_WORKERS: int = 2
+    # Invoice limits for buffered JSON responses vs streamed NDJSON / merged PDF output
+    RECEIPT_BULK_SYNC_LIMIT: int = 50
+    RECEIPT_BULK_STREAM_LIMIT: int = 2000
+
+    # Rendered receipt cache: entry TTL, per-tenant LRU cap, seconds a submitted invoice's version is trusted without refetching
+    RECEIPT_CACHE_TTL: int = 604800
+    RECEIPT_CACHE_MAX_ENTRIES: int = 5000
+    RECEIPT_CACHE_VERSION_TTL: int = 300
+
+    # File storage: upload read/hash chunk size, nginx internal location for X-Accel-Redirect downloads (empty = serve directly)
+    FILE_UPLOAD_CHUNK_SIZE: int = 1048576
+    FILES_ACCEL_REDIRECT_PREFIX: str = ""
+
+    # Notification streams (SSE / WebSocket): per-connection event queue bound, keepalive interval seconds
+    NOTIFICATION_STREAM_QUEUE_SIZE: int = 100
+    NOTIFICATION_STREAM_HEARTBEAT: float = 15.0
+
+    # POS event bus: worker pool, queue bound, overflow policy (drop_lowest | block), Redis persistence batching
+    EVENT_BUS_WORKERS: int = 4
+    EVENT_BUS_QUEUE_SIZE: int = 10000
+    EVENT_BUS_OVERFLOW_POLICY: str = "drop_lowest"
+    EVENT_BUS_PERSIST_BATCH: int = 100
+    EVENT_BUS_PERSIST_INTERVAL: float = 0.5
+    # Cross-worker delivery through a Redis Streams consumer group (read batch, block ms, idle ms before reclaim)
+    EVENT_BUS_DISTRIBUTED: bool = False
+    EVENT_BUS_CONSUMER_GROUP: str = "pos-event-bus"
+    EVENT_BUS_STREAM_BATCH: int = 100
+    EVENT_BUS_STREAM_BLOCK_MS: int = 1000
+    EVENT_BUS_STREAM_MAXLEN: int = 100000
+    EVENT_BUS_CLAIM_IDLE_MS: int = 60000
+    EVENT_BUS_RECLAIM_INTERVAL: float = 30
+
+    # Webhook delivery: concurrent requests (overall / per destination host), per-endpoint queue bound,
+    # circuit breaker (failures / cooldown seconds), retry poll (seconds), attempts kept per endpoint
+    WEBHOOK_MAX_CONCURRENCY: int = 50
+    WEBHOOK_HOST_MAX_CONNECTIONS: int = 10
+    WEBHOOK_ENDPOINT_QUEUE_SIZE: int = 1000
+    WEBHOOK_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    WEBHOOK_CIRCUIT_COOLDOWN: int = 60
+    WEBHOOK_RETRY_POLL_INTERVAL: float = 1.0
+    WEBHOOK_HISTORY_SIZE: int = 200
+
     # Redis (Optional - for caching)
     REDIS_URL: str = "redis://localhost:6379/0"
-    
+
+    # RBAC permission cache: Redis TTL, and per-process LRU TTL/size (seconds / entries)
+    RBAC_PERMISSION_CACHE_TTL: int = 300
+    RBAC_LOCAL_CACHE_TTL: int = 30
+    RBAC_LOCAL_CACHE_SIZE: int = 10000
+
+    # Compiled tax rules: per-process cache TTL (bounds staleness across workers, seconds) and tenants kept
+    TAX_RULE_CACHE_TTL: int = 60
+    TAX_RULE_CACHE_SIZE: int = 1000
+
     # API Base URL (for webhooks and callbacks)
     API_BASE_URL: str = "http://localhost:9000"
 
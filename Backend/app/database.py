@@ -1,13 +1,82 @@
+import time
+
+from prometheus_client import Gauge, Histogram
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.config import settings
 
 SQL_DATABASE_URL = f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
+ASYNC_SQL_DATABASE_URL = SQL_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting to check a connection out of the SQLAlchemy pool",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections currently checked out of the SQLAlchemy pool",
+    ["engine"],
+)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records checkout wait time."""
+    metric_label = "sync"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(engine=self.metric_label).observe(time.perf_counter() - started)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout wait time."""
+    metric_label = "async"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(engine=self.metric_label).observe(time.perf_counter() - started)
+
+
+_pool_options = dict(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+)
 
 # Synchronous Engine for normal operations
-engine = create_engine(SQL_DATABASE_URL)
+engine = create_engine(
+    SQL_DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    connect_args={"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"},
+    **_pool_options,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async Engine (asyncpg) for handlers that should not block the event loop.
+# Routers move over by depending on get_async_db instead of get_db.
+async_engine = create_async_engine(
+    ASYNC_SQL_DATABASE_URL,
+    poolclass=InstrumentedAsyncQueuePool,
+    connect_args={"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}},
+    **_pool_options,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+DB_POOL_CHECKED_OUT.labels(engine="sync").set_function(lambda: engine.pool.checkedout())
+DB_POOL_CHECKED_OUT.labels(engine="async").set_function(lambda: async_engine.pool.checkedout())
+
 # Base class for SQLAlchemy models
 Base = declarative_base()
 
@@ -17,3 +86,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -109,10 +109,10 @@ def require_any_permission(permissions: List[str]) -> Callable:
                 detail="Invalid token: malformed IDs"
             )
         
-        # Check if user has ANY of the permissions
-        for permission in permissions:
-            if rbac_service.has_permission(db, user_uuid, tenant_uuid, permission):
-                return True
+        # Check if user has ANY of the permissions (one compiled matcher for all checks)
+        matcher = rbac_service.get_permission_matcher(db, user_uuid, tenant_uuid)
+        if any(matcher.matches(permission) for permission in permissions):
+            return True
         
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -164,11 +164,11 @@ def require_all_permissions(permissions: List[str]) -> Callable:
                 detail="Invalid token: malformed IDs"
             )
         
-        # Check if user has ALL permissions
-        missing_permissions = []
-        for permission in permissions:
-            if not rbac_service.has_permission(db, user_uuid, tenant_uuid, permission):
-                missing_permissions.append(permission)
+        # Check if user has ALL permissions (one compiled matcher for all checks)
+        matcher = rbac_service.get_permission_matcher(db, user_uuid, tenant_uuid)
+        missing_permissions = [
+            permission for permission in permissions if not matcher.matches(permission)
+        ]
         
         if missing_permissions:
             raise HTTPException(
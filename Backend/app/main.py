@@ -171,6 +171,51 @@ app.include_router(tax.router, prefix="/api", tags=["Compatibility"])
 @app.on_event("startup")
 async def startup_event():
     print(f"Starting up in {settings.API_ENV} mode")
+    from .services.pos.event_bus import event_bus
+    if settings.EVENT_BUS_DISTRIBUTED and event_bus.redis is None:
+        event_bus.redis = redis_client
+    await event_bus.start_processing()
+    from .services.pos.sales_facts import sales_fact_store
+    await sales_fact_store.start(event_bus)
+    from .services.cache.receipt_cache import receipt_cache
+    if receipt_cache.redis is None:
+        receipt_cache.redis = redis_client
+    await receipt_cache.start(event_bus)
+    from .services.webhook_dispatcher import webhook_dispatcher
+    from .services.pos.webhook_service import webhook_service
+    if webhook_dispatcher.redis is None:
+        webhook_dispatcher.redis = redis_client
+    if webhook_service.redis is None:
+        webhook_service.redis = redis_client
+    await webhook_service.start_processing()
+    from .routers.pos_sync import offline_service
+    if offline_service.redis_client is None:
+        offline_service.redis_client = redis_client
+    from .services.report_jobs import report_jobs
+    if report_jobs.redis_client is None:
+        report_jobs.redis_client = redis_client
+    from .services.notification_service import notification_service
+    if notification_service.hub.redis is None:
+        notification_service.hub.redis = redis_client
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from .services.pos.event_bus import event_bus
+    await event_bus.shutdown()
+    from .services.pos.webhook_service import webhook_service
+    await webhook_service.shutdown()
+    from .services.report_jobs import report_jobs
+    await report_jobs.shutdown()
+    from .services.pos.bulk_receipts import shutdown_render_pool
+    shutdown_render_pool()
+    from .services.notification_service import notification_service
+    await notification_service.hub.shutdown()
+    from .services.erpnext_client import erpnext_adapter
+    await erpnext_adapter.aclose()
+    from .services.pos.pos_service_registry import pos_service_registry
+    await pos_service_registry.aclose()
+    from .database import async_engine
+    await async_engine.dispose()
 
 # Prometheus metrics
 metrics_app = make_asgi_app()
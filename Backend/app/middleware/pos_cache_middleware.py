@@ -2,107 +2,348 @@
 POS Cache Middleware
 FastAPI middleware for automatic caching of POS-related requests
 """
+import asyncio
+import hashlib
 import json
+import random
+import struct
 import time
+import zlib
 import logging
-from typing import Callable, Dict, Any, Optional
-from fastapi import Request, Response
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-
+from typing import Dict, Any, List, Optional, Set, Tuple
+from fastapi import Request
+from jose import JWTError, jwt
+from prometheus_client import Counter
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.services.auth_service import ALGORITHM
 from app.services.cache.pos_cache import POSCacheService
 
 logger = logging.getLogger(__name__)
 
+REFRESH_LOCK_TTL = 30
+# Response headers replayed on cache hits
+STORED_HEADERS = {b"content-type", b"etag", b"cache-control", b"content-language"}
+# Bodies smaller than this are stored uncompressed
+COMPRESS_MIN_BYTES = 512
+
+POS_RESPONSE_CACHE = Counter(
+    "pos_response_cache_requests_total",
+    "POS response cache lookups by result (hit, stale, miss, coalesced, bypass)",
+    ["result"],
+)
+POS_RESPONSE_CACHE_REFRESHES = Counter(
+    "pos_response_cache_refreshes_total",
+    "Background stale-while-revalidate refreshes by outcome",
+    ["outcome"],
+)
+
+# Endpoints whose responses may be shared, with their fresh TTL (seconds).
+# Only list GET routes whose dependencies are the token checks mirrored by
+# _token_identity (require_tenant_access / get_current_user): routes using
+# require_permission or filtering by role (warehouses) must not be added.
+# Live data (stock, sessions, orders) and the item catalogue, which is
+# served from the catalogue mirror, are not cached here.
+CACHEABLE_ENDPOINTS = {
+    "/api/pos/profiles": 3600,
+    "/api/pos/customers": 900,
+    "/api/pos/quick-actions": 1800,
+    "/api/pos/analytics": 300,
+}
+UNCACHEABLE_ENDPOINTS = (
+    "/api/pos/analytics/realtime",
+    "/api/pos/analytics/export",
+)
+
+
+def _token_payload(request: Request) -> Optional[Dict[str, Any]]:
+    """Verified claims of the request's bearer token, or None"""
+    authorization = request.headers.get("Authorization", "")
+    if not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        return jwt.decode(authorization[7:], settings.SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
+
+def _token_tenant_id(request: Request) -> Optional[str]:
+    """Tenant claim of the request's bearer token"""
+    payload = _token_payload(request)
+    tenant_id = payload.get("tenant_id") if payload else None
+    return str(tenant_id) if tenant_id else None
+
+
+def _token_identity(request: Request) -> Optional[Tuple[str, str]]:
+    """
+    (tenant, caller) a cached response may be served to.
+
+    Entries are keyed by the verified token tenant (not the X-Tenant-ID
+    header) and by the user plus a digest of the claims routes authorize on,
+    so a hit is only served to the same user, with the same roles, holding a
+    valid unexpired token for that tenant - the checks the allow-listed
+    routes' own dependencies perform. Requests without such a token are not
+    cached.
+    """
+    payload = _token_payload(request)
+    if not payload or not payload.get("tenant_id") or not payload.get("sub"):
+        return None
+    claims = json.dumps(
+        {
+            "roles": payload.get("roles"),
+            "super_admin": bool(payload.get("is_super_admin")),
+            "kyc_tier": payload.get("kyc_tier"),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    caller = f"{payload['sub']}:{hashlib.sha1(claims.encode()).hexdigest()[:12]}"
+    return str(payload["tenant_id"]), caller
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
 
-class POSCacheMiddleware(BaseHTTPMiddleware):
+def _encode_entry(entry: Dict[str, Any]) -> bytes:
+    """Serialize a cache entry as <meta length><JSON meta><zlib or raw body>"""
+    body = entry["body"]
+    encoding = "zlib" if len(body) >= COMPRESS_MIN_BYTES else "identity"
+    payload = zlib.compress(body, 6) if encoding == "zlib" else body
+    meta = json.dumps({k: v for k, v in entry.items() if k != "body"} | {"encoding": encoding}).encode()
+    return struct.pack(">I", len(meta)) + meta + payload
+
+
+def _decode_entry(data: bytes) -> Dict[str, Any]:
+    (meta_length,) = struct.unpack(">I", data[:4])
+    entry = json.loads(data[4:4 + meta_length])
+    payload = data[4 + meta_length:]
+    entry["body"] = zlib.decompress(payload) if entry.pop("encoding") == "zlib" else payload
+    return entry
+
+
+def _cache_group(path: str) -> str:
+    """Resource group of a POS path, e.g. /api/pos/items/ABC -> items (used as cache tag)"""
+    parts = path[len("/api/pos"):].strip("/").split("/")
+    return parts[0] or "root"
+
+
+class POSCacheMiddleware:
     """
-    Middleware for caching POS API responses
+    Pure ASGI middleware for caching POS API responses
+
+    Caches GET responses of the CACHEABLE_ENDPOINTS allow-list per tenant and
+    caller (see _token_identity) while streaming them to the client (the body is
+    teed, not buffered ahead of sending), skips bodies larger than
+    POS_CACHE_MAX_BODY_BYTES and stores them zlib-compressed.
 
-    Automatically caches GET requests and adds cache headers
+    Entries are fresh for a jittered TTL, then served stale for a further
+    window while one background request revalidates them. Concurrent misses
+    for the same key in a process share one downstream request.
+
+    Conditional requests: cached responses carry an ETag and If-None-Match
+    is answered with 304; request `Cache-Control: no-cache` / `max-age=0`
+    revalidates against the backend and `no-store` bypasses the cache.
     """
 
     def __init__(self, app: ASGIApp, cache_service: Optional[POSCacheService] = None):
-        super().__init__(app)
+        self.app = app
         self.cache_service = cache_service
+        self.max_body_bytes = settings.POS_CACHE_MAX_BODY_BYTES
+        # cache_key -> future resolved with the leader's stored entry (or None)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: Set[str] = set()
+        self._background: Set[asyncio.Task] = set()
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Process request and apply caching logic"""
 
         # Only cache GET requests to POS endpoints
-        if request.method != "GET" or not request.url.path.startswith("/api/pos"):
-            return await call_next(request)
-
-        # Skip caching for certain endpoints that need fresh data
-        skip_cache_endpoints = [
-            "/api/pos/invoice",  # Invoice creation
-            "/api/pos/sync",     # Sync operations
-            "/api/pos/payments", # Payment operations
-        ]
+        if scope["type"] != "http" or scope["method"] != "GET" or not scope["path"].startswith("/api/pos"):
+            await self.app(scope, receive, send)
+            return
 
-        if any(request.url.path.startswith(endpoint) for endpoint in skip_cache_endpoints):
-            return await call_next(request)
+        request = Request(scope)
+        request_cache_control = request.headers.get("cache-control", "").lower()
+        identity = _token_identity(request) if self._get_cache_ttl(scope["path"]) else None
+        if not self.cache_service or not identity or "no-store" in request_cache_control:
+            POS_RESPONSE_CACHE.labels(result="bypass").inc()
+            await self.app(scope, receive, send)
+            return
 
-        # Try to get cached response
-        cache_key = self._generate_cache_key(request)
-        cached_response = await self._get_cached_response(cache_key)
+        tenant_id, caller = identity
+        cache_key = self._generate_cache_key(request, tenant_id, caller)
+        revalidate = "no-cache" in request_cache_control or "max-age=0" in request_cache_control
+        cached_response = None if revalidate else await self._get_cached_response(cache_key)
 
         if cached_response:
-            # Return cached response with appropriate headers
-            response = JSONResponse(
-                content=cached_response["data"],
-                status_code=200
-            )
-            response.headers["X-Cache-Status"] = "HIT"
-            response.headers["X-Cache-Key"] = cache_key
-            if cached_response.get("cached_at"):
-                response.headers["X-Cached-At"] = cached_response["cached_at"]
+            if cached_response["fresh_until"] > time.time():
+                POS_RESPONSE_CACHE.labels(result="hit").inc()
+                logger.debug(f"Cache HIT for {scope['path']}")
+                await self._send_cached(cached_response, request, cache_key, "HIT", send)
+                return
+
+            # Serve stale, revalidate in the background
+            POS_RESPONSE_CACHE.labels(result="stale").inc()
+            self._schedule_refresh(cache_key, scope, tenant_id)
+            await self._send_cached(cached_response, request, cache_key, "STALE", send)
+            return
 
-            logger.debug(f"Cache HIT for {request.url.path}")
-            return response
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None and not revalidate:
+            entry = await asyncio.shield(inflight)
+            if entry:
+                POS_RESPONSE_CACHE.labels(result="coalesced").inc()
+                await self._send_cached(entry, request, cache_key, "HIT", send)
+                return
+            # Leader's response was not cacheable; make our own request
+            POS_RESPONSE_CACHE.labels(result="bypass").inc()
+            await self.app(scope, receive, send)
+            return
 
-        # No cache hit, process request
-        start_time = time.time()
-        response = await call_next(request)
-        processing_time = time.time() - start_time
+        POS_RESPONSE_CACHE.labels(result="miss").inc()
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        entry = None
+        try:
+            entry = await self._run_and_store(cache_key, scope, tenant_id, receive, send)
+        finally:
+            if self._inflight.get(cache_key) is future:
+                del self._inflight[cache_key]
+            future.set_result(entry)
+
+    async def _run_and_store(
+        self,
+        cache_key: str,
+        scope: Scope,
+        tenant_id: str,
+        receive: Receive,
+        send: Optional[Send]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Run the downstream app, forwarding to `send` (if given) while teeing the body.
+
+        Returns the stored cache entry, or None if the response was not cacheable.
+        """
+        state: Dict[str, Any] = {"cacheable": False, "status": 500, "headers": [], "size": 0}
+        chunks: List[bytes] = []
+
+        async def tee(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() != b"x-cache-status"]
+                header_map = {k.lower(): v for k, v in headers}
+                content_length = header_map.get(b"content-length")
+                cache_control = header_map.get(b"cache-control", b"").lower()
+                state["status"] = message["status"]
+                # private / no-cache responses must not be served from a shared cache
+                state["cacheable"] = (
+                    message["status"] == 200 and
+                    header_map.get(b"content-type", b"").startswith(b"application/json") and
+                    not any(directive in cache_control for directive in (b"no-store", b"private", b"no-cache")) and
+                    int(content_length or 0) <= self.max_body_bytes
+                )
+                headers.append((b"x-cache-status", b"MISS" if state["cacheable"] else b"BYPASS"))
+                state["headers"] = headers
+                message = {**message, "headers": headers}
+                if state["cacheable"] and content_length is not None and b"etag" not in header_map:
+                    # Bounded body: hold the headers back until the ETag is known
+                    state["deferred"] = message
+                    return
+            elif message["type"] == "http.response.body" and state["cacheable"]:
+                body = message.get("body", b"")
+                state["size"] += len(body)
+                if state["size"] > self.max_body_bytes:
+                    # Too large to cache: keep streaming, stop teeing
+                    state["cacheable"] = False
+                    chunks.clear()
+                else:
+                    chunks.append(body)
+                if "deferred" in state:
+                    if message.get("more_body", False):
+                        return
+                    body = b"".join(chunks)
+                    state["headers"].append((b"etag", _etag(body).encode()))
+                    message = {"type": "http.response.body", "body": body}
+                    if send is not None:
+                        await send(state.pop("deferred"))
+            if send is not None:
+                await send(message)
+
+        await self.app(dict(scope), receive, tee)
+
+        if not state["cacheable"]:
+            return None
+        return await self._cache_response(
+            cache_key, state["headers"], b"".join(chunks), scope["path"], tenant_id
+        )
 
-        # Cache successful GET responses that took time to process
-        if (response.status_code == 200 and
-            processing_time > 0.1 and  # Only cache if processing took > 100ms
-            hasattr(response, 'body') and
-            len(response.body) < 1024 * 1024):  # Only cache responses < 1MB
+    def _schedule_refresh(self, cache_key: str, scope: Scope, tenant_id: str) -> None:
+        """Start one background revalidation per key in this process"""
+        if cache_key in self._refreshing:
+            return
+        self._refreshing.add(cache_key)
+        task = asyncio.create_task(self._refresh(cache_key, dict(scope), tenant_id))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
 
-            try:
-                # Try to parse JSON response
-                if hasattr(response, 'body'):
-                    response_data = json.loads(response.body.decode('utf-8'))
+    async def _refresh(self, cache_key: str, scope: Scope, tenant_id: str) -> None:
+        # Replays the stale hit's own request; its token is the caller the key belongs to
+        async def receive() -> Message:
+            return {"type": "http.request", "body": b"", "more_body": False}
 
-                    # Cache the response
-                    await self._cache_response(cache_key, response_data, request)
+        try:
+            # Only one worker across processes revalidates a given key
+            lock_key = f"middleware-refresh:{cache_key}"
+            if not await self.cache_service.redis.set(lock_key, "1", nx=True, ex=REFRESH_LOCK_TTL):
+                return
+            try:
+                stored = await self._run_and_store(cache_key, scope, tenant_id, receive, None)
+                POS_RESPONSE_CACHE_REFRESHES.labels(outcome="success" if stored else "uncacheable").inc()
+            finally:
+                await self.cache_service.redis.delete(lock_key)
+        except Exception as e:
+            POS_RESPONSE_CACHE_REFRESHES.labels(outcome="error").inc()
+            logger.warning(f"Background refresh failed for {cache_key}: {e}")
+        finally:
+            self._refreshing.discard(cache_key)
+
+    async def _send_cached(
+        self,
+        cached_response: Dict[str, Any],
+        request: Request,
+        cache_key: str,
+        status: str,
+        send: Send
+    ) -> None:
+        """Send a cache entry, or 304 when the client already holds its ETag"""
+        etag = cached_response["etag"]
+        headers = [(k.encode("latin-1"), v.encode("latin-1")) for k, v in cached_response["headers"]]
+        headers += [
+            (b"x-cache-status", status.encode()),
+            (b"x-cache-key", cache_key.encode("utf-8")),
+            (b"x-cached-at", str(cached_response["cached_at"]).encode()),
+        ]
 
-                    response.headers["X-Cache-Status"] = "MISS"
-                    logger.debug(f"Cache MISS and stored for {request.url.path}")
-                else:
-                    response.headers["X-Cache-Status"] = "BYPASS"
-            except (json.JSONDecodeError, UnicodeDecodeError):
-                # Not JSON or couldn't decode, don't cache
-                response.headers["X-Cache-Status"] = "BYPASS"
-        else:
-            response.headers["X-Cache-Status"] = "BYPASS"
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            headers = [(k, v) for k, v in headers if k not in (b"content-type", b"content-length")]
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
 
-        return response
+        body = cached_response["body"]
+        headers.append((b"content-length", str(len(body)).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
 
-    def _generate_cache_key(self, request: Request) -> str:
+    def _generate_cache_key(self, request: Request, tenant_id: str, caller: str) -> str:
         """Generate cache key from request"""
         path = request.url.path
         query_params = str(request.query_params)
 
-        # Include tenant ID in cache key for multi-tenancy
-        tenant_id = request.headers.get("X-Tenant-ID", "default")
-
-        # Create deterministic cache key
-        key_parts = [tenant_id, path]
+        # Include tenant and caller in cache key so entries are never shared across users
+        key_parts = [tenant_id, caller, path]
         if query_params:
             # Sort query params for consistency
             sorted_params = "&".join(sorted(query_params.split("&")))
@@ -111,92 +352,112 @@ class POSCacheMiddleware(BaseHTTPMiddleware):
         return ":".join(key_parts)
 
     async def _get_cached_response(self, cache_key: str) -> Optional[Dict[str, Any]]:
-        """Get cached response data"""
+        """Get and decode a cached response entry"""
         if not self.cache_service or not hasattr(self.cache_service, 'redis'):
             return None
 
         try:
-            # Use Redis directly for middleware caching
-            # In a more sophisticated setup, this could use a separate cache namespace
-            cached_data = await self.cache_service.redis.get(f"middleware:{cache_key}")
-            if cached_data:
-                return json.loads(cached_data)
+            payload = await self.cache_service.get_bytes(f"middleware:{cache_key}")
+            if payload:
+                return _decode_entry(payload)
         except Exception as e:
             logger.warning(f"Failed to get cached response for {cache_key}: {e}")
 
         return None
 
-    async def _cache_response(self, cache_key: str, response_data: Any, request: Request) -> None:
-        """Cache response data"""
+    async def _cache_response(
+        self,
+        cache_key: str,
+        raw_headers: List[Tuple[bytes, bytes]],
+        body: bytes,
+        path: str,
+        tenant_id: str
+    ) -> Optional[Dict[str, Any]]:
+        """Cache response data with a jittered fresh TTL plus a stale window"""
         if not self.cache_service or not hasattr(self.cache_service, 'redis'):
-            return
+            return None
 
         try:
-            # Determine TTL based on endpoint
-            ttl = self._get_cache_ttl(request.url.path)
-
-            cache_data = {
-                "data": response_data,
-                "cached_at": time.time(),
-                "ttl": ttl
+            # Determine TTL based on endpoint, jittered so entries don't expire together
+            ttl = self._get_cache_ttl(path)
+            jitter = settings.POS_CACHE_TTL_JITTER
+            fresh_ttl = max(1, int(ttl * random.uniform(1 - jitter, 1 + jitter)))
+            stale_ttl = int(ttl * settings.POS_CACHE_STALE_FACTOR)
+
+            # Keep representation headers; reuse a downstream ETag when there is one
+            headers = {
+                k.decode("latin-1").lower(): v.decode("latin-1")
+                for k, v in raw_headers
+                if k.lower() in STORED_HEADERS
+            }
+            headers.setdefault("etag", _etag(body))
+
+            now = time.time()
+            entry = {
+                "headers": sorted(headers.items()),
+                "etag": headers["etag"],
+                "cached_at": now,
+                "fresh_until": now + fresh_ttl,
+                "ttl": fresh_ttl,
+                "body": body
             }
 
-            await self.cache_service.redis.setex(
+            await self.cache_service.set_tagged(
                 f"middleware:{cache_key}",
-                ttl,
-                json.dumps(cache_data)
+                fresh_ttl + stale_ttl,
+                _encode_entry(entry),
+                tenant_id,
+                tags=[f"middleware:{_cache_group(path)}"]
             )
 
-            logger.debug(f"Cached response for {cache_key} with TTL {ttl}s")
+            logger.debug(f"Cached response for {cache_key} with TTL {fresh_ttl}s (+{stale_ttl}s stale)")
+            return entry
 
         except Exception as e:
             logger.warning(f"Failed to cache response for {cache_key}: {e}")
+            return None
 
-    def _get_cache_ttl(self, path: str) -> int:
-        """Get cache TTL based on endpoint"""
-        # Different TTLs for different types of data
-        ttl_map = {
-            "/api/pos/items": 1800,      # 30 minutes for items
-            "/api/pos/customers": 900,   # 15 minutes for customers
-            "/api/pos/profiles": 3600,   # 1 hour for profiles
-            "/api/pos/quick-actions": 1800,  # 30 minutes for quick actions
-            "/api/pos/analytics": 300,   # 5 minutes for analytics
-        }
-
-        # Check for exact matches first
-        for endpoint, ttl in ttl_map.items():
-            if path.startswith(endpoint):
+    def _get_cache_ttl(self, path: str) -> Optional[int]:
+        """Cache TTL of an allow-listed endpoint, None if the path is not cached"""
+        if path.startswith(UNCACHEABLE_ENDPOINTS):
+            return None
+        for endpoint, ttl in CACHEABLE_ENDPOINTS.items():
+            if path == endpoint or path.startswith(endpoint + "/"):
                 return ttl
-
-        # Default TTL for other POS endpoints
-        return 600  # 10 minutes
+        return None
 
 
-class CacheInvalidationMiddleware(BaseHTTPMiddleware):
+class CacheInvalidationMiddleware:
     """
-    Middleware for cache invalidation on write operations
+    Pure ASGI middleware for cache invalidation on write operations
 
     Automatically invalidates relevant cache entries when data is modified
     """
 
     def __init__(self, app: ASGIApp, cache_service: Optional[POSCacheService] = None):
-        super().__init__(app)
+        self.app = app
         self.cache_service = cache_service
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Process request and invalidate cache if needed"""
+        if (scope["type"] != "http" or scope["method"] not in ["POST", "PUT", "DELETE"] or
+                not scope["path"].startswith("/api/pos")):
+            await self.app(scope, receive, send)
+            return
 
-        # Store original request for cache invalidation
-        response = await call_next(request)
+        status_code = None
 
-        # Only invalidate cache for successful write operations
-        if (request.method in ["POST", "PUT", "DELETE"] and
-            request.url.path.startswith("/api/pos") and
-            response.status_code in [200, 201, 204]):
+        async def capture_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
 
-            await self._invalidate_relevant_cache(request)
+        await self.app(scope, receive, capture_status)
 
-        return response
+        # Only invalidate cache for successful write operations
+        if status_code in [200, 201, 204]:
+            await self._invalidate_relevant_cache(Request(scope))
 
     async def _invalidate_relevant_cache(self, request: Request) -> None:
         """Invalidate cache entries related to the modified data"""
@@ -204,7 +465,7 @@ class CacheInvalidationMiddleware(BaseHTTPMiddleware):
             return
 
         path = request.url.path
-        tenant_id = request.headers.get("X-Tenant-ID", "default")
+        tenant_id = _token_tenant_id(request) or request.headers.get("X-Tenant-ID", "default")
 
         try:
             if path.startswith("/api/pos/items"):
@@ -234,18 +495,12 @@ class CacheInvalidationMiddleware(BaseHTTPMiddleware):
             return
 
         try:
-            # Clear all item caches for the tenant
-            pattern = f"pos:items:{tenant_id}:*"
-            keys = await self.cache_service.redis.keys(pattern)
-            if keys:
-                await self.cache_service.redis.delete(*keys)
-                logger.debug(f"Invalidated {len(keys)} item cache entries")
-
-            # Also clear frequent items cache
-            pattern = f"pos:frequent_items:{tenant_id}:*"
-            keys = await self.cache_service.redis.keys(pattern)
-            if keys:
-                await self.cache_service.redis.delete(*keys)
+            # Next catalogue read picks up the change with a delta sync
+            await self.cache_service.catalog.mark_stale(tenant_id)
+
+            # Also clear frequent items and cached item responses
+            deleted = await self.cache_service.invalidate_tags(tenant_id, "frequent_items", "middleware:items")
+            logger.debug(f"Invalidated {deleted} item cache entries")
 
         except Exception as e:
             logger.warning(f"Failed to invalidate item cache: {e}")
@@ -256,8 +511,7 @@ class CacheInvalidationMiddleware(BaseHTTPMiddleware):
             return
 
         try:
-            key = f"pos:customers:{tenant_id}"
-            await self.cache_service.redis.delete(key)
+            await self.cache_service.invalidate_tags(tenant_id, "customers", "middleware:customers")
             logger.debug("Invalidated customer cache")
 
         except Exception as e:
@@ -270,11 +524,8 @@ class CacheInvalidationMiddleware(BaseHTTPMiddleware):
 
         try:
             # Clear all profile caches for the tenant
-            pattern = f"pos:profile:{tenant_id}:*"
-            keys = await self.cache_service.redis.keys(pattern)
-            if keys:
-                await self.cache_service.redis.delete(*keys)
-                logger.debug(f"Invalidated {len(keys)} profile cache entries")
+            deleted = await self.cache_service.invalidate_tags(tenant_id, "profile", "middleware:profiles")
+            logger.debug(f"Invalidated {deleted} profile cache entries")
 
         except Exception as e:
             logger.warning(f"Failed to invalidate profile cache: {e}")
@@ -286,11 +537,8 @@ class CacheInvalidationMiddleware(BaseHTTPMiddleware):
 
         try:
             # Clear quick actions cache (contains recent transactions)
-            pattern = f"pos:quick_actions:{tenant_id}:*"
-            keys = await self.cache_service.redis.keys(pattern)
-            if keys:
-                await self.cache_service.redis.delete(*keys)
-                logger.debug(f"Invalidated {len(keys)} transaction cache entries")
+            deleted = await self.cache_service.invalidate_tags(tenant_id, "quick_actions", "middleware:quick-actions")
+            logger.debug(f"Invalidated {deleted} transaction cache entries")
 
         except Exception as e:
-            logger.warning(f"Failed to invalidate transaction cache: {e}")
\ No newline at end of file
+            logger.warning(f"Failed to invalidate transaction cache: {e}")
@@ -0,0 +1,51 @@
+"""
+File storage index
+
+Per-tenant metadata for uploaded files. File contents are stored once per
+tenant per SHA-256 (content-addressed blobs on disk); each upload is a row in
+stored_files pointing at its blob, and blobs are reference counted.
+"""
+from sqlalchemy import Column, String, BigInteger, Integer, TIMESTAMP, Index
+from app.models.iam import Base
+
+
+class StoredBlob(Base):
+    """Deduplicated file content, one per tenant and hash"""
+
+    __tablename__ = "stored_blobs"
+
+    tenant_id = Column(String(50), primary_key=True)
+    content_hash = Column(String(64), primary_key=True)  # SHA-256 hex
+    size_bytes = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=1)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<StoredBlob(tenant_id={self.tenant_id}, content_hash={self.content_hash[:12]})>"
+
+
+class StoredFile(Base):
+    """An uploaded file"""
+
+    __tablename__ = "stored_files"
+
+    id = Column(String(36), primary_key=True)
+    tenant_id = Column(String(50), nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    original_filename = Column(String(255), nullable=False)
+    extension = Column(String(16), nullable=False, default="")
+    mime_type = Column(String(127), nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    category = Column(String(32), nullable=False)
+    uploaded_by = Column(String(255), nullable=False)
+    uploaded_at = Column(TIMESTAMP(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # Newest-first listing (keyset on uploaded_at, id), optionally per category
+        Index("ix_stored_files_tenant_uploaded", "tenant_id", "uploaded_at", "id"),
+        Index("ix_stored_files_tenant_category_uploaded", "tenant_id", "category", "uploaded_at", "id"),
+        Index("ix_stored_files_tenant_hash", "tenant_id", "content_hash"),
+    )
+
+    def __repr__(self):
+        return f"<StoredFile(id={self.id}, tenant_id={self.tenant_id}, filename={self.original_filename})>"
@@ -0,0 +1,48 @@
+"""
+User notifications
+
+Notifications are rows in `notifications`; per-user totals and unread counts
+are kept in `notification_counters` so badge counts never scan a user's list.
+"""
+from sqlalchemy import Column, String, Integer, Boolean, TIMESTAMP, Index
+from app.models.iam import Base
+
+
+class Notification(Base):
+    """A notification addressed to one user"""
+
+    __tablename__ = "notifications"
+
+    id = Column(String(36), primary_key=True)
+    user_id = Column(String(255), nullable=False)
+    tenant_id = Column(String(50), nullable=True)
+    title = Column(String(200), nullable=False)
+    message = Column(String(1000), nullable=False)
+    type = Column(String(20), nullable=False, default="info")
+    action_url = Column(String(500), nullable=True)
+    is_read = Column(Boolean, nullable=False, default=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    read_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Newest-first listing (keyset on created_at, id), all or unread only
+        Index("ix_notifications_user_created", "user_id", "created_at", "id"),
+        Index("ix_notifications_user_read_created", "user_id", "is_read", "created_at", "id"),
+    )
+
+    def __repr__(self):
+        return f"<Notification(id={self.id}, user_id={self.user_id}, type={self.type})>"
+
+
+class NotificationCounter(Base):
+    """Running notification totals for a user"""
+
+    __tablename__ = "notification_counters"
+
+    user_id = Column(String(255), primary_key=True)
+    total_count = Column(Integer, nullable=False, default=0)
+    unread_count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<NotificationCounter(user_id={self.user_id}, unread={self.unread_count})>"
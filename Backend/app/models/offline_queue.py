@@ -0,0 +1,27 @@
+"""
+Offline transaction spill segment
+
+Overflow for the Redis offline queue: once a tenant's hot segment is full,
+newer transactions are appended here and promoted back as it drains.
+"""
+from sqlalchemy import Column, String, BigInteger, LargeBinary, TIMESTAMP, UniqueConstraint
+from app.models.iam import Base
+
+
+class OfflineTransactionSpill(Base):
+    """A queued offline transaction waiting for room in the Redis hot segment"""
+
+    __tablename__ = "offline_transaction_spill"
+
+    tenant_id = Column(String(50), primary_key=True)
+    sequence = Column(BigInteger, primary_key=True)  # Per-tenant queue order, shared with Redis
+    transaction_id = Column(String(36), nullable=False)
+    payload = Column(LargeBinary, nullable=False)  # zlib-compressed packed transaction
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("transaction_id", name="unique_offline_spill_transaction"),
+    )
+
+    def __repr__(self):
+        return f"<OfflineTransactionSpill(tenant_id={self.tenant_id}, sequence={self.sequence})>"
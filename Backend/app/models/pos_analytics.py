@@ -0,0 +1,64 @@
+"""
+POS sales fact store
+
+Local, incrementally maintained copy of submitted POS invoices used by the
+analytics endpoints instead of pulling raw invoices from ERPNext per request.
+"""
+from sqlalchemy import Column, String, Integer, Float, Date, Text, DateTime, Index
+from app.models.iam import Base
+
+
+class PosSalesFact(Base):
+    """One row per POS Sales Invoice"""
+
+    __tablename__ = "pos_sales_facts"
+
+    tenant_id = Column(String(50), primary_key=True)
+    invoice = Column(String(140), primary_key=True)
+    posting_date = Column(Date, nullable=False)
+    posting_hour = Column(Integer, nullable=False, default=0)
+    pos_profile = Column(String(140), nullable=False, default="")
+    customer = Column(String(140), nullable=True)
+    cashier = Column(String(140), nullable=False, default="")  # Invoice owner
+    net_total = Column(Float, nullable=False, default=0)
+    tax_total = Column(Float, nullable=False, default=0)
+    grand_total = Column(Float, nullable=False, default=0)
+    docstatus = Column(Integer, nullable=False, default=1)  # 1=submitted, 2=cancelled
+    modified = Column(String(32), nullable=False, default="")  # ERPNext `modified`
+    lines = Column(Text, nullable=False, default="[]")  # JSON [[item_code, item_name, qty, amount], ...]
+    payments = Column(Text, nullable=False, default="[]")  # JSON [[mode_of_payment, amount], ...]
+
+    __table_args__ = (
+        Index("ix_pos_sales_facts_tenant_date", "tenant_id", "posting_date"),
+    )
+
+
+class PosSalesRollup(Base):
+    """Hourly totals per POS profile and dimension (profile, item, payment_mode, cashier)"""
+
+    __tablename__ = "pos_sales_rollups"
+
+    tenant_id = Column(String(50), primary_key=True)
+    bucket_date = Column(Date, primary_key=True)
+    bucket_hour = Column(Integer, primary_key=True)
+    pos_profile = Column(String(140), primary_key=True)
+    dimension = Column(String(20), primary_key=True)
+    dimension_key = Column(String(140), primary_key=True)
+    label = Column(String(140), nullable=True)
+    amount = Column(Float, nullable=False, default=0)
+    quantity = Column(Float, nullable=False, default=0)
+    transactions = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_pos_sales_rollups_lookup", "tenant_id", "dimension", "bucket_date"),
+    )
+
+
+class PosSalesSyncState(Base):
+    """ERPNext `modified` watermark for the fact store backfill"""
+
+    __tablename__ = "pos_sales_sync_state"
+
+    tenant_id = Column(String(50), primary_key=True)
+    watermark = Column(String(32), nullable=False, default="")
+    synced_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, Body, Request, status
+import anyio
 import json
 from app.services.erpnext_client import erpnext_adapter
+from app.services.cache.receipt_cache import receipt_cache
 from app.dependencies.auth import get_current_token_payload, require_tenant_access
 from app.middleware.response_normalizer import ResponseNormalizer
 from typing import List, Dict, Any
@@ -576,7 +578,10 @@ def amend_sales_invoice(
     amended_doc["amended_from"] = invoice_id
     amended_doc["docstatus"] = 0
     
-    return erpnext_adapter.create_resource("Sales Invoice", amended_doc, tenant_id)
+    created = erpnext_adapter.create_resource("Sales Invoice", amended_doc, tenant_id)
+    # Receipts rendered for the original must not be reprinted
+    anyio.from_thread.run(receipt_cache.invalidate_invoice, tenant_id, invoice_id)
+    return created
 
 
 @router.delete("/sales-invoices/{invoice_id}", status_code=status.HTTP_204_NO_CONTENT)
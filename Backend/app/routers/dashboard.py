@@ -12,6 +12,7 @@ import logging
 from app.database import get_db
 from app.dependencies.auth import require_tenant_access, get_current_user
 from app.services.erpnext_client import erpnext_adapter
+from app.services.metrics_aggregator import MetricsAggregator
 
 router = APIRouter(
     prefix="/dashboard",
@@ -56,21 +57,15 @@ async def get_dashboard_metrics(
             date_from = today.strftime("%Y-%m-%d")
             date_to = today.strftime("%Y-%m-%d")
         
-        # Fetch metrics in parallel (simplified - sequential for now)
-        sales_metrics = await _get_sales_metrics(tenant_id, date_from, date_to)
-        inventory_metrics = await _get_inventory_metrics(tenant_id)
-        outstanding_metrics = await _get_outstanding_metrics(tenant_id)
-        hr_metrics = await _get_hr_metrics(tenant_id)
-        orders_metrics = await _get_orders_metrics(tenant_id, date_from, date_to)
+        # Modules are collected concurrently; a slow module returns its
+        # fallback (status "timeout") instead of holding up the others
+        results = await dashboard_metrics.collect(
+            tenant_id, DASHBOARD_MODULES, date_from=date_from, date_to=date_to
+        )
         
         return {
-            "metrics": {
-                "sales": sales_metrics,
-                "inventory": inventory_metrics,
-                "outstanding": outstanding_metrics,
-                "hr": hr_metrics,
-                "orders": orders_metrics
-            },
+            "metrics": {name: result.value for name, result in results.items()},
+            "module_status": {name: result.status for name, result in results.items()},
             "period": period,
             "date_range": {"from": date_from, "to": date_to},
             "generated_at": datetime.now().isoformat()
@@ -112,29 +107,20 @@ async def get_module_metrics(
         
         date_to = today.strftime("%Y-%m-%d")
         
-        module_handlers = {
-            "sales": _get_sales_metrics,
-            "inventory": lambda t: _get_inventory_metrics(t),
-            "finance": lambda t: _get_finance_metrics(t, date_from, date_to),
-            "hr": lambda t: _get_hr_metrics(t),
-            "pos": lambda t: _get_pos_metrics(t, date_from, date_to)
-        }
-        
-        handler = module_handlers.get(module)
-        if not handler:
+        if module not in MODULE_ENDPOINT_MODULES:
             raise HTTPException(
                 status_code=400,
-                detail=f"Unknown module: {module}. Available: {list(module_handlers.keys())}"
+                detail=f"Unknown module: {module}. Available: {list(MODULE_ENDPOINT_MODULES)}"
             )
         
-        if module == "sales":
-            metrics = await handler(tenant_id, date_from, date_to)
-        else:
-            metrics = await handler(tenant_id)
+        result = (await dashboard_metrics.collect(
+            tenant_id, [module], date_from=date_from, date_to=date_to
+        ))[module]
         
         return {
             "module": module,
-            "metrics": metrics,
+            "metrics": result.value,
+            "status": result.status,
             "period": period,
             "date_range": {"from": date_from, "to": date_to}
         }
@@ -160,7 +146,7 @@ async def get_quick_stats(
         today = datetime.now().date().strftime("%Y-%m-%d")
         
         # Get today's sales count (quick query)
-        sales_response = erpnext_adapter.proxy_request(
+        sales_response = await erpnext_adapter.aproxy_request(
             tenant_id=tenant_id,
             path="resource/Sales Invoice",
             method="GET",
@@ -178,7 +164,7 @@ async def get_quick_stats(
         today_revenue = sum(float(s.get("grand_total", 0)) for s in sales)
         
         # Get pending orders (quick query)
-        orders_response = erpnext_adapter.proxy_request(
+        orders_response = await erpnext_adapter.aproxy_request(
             tenant_id=tenant_id,
             path="resource/Sales Order",
             method="GET",
@@ -224,7 +210,7 @@ async def get_dashboard_alerts(
         alerts = []
         
         # Check for low stock items
-        stock_response = erpnext_adapter.proxy_request(
+        stock_response = await erpnext_adapter.aproxy_request(
             tenant_id=tenant_id,
             path="resource/Bin",
             method="GET",
@@ -248,7 +234,7 @@ async def get_dashboard_alerts(
         
         # Check for overdue invoices
         today = datetime.now().date().strftime("%Y-%m-%d")
-        overdue_response = erpnext_adapter.proxy_request(
+        overdue_response = await erpnext_adapter.aproxy_request(
             tenant_id=tenant_id,
             path="resource/Sales Invoice",
             method="GET",
@@ -293,238 +279,238 @@ async def _get_sales_metrics(
     tenant_id: str, date_from: str, date_to: str
 ) -> Dict[str, Any]:
     """Get sales metrics"""
-    try:
-        filters = [
-            ["docstatus", "=", 1],
-            ["posting_date", ">=", date_from],
-            ["posting_date", "<=", date_to]
-        ]
-        
-        response = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/Sales Invoice",
-            method="GET",
-            params={
-                "filters": json.dumps(filters),
-                "fields": json.dumps(["name", "grand_total", "net_total"]),
-                "limit_page_length": 1000
-            }
-        )
-        
-        invoices = response.get("data", []) if isinstance(response, dict) else []
-        total_revenue = sum(float(inv.get("grand_total", 0)) for inv in invoices)
-        
-        return {
-            "total_invoices": len(invoices),
-            "total_revenue": round(total_revenue, 2),
-            "avg_invoice_value": round(total_revenue / len(invoices), 2) if invoices else 0
+    filters = [
+        ["docstatus", "=", 1],
+        ["posting_date", ">=", date_from],
+        ["posting_date", "<=", date_to]
+    ]
+    
+    response = await erpnext_adapter.aproxy_request(
+        tenant_id=tenant_id,
+        path="resource/Sales Invoice",
+        method="GET",
+        params={
+            "filters": json.dumps(filters),
+            "fields": json.dumps(["name", "grand_total", "net_total"]),
+            "limit_page_length": 1000
         }
-        
-    except Exception as e:
-        logger.error(f"Sales metrics error: {e}")
-        return {"total_invoices": 0, "total_revenue": 0, "avg_invoice_value": 0}
+    )
+    
+    invoices = response.get("data", []) if isinstance(response, dict) else []
+    total_revenue = sum(float(inv.get("grand_total", 0)) for inv in invoices)
+    
+    return {
+        "total_invoices": len(invoices),
+        "total_revenue": round(total_revenue, 2),
+        "avg_invoice_value": round(total_revenue / len(invoices), 2) if invoices else 0
+    }
 
 
 async def _get_inventory_metrics(tenant_id: str) -> Dict[str, Any]:
     """Get inventory metrics"""
-    try:
-        # Get items count
-        items_response = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/Item",
-            method="GET",
-            params={
-                "filters": json.dumps([["is_stock_item", "=", 1]]),
-                "fields": json.dumps(["name"]),
-                "limit_page_length": 0
-            }
-        )
-        
-        items = items_response.get("data", []) if isinstance(items_response, dict) else []
-        
-        # Get low stock count
-        low_stock_response = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/Bin",
-            method="GET",
-            params={
-                "filters": json.dumps([["actual_qty", "<", 10]]),
-                "fields": json.dumps(["name"]),
-                "limit_page_length": 0
-            }
-        )
-        
-        low_stock = low_stock_response.get("data", []) if isinstance(low_stock_response, dict) else []
-        
-        return {
-            "total_items": len(items),
-            "low_stock_items": len(low_stock),
-            "out_of_stock": 0  # Would need separate query
+    # Get items count
+    items_response = await erpnext_adapter.aproxy_request(
+        tenant_id=tenant_id,
+        path="resource/Item",
+        method="GET",
+        params={
+            "filters": json.dumps([["is_stock_item", "=", 1]]),
+            "fields": json.dumps(["name"]),
+            "limit_page_length": 0
         }
-        
-    except Exception as e:
-        logger.error(f"Inventory metrics error: {e}")
-        return {"total_items": 0, "low_stock_items": 0, "out_of_stock": 0}
+    )
+    
+    items = items_response.get("data", []) if isinstance(items_response, dict) else []
+    
+    # Get low stock count
+    low_stock_response = await erpnext_adapter.aproxy_request(
+        tenant_id=tenant_id,
+        path="resource/Bin",
+        method="GET",
+        params={
+            "filters": json.dumps([["actual_qty", "<", 10]]),
+            "fields": json.dumps(["name"]),
+            "limit_page_length": 0
+        }
+    )
+    
+    low_stock = low_stock_response.get("data", []) if isinstance(low_stock_response, dict) else []
+    
+    return {
+        "total_items": len(items),
+        "low_stock_items": len(low_stock),
+        "out_of_stock": 0  # Would need separate query
+    }
 
 
 async def _get_outstanding_metrics(tenant_id: str) -> Dict[str, Any]:
     """Get outstanding payment metrics"""
-    try:
-        response = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/Sales Invoice",
-            method="GET",
-            params={
-                "filters": json.dumps([
-                    ["docstatus", "=", 1],
-                    ["status", "in", ["Unpaid", "Overdue", "Partly Paid"]]
-                ]),
-                "fields": json.dumps(["name", "grand_total", "outstanding_amount", "status"]),
-                "limit_page_length": 500
-            }
-        )
-        
-        invoices = response.get("data", []) if isinstance(response, dict) else []
-        outstanding = sum(float(inv.get("outstanding_amount", 0)) for inv in invoices)
-        overdue = [inv for inv in invoices if inv.get("status") == "Overdue"]
-        
-        return {
-            "unpaid_invoices": len(invoices),
-            "total_outstanding": round(outstanding, 2),
-            "overdue_count": len(overdue)
+    response = await erpnext_adapter.aproxy_request(
+        tenant_id=tenant_id,
+        path="resource/Sales Invoice",
+        method="GET",
+        params={
+            "filters": json.dumps([
+                ["docstatus", "=", 1],
+                ["status", "in", ["Unpaid", "Overdue", "Partly Paid"]]
+            ]),
+            "fields": json.dumps(["name", "grand_total", "outstanding_amount", "status"]),
+            "limit_page_length": 500
         }
-        
-    except Exception as e:
-        logger.error(f"Outstanding metrics error: {e}")
-        return {"unpaid_invoices": 0, "total_outstanding": 0, "overdue_count": 0}
+    )
+    
+    invoices = response.get("data", []) if isinstance(response, dict) else []
+    outstanding = sum(float(inv.get("outstanding_amount", 0)) for inv in invoices)
+    overdue = [inv for inv in invoices if inv.get("status") == "Overdue"]
+    
+    return {
+        "unpaid_invoices": len(invoices),
+        "total_outstanding": round(outstanding, 2),
+        "overdue_count": len(overdue)
+    }
 
 
 async def _get_hr_metrics(tenant_id: str) -> Dict[str, Any]:
     """Get HR metrics"""
-    try:
-        response = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/Employee",
-            method="GET",
-            params={
-                "filters": json.dumps([["status", "=", "Active"]]),
-                "fields": json.dumps(["name", "department"]),
-                "limit_page_length": 500
-            }
-        )
-        
-        employees = response.get("data", []) if isinstance(response, dict) else []
-        
-        return {
-            "total_employees": len(employees),
-            "present_today": 0,  # Would need attendance check
-            "on_leave": 0
+    response = await erpnext_adapter.aproxy_request(
+        tenant_id=tenant_id,
+        path="resource/Employee",
+        method="GET",
+        params={
+            "filters": json.dumps([["status", "=", "Active"]]),
+            "fields": json.dumps(["name", "department"]),
+            "limit_page_length": 500
         }
-        
-    except Exception as e:
-        logger.error(f"HR metrics error: {e}")
-        return {"total_employees": 0, "present_today": 0, "on_leave": 0}
+    )
+    
+    employees = response.get("data", []) if isinstance(response, dict) else []
+    
+    return {
+        "total_employees": len(employees),
+        "present_today": 0,  # Would need attendance check
+        "on_leave": 0
+    }
 
 
 async def _get_orders_metrics(
     tenant_id: str, date_from: str, date_to: str
 ) -> Dict[str, Any]:
     """Get orders metrics"""
-    try:
-        response = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/Sales Order",
-            method="GET",
-            params={
-                "filters": json.dumps([
-                    ["transaction_date", ">=", date_from],
-                    ["transaction_date", "<=", date_to]
-                ]),
-                "fields": json.dumps(["name", "status", "grand_total"]),
-                "limit_page_length": 500
-            }
-        )
-        
-        orders = response.get("data", []) if isinstance(response, dict) else []
-        pending = [o for o in orders if o.get("status") in ["Draft", "To Deliver and Bill"]]
-        
-        return {
-            "total_orders": len(orders),
-            "pending_orders": len(pending),
-            "completed_orders": len(orders) - len(pending)
+    response = await erpnext_adapter.aproxy_request(
+        tenant_id=tenant_id,
+        path="resource/Sales Order",
+        method="GET",
+        params={
+            "filters": json.dumps([
+                ["transaction_date", ">=", date_from],
+                ["transaction_date", "<=", date_to]
+            ]),
+            "fields": json.dumps(["name", "status", "grand_total"]),
+            "limit_page_length": 500
         }
-        
-    except Exception as e:
-        logger.error(f"Orders metrics error: {e}")
-        return {"total_orders": 0, "pending_orders": 0, "completed_orders": 0}
+    )
+    
+    orders = response.get("data", []) if isinstance(response, dict) else []
+    pending = [o for o in orders if o.get("status") in ["Draft", "To Deliver and Bill"]]
+    
+    return {
+        "total_orders": len(orders),
+        "pending_orders": len(pending),
+        "completed_orders": len(orders) - len(pending)
+    }
 
 
 async def _get_finance_metrics(
     tenant_id: str, date_from: str, date_to: str
 ) -> Dict[str, Any]:
     """Get finance metrics"""
-    try:
-        # Get account balance summary (simplified)
-        gl_response = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/GL Entry",
-            method="GET",
-            params={
-                "filters": json.dumps([
-                    ["posting_date", ">=", date_from],
-                    ["posting_date", "<=", date_to]
-                ]),
-                "fields": json.dumps(["debit", "credit"]),
-                "limit_page_length": 1000
-            }
-        )
-        
-        entries = gl_response.get("data", []) if isinstance(gl_response, dict) else []
-        total_debit = sum(float(e.get("debit", 0)) for e in entries)
-        total_credit = sum(float(e.get("credit", 0)) for e in entries)
-        
-        return {
-            "total_debit": round(total_debit, 2),
-            "total_credit": round(total_credit, 2),
-            "net_movement": round(total_debit - total_credit, 2),
-            "gl_entries": len(entries)
+    # Get account balance summary (simplified)
+    gl_response = await erpnext_adapter.aproxy_request(
+        tenant_id=tenant_id,
+        path="resource/GL Entry",
+        method="GET",
+        params={
+            "filters": json.dumps([
+                ["posting_date", ">=", date_from],
+                ["posting_date", "<=", date_to]
+            ]),
+            "fields": json.dumps(["debit", "credit"]),
+            "limit_page_length": 1000
         }
-        
-    except Exception as e:
-        logger.error(f"Finance metrics error: {e}")
-        return {"total_debit": 0, "total_credit": 0, "net_movement": 0, "gl_entries": 0}
+    )
+    
+    entries = gl_response.get("data", []) if isinstance(gl_response, dict) else []
+    total_debit = sum(float(e.get("debit", 0)) for e in entries)
+    total_credit = sum(float(e.get("credit", 0)) for e in entries)
+    
+    return {
+        "total_debit": round(total_debit, 2),
+        "total_credit": round(total_credit, 2),
+        "net_movement": round(total_debit - total_credit, 2),
+        "gl_entries": len(entries)
+    }
 
 
 async def _get_pos_metrics(
     tenant_id: str, date_from: str, date_to: str
 ) -> Dict[str, Any]:
     """Get POS-specific metrics"""
-    try:
-        response = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/Sales Invoice",
-            method="GET",
-            params={
-                "filters": json.dumps([
-                    ["is_pos", "=", 1],
-                    ["docstatus", "=", 1],
-                    ["posting_date", ">=", date_from],
-                    ["posting_date", "<=", date_to]
-                ]),
-                "fields": json.dumps(["name", "grand_total"]),
-                "limit_page_length": 1000
-            }
-        )
-        
-        invoices = response.get("data", []) if isinstance(response, dict) else []
-        total = sum(float(inv.get("grand_total", 0)) for inv in invoices)
-        
-        return {
-            "pos_transactions": len(invoices),
-            "pos_revenue": round(total, 2),
-            "avg_transaction": round(total / len(invoices), 2) if invoices else 0
+    response = await erpnext_adapter.aproxy_request(
+        tenant_id=tenant_id,
+        path="resource/Sales Invoice",
+        method="GET",
+        params={
+            "filters": json.dumps([
+                ["is_pos", "=", 1],
+                ["docstatus", "=", 1],
+                ["posting_date", ">=", date_from],
+                ["posting_date", "<=", date_to]
+            ]),
+            "fields": json.dumps(["name", "grand_total"]),
+            "limit_page_length": 1000
         }
-        
-    except Exception as e:
-        logger.error(f"POS metrics error: {e}")
-        return {"pos_transactions": 0, "pos_revenue": 0, "avg_transaction": 0}
+    )
+    
+    invoices = response.get("data", []) if isinstance(response, dict) else []
+    total = sum(float(inv.get("grand_total", 0)) for inv in invoices)
+    
+    return {
+        "pos_transactions": len(invoices),
+        "pos_revenue": round(total, 2),
+        "avg_transaction": round(total / len(invoices), 2) if invoices else 0
+    }
+
+
+# Module collectors, cached per tenant (and period) with TTLs in seconds
+dashboard_metrics = MetricsAggregator()
+dashboard_metrics.register(
+    "sales", _get_sales_metrics, ttl=30, params=("date_from", "date_to"),
+    fallback={"total_invoices": 0, "total_revenue": 0, "avg_invoice_value": 0}
+)
+dashboard_metrics.register(
+    "inventory", _get_inventory_metrics, ttl=120,
+    fallback={"total_items": 0, "low_stock_items": 0, "out_of_stock": 0}
+)
+dashboard_metrics.register(
+    "outstanding", _get_outstanding_metrics, ttl=120,
+    fallback={"unpaid_invoices": 0, "total_outstanding": 0, "overdue_count": 0}
+)
+dashboard_metrics.register(
+    "hr", _get_hr_metrics, ttl=600,
+    fallback={"total_employees": 0, "present_today": 0, "on_leave": 0}
+)
+dashboard_metrics.register(
+    "orders", _get_orders_metrics, ttl=60, params=("date_from", "date_to"),
+    fallback={"total_orders": 0, "pending_orders": 0, "completed_orders": 0}
+)
+dashboard_metrics.register(
+    "finance", _get_finance_metrics, ttl=120, params=("date_from", "date_to"),
+    fallback={"total_debit": 0, "total_credit": 0, "net_movement": 0, "gl_entries": 0}
+)
+dashboard_metrics.register(
+    "pos", _get_pos_metrics, ttl=30, params=("date_from", "date_to"),
+    fallback={"pos_transactions": 0, "pos_revenue": 0, "avg_transaction": 0}
+)
+
+DASHBOARD_MODULES = ["sales", "inventory", "outstanding", "hr", "orders"]
+MODULE_ENDPOINT_MODULES = ["sales", "inventory", "finance", "hr", "pos"]
@@ -53,6 +53,7 @@ def erpnext_health_check(
         if login_success or (isinstance(login_error, str) and login_error.strip() == "Logged In"):
             health_status["authenticated"] = True
             health_status["message"] = "ERPNext is connected and authenticated successfully"
+            health_status["session_pool"] = erpnext_adapter.session_stats()
             return health_status
         else:
             health_status["authenticated"] = False
@@ -1,6 +1,11 @@
 """
 Files API
 File upload, storage, and management
+
+Uploads are streamed to disk in chunks and stored once per tenant per content
+hash; metadata lives in the stored_files index (see app.services.file_storage).
+Files uploaded before the index existed are still served by id from the
+tenant directory.
 """
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from fastapi.responses import FileResponse
@@ -9,13 +14,14 @@ from typing import Optional, Dict, Any, List
 from datetime import datetime
 from pydantic import BaseModel, Field
 import os
-import uuid
-import shutil
 import mimetypes
 import logging
 
+from app.config import settings
 from app.database import get_db
 from app.dependencies.auth import require_tenant_access, get_current_user
+from app.models.file_storage import StoredFile
+from app.services.file_storage import FileStorage, FileTooLarge, StoredFileResponse
 
 router = APIRouter(
     prefix="/files",
@@ -34,6 +40,9 @@ ALLOWED_EXTENSIONS = {
 }
 
 
+file_storage = FileStorage(UPLOAD_DIR)
+
+
 class FileMetadata(BaseModel):
     """File metadata response"""
     id: str
@@ -54,11 +63,30 @@ class FileUploadResponse(BaseModel):
     error: Optional[str] = None
 
 
-def _ensure_upload_dir(tenant_id: str) -> str:
-    """Ensure tenant upload directory exists"""
+def _legacy_file(tenant_id: str, file_id: str) -> Optional[str]:
+    """Path of a file stored before the index existed ({file_id}{ext} in the tenant directory)"""
     tenant_dir = os.path.join(UPLOAD_DIR, tenant_id)
-    os.makedirs(tenant_dir, exist_ok=True)
-    return tenant_dir
+    if not file_id or not os.path.isdir(tenant_dir):
+        return None
+    for filename in os.listdir(tenant_dir):
+        file_path = os.path.join(tenant_dir, filename)
+        if filename.startswith(file_id) and os.path.isfile(file_path):
+            return file_path
+    return None
+
+
+def _metadata(stored: StoredFile, tenant_id: str) -> FileMetadata:
+    return FileMetadata(
+        id=stored.id,
+        filename=f"{stored.id}{stored.extension}",
+        original_filename=stored.original_filename,
+        mime_type=stored.mime_type,
+        size_bytes=stored.size_bytes,
+        category=stored.category,
+        uploaded_by=stored.uploaded_by,
+        uploaded_at=stored.uploaded_at.isoformat(),
+        url=f"/api/tenants/{tenant_id}/files/{stored.id}"
+    )
 
 
 def _get_file_category(filename: str) -> str:
@@ -84,12 +112,14 @@ async def upload_file(
     file: UploadFile = File(...),
     category: Optional[str] = Query(None, description="File category: image, document, archive"),
     tenant_id: str = Depends(require_tenant_access),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ) -> FileUploadResponse:
     """
     Upload a single file
     
-    Stores file locally and returns metadata with download URL
+    Streams the file to storage (identical content is stored once) and returns
+    metadata with download URL
     """
     try:
         # Validate file
@@ -102,48 +132,27 @@ async def upload_file(
                 detail=f"File type not allowed. Allowed: {ALLOWED_EXTENSIONS}"
             )
         
-        # Read file content to check size
-        content = await file.read()
-        if len(content) > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large. Maximum size: {MAX_FILE_SIZE / 1024 / 1024}MB"
-            )
-        
-        # Generate unique filename
-        file_id = str(uuid.uuid4())
-        ext = os.path.splitext(file.filename)[1].lower()
-        stored_filename = f"{file_id}{ext}"
-        
-        # Store file
-        tenant_dir = _ensure_upload_dir(tenant_id)
-        file_path = os.path.join(tenant_dir, stored_filename)
-        
-        with open(file_path, "wb") as f:
-            f.write(content)
-        
         # Determine MIME type
         mime_type, _ = mimetypes.guess_type(file.filename)
         if not mime_type:
             mime_type = "application/octet-stream"
         
-        # Build metadata
-        file_category = category or _get_file_category(file.filename)
-        metadata = FileMetadata(
-            id=file_id,
-            filename=stored_filename,
-            original_filename=file.filename,
-            mime_type=mime_type,
-            size_bytes=len(content),
-            category=file_category,
-            uploaded_by=current_user.get("email", "unknown"),
-            uploaded_at=datetime.now().isoformat(),
-            url=f"/api/tenants/{tenant_id}/files/{file_id}"
-        )
+        try:
+            stored = await file_storage.save_upload(
+                db,
+                tenant_id,
+                file,
+                max_size=MAX_FILE_SIZE,
+                mime_type=mime_type,
+                category=category or _get_file_category(file.filename),
+                uploaded_by=current_user.get("email", "unknown")
+            )
+        except FileTooLarge as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        logger.info(f"File uploaded: {file_id} for tenant {tenant_id}")
+        logger.info(f"File uploaded: {stored.id} for tenant {tenant_id}")
         
-        return FileUploadResponse(success=True, file=metadata)
+        return FileUploadResponse(success=True, file=_metadata(stored, tenant_id))
         
     except HTTPException:
         raise
@@ -156,7 +165,8 @@ async def upload_file(
 async def upload_multiple_files(
     files: List[UploadFile] = File(...),
     tenant_id: str = Depends(require_tenant_access),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Upload multiple files at once
@@ -171,7 +181,8 @@ async def upload_multiple_files(
                 file=file,
                 category=None,
                 tenant_id=tenant_id,
-                current_user=current_user
+                current_user=current_user,
+                db=db
             )
             results.append({
                 "filename": file.filename,
@@ -200,58 +211,51 @@ async def upload_multiple_files(
 @router.get("")
 async def list_files(
     category: Optional[str] = Query(None, description="Filter by category"),
-    limit: int = Query(50, le=200),
-    offset: int = Query(0),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     tenant_id: str = Depends(require_tenant_access),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     List uploaded files
     
-    Returns file metadata with pagination
+    Returns file metadata, newest first. Pass `next_cursor` back as `cursor`
+    to page through large directories without offset scans.
     """
     try:
-        tenant_dir = os.path.join(UPLOAD_DIR, tenant_id)
-        
-        if not os.path.exists(tenant_dir):
-            return {"files": [], "total": 0}
-        
-        files = []
-        for filename in os.listdir(tenant_dir):
-            file_path = os.path.join(tenant_dir, filename)
-            if os.path.isfile(file_path):
-                file_id = os.path.splitext(filename)[0]
-                stat = os.stat(file_path)
-                mime_type, _ = mimetypes.guess_type(filename)
-                file_category = _get_file_category(filename)
-                
-                if category and file_category != category:
-                    continue
-                
-                files.append({
-                    "id": file_id,
-                    "filename": filename,
-                    "size_bytes": stat.st_size,
-                    "mime_type": mime_type or "application/octet-stream",
-                    "category": file_category,
-                    "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                    "url": f"/api/tenants/{tenant_id}/files/{file_id}"
-                })
-        
-        # Sort by modification time (newest first)
-        files.sort(key=lambda x: x["modified_at"], reverse=True)
+        try:
+            rows, next_cursor = file_storage.list(
+                db, tenant_id, category=category, limit=limit, cursor=cursor, offset=offset
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
         
-        # Paginate
-        total = len(files)
-        files = files[offset:offset + limit]
+        files = [
+            {
+                "id": stored.id,
+                "filename": f"{stored.id}{stored.extension}",
+                "original_filename": stored.original_filename,
+                "size_bytes": stored.size_bytes,
+                "mime_type": stored.mime_type,
+                "category": stored.category,
+                "modified_at": stored.uploaded_at.isoformat(),
+                "url": f"/api/tenants/{tenant_id}/files/{stored.id}"
+            }
+            for stored in rows
+        ]
         
         return {
             "files": files,
-            "total": total,
+            "total": file_storage.count(db, tenant_id, category=category),
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": next_cursor
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to list files: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -261,7 +265,8 @@ async def list_files(
 async def get_file_metadata(
     file_id: str,
     tenant_id: str = Depends(require_tenant_access),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Get file metadata
@@ -269,26 +274,36 @@ async def get_file_metadata(
     Returns metadata without downloading the file
     """
     try:
-        tenant_dir = os.path.join(UPLOAD_DIR, tenant_id)
+        stored = file_storage.get(db, tenant_id, file_id)
+        if stored is not None:
+            return {
+                "id": stored.id,
+                "filename": f"{stored.id}{stored.extension}",
+                "original_filename": stored.original_filename,
+                "size_bytes": stored.size_bytes,
+                "mime_type": stored.mime_type,
+                "category": stored.category,
+                "content_hash": stored.content_hash,
+                "modified_at": stored.uploaded_at.isoformat(),
+                "download_url": f"/api/tenants/{tenant_id}/files/{file_id}/download"
+            }
         
-        # Find file with matching ID
-        for filename in os.listdir(tenant_dir):
-            if filename.startswith(file_id):
-                file_path = os.path.join(tenant_dir, filename)
-                stat = os.stat(file_path)
-                mime_type, _ = mimetypes.guess_type(filename)
-                
-                return {
-                    "id": file_id,
-                    "filename": filename,
-                    "size_bytes": stat.st_size,
-                    "mime_type": mime_type or "application/octet-stream",
-                    "category": _get_file_category(filename),
-                    "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-                    "download_url": f"/api/tenants/{tenant_id}/files/{file_id}/download"
-                }
+        file_path = _legacy_file(tenant_id, file_id)
+        if file_path is None:
+            raise HTTPException(status_code=404, detail="File not found")
         
-        raise HTTPException(status_code=404, detail="File not found")
+        filename = os.path.basename(file_path)
+        stat = os.stat(file_path)
+        mime_type, _ = mimetypes.guess_type(filename)
+        return {
+            "id": file_id,
+            "filename": filename,
+            "size_bytes": stat.st_size,
+            "mime_type": mime_type or "application/octet-stream",
+            "category": _get_file_category(filename),
+            "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            "download_url": f"/api/tenants/{tenant_id}/files/{file_id}/download"
+        }
         
     except HTTPException:
         raise
@@ -301,29 +316,44 @@ async def get_file_metadata(
 async def download_file(
     file_id: str,
     tenant_id: str = Depends(require_tenant_access),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
     Download a file
     
-    Returns the file content for download
+    Supports Range / If-Range requests and ETag revalidation (If-None-Match).
     """
     try:
-        tenant_dir = os.path.join(UPLOAD_DIR, tenant_id)
+        stored = file_storage.get(db, tenant_id, file_id)
+        if stored is not None:
+            blob_path = file_storage.blob_path(tenant_id, stored.content_hash)
+            accel_path = None
+            if settings.FILES_ACCEL_REDIRECT_PREFIX:
+                relative = os.path.relpath(blob_path, file_storage.root).replace(os.sep, "/")
+                accel_path = f"{settings.FILES_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{relative}"
+            elif not os.path.isfile(blob_path):
+                raise HTTPException(status_code=404, detail="File not found")
+            
+            return StoredFileResponse(
+                path=blob_path,
+                etag=file_storage.etag(stored),
+                accel_path=accel_path,
+                filename=stored.original_filename,
+                media_type=stored.mime_type
+            )
         
-        # Find file with matching ID
-        for filename in os.listdir(tenant_dir):
-            if filename.startswith(file_id):
-                file_path = os.path.join(tenant_dir, filename)
-                mime_type, _ = mimetypes.guess_type(filename)
-                
-                return FileResponse(
-                    path=file_path,
-                    filename=filename,
-                    media_type=mime_type or "application/octet-stream"
-                )
+        file_path = _legacy_file(tenant_id, file_id)
+        if file_path is None:
+            raise HTTPException(status_code=404, detail="File not found")
         
-        raise HTTPException(status_code=404, detail="File not found")
+        filename = os.path.basename(file_path)
+        mime_type, _ = mimetypes.guess_type(filename)
+        return FileResponse(
+            path=file_path,
+            filename=filename,
+            media_type=mime_type or "application/octet-stream"
+        )
         
     except HTTPException:
         raise
@@ -336,31 +366,29 @@ async def download_file(
 async def delete_file(
     file_id: str,
     tenant_id: str = Depends(require_tenant_access),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Delete a file
     
-    Permanently removes the file from storage
+    Permanently removes the file (its content is removed with the last file sharing it)
     """
     try:
-        tenant_dir = os.path.join(UPLOAD_DIR, tenant_id)
+        deleted = file_storage.delete(db, tenant_id, file_id)
+        if not deleted:
+            file_path = _legacy_file(tenant_id, file_id)
+            if file_path is None:
+                raise HTTPException(status_code=404, detail="File not found")
+            os.remove(file_path)
         
-        # Find and delete file with matching ID
-        for filename in os.listdir(tenant_dir):
-            if filename.startswith(file_id):
-                file_path = os.path.join(tenant_dir, filename)
-                os.remove(file_path)
-                
-                logger.info(f"File deleted: {file_id} for tenant {tenant_id}")
-                
-                return {
-                    "success": True,
-                    "id": file_id,
-                    "message": "File deleted successfully"
-                }
+        logger.info(f"File deleted: {file_id} for tenant {tenant_id}")
         
-        raise HTTPException(status_code=404, detail="File not found")
+        return {
+            "success": True,
+            "id": file_id,
+            "message": "File deleted successfully"
+        }
         
     except HTTPException:
         raise
@@ -7,6 +7,7 @@ from app.models.iam import User, Tenant, Membership
 from app.models.rbac import Role, UserRole
 from app.utils.codes import generate_entity_code
 from app.services.auth_service import auth_service
+from app.services.rbac_service import rbac_service
 from app.dependencies.auth import get_current_user, require_tenant_access, get_current_token_payload
 from typing import Optional, List
 from datetime import datetime
@@ -554,6 +555,7 @@ def invite_user(
             existing_mem.role = req.role
             existing_mem.status = "INVITED"
             db.commit()
+            rbac_service.invalidate_permission_cache(user.id, tenant.id)
             return {
                 "message": f"Re-invitation sent to {user.email}",
                 "invitation_code": invitation_code,
@@ -811,6 +813,8 @@ def update_user_membership(
         membership.status = req.status
     
     db.commit()
+    # Membership.role == "ADMIN" grants every permission; drop the cached set
+    rbac_service.invalidate_permission_cache(user_id, tenant_id)
     
     return {
         "message": "Membership updated",
@@ -839,6 +843,7 @@ def remove_user_from_tenant(
     
     db.delete(membership)
     db.commit()
+    rbac_service.invalidate_permission_cache(user_id, tenant_id)
     
     return {"message": "User removed from tenant"}
 
@@ -1065,6 +1070,7 @@ def add_user_to_tenant(
         db.add(user_role)
     
     db.commit()
+    rbac_service.invalidate_permission_cache(user.id, tenant_id)
     
     return {
         "message": "User added to tenant successfully",
@@ -1,18 +1,27 @@
 """
 Notifications API
 User notification management and delivery
+
+Notifications are stored in Postgres (see app.services.notification_service)
+and pushed to clients over server-sent events (/stream) or a WebSocket (/ws).
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from jose import JWTError, jwt
 from sqlalchemy.orm import Session
-from typing import Optional, Dict, Any, List
-from datetime import datetime
+from typing import Optional, Dict, Any
+from datetime import datetime, timezone
 from pydantic import BaseModel, Field
 from enum import Enum
-import uuid
+import asyncio
+import json
 import logging
 
-from app.database import get_db
+from app.config import settings
+from app.database import get_db, SessionLocal
 from app.dependencies.auth import get_current_user
+from app.services.auth_service import ALGORITHM
+from app.services.notification_service import notification_service, serialize
 
 router = APIRouter(
     prefix="/notifications",
@@ -52,65 +61,75 @@ class NotificationResponse(BaseModel):
     action_url: Optional[str]
     created_at: str
     read_at: Optional[str]
+    expires_at: Optional[str] = None
 
 
-# In-memory storage for notifications (in production, use database)
-# This is a temporary solution - the notification model should be added to the database
-_notifications_store: Dict[str, List[Dict[str, Any]]] = {}
+def _sse(event: Dict[str, Any]) -> str:
+    """Format a hub event as a server-sent event"""
+    lines = [f"event: {event.get('event', 'message')}"]
+    notification = event.get("notification")
+    if notification:
+        lines.append(f"id: {notification['id']}")
+    lines.append(f"data: {json.dumps(event, default=str)}")
+    return "\n".join(lines) + "\n\n"
 
 
-def _get_user_notifications(user_id: str) -> List[Dict[str, Any]]:
-    """Get notifications for a user"""
-    return _notifications_store.get(user_id, [])
+def _unread_event(user_id: str) -> Dict[str, Any]:
+    db = SessionLocal()
+    try:
+        return {"event": "unread_count", "unread_count": notification_service.unread_count(db, user_id)}
+    finally:
+        db.close()
 
 
-def _add_notification(user_id: str, notification: Dict[str, Any]):
-    """Add notification for a user"""
-    if user_id not in _notifications_store:
-        _notifications_store[user_id] = []
-    _notifications_store[user_id].insert(0, notification)
-    # Keep only last 100 notifications
-    _notifications_store[user_id] = _notifications_store[user_id][:100]
+def _parse_expires_at(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        expires_at = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="expires_at must be an ISO 8601 datetime")
+    return expires_at if expires_at.tzinfo else expires_at.replace(tzinfo=timezone.utc)
 
 
 @router.get("")
 async def list_notifications(
     unread_only: bool = Query(False, description="Show only unread notifications"),
     type: Optional[NotificationType] = Query(None, description="Filter by type"),
-    limit: int = Query(20, le=100),
-    offset: int = Query(0),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     List notifications for current user
     
-    Returns paginated list of notifications with filter options
+    Returns notifications newest first with filter options. Pass `next_cursor`
+    back as `cursor` for the next page.
     """
     try:
         user_id = current_user.get("user_id") or current_user.get("sub", "")
+        type_value = type.value if type else None
         
-        notifications = _get_user_notifications(user_id)
-        
-        # Apply filters
-        if unread_only:
-            notifications = [n for n in notifications if not n.get("is_read")]
-        
-        if type:
-            notifications = [n for n in notifications if n.get("type") == type.value]
-        
-        # Paginate
-        total = len(notifications)
-        notifications = notifications[offset:offset + limit]
+        try:
+            notifications, next_cursor = notification_service.list(
+                db, user_id, unread_only=unread_only, type=type_value, limit=limit, cursor=cursor, offset=offset
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
         
         return {
-            "notifications": notifications,
-            "total": total,
-            "unread_count": sum(1 for n in _get_user_notifications(user_id) if not n.get("is_read")),
+            "notifications": [serialize(n) for n in notifications],
+            "total": notification_service.count(db, user_id, unread_only=unread_only, type=type_value),
+            "unread_count": notification_service.unread_count(db, user_id),
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": next_cursor
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to list notifications: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -118,7 +137,8 @@ async def list_notifications(
 
 @router.get("/unread-count")
 async def get_unread_count(
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Get unread notification count
@@ -127,11 +147,9 @@ async def get_unread_count(
     """
     try:
         user_id = current_user.get("user_id") or current_user.get("sub", "")
-        notifications = _get_user_notifications(user_id)
-        unread = sum(1 for n in notifications if not n.get("is_read"))
         
         return {
-            "unread_count": unread,
+            "unread_count": notification_service.unread_count(db, user_id),
             "user_id": user_id
         }
         
@@ -140,6 +158,83 @@ async def get_unread_count(
         return {"unread_count": 0}
 
 
+@router.get("/stream")
+async def stream_notifications(
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Server-sent event stream of the current user's notifications
+    
+    Sends the unread count on connect, then `notification`, `read` and
+    `deleted` events (each carrying the new unread count) as they happen on
+    any API worker. A keepalive comment is sent when idle.
+    """
+    user_id = current_user.get("user_id") or current_user.get("sub", "")
+    
+    async def event_stream():
+        async with notification_service.hub.subscribe(user_id) as queue:
+            yield _sse(await asyncio.to_thread(_unread_event, user_id))
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.NOTIFICATION_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(event)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws")
+async def notifications_websocket(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None, description="Access token (browsers cannot set headers on WebSockets)")
+):
+    """
+    WebSocket push of the current user's notifications
+    
+    Same events as /stream, sent as JSON messages; idle connections receive
+    {"event": "ping"}. Authenticate with ?token= or an Authorization header.
+    """
+    authorization = websocket.headers.get("authorization", "")
+    if not token and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    try:
+        payload = jwt.decode(token or "", settings.SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    user_id = payload.get("sub")
+    if not user_id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    async with notification_service.hub.subscribe(user_id) as queue:
+        async def push():
+            await websocket.send_json(await asyncio.to_thread(_unread_event, user_id))
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.NOTIFICATION_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    event = {"event": "ping"}
+                await websocket.send_json(event)
+        
+        pusher = asyncio.create_task(push())
+        try:
+            # Client messages are ignored; receiving detects the disconnect
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            pusher.cancel()
+
+
 @router.post("")
 async def create_notification(
     notification: NotificationCreate,
@@ -160,27 +255,22 @@ async def create_notification(
                 detail="Only admins can create notifications for other users"
             )
         
-        notification_id = str(uuid.uuid4())
-        notification_data = {
-            "id": notification_id,
-            "user_id": notification.user_id,
-            "tenant_id": notification.tenant_id,
-            "title": notification.title,
-            "message": notification.message,
-            "type": notification.type.value,
-            "is_read": False,
-            "action_url": notification.action_url,
-            "created_at": datetime.now().isoformat(),
-            "read_at": None
-        }
-        
-        _add_notification(notification.user_id, notification_data)
+        created = await notification_service.create(
+            db,
+            user_id=notification.user_id,
+            tenant_id=notification.tenant_id,
+            title=notification.title,
+            message=notification.message,
+            type=notification.type.value,
+            action_url=notification.action_url,
+            expires_at=_parse_expires_at(notification.expires_at)
+        )
         
-        logger.info(f"Notification created: {notification_id} for user {notification.user_id}")
+        logger.info(f"Notification created: {created.id} for user {notification.user_id}")
         
         return {
             "success": True,
-            "notification": notification_data
+            "notification": serialize(created)
         }
         
     except HTTPException:
@@ -193,20 +283,20 @@ async def create_notification(
 @router.get("/{notification_id}")
 async def get_notification(
     notification_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Get a specific notification
     """
     try:
         user_id = current_user.get("user_id") or current_user.get("sub", "")
-        notifications = _get_user_notifications(user_id)
+        notification = notification_service.get(db, user_id, notification_id)
         
-        for n in notifications:
-            if n.get("id") == notification_id:
-                return {"notification": n}
+        if notification is None:
+            raise HTTPException(status_code=404, detail="Notification not found")
         
-        raise HTTPException(status_code=404, detail="Notification not found")
+        return {"notification": serialize(notification)}
         
     except HTTPException:
         raise
@@ -218,26 +308,23 @@ async def get_notification(
 @router.patch("/{notification_id}/read")
 async def mark_notification_read(
     notification_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Mark a notification as read
     """
     try:
         user_id = current_user.get("user_id") or current_user.get("sub", "")
-        notifications = _get_user_notifications(user_id)
+        notification = await notification_service.mark_read(db, user_id, notification_id)
         
-        for n in notifications:
-            if n.get("id") == notification_id:
-                n["is_read"] = True
-                n["read_at"] = datetime.now().isoformat()
-                
-                return {
-                    "success": True,
-                    "notification": n
-                }
+        if notification is None:
+            raise HTTPException(status_code=404, detail="Notification not found")
         
-        raise HTTPException(status_code=404, detail="Notification not found")
+        return {
+            "success": True,
+            "notification": serialize(notification)
+        }
         
     except HTTPException:
         raise
@@ -248,25 +335,18 @@ async def mark_notification_read(
 
 @router.post("/mark-all-read")
 async def mark_all_notifications_read(
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Mark all notifications as read
     """
     try:
         user_id = current_user.get("user_id") or current_user.get("sub", "")
-        notifications = _get_user_notifications(user_id)
-        
-        read_count = 0
-        for n in notifications:
-            if not n.get("is_read"):
-                n["is_read"] = True
-                n["read_at"] = datetime.now().isoformat()
-                read_count += 1
         
         return {
             "success": True,
-            "marked_read": read_count
+            "marked_read": await notification_service.mark_all_read(db, user_id)
         }
         
     except Exception as e:
@@ -277,26 +357,23 @@ async def mark_all_notifications_read(
 @router.delete("/{notification_id}")
 async def delete_notification(
     notification_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Delete a notification
     """
     try:
         user_id = current_user.get("user_id") or current_user.get("sub", "")
-        notifications = _get_user_notifications(user_id)
         
-        for i, n in enumerate(notifications):
-            if n.get("id") == notification_id:
-                notifications.pop(i)
-                
-                return {
-                    "success": True,
-                    "id": notification_id,
-                    "message": "Notification deleted"
-                }
+        if not await notification_service.delete(db, user_id, notification_id):
+            raise HTTPException(status_code=404, detail="Notification not found")
         
-        raise HTTPException(status_code=404, detail="Notification not found")
+        return {
+            "success": True,
+            "id": notification_id,
+            "message": "Notification deleted"
+        }
         
     except HTTPException:
         raise
@@ -307,7 +384,8 @@ async def delete_notification(
 
 @router.delete("")
 async def clear_all_notifications(
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
     """
     Clear all notifications for current user
@@ -315,18 +393,9 @@ async def clear_all_notifications(
     try:
         user_id = current_user.get("user_id") or current_user.get("sub", "")
         
-        if user_id in _notifications_store:
-            count = len(_notifications_store[user_id])
-            _notifications_store[user_id] = []
-            
-            return {
-                "success": True,
-                "cleared": count
-            }
-        
         return {
             "success": True,
-            "cleared": 0
+            "cleared": await notification_service.clear(db, user_id)
         }
         
     except Exception as e:
@@ -341,27 +410,27 @@ async def send_notification(
     message: str,
     notification_type: NotificationType = NotificationType.INFO,
     action_url: Optional[str] = None,
-    tenant_id: Optional[str] = None
+    tenant_id: Optional[str] = None,
+    db: Optional[Session] = None
 ) -> str:
     """
     Send a notification to a user
     
-    Can be called by other services to create notifications
+    Can be called by other services to create notifications; opens its own
+    session when none is given
     """
-    notification_id = str(uuid.uuid4())
-    notification_data = {
-        "id": notification_id,
-        "user_id": user_id,
-        "tenant_id": tenant_id,
-        "title": title,
-        "message": message,
-        "type": notification_type.value,
-        "is_read": False,
-        "action_url": action_url,
-        "created_at": datetime.now().isoformat(),
-        "read_at": None
-    }
-    
-    _add_notification(user_id, notification_data)
-    
-    return notification_id
+    session = db or SessionLocal()
+    try:
+        notification = await notification_service.create(
+            session,
+            user_id=user_id,
+            tenant_id=tenant_id,
+            title=title,
+            message=message,
+            type=notification_type.value,
+            action_url=action_url
+        )
+        return notification.id
+    finally:
+        if db is None:
+            session.close()
@@ -11,7 +11,7 @@ This router is designed for:
 Author: MoranERP Team
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query, Body, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, UploadFile, File, Request, Response
 from pydantic import BaseModel, Field
 from typing import List, Optional, Any, Dict
 from datetime import date, datetime, timezone
@@ -21,6 +21,7 @@ import io
 import logging
 import uuid
 import hashlib
+import asyncio
 
 logger = logging.getLogger(__name__)
 from app.services.erpnext_client import erpnext_adapter
@@ -33,6 +34,8 @@ from app.services.pos.vat_service import VATService
 from app.services.pos.gl_distribution_service import GLDistributionService
 from app.services.pos.accounting_integration import AccountingIntegrationService
 from app.services.pos.inventory_integration import InventoryIntegrationService
+from app.services.pos.invoice_preparation import InvoicePreparationService
+from app.services.cache.item_catalog import ItemCatalogMirror, normalize_item, paginate_items, public_item
 from app.database import get_db
 from sqlalchemy.orm import Session
 from app.models.rbac import Role
@@ -60,6 +63,20 @@ def _get_redis_client():
         _redis_client = None
         return None
 
+
+_catalog_mirror: Optional[ItemCatalogMirror] = None
+
+
+def _get_catalog_mirror() -> Optional[ItemCatalogMirror]:
+    """Process-wide catalogue mirror, so its per-tenant snapshots outlive a request"""
+    global _catalog_mirror
+    if _catalog_mirror is None:
+        redis_client = _get_redis_client()
+        if redis_client is None:
+            return None
+        _catalog_mirror = ItemCatalogMirror(redis_client)
+    return _catalog_mirror
+
 router = APIRouter(
     tags=["Point of Sale"]
 )
@@ -130,62 +147,50 @@ class SalesPersonCreate(BaseModel):
 
 @router.get("/items")
 async def list_items(
+    request: Request,
+    response: Response,
+    search: Optional[str] = Query(None, description="Match against item code or name"),
+    item_group: Optional[str] = Query(None),
+    page: int = Query(1, ge=1),
+    page_size: Optional[int] = Query(None, ge=1, le=1000, description="Omit to return the full catalogue"),
     tenant_id: str = Depends(require_tenant_access),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Get all available items for sale.
     Returns item code, name, price, and stock availability.
+
+    Served from the tenant catalogue mirror (delta-synced from ERPNext) with
+    an ETag; clients sending a matching If-None-Match get 304 Not Modified.
     """
-    import json
-    
-    items = erpnext_adapter.proxy_request(
-        tenant_id=tenant_id,
-        path="resource/Item",
-        method="GET",
-        params={
-            "fields": json.dumps([
-                "name",
-                "item_code",
-                "item_name",
-                "standard_rate",
-                "stock_uom",
-                "is_stock_item",
-                "description",
-                "image"
-            ]),
-            "limit_page_length": 500
-        }
-    )
-    if isinstance(items, dict):
-        items = items.get("data", [])
-    normalized_items = []
-    zero_rate_items = []
-    for item in items or []:
-        if not isinstance(item, dict):
-            continue
-        item_code = item.get("item_code") or item.get("name")
-        standard_rate = item.get("standard_rate") or 0
-        
-        # Track items with zero rates for warning
-        if standard_rate == 0:
-            zero_rate_items.append(item_code)
-        
-        normalized_items.append({
-            "item_code": item_code,
-            "item_name": item.get("item_name") or item_code,
-            "standard_rate": standard_rate,
-            "stock_uom": item.get("stock_uom") or "Nos",
-            "is_stock_item": bool(item.get("is_stock_item")) if item.get("is_stock_item") is not None else None,
-            "description": item.get("description"),
-            "image": item.get("image")
-        })
-    
+    result = None
+    catalog = _get_catalog_mirror()
+    if catalog is not None:
+        try:
+            if await catalog.ensure_fresh(tenant_id, erpnext_adapter):
+                result = await catalog.query(tenant_id, search, item_group, page, page_size)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.warning(f"[POS] Item catalogue mirror unavailable, reading ERPNext directly: {e}")
+
+    if result is None:
+        rows = await ItemCatalogMirror().fetch_from_erpnext(tenant_id, erpnext_adapter)
+        items = [public_item(normalize_item(row)) for row in rows if not row.get("disabled")]
+        result = paginate_items(items, search, item_group, page, page_size)
+
+    etag = result.pop("etag")
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
     # Log warning if items have zero rates
+    zero_rate_items = [item["item_code"] for item in result["items"] if not item.get("standard_rate")]
     if zero_rate_items:
         logger.warning(f"[POS] {len(zero_rate_items)} items have zero standard_rate: {zero_rate_items[:10]}{'...' if len(zero_rate_items) > 10 else ''}")
-    
-    return {"items": normalized_items}
+
+    return result
 
 
 @router.get("/items/{item_code}")
@@ -195,7 +200,7 @@ async def get_item(
     current_user: dict = Depends(get_current_user)
 ):
     """Get details of a specific item including current stock."""
-    item = erpnext_adapter.proxy_request(
+    item = await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path=f"resource/Item/{item_code}",
         method="GET"
@@ -223,7 +228,7 @@ async def get_item_stock(
 
         logger.info(f"Fetching stock for {item_code} in {warehouse} (Tenant: {tenant_id})")
 
-        stock = erpnext_adapter.proxy_request(
+        stock = await erpnext_adapter.aproxy_request(
             tenant_id=tenant_id,
             path="method/erpnext.stock.utils.get_stock_balance",
             method="GET",
@@ -267,7 +272,7 @@ async def get_item_stock(
                 "order_by": "posting_date desc, posting_time desc, creation desc"
             }
             
-            ledger_entries = erpnext_adapter.proxy_request(
+            ledger_entries = await erpnext_adapter.aproxy_request(
                 tenant_id=tenant_id,
                 path="resource/Stock Ledger Entry",
                 method="GET",
@@ -335,7 +340,7 @@ async def get_bulk_item_stock(
         raise HTTPException(status_code=422, detail="Provide either pos_profile_id or warehouse")
 
     if warehouse is None and pos_profile_id is not None:
-        profile = erpnext_adapter.proxy_request(
+        profile = await erpnext_adapter.aproxy_request(
             tenant_id=tenant_id,
             path=f"resource/POS Profile/{pos_profile_id}",
             method="GET",
@@ -365,7 +370,7 @@ async def get_bulk_item_stock(
 
     # Query ERPNext Bin (reservation-aware via projected_qty)
     filters = [["warehouse", "=", warehouse], ["item_code", "in", item_codes]]
-    bin_result = erpnext_adapter.proxy_request(
+    bin_result = await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path="resource/Bin",
         method="GET",
@@ -407,7 +412,7 @@ async def get_bulk_item_stock(
                 ["warehouse", "=", warehouse],
                 ["item_code", "in", missing_item_codes]
             ]
-            sle_result = erpnext_adapter.proxy_request(
+            sle_result = await erpnext_adapter.aproxy_request(
                 tenant_id=tenant_id,
                 path="resource/Stock Ledger Entry",
                 method="GET",
@@ -512,7 +517,7 @@ async def list_warehouses(
 
     # Priority 3: Validate/Verify against available companies in ERPNext
     try:
-        companies_res = erpnext_adapter.proxy_request(
+        companies_res = await erpnext_adapter.aproxy_request(
              tenant_id=tenant_id,
              path="resource/Company",
              method="GET",
@@ -553,7 +558,7 @@ async def list_warehouses(
     if warehouse_filters:
         warehouse_params["filters"] = json.dumps(warehouse_filters)
 
-    warehouses = erpnext_adapter.proxy_request(
+    warehouses = await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path="resource/Warehouse",
         method="GET",
@@ -667,7 +672,7 @@ async def list_payment_modes(
     current_user: dict = Depends(get_current_user)
 ):
     """Get all available payment modes (Cash, Mpesa, etc.)."""
-    modes = erpnext_adapter.proxy_request(
+    modes = await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path="resource/Mode of Payment",
         method="GET"
@@ -684,7 +689,7 @@ async def list_customers(
     current_user: dict = Depends(get_current_user)
 ):
     """List all customers, optionally filtered by group."""
-    customers = erpnext_adapter.proxy_request(
+    customers = await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path="resource/Customer",
         method="GET"
@@ -709,7 +714,7 @@ async def create_customer(
     current_user: dict = Depends(get_current_user)
 ):
     """Create a new customer."""
-    result = erpnext_adapter.proxy_request(
+    result = await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path="resource/Customer",
         method="POST",
@@ -725,7 +730,7 @@ async def get_customer(
     current_user: dict = Depends(get_current_user)
 ):
     """Get details of a specific customer."""
-    customer = erpnext_adapter.proxy_request(
+    customer = await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path=f"resource/Customer/{customer_name}",
         method="GET"
@@ -743,7 +748,7 @@ async def update_customer(
     current_user: dict = Depends(get_current_user)
 ):
     """Update an existing customer."""
-    result = erpnext_adapter.proxy_request(
+    result = await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path=f"resource/Customer/{customer_name}",
         method="PUT",
@@ -759,7 +764,7 @@ async def delete_customer(
     current_user: dict = Depends(get_current_user)
 ):
     """Delete a customer."""
-    erpnext_adapter.proxy_request(
+    await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path=f"resource/Customer/{customer_name}",
         method="DELETE"
@@ -776,7 +781,7 @@ async def list_sales_persons(
     current_user: dict = Depends(get_current_user)
 ):
     """List all sales persons (Fundis, Sales Team, Wholesalers)."""
-    persons = erpnext_adapter.proxy_request(
+    persons = await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path="resource/Sales Person",
         method="GET"
@@ -806,7 +811,7 @@ async def create_sales_person(
     if not person.referral_prefix:
         person.referral_prefix = prefix_map.get(person.person_type, "REF-")
     
-    result = erpnext_adapter.proxy_request(
+    result = await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path="resource/Sales Person",
         method="POST",
@@ -856,184 +861,30 @@ async def create_invoice(
                 "message": "Tenant not found"
             }
         )
-    # Resolve company from tenant settings or ERPNext
+    # Resolve company from tenant settings (ERPNext/profile may override it below)
     company = tenant.name
     if tenant.tenant_settings and tenant.tenant_settings.company_name:
         company = tenant.tenant_settings.company_name
-    company_names = []
-    try:
-        companies_response = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/Company",
-            method="GET",
-            params={"limit_page_length": 100}
-        )
-        company_names = [c.get("name") for c in (companies_response.get("data", []) if isinstance(companies_response, dict) else []) if isinstance(c, dict) and c.get("name")]
-        if company not in company_names and company_names:
-            company = company_names[0]
-    except Exception:
-        # Proceed with resolved company even if ERPNext lookup fails
-        pass
-    logger.info(f"Using company '{company}' for tenant {tenant_id}")
 
-    # Fetch POS Profile and extract details (REQUIRED for POS Profile Integration)
-    try:
-        profile = await pos_service.get_pos_profile_details(invoice.pos_profile_id)
-        logger.info(f"POS Profile {invoice.pos_profile_id} fetched for tenant {tenant_id}")
-    except Exception as e:
-        logger.error(f"Failed to fetch required POS Profile {invoice.pos_profile_id}: {str(e)}")
-        raise HTTPException(
-            status_code=400,
-            detail={
-                "type": "pos_profile_not_found",
-                "message": f"POS Profile {invoice.pos_profile_id} not found or inaccessible",
-                "pos_profile_id": invoice.pos_profile_id
-            }
-        )
-
-    # Extract warehouse from profile (REQUIRED)
-    profile_warehouse = profile.get('warehouse')
-    if not profile_warehouse:
-        logger.error(f"POS Profile {invoice.pos_profile_id} does not have a warehouse configured")
-        raise HTTPException(
-            status_code=400,
-            detail={
-                "type": "pos_profile_invalid",
-                "message": f"POS Profile {invoice.pos_profile_id} must have a warehouse configured",
-                "pos_profile_id": invoice.pos_profile_id
-            }
-        )
-    logger.info(f"Using warehouse from POS profile: {profile_warehouse}")
-
-    # Ensure warehouse is not a group node
-    try:
-        wh_doc = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path=f"resource/Warehouse/{profile_warehouse}",
-            method="GET"
-        )
-        wh_data = wh_doc.get("data") if isinstance(wh_doc, dict) else wh_doc
-        if isinstance(wh_data, dict) and wh_data.get("is_group") == 1:
-            logger.warning(f"Warehouse {profile_warehouse} is a group; resolving a child warehouse")
-            child_response = erpnext_adapter.proxy_request(
-                tenant_id=tenant_id,
-                path="resource/Warehouse",
-                method="GET",
-                params={
-                    "filters": json.dumps([
-                        ["parent_warehouse", "=", profile_warehouse],
-                        ["is_group", "=", 0]
-                    ]),
-                    "fields": '["name"]',
-                    "limit_page_length": 1
-                }
-            )
-            child_list = child_response.get("data", []) if isinstance(child_response, dict) else []
-            if child_list:
-                profile_warehouse = child_list[0].get("name")
-                logger.info(f"Using child warehouse: {profile_warehouse}")
-            else:
-                raise HTTPException(
-                    status_code=400,
-                    detail={
-                        "type": "warehouse_group_not_allowed",
-                        "message": f"Warehouse {profile_warehouse} is a group and has no child warehouses for transactions"
-                    }
-                )
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.warning(f"Failed to validate warehouse group status: {e}")
-
-    # Override company if profile has a valid company
-    profile_company = profile.get('company')
-    if profile_company and (not company_names or profile_company in company_names):
-        company = profile_company
-        logger.info(f"Using company from POS profile: {company}")
-
-    # Validate customer exists (auto-create for new customers)
-    try:
-        customer_result = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path=f"resource/Customer/{invoice.customer}",
-            method="GET"
-        )
-        logger.info(f"Customer {invoice.customer} validated for tenant {tenant_id}")
-    except HTTPException as e:
-        if e.status_code == 404:
-            logger.warning(f"Customer {invoice.customer} not found; creating new customer")
-            customer_group = invoice.customer_type if invoice.customer_type in ["Direct", "Fundi", "Sales Team", "Wholesaler"] else "Direct"
-            try:
-                erpnext_adapter.proxy_request(
-                    tenant_id=tenant_id,
-                    path="resource/Customer",
-                    method="POST",
-                    json_data={
-                        "customer_name": invoice.customer,
-                        "customer_group": customer_group,
-                        "customer_type": "Individual"
-                    }
-                )
-                logger.info(f"Customer {invoice.customer} created for tenant {tenant_id}")
-            except Exception as create_error:
-                logger.error(f"Failed to create customer {invoice.customer}: {create_error}")
-                raise HTTPException(
-                    status_code=400,
-                    detail={
-                        "type": "customer_not_found",
-                        "message": f"Customer {invoice.customer} not found and could not be created",
-                        "customer": invoice.customer
-                    }
-                )
-        else:
-            raise
-
-    # If no warehouse from profile, try to find a default warehouse
-    if not profile_warehouse:
-        try:
-            warehouses_result = erpnext_adapter.proxy_request(
-                tenant_id=tenant_id,
-                path="resource/Warehouse",
-                method="GET",
-                params={
-                    "filters": f'[["company", "=", "{company}"]]',
-                    "limit_page_length": 10
-                }
-            )
-
-            if isinstance(warehouses_result, dict):
-                warehouses = warehouses_result.get("data", [])
-                if warehouses:
-                    # Prefer stores over other warehouse types
-                    for wh in warehouses:
-                        if 'store' in wh.get('name', '').lower():
-                            profile_warehouse = wh.get('name')
-                            break
-                    if not profile_warehouse:
-                        profile_warehouse = warehouses[0].get('name')
-
-                    logger.info(f"Using fallback warehouse: {profile_warehouse}")
-        except Exception as e:
-            logger.error(f"Failed to find fallback warehouse: {e}")
-
-    if not profile_warehouse:
-        raise HTTPException(
-            status_code=400,
-            detail={
-                "type": "no_warehouse_available",
-                "message": "No warehouse available for invoice creation"
-            }
-        )
-    
-    # Extract payment accounts from profile (REQUIRED for account mapping)
-    payment_accounts = profile.get('payment_accounts', {})
-    if not payment_accounts:
-        logger.warning(f"POS Profile {invoice.pos_profile_id} has no payment accounts configured")
-        # Continue with empty dict - validation will catch missing accounts
+    # Resolve profile context and basket item details concurrently.
+    # Profile context (company, warehouse, accounts, payment mapping) is cached per POS profile.
+    preparation = InvoicePreparationService(erpnext_adapter, tenant_id, pos_service)
+    context, item_details = await asyncio.gather(
+        preparation.get_profile_context(invoice.pos_profile_id, company),
+        preparation.fetch_item_details([item.item_code for item in invoice.items]),
+    )
+    profile = context.profile
+    profile_warehouse = context.warehouse
+    company = context.company
+    payment_accounts = context.payment_accounts
+    account_names = context.account_names
+    account_types = context.account_types
+    account_is_group = context.account_is_group
+    logger.info(f"Using company '{company}' and warehouse '{profile_warehouse}' from POS profile {invoice.pos_profile_id}")
     
     # Initialize services
     vat_service = VATService()
-    accounting_service = AccountingIntegrationService(pos_service)
+    accounting_service = AccountingIntegrationService(pos_service, known_accounts=account_names)
     inventory_service = InventoryIntegrationService(erpnext_adapter, tenant_id)
     
     # Validate payment accounts exist
@@ -1079,6 +930,7 @@ async def create_invoice(
                     for item in invoice.items
                 ],
                 profile_warehouse,
+                item_details=item_details,
             )
             logger.info(f"Stock availability validated for {len(invoice.items)} items")
         except HTTPException as e:
@@ -1096,30 +948,9 @@ async def create_invoice(
             )
     else:
         logger.info(f"Skipping stock validation for {len(invoice.items)} items (development mode)")
-    
-    # Fetch accounts once for fallback mapping
-    account_names = set()
-    account_types = {}
-    account_is_group = {}
-    try:
-        accounts_result = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/Account",
-            method="GET",
-            params={
-                "filters": f'[[\"company\", \"=\", \"{company}\"]]',
-                "fields": '["name","account_type","is_group"]',
-                "limit_page_length": 1000
-            }
-        )
-        for acc in accounts_result.get("data", []) if isinstance(accounts_result, dict) else []:
-            name = acc.get("name")
-            if name:
-                account_names.add(name)
-                account_types[name] = acc.get("account_type")
-                account_is_group[name] = acc.get("is_group")
-    except Exception as e:
-        logger.warning(f"Failed to load account list for fallback mapping: {e}")
+
+    # Only create a walk-in customer once the sale has passed validation
+    await preparation.ensure_customer(invoice.customer, invoice.customer_type)
 
     def pick_account_by_type(type_candidates, name_hint=None) -> Optional[str]:
         if name_hint:
@@ -1162,37 +993,8 @@ async def create_invoice(
         # Use item warehouse if provided, otherwise use profile warehouse
         warehouse = item.warehouse or profile_warehouse
         
-        # Fetch item details for rate and accounts
-        try:
-            item_detail = erpnext_adapter.proxy_request(
-                tenant_id=tenant_id,
-                path=f"resource/Item/{item.item_code}",
-                method="GET"
-            )
-        except HTTPException as e:
-            if e.status_code == 404:
-                logger.error(f"Item {item.item_code} not found for tenant {tenant_id}")
-                raise HTTPException(
-                    status_code=404,
-                    detail={
-                        "type": "item_not_found",
-                        "message": f"Item {item.item_code} not found",
-                        "item_code": item.item_code
-                    }
-                )
-            else:
-                raise
-
-        if not item_detail:
-            logger.error(f"Item {item.item_code} not found for tenant {tenant_id}")
-            raise HTTPException(
-                status_code=404,
-                detail={
-                    "type": "item_not_found",
-                    "message": f"Item {item.item_code} not found",
-                    "item_code": item.item_code
-                }
-            )
+        # Item details were resolved for the whole basket in one query
+        item_detail = item_details[item.item_code]
         
         # Get rate
         rate = item.rate or item_detail.get("standard_rate", 0)
@@ -1261,23 +1063,9 @@ async def create_invoice(
     try:
         await accounting_service.validate_vat_account(vat_account, company)
     except HTTPException:
-        # Try to find any VAT account for this company and fallback
+        # Try to find any VAT account for this company (from the cached chart of accounts) and fallback
         try:
-            accounts_result = erpnext_adapter.proxy_request(
-                tenant_id=tenant_id,
-                path="resource/Account",
-                method="GET",
-                params={
-                    "filters": f'[[\"company\", \"=\", \"{company}\"]]',
-                    "fields": '["name"]',
-                    "limit_page_length": 500
-                }
-            )
-            vat_candidates = [
-                acc.get("name")
-                for acc in accounts_result.get("data", [])
-                if isinstance(acc, dict) and acc.get("name") and "VAT" in acc.get("name", "").upper()
-            ]
+            vat_candidates = sorted(name for name in account_names if "VAT" in name.upper())
             if vat_candidates:
                 vat_account = vat_candidates[0]
                 logger.info(f"Using fallback VAT account '{vat_account}' for company {company}")
@@ -1472,7 +1260,7 @@ async def create_invoice(
     
     # Send to ERPNext
     try:
-        result = erpnext_adapter.proxy_request(
+        result = await erpnext_adapter.aproxy_request(
             tenant_id=tenant_id,
             path="resource/Sales Invoice",
             method="POST",
@@ -1531,7 +1319,7 @@ async def list_invoices(
     if to_date:
         filters.append(["posting_date", "<=", to_date])
 
-    invoices = erpnext_adapter.proxy_request(
+    invoices = await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path="resource/Sales Invoice",
         method="GET",
@@ -1555,7 +1343,7 @@ async def get_invoice(
     current_user: dict = Depends(get_current_user)
 ):
     """Get details of a specific invoice."""
-    invoice = erpnext_adapter.proxy_request(
+    invoice = await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path=f"resource/Sales Invoice/{invoice_name}",
         method="GET"
@@ -1572,7 +1360,7 @@ async def update_invoice(
 ):
     """Update POS Sales Invoice (only in Draft status)."""
     # Verify invoice exists and is in draft status
-    invoice = erpnext_adapter.proxy_request(
+    invoice = await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path=f"resource/Sales Invoice/{invoice_name}",
         method="GET"
@@ -1583,7 +1371,7 @@ async def update_invoice(
     if invoice.get("docstatus") != 0:  # 0 = Draft, 1 = Submitted, 2 = Cancelled
         raise HTTPException(status_code=403, detail="Can only edit Draft invoices")
     
-    result = erpnext_adapter.proxy_request(
+    result = await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path=f"resource/Sales Invoice/{invoice_name}",
         method="PUT",
@@ -1600,7 +1388,7 @@ async def delete_invoice(
 ):
     """Delete POS Sales Invoice (only if Draft)."""
     # Verify invoice exists and is in draft status
-    invoice = erpnext_adapter.proxy_request(
+    invoice = await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path=f"resource/Sales Invoice/{invoice_name}",
         method="GET"
@@ -1611,7 +1399,7 @@ async def delete_invoice(
     if invoice.get("docstatus") != 0:
         raise HTTPException(status_code=403, detail="Can only delete Draft invoices")
     
-    erpnext_adapter.proxy_request(
+    await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path=f"resource/Sales Invoice/{invoice_name}",
         method="DELETE"
@@ -1639,7 +1427,7 @@ async def get_cash_summary(
         params["to_date"] = to_date
     
     try:
-        result = erpnext_adapter.proxy_request(
+        result = await erpnext_adapter.aproxy_request(
             tenant_id=tenant_id,
             path="method/paint_shop_custom.get_cash_summary",
             method="GET",
@@ -1676,7 +1464,7 @@ async def get_commission_report(
     if sales_person:
         params["sales_person"] = sales_person
     
-    result = erpnext_adapter.proxy_request(
+    result = await erpnext_adapter.aproxy_request(
         tenant_id=tenant_id,
         path="method/paint_shop_custom.get_commission_report",
         method="GET",
@@ -1702,7 +1490,7 @@ async def get_daily_summary(
     # Get sales invoices - use basic fields only to avoid ERPNext field issues
     invoice_fields = ["name", "grand_total", "customer", "posting_date"]
     try:
-        invoices = erpnext_adapter.proxy_request(
+        invoices = await erpnext_adapter.aproxy_request(
             tenant_id=tenant_id,
             path="resource/Sales Invoice",
             method="GET",
@@ -5,7 +5,7 @@ Advanced reporting and analytics for POS performance insights
 from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
 from sqlalchemy.orm import Session
 from typing import Optional, Dict, Any, List
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from pydantic import BaseModel, Field
 import json
 
@@ -13,6 +13,7 @@ from app.database import get_db
 from app.dependencies.auth import require_tenant_access, get_current_user
 from app.services.pos.pos_service_factory import get_pos_service
 from app.services.pos.pos_service_base import PosServiceBase
+from app.services.pos.sales_facts import sales_fact_store
 
 router = APIRouter(
     prefix="/pos/analytics",
@@ -75,7 +76,7 @@ async def get_dashboard_analytics(
             date_to = datetime.now().strftime("%Y-%m-%d")
 
         analytics_data = await _build_dashboard_analytics(
-            tenant_id, date_from, date_to, pos_profile_id
+            db, tenant_id, date_from, date_to, pos_profile_id
         )
 
         return {
@@ -116,7 +117,7 @@ async def get_sales_analytics(
         if not request.date_to:
             request.date_to = datetime.now().strftime("%Y-%m-%d")
 
-        sales_data = await _build_sales_analytics(tenant_id, request)
+        sales_data = await _build_sales_analytics(db, tenant_id, request)
 
         return {
             "sales_analytics": sales_data,
@@ -157,7 +158,7 @@ async def get_product_analytics(
             date_to = datetime.now().strftime("%Y-%m-%d")
 
         product_data = await _build_product_analytics(
-            tenant_id, date_from, date_to, pos_profile_id, limit
+            db, tenant_id, date_from, date_to, pos_profile_id, limit
         )
 
         return {
@@ -199,7 +200,7 @@ async def get_payment_analytics(
             date_to = datetime.now().strftime("%Y-%m-%d")
 
         payment_data = await _build_payment_analytics(
-            tenant_id, date_from, date_to, pos_profile_id
+            db, tenant_id, date_from, date_to, pos_profile_id
         )
 
         return {
@@ -240,7 +241,7 @@ async def get_staff_analytics(
             date_to = datetime.now().strftime("%Y-%m-%d")
 
         staff_data = await _build_staff_analytics(
-            tenant_id, date_from, date_to, pos_profile_id
+            db, tenant_id, date_from, date_to, pos_profile_id
         )
 
         return {
@@ -281,7 +282,7 @@ async def get_customer_analytics(
             date_to = datetime.now().strftime("%Y-%m-%d")
 
         customer_data = await _build_customer_analytics(
-            tenant_id, date_from, date_to, pos_profile_id
+            db, tenant_id, date_from, date_to, pos_profile_id
         )
 
         return {
@@ -395,7 +396,7 @@ async def get_realtime_analytics(
     Returns live sales data for the current day
     """
     try:
-        realtime_data = await _build_realtime_analytics(tenant_id)
+        realtime_data = await _build_realtime_analytics(db, tenant_id)
 
         return {
             "realtime_analytics": realtime_data,
@@ -415,128 +416,61 @@ async def get_realtime_analytics(
 
 
 # Helper functions for building analytics data
+# All figures come from the local sales fact store (app.services.pos.sales_facts),
+# which is refreshed from ERPNext incrementally before each read.
+
+async def _refresh_facts(tenant_id: str) -> None:
+    """Bring the tenant's sales facts up to date if the last backfill is stale"""
+    from app.services.erpnext_client import erpnext_adapter
+    await sales_fact_store.ensure_fresh(tenant_id, erpnext_adapter)
+
+
+def _date_range(date_from: str, date_to: str):
+    return date.fromisoformat(date_from), date.fromisoformat(date_to)
+
+
+def _payment_breakdown(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    total = sum(row["amount"] for row in rows)
+    return {
+        row["name"]: {
+            "amount": row["amount"],
+            "count": row["transactions"],
+            "percentage": (row["amount"] / total * 100) if total > 0 else 0,
+        }
+        for row in rows
+    }
+
 
 async def _build_dashboard_analytics(
-    tenant_id: str, date_from: str, date_to: str, pos_profile_id: Optional[str]
+    db: Session, tenant_id: str, date_from: str, date_to: str, pos_profile_id: Optional[str]
 ) -> Dict[str, Any]:
-    """Build comprehensive dashboard analytics from actual data"""
+    """Build comprehensive dashboard analytics from the sales fact store"""
     try:
-        from app.services.erpnext_client import erpnext_adapter
-        import json
-        
-        # Query actual POS invoices for the date range
-        filters = [
-            ["is_pos", "=", 1],
-            ["docstatus", "=", 1],  # Submitted only
-            ["posting_date", ">=", date_from],
-            ["posting_date", "<=", date_to]
-        ]
-        
-        if pos_profile_id:
-            filters.append(["pos_profile", "=", pos_profile_id])
-        
-        invoices_response = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/Sales Invoice",
-            method="GET",
-            params={
-                "filters": json.dumps(filters),
-                "fields": json.dumps([
-                    "name", "grand_total", "net_total", "total_taxes_and_charges",
-                    "posting_date", "posting_time", "customer", "owner",
-                    "items.item_code", "items.item_name", "items.qty", "items.amount",
-                    "payments.mode_of_payment", "payments.amount"
-                ]),
-                "limit_page_length": 1000
-            }
-        )
-        
-        invoices = invoices_response.get("data", []) if isinstance(invoices_response, dict) else []
-        
-        # Calculate real metrics from invoices
-        total_sales = sum(float(inv.get("net_total", 0)) for inv in invoices)
-        total_transactions = len(invoices)
-        total_vat = sum(float(inv.get("total_taxes_and_charges", 0)) for inv in invoices)
-        avg_transaction = total_sales / total_transactions if total_transactions > 0 else 0
-        
-        # Get unique customers
-        unique_customers = len(set(inv.get("customer") for inv in invoices if inv.get("customer")))
-        
-        # Calculate payment method breakdown
-        payment_methods = {}
-        for inv in invoices:
-            payments = inv.get("payments", [])
-            if isinstance(payments, list):
-                for payment in payments:
-                    mode = payment.get("mode_of_payment", "Unknown")
-                    amount = float(payment.get("amount", 0))
-                    if mode not in payment_methods:
-                        payment_methods[mode] = {"amount": 0, "count": 0}
-                    payment_methods[mode]["amount"] += amount
-                    payment_methods[mode]["count"] += 1
-        
-        # Calculate percentages
-        total_payments = sum(pm["amount"] for pm in payment_methods.values())
-        for mode, data in payment_methods.items():
-            data["percentage"] = (data["amount"] / total_payments * 100) if total_payments > 0 else 0
-        
-        # Calculate sales by day
-        sales_by_day = {}
-        for inv in invoices:
-            date_str = inv.get("posting_date", "")
-            if date_str:
-                if date_str not in sales_by_day:
-                    sales_by_day[date_str] = {"sales": 0, "transactions": 0}
-                sales_by_day[date_str]["sales"] += float(inv.get("net_total", 0))
-                sales_by_day[date_str]["transactions"] += 1
-        
-        sales_by_day_list = [
-            {"date": date, "sales": data["sales"], "transactions": data["transactions"]}
-            for date, data in sorted(sales_by_day.items())
-        ]
-        
-        # Calculate top products
-        product_sales = {}
-        for inv in invoices:
-            items = inv.get("items", [])
-            if isinstance(items, list):
-                for item in items:
-                    item_code = item.get("item_code", "")
-                    item_name = item.get("item_name", item_code)
-                    qty = float(item.get("qty", 0))
-                    amount = float(item.get("amount", 0))
-                    if item_code not in product_sales:
-                        product_sales[item_code] = {"name": item_name, "sales": 0, "quantity": 0}
-                    product_sales[item_code]["sales"] += amount
-                    product_sales[item_code]["quantity"] += qty
-        
-        top_products = sorted(
-            [
-                {"name": data["name"], "sales": data["sales"], "quantity": data["quantity"]}
-                for data in product_sales.values()
-            ],
-            key=lambda x: x["sales"],
-            reverse=True
-        )[:10]
-        
+        await _refresh_facts(tenant_id)
+        start, end = _date_range(date_from, date_to)
+
+        summary = sales_fact_store.summary(db, tenant_id, start, end, pos_profile_id)
+        sales_by_day = sales_fact_store.series(db, tenant_id, start, end, pos_profile_id)
+        top_products = sales_fact_store.top(db, tenant_id, "item", start, end, pos_profile_id, limit=10)
+        payments = sales_fact_store.top(db, tenant_id, "payment_mode", start, end, pos_profile_id)
+
         dashboard_data = {
             "summary": {
-                "total_sales": round(total_sales, 2),
-                "total_transactions": total_transactions,
-                "avg_transaction": round(avg_transaction, 2),
-                "total_customers": unique_customers,
-                "total_vat": round(total_vat, 2),
+                **summary,
                 "date_range": f"{date_from} to {date_to}"
             },
             "trends": {
-                "sales_by_day": sales_by_day_list
+                "sales_by_day": sales_by_day
             },
             "top_performers": {
-                "products": top_products
+                "products": [
+                    {"name": p["name"], "sales": p["amount"], "quantity": p["quantity"]}
+                    for p in top_products
+                ]
             },
-            "payment_methods": payment_methods,
+            "payment_methods": _payment_breakdown(payments),
             "kpis": {
-                "avg_order_value": round(avg_transaction, 2),
+                "avg_order_value": summary["avg_transaction"],
                 "conversion_rate": 0,  # Would need session data
                 "customer_satisfaction": 0,  # Would need rating data
                 "inventory_turnover": 0  # Would need inventory data
@@ -550,74 +484,123 @@ async def _build_dashboard_analytics(
         return {}
 
 
-async def _build_sales_analytics(tenant_id: str, request: AnalyticsRequest) -> Dict[str, Any]:
-    """Build sales analytics data"""
-    # Implementation would query actual sales data
-    return {
-        "grouped_sales": [],
+async def _build_sales_analytics(db: Session, tenant_id: str, request: AnalyticsRequest) -> Dict[str, Any]:
+    """Build sales analytics data grouped by hour, day, week or month"""
+    await _refresh_facts(tenant_id)
+    start, end = _date_range(request.date_from, request.date_to)
+    grain = request.group_by if request.group_by in ("hour", "day", "week", "month") else "day"
+
+    grouped_sales = sales_fact_store.series(db, tenant_id, start, end, request.pos_profile_id, grain=grain)
+    for period in grouped_sales:
+        period["avg_transaction"] = round(period["sales"] / period["transactions"], 2) if period["transactions"] else 0
+    summary = sales_fact_store.summary(db, tenant_id, start, end, request.pos_profile_id)
+
+    sales_data = {
+        "grouped_sales": grouped_sales,
         "total_metrics": {
-            "total_sales": 0,
-            "total_transactions": 0,
-            "avg_transaction": 0
+            "total_sales": summary["total_sales"],
+            "total_transactions": summary["total_transactions"],
+            "avg_transaction": summary["avg_transaction"]
         }
     }
+    if "top_items" in request.metrics:
+        sales_data["top_items"] = sales_fact_store.top(db, tenant_id, "item", start, end, request.pos_profile_id, limit=10)
+    if "payment_methods" in request.metrics:
+        sales_data["payment_methods"] = _payment_breakdown(
+            sales_fact_store.top(db, tenant_id, "payment_mode", start, end, request.pos_profile_id)
+        )
+    return sales_data
 
 
 async def _build_product_analytics(
-    tenant_id: str, date_from: str, date_to: str, pos_profile_id: Optional[str], limit: int
+    db: Session, tenant_id: str, date_from: str, date_to: str, pos_profile_id: Optional[str], limit: int
 ) -> Dict[str, Any]:
     """Build product analytics data"""
-    # Implementation would query actual product sales data
+    await _refresh_facts(tenant_id)
+    start, end = _date_range(date_from, date_to)
     return {
-        "top_products": [],
-        "product_categories": [],
-        "slow_moving_items": []
+        "top_products": sales_fact_store.top(db, tenant_id, "item", start, end, pos_profile_id, limit=limit),
+        "product_categories": [],  # Item groups are not part of the sales facts
+        "slow_moving_items": sales_fact_store.top(
+            db, tenant_id, "item", start, end, pos_profile_id, limit=limit, ascending=True
+        )
     }
 
 
 async def _build_payment_analytics(
-    tenant_id: str, date_from: str, date_to: str, pos_profile_id: Optional[str]
+    db: Session, tenant_id: str, date_from: str, date_to: str, pos_profile_id: Optional[str]
 ) -> Dict[str, Any]:
     """Build payment method analytics"""
-    # Implementation would query actual payment data
+    await _refresh_facts(tenant_id)
+    start, end = _date_range(date_from, date_to)
     return {
-        "payment_distribution": {},
-        "payment_success_rates": {},
-        "payment_trends": []
+        "payment_distribution": _payment_breakdown(
+            sales_fact_store.top(db, tenant_id, "payment_mode", start, end, pos_profile_id)
+        ),
+        "payment_success_rates": {},  # Only completed payments reach ERPNext invoices
+        "payment_trends": sales_fact_store.series(
+            db, tenant_id, start, end, pos_profile_id, dimension="payment_mode", by_key=True
+        )
     }
 
 
 async def _build_staff_analytics(
-    tenant_id: str, date_from: str, date_to: str, pos_profile_id: Optional[str]
+    db: Session, tenant_id: str, date_from: str, date_to: str, pos_profile_id: Optional[str]
 ) -> Dict[str, Any]:
     """Build staff performance analytics"""
-    # Implementation would query actual staff sales data
+    await _refresh_facts(tenant_id)
+    start, end = _date_range(date_from, date_to)
+    staff = sales_fact_store.top(db, tenant_id, "cashier", start, end, pos_profile_id)
+    performance = [
+        {
+            "staff": row["key"],
+            "sales": row["amount"],
+            "transactions": row["transactions"],
+            "avg_transaction": round(row["amount"] / row["transactions"], 2) if row["transactions"] else 0
+        }
+        for row in staff
+    ]
     return {
-        "staff_performance": [],
-        "staff_metrics": {}
+        "staff_performance": performance,
+        "staff_metrics": {
+            "total_staff": len(performance),
+            "top_performer": performance[0]["staff"] if performance else None
+        }
     }
 
 
 async def _build_customer_analytics(
-    tenant_id: str, date_from: str, date_to: str, pos_profile_id: Optional[str]
+    db: Session, tenant_id: str, date_from: str, date_to: str, pos_profile_id: Optional[str]
 ) -> Dict[str, Any]:
     """Build customer analytics data"""
-    # Implementation would query actual customer data
+    await _refresh_facts(tenant_id)
+    start, end = _date_range(date_from, date_to)
+    customers = sales_fact_store.customers(db, tenant_id, start, end, pos_profile_id)
     return {
-        "customer_segments": {},
+        "customer_segments": {
+            "unique": customers["unique_customers"],
+            "repeat": customers["repeat_customers"]
+        },
         "loyalty_program_stats": {},
-        "customer_lifetime_value": {}
+        "customer_lifetime_value": {
+            "avg_spend": customers["avg_spend_per_customer"],
+            "top_customers": customers["top_customers"]
+        }
     }
 
 
-async def _build_realtime_analytics(tenant_id: str) -> Dict[str, Any]:
-    """Build real-time analytics data"""
-    # Implementation would query current day data
+async def _build_realtime_analytics(db: Session, tenant_id: str) -> Dict[str, Any]:
+    """Build real-time analytics data for the current day"""
+    await _refresh_facts(tenant_id)
+    now = datetime.now()
+    today = now.date()
+    summary = sales_fact_store.summary(db, tenant_id, today, today)
+    hours = sales_fact_store.series(db, tenant_id, today, today, grain="hour")
     return {
-        "today_sales": 0,
-        "today_transactions": 0,
-        "current_hour_sales": 0,
-        "active_customers": 0
+        "today_sales": summary["total_sales"],
+        "today_transactions": summary["total_transactions"],
+        "current_hour_sales": sum(h["sales"] for h in hours if h["hour"] == now.hour),
+        "active_customers": summary["total_customers"]
     }
 
 
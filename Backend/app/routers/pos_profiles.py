@@ -11,6 +11,7 @@ from app.models.pos_profile import (
 )
 from app.services.pos.pos_service_factory import get_pos_service
 from app.services.pos.pos_service_base import PosServiceBase
+from app.services.pos.invoice_preparation import invalidate_profile_context
 from app.dependencies.auth import get_current_token_payload, require_tenant_access
 from app.dependencies.permissions import require_permission
 
@@ -118,6 +119,7 @@ async def update_pos_profile(
             update_data['receipt_settings'] = update_data['receipt_settings'].dict()
         
         result = await pos_service.update_profile(profile_id, **update_data)
+        invalidate_profile_context(tenant_id, profile_id)
         return {"data": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -137,6 +139,7 @@ async def delete_pos_profile(
     """
     try:
         success = await pos_service.delete_profile(profile_id)
+        invalidate_profile_context(tenant_id, profile_id)
         return {"success": success, "message": "Profile deleted successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
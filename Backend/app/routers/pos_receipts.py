@@ -3,15 +3,21 @@
 Handles receipt generation (HTML/thermal/PDF), printing, and delivery.
 """
 
+import asyncio
 import base64
+import json
 
 from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from typing import Optional
+from app.config import settings
 from app.database import get_db
 from app.dependencies.auth import require_tenant_access, get_current_user
 from app.services.pos.receipt_service import ReceiptService
+from app.services.pos.bulk_receipts import BulkReceiptPipeline
+from app.services.cache.receipt_cache import receipt_cache
 from app.services.pos.pos_service_factory import get_pos_service
 from app.services.pos.pos_service_base import PosServiceBase
 
@@ -21,6 +27,7 @@ router = APIRouter(
 )
 
 LANGUAGE_DESC = "Language: en, sw"
+BULK_OUTPUTS = ("json", "ndjson", "pdf")
 
 
 def _validate_invoice_id(invoice_id: str) -> str:
@@ -61,18 +68,84 @@ def _normalize_bulk_print_invoice_ids(invoice_ids: list[str] | None) -> list[str
     return [_validate_invoice_id(i) for i in invoice_ids]
 
 
-def _parse_bulk_print_payload(payload: object, receipt_format: str, width: int, language: str) -> tuple[list[str] | None, str, int, str]:
+async def _fetch_invoice(pos_service: PosServiceBase, invoice_id: str) -> dict:
+    invoice_data = await pos_service._request(
+        method="GET",
+        endpoint=f"/api/resource/Sales Invoice/{invoice_id}"
+    )
+
+    if not invoice_data or not invoice_data.get("data"):
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "type": "invoice_not_found",
+                "message": f"Invoice {invoice_id} not found",
+                "invoice_id": invoice_id
+            }
+        )
+
+    return invoice_data["data"]
+
+
+def _render_receipt(invoice: dict, receipt_format: str, width: int, language: str) -> str | bytes:
+    receipt_service = ReceiptService()
+    if receipt_format == "thermal":
+        return receipt_service.generate_thermal_receipt(invoice_data=invoice, width=width, language=language)
+    if receipt_format == "pdf":
+        return receipt_service.generate_pdf_receipt(invoice_data=invoice, language=language)
+    return receipt_service.generate_html_receipt(invoice_data=invoice, language=language)
+
+
+async def _get_rendered_receipt(
+    pos_service: PosServiceBase,
+    tenant_id: str,
+    invoice_id: str,
+    receipt_format: str,
+    language: str,
+    width: int = 80
+) -> str | bytes:
+    """Rendered receipt (PDF as bytes), served from the receipt cache when the invoice is unchanged."""
+    if receipt_format not in ("thermal", "pdf"):
+        receipt_format = "html"
+    if receipt_format != "thermal":
+        width = 0  # Only thermal output depends on width
+
+    # Reprints of a recently seen submitted invoice skip the ERPNext fetch
+    version = await receipt_cache.known_version(tenant_id, invoice_id)
+    if version:
+        content = await receipt_cache.get(tenant_id, invoice_id, version, receipt_format, width, language)
+        if content is not None:
+            return content
+
+    invoice = await _fetch_invoice(pos_service, invoice_id)
+    modified = str(invoice.get("modified") or "")
+
+    content = None
+    if modified and modified != version:
+        content = await receipt_cache.get(tenant_id, invoice_id, modified, receipt_format, width, language)
+    if content is None:
+        content = await asyncio.to_thread(_render_receipt, invoice, receipt_format, width, language)
+        await receipt_cache.set(tenant_id, invoice_id, modified, receipt_format, width, language, content)
+
+    if invoice.get("docstatus") == 1:
+        await receipt_cache.remember_version(tenant_id, invoice_id, modified)
+    return content
+
+
+def _parse_bulk_print_payload(
+    payload: object, receipt_format: str, width: int, language: str, output: str = "json"
+) -> tuple[list[str] | None, str, int, str, str]:
     """Normalize bulk print input payload.
 
     Supports:
     - ["INV-0001", ...]
-    - {"invoice_ids": [...], "format": "thermal", "width": 80, "language": "en"}
+    - {"invoice_ids": [...], "format": "thermal", "width": 80, "language": "en", "output": "ndjson"}
     """
     invoice_ids: list[str] | None = None
 
     if isinstance(payload, list):
         invoice_ids = payload
-        return invoice_ids, receipt_format, width, language
+        return invoice_ids, receipt_format, width, language, output
 
     if isinstance(payload, dict):
         invoice_ids_value = payload.get("invoice_ids")
@@ -81,9 +154,10 @@ def _parse_bulk_print_payload(payload: object, receipt_format: str, width: int,
         receipt_format = payload.get("format", receipt_format)
         width = payload.get("width", width)
         language = payload.get("language", language)
-        return invoice_ids, receipt_format, width, language
+        output = payload.get("output", output)
+        return invoice_ids, receipt_format, width, language, output
 
-    return None, receipt_format, width, language
+    return None, receipt_format, width, language, output
 
 
 class EmailReceiptRequest(BaseModel):
@@ -113,45 +187,16 @@ async def get_receipt(
     """
     try:
         invoice_id = _validate_invoice_id(invoice_id)
-        receipt_service = ReceiptService()
 
-        # Get invoice data from ERPNext
-        invoice_data = await pos_service._request(
-            method="GET",
-            endpoint=f"/api/resource/Sales Invoice/{invoice_id}"
-        )
-
-        if not invoice_data or not invoice_data.get("data"):
-            raise HTTPException(
-                status_code=404,
-                detail={
-                    "type": "invoice_not_found",
-                    "message": f"Invoice {invoice_id} not found",
-                    "invoice_id": invoice_id
-                }
-            )
-
-        invoice = invoice_data["data"]
+        receipt_content = await _get_rendered_receipt(pos_service, tenant_id, invoice_id, receipt_format, language)
 
         # Generate receipt based on format
         if receipt_format == "thermal":
-            receipt_content = receipt_service.generate_thermal_receipt(
-                invoice_data=invoice,
-                language=language
-            )
             content_type = "text/plain"
         elif receipt_format == "pdf":
-            pdf_bytes = receipt_service.generate_pdf_receipt(
-                invoice_data=invoice,
-                language=language
-            )
-            receipt_content = base64.b64encode(pdf_bytes).decode("ascii")
+            receipt_content = base64.b64encode(receipt_content).decode("ascii")
             content_type = "application/pdf"
         else:  # html
-            receipt_content = receipt_service.generate_html_receipt(
-                invoice_data=invoice,
-                language=language
-            )
             content_type = "text/html"
 
         return {
@@ -196,29 +241,8 @@ async def email_receipt(
 
         resolved_language = request.language or language
 
-        # Get invoice data
-        invoice_data = await pos_service._request(
-            method="GET",
-            endpoint=f"/api/resource/Sales Invoice/{invoice_id}"
-        )
-
-        if not invoice_data or not invoice_data.get("data"):
-            raise HTTPException(
-                status_code=404,
-                detail={
-                    "type": "invoice_not_found",
-                    "message": f"Invoice {invoice_id} not found",
-                    "invoice_id": invoice_id
-                }
-            )
-
-        invoice = invoice_data["data"]
-
         # Generate HTML receipt
-        receipt_html = receipt_service.generate_html_receipt(
-            invoice_data=invoice,
-            language=resolved_language
-        )
+        receipt_html = await _get_rendered_receipt(pos_service, tenant_id, invoice_id, "html", resolved_language)
 
         # Send email
         result = receipt_service.send_receipt_email(
@@ -264,29 +288,9 @@ async def sms_receipt(
 
         resolved_language = request.language or language
 
-        # Get invoice data
-        invoice_data = await pos_service._request(
-            method="GET",
-            endpoint=f"/api/resource/Sales Invoice/{invoice_id}"
-        )
-
-        if not invoice_data or not invoice_data.get("data"):
-            raise HTTPException(
-                status_code=404,
-                detail={
-                    "type": "invoice_not_found",
-                    "message": f"Invoice {invoice_id} not found",
-                    "invoice_id": invoice_id
-                }
-            )
-
-        invoice = invoice_data["data"]
-
-        # Generate thermal receipt (text format for SMS)
-        receipt_text = receipt_service.generate_thermal_receipt(
-            invoice_data=invoice,
-            width=48,  # SMS-friendly width
-            language=resolved_language
+        # Generate thermal receipt (text format for SMS, SMS-friendly width)
+        receipt_text = await _get_rendered_receipt(
+            pos_service, tenant_id, invoice_id, "thermal", resolved_language, width=48
         )
 
         # Send SMS
@@ -329,31 +333,10 @@ async def get_thermal_receipt(
     """
     try:
         invoice_id = _validate_invoice_id(invoice_id)
-        receipt_service = ReceiptService()
-
-        # Get invoice data
-        invoice_data = await pos_service._request(
-            method="GET",
-            endpoint=f"/api/resource/Sales Invoice/{invoice_id}"
-        )
-
-        if not invoice_data or not invoice_data.get("data"):
-            raise HTTPException(
-                status_code=404,
-                detail={
-                    "type": "invoice_not_found",
-                    "message": f"Invoice {invoice_id} not found",
-                    "invoice_id": invoice_id
-                }
-            )
-
-        invoice = invoice_data["data"]
 
         # Generate thermal receipt
-        receipt_content = receipt_service.generate_thermal_receipt(
-            invoice_data=invoice,
-            width=width,
-            language=language
+        receipt_content = await _get_rendered_receipt(
+            pos_service, tenant_id, invoice_id, "thermal", language, width=width
         )
 
         return {
@@ -385,6 +368,7 @@ async def bulk_print_receipts(
     receipt_format: str = Query("thermal", alias="format", description="Receipt format: thermal, html"),
     width: int = Query(80, description="Printer width for thermal format"),
     language: str = Query("en", description=LANGUAGE_DESC),
+    output: str = Query("json", description="Response: json, ndjson (streamed, one receipt per line), pdf (one merged PDF)"),
     tenant_id: str = Depends(require_tenant_access),
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -393,14 +377,16 @@ async def bulk_print_receipts(
     """
     Generate receipts for multiple invoices
 
-    Useful for end-of-day batch printing
+    Useful for end-of-day batch printing. Streamed (ndjson) and merged PDF
+    output accept larger batches than the buffered JSON response.
     """
     try:
-        invoice_ids, receipt_format, width, language = _parse_bulk_print_payload(
+        invoice_ids, receipt_format, width, language, output = _parse_bulk_print_payload(
             payload=payload,
             receipt_format=receipt_format,
             width=width,
             language=language,
+            output=output,
         )
 
         invoice_ids = _normalize_bulk_print_invoice_ids(invoice_ids)
@@ -414,60 +400,69 @@ async def bulk_print_receipts(
                 }
             )
 
-        if len(invoice_ids) > 50:  # Limit batch size
+        if output not in BULK_OUTPUTS:
             raise HTTPException(
                 status_code=400,
                 detail={
                     "type": "validation_error",
-                    "message": "Maximum 50 invoices allowed in batch",
+                    "message": f"Unknown output '{output}'",
+                    "supported_outputs": list(BULK_OUTPUTS)
+                }
+            )
+
+        limit = settings.RECEIPT_BULK_SYNC_LIMIT if output == "json" else settings.RECEIPT_BULK_STREAM_LIMIT
+        if len(invoice_ids) > limit:  # Limit batch size
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "type": "validation_error",
+                    "message": f"Maximum {limit} invoices allowed in batch for {output} output",
                     "provided_count": len(invoice_ids)
                 }
             )
 
-        receipt_service = ReceiptService()
-        receipts = []
-
-        for invoice_id in invoice_ids:
-            try:
-                # Get invoice data
-                invoice_data = await pos_service._request(
-                    method="GET",
-                    endpoint=f"/api/resource/Sales Invoice/{invoice_id}"
+        pipeline = BulkReceiptPipeline(pos_service)
+
+        if output == "pdf":
+            pdf_bytes, missing = await pipeline.merged_pdf(invoice_ids, language=language)
+            if not pdf_bytes:
+                raise HTTPException(
+                    status_code=404,
+                    detail={
+                        "type": "invoice_not_found",
+                        "message": "None of the requested invoices were found",
+                        "invoice_ids": missing
+                    }
                 )
+            return Response(
+                content=pdf_bytes,
+                media_type="application/pdf",
+                headers={
+                    "Content-Disposition": 'attachment; filename="receipts.pdf"',
+                    "X-Receipts-Missing": ",".join(missing)
+                }
+            )
 
-                if invoice_data and invoice_data.get("data"):
-                    invoice = invoice_data["data"]
-
-                    if receipt_format == "thermal":
-                        content = receipt_service.generate_thermal_receipt(
-                            invoice_data=invoice,
-                            width=width,
-                            language=language
-                        )
-                    else:  # html
-                        content = receipt_service.generate_html_receipt(
-                            invoice_data=invoice,
-                            language=language
-                        )
-
-                    receipts.append({
-                        "invoice_id": invoice_id,
-                        "content": content,
-                        "success": True
-                    })
-                else:
-                    receipts.append({
-                        "invoice_id": invoice_id,
-                        "success": False,
-                        "error": "Invoice not found"
-                    })
-
-            except Exception as e:
-                receipts.append({
-                    "invoice_id": invoice_id,
-                    "success": False,
-                    "error": str(e)
-                })
+        if output == "ndjson":
+            async def stream_lines():
+                successful = 0
+                async for receipt in pipeline.iter_receipts(invoice_ids, receipt_format, width, language):
+                    successful += receipt["success"]
+                    yield json.dumps(receipt) + "\n"
+                yield json.dumps({
+                    "summary": True,
+                    "format": receipt_format,
+                    "language": language,
+                    "total_requested": len(invoice_ids),
+                    "successful": successful,
+                    "failed": len(invoice_ids) - successful
+                }) + "\n"
+
+            return StreamingResponse(stream_lines(), media_type="application/x-ndjson")
+
+        receipts = [
+            receipt async for receipt in pipeline.iter_receipts(invoice_ids, receipt_format, width, language)
+        ]
 
         successful_count = sum(1 for r in receipts if r["success"])
         failed_count = len(receipts) - successful_count
@@ -491,4 +486,4 @@ async def bulk_print_receipts(
                 "message": "Failed to generate bulk receipts",
                 "error": str(e)
             }
-        )
\ No newline at end of file
+        )
@@ -9,7 +9,8 @@ from sqlalchemy.orm import Session
 from typing import Optional, Dict, Any, List
 from app.database import get_db
 from app.dependencies.auth import require_tenant_access, get_current_user
-from app.services.pos.offline_service import OfflineService, OfflineTransaction, SyncConflict
+from app.services.erpnext_client import erpnext_adapter
+from app.services.pos.offline_service import OfflineService, OfflineSpillStore, OfflineTransaction, SyncConflict
 from app.services.pos.pos_service_factory import get_pos_service
 from app.services.pos.pos_service_base import PosServiceBase
 
@@ -21,7 +22,7 @@ router = APIRouter(
 )
 
 # Global offline service instance
-offline_service = OfflineService()
+offline_service = OfflineService(erpnext_adapter=erpnext_adapter, spill_store=OfflineSpillStore())
 
 
 @router.get("/status")
@@ -52,6 +53,7 @@ async def get_sync_status(
 @router.get("/pending")
 async def get_pending_transactions(
     limit: int = Query(50, description="Maximum transactions to return"),
+    cursor: int = Query(0, description="Return transactions queued after this sequence (the previous page's next_cursor)"),
     tenant_id: str = Depends(require_tenant_access),
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -62,11 +64,12 @@ async def get_pending_transactions(
     Returns list of transactions waiting to be synchronized
     """
     try:
-        transactions = await offline_service.get_pending_transactions(tenant_id, limit)
+        transactions = await offline_service.get_pending_transactions(tenant_id, limit, cursor)
         return {
             "pending_transactions": [tx.to_dict() for tx in transactions],
             "count": len(transactions),
-            "limit": limit
+            "limit": limit,
+            "next_cursor": transactions[-1].sequence if len(transactions) == limit else None
         }
     except Exception as e:
         raise HTTPException(
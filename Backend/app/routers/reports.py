@@ -3,17 +3,23 @@ Reports API
 Cross-module reporting for business intelligence and analytics
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
 from pydantic import BaseModel, Field
 from enum import Enum
+import asyncio
 import json
 import logging
+import os
 
+from app.config import settings
 from app.database import get_db
 from app.dependencies.auth import require_tenant_access, get_current_user
 from app.services.erpnext_client import erpnext_adapter
+from app.services.report_jobs import report_jobs
+from app.services.report_query import report_query, rounded
 
 router = APIRouter(
     prefix="/reports",
@@ -266,59 +272,167 @@ async def get_stock_levels(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "json": "application/json"}
+
+
+def _export_format(format: ReportFormat) -> str:
+    if format.value not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "type": "invalid_format",
+                "message": f"Format '{format.value}' not supported for row exports",
+                "supported_formats": list(EXPORT_MEDIA_TYPES)
+            }
+        )
+    return format.value
+
+
+def _job_response(tenant_id: str, job: Dict[str, Any]) -> Dict[str, Any]:
+    response = dict(job)
+    if job["status"] == "completed":
+        response["download_url"] = f"/api/tenants/{tenant_id}/reports/jobs/{job['job_id']}/download"
+    return response
+
+
+@router.post("/jobs", status_code=202)
+async def create_report_job(
+    request: ReportRequest,
+    tenant_id: str = Depends(require_tenant_access),
+    current_user: dict = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """
+    Start a background export of a report's rows
+    
+    Returns a job handle; poll it until status is "completed", then fetch download_url
+    """
+    export_format = _export_format(request.format)
+    try:
+        job = await report_jobs.submit(
+            tenant_id, request.report_type.value, request.date_from, request.date_to, export_format
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _job_response(tenant_id, job)
+
+
+@router.get("/jobs/{job_id}")
+async def get_report_job(
+    job_id: str,
+    tenant_id: str = Depends(require_tenant_access),
+    current_user: dict = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Get the status of a background report export"""
+    job = await report_jobs.get(tenant_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found or expired")
+    return _job_response(tenant_id, job)
+
+
+@router.get("/jobs/{job_id}/download")
+async def download_report_job(
+    job_id: str,
+    tenant_id: str = Depends(require_tenant_access),
+    current_user: dict = Depends(get_current_user)
+):
+    """Download a completed report export"""
+    job = await report_jobs.get(tenant_id, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Report job not found or expired")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Report job is {job['status']}")
+    
+    path = report_jobs.file_path(tenant_id, job_id, job["format"])
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Report file has expired")
+    return FileResponse(
+        path,
+        media_type=EXPORT_MEDIA_TYPES[job["format"]],
+        filename=f"{job['report_type']}-report-{job_id}.{job['format']}"
+    )
+
+
+@router.get("/{report_type}/rows")
+async def stream_report_rows(
+    report_type: ReportType,
+    date_from: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    format: ReportFormat = Query(ReportFormat.CSV, description="Output format (csv or json)"),
+    tenant_id: str = Depends(require_tenant_access),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Stream every row behind a report
+    
+    Rows are fetched from ERPNext page by page and written out as they arrive,
+    so memory use does not grow with the size of the report
+    """
+    export_format = _export_format(format)
+    return StreamingResponse(
+        report_query.stream_dataset(tenant_id, report_type.value, date_from, date_to, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{report_type.value}-report.{export_format}"'}
+    )
+
+
 # Report generation helper functions
+# Totals and breakdowns are aggregated by ERPNext (see app.services.report_query);
+# only one row per group crosses the wire
+
+def _date_filters(date_from: str, date_to: str) -> List[List[Any]]:
+    return [["posting_date", ">=", date_from], ["posting_date", "<=", date_to]]
+
+
+def _group_map(rows: List[Dict[str, Any]], key: str, *fields: str) -> Dict[str, Dict[str, Any]]:
+    """Index grouped aggregate rows by their group value"""
+    return {
+        row.get(key) or "Unknown": {
+            field: int(row.get(field) or 0) if field == "entries" else rounded(row.get(field))
+            for field in fields
+        }
+        for row in rows
+    }
+
 
 async def _generate_sales_report(
     tenant_id: str, date_from: str, date_to: str
 ) -> Dict[str, Any]:
     """Generate sales report from ERPNext data"""
     try:
-        filters = [
-            ["docstatus", "=", 1],
-            ["posting_date", ">=", date_from],
-            ["posting_date", "<=", date_to]
-        ]
-        
-        invoices = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/Sales Invoice",
-            method="GET",
-            params={
-                "filters": json.dumps(filters),
-                "fields": json.dumps([
-                    "name", "customer", "grand_total", "net_total",
-                    "total_taxes_and_charges", "posting_date", "status"
-                ]),
-                "limit_page_length": 1000
-            }
+        filters = [["docstatus", "=", 1]] + _date_filters(date_from, date_to)
+        
+        totals, by_customer = await asyncio.gather(
+            report_query.totals(tenant_id, "Sales Invoice", [
+                "count(name) as invoices",
+                "sum(grand_total) as revenue",
+                "sum(net_total) as net_sales",
+                "sum(total_taxes_and_charges) as tax"
+            ], filters),
+            report_query.aggregate(
+                tenant_id, "Sales Invoice",
+                ["customer", "count(name) as invoices", "sum(grand_total) as total"],
+                filters, group_by="customer", order_by="total desc", limit=10
+            )
         )
         
-        data = invoices.get("data", []) if isinstance(invoices, dict) else []
-        
-        total_revenue = sum(float(inv.get("grand_total", 0)) for inv in data)
-        total_net = sum(float(inv.get("net_total", 0)) for inv in data)
-        total_tax = sum(float(inv.get("total_taxes_and_charges", 0)) for inv in data)
-        
-        # Group by customer
-        by_customer = {}
-        for inv in data:
-            customer = inv.get("customer", "Unknown")
-            if customer not in by_customer:
-                by_customer[customer] = {"count": 0, "total": 0}
-            by_customer[customer]["count"] += 1
-            by_customer[customer]["total"] += float(inv.get("grand_total", 0))
+        invoices = int(totals.get("invoices", 0))
+        revenue = rounded(totals.get("revenue"))
         
         return {
             "summary": {
-                "total_invoices": len(data),
-                "total_revenue": round(total_revenue, 2),
-                "total_net_sales": round(total_net, 2),
-                "total_tax": round(total_tax, 2),
-                "avg_invoice_value": round(total_revenue / len(data), 2) if data else 0
+                "total_invoices": invoices,
+                "total_revenue": revenue,
+                "total_net_sales": rounded(totals.get("net_sales")),
+                "total_tax": rounded(totals.get("tax")),
+                "avg_invoice_value": round(revenue / invoices, 2) if invoices else 0
             },
             "by_customer": [
-                {"customer": k, "invoices": v["count"], "total": round(v["total"], 2)}
-                for k, v in sorted(by_customer.items(), key=lambda x: x[1]["total"], reverse=True)[:10]
+                {
+                    "customer": row.get("customer") or "Unknown",
+                    "invoices": int(row.get("invoices") or 0),
+                    "total": rounded(row.get("total"))
+                }
+                for row in by_customer
             ]
         }
         
@@ -332,49 +446,32 @@ async def _generate_inventory_report(
 ) -> Dict[str, Any]:
     """Generate inventory report"""
     try:
-        # Get items
-        items = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/Item",
-            method="GET",
-            params={
-                "filters": json.dumps([["is_stock_item", "=", 1]]),
-                "fields": json.dumps(["name", "item_name", "item_group", "stock_uom"]),
-                "limit_page_length": 500
-            }
-        )
-        
-        item_list = items.get("data", []) if isinstance(items, dict) else []
-        
-        # Get stock levels
-        bins = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/Bin",
-            method="GET",
-            params={
-                "fields": json.dumps(["item_code", "warehouse", "actual_qty", "valuation_rate"]),
-                "limit_page_length": 1000
-            }
-        )
-        
-        bin_data = bins.get("data", []) if isinstance(bins, dict) else []
-        
-        # Calculate totals
-        total_qty = sum(float(b.get("actual_qty", 0)) for b in bin_data)
-        total_value = sum(
-            float(b.get("actual_qty", 0)) * float(b.get("valuation_rate", 0))
-            for b in bin_data
+        items, by_warehouse, low_stock = await asyncio.gather(
+            report_query.totals(
+                tenant_id, "Item", ["count(name) as items"], [["is_stock_item", "=", 1]]
+            ),
+            report_query.aggregate(
+                tenant_id, "Bin",
+                ["warehouse", "count(name) as entries", "sum(actual_qty) as quantity", "sum(stock_value) as value"],
+                group_by="warehouse", order_by="value desc"
+            ),
+            report_query.aggregate(
+                tenant_id, "Bin",
+                ["item_code", "warehouse", "actual_qty", "projected_qty"],
+                [["actual_qty", "<", settings.REPORT_LOW_STOCK_THRESHOLD]],
+                order_by="actual_qty asc", limit=50
+            )
         )
         
         return {
             "summary": {
-                "total_items": len(item_list),
-                "total_stock_entries": len(bin_data),
-                "total_quantity": round(total_qty, 2),
-                "total_value": round(total_value, 2)
+                "total_items": int(items.get("items", 0)),
+                "total_stock_entries": sum(int(row.get("entries") or 0) for row in by_warehouse),
+                "total_quantity": rounded(sum(float(row.get("quantity") or 0) for row in by_warehouse)),
+                "total_value": rounded(sum(float(row.get("value") or 0) for row in by_warehouse))
             },
-            "by_warehouse": {},
-            "low_stock_items": []
+            "by_warehouse": _group_map(by_warehouse, "warehouse", "entries", "quantity", "value"),
+            "low_stock_items": low_stock
         }
         
     except Exception as e:
@@ -387,37 +484,31 @@ async def _generate_finance_report(
 ) -> Dict[str, Any]:
     """Generate financial summary report"""
     try:
-        # Get GL entries
-        gl_entries = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/GL Entry",
-            method="GET",
-            params={
-                "filters": json.dumps([
-                    ["posting_date", ">=", date_from],
-                    ["posting_date", "<=", date_to]
-                ]),
-                "fields": json.dumps([
-                    "account", "debit", "credit", "posting_date", "voucher_type"
-                ]),
-                "limit_page_length": 1000
-            }
+        filters = [["is_cancelled", "=", 0]] + _date_filters(date_from, date_to)
+        sums = ["count(name) as entries", "sum(debit) as total_debit", "sum(credit) as total_credit"]
+        
+        by_voucher_type, by_account = await asyncio.gather(
+            report_query.aggregate(
+                tenant_id, "GL Entry", ["voucher_type"] + sums, filters, group_by="voucher_type"
+            ),
+            report_query.aggregate(
+                tenant_id, "GL Entry", ["account"] + sums, filters,
+                group_by="account", order_by="total_debit desc", limit=25
+            )
         )
         
-        entries = gl_entries.get("data", []) if isinstance(gl_entries, dict) else []
-        
-        total_debit = sum(float(e.get("debit", 0)) for e in entries)
-        total_credit = sum(float(e.get("credit", 0)) for e in entries)
+        total_debit = sum(float(row.get("total_debit") or 0) for row in by_voucher_type)
+        total_credit = sum(float(row.get("total_credit") or 0) for row in by_voucher_type)
         
         return {
             "summary": {
-                "total_entries": len(entries),
-                "total_debit": round(total_debit, 2),
-                "total_credit": round(total_credit, 2),
-                "net_movement": round(total_debit - total_credit, 2)
+                "total_entries": sum(int(row.get("entries") or 0) for row in by_voucher_type),
+                "total_debit": rounded(total_debit),
+                "total_credit": rounded(total_credit),
+                "net_movement": rounded(total_debit - total_credit)
             },
-            "by_voucher_type": {},
-            "by_account": {}
+            "by_voucher_type": _group_map(by_voucher_type, "voucher_type", "entries", "total_debit", "total_credit"),
+            "by_account": _group_map(by_account, "account", "entries", "total_debit", "total_credit")
         }
         
     except Exception as e:
@@ -430,33 +521,36 @@ async def _generate_purchases_report(
 ) -> Dict[str, Any]:
     """Generate purchases report"""
     try:
-        purchases = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/Purchase Invoice",
-            method="GET",
-            params={
-                "filters": json.dumps([
-                    ["docstatus", "=", 1],
-                    ["posting_date", ">=", date_from],
-                    ["posting_date", "<=", date_to]
-                ]),
-                "fields": json.dumps([
-                    "name", "supplier", "grand_total", "posting_date", "status"
-                ]),
-                "limit_page_length": 500
-            }
+        filters = [["docstatus", "=", 1]] + _date_filters(date_from, date_to)
+        
+        totals, by_supplier = await asyncio.gather(
+            report_query.totals(
+                tenant_id, "Purchase Invoice", ["count(name) as invoices", "sum(grand_total) as total"], filters
+            ),
+            report_query.aggregate(
+                tenant_id, "Purchase Invoice",
+                ["supplier", "count(name) as invoices", "sum(grand_total) as total"],
+                filters, group_by="supplier", order_by="total desc", limit=10
+            )
         )
         
-        data = purchases.get("data", []) if isinstance(purchases, dict) else []
-        total = sum(float(p.get("grand_total", 0)) for p in data)
+        invoices = int(totals.get("invoices", 0))
+        total = rounded(totals.get("total"))
         
         return {
             "summary": {
-                "total_invoices": len(data),
-                "total_purchases": round(total, 2),
-                "avg_purchase_value": round(total / len(data), 2) if data else 0
+                "total_invoices": invoices,
+                "total_purchases": total,
+                "avg_purchase_value": round(total / invoices, 2) if invoices else 0
             },
-            "by_supplier": []
+            "by_supplier": [
+                {
+                    "supplier": row.get("supplier") or "Unknown",
+                    "invoices": int(row.get("invoices") or 0),
+                    "total": rounded(row.get("total"))
+                }
+                for row in by_supplier
+            ]
         }
         
     except Exception as e:
@@ -469,24 +563,19 @@ async def _generate_customers_report(
 ) -> Dict[str, Any]:
     """Generate customer analytics report"""
     try:
-        customers = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/Customer",
-            method="GET",
-            params={
-                "fields": json.dumps(["name", "customer_name", "customer_group", "territory"]),
-                "limit_page_length": 500
-            }
-        )
-        
-        data = customers.get("data", []) if isinstance(customers, dict) else []
+        by_group, by_territory = await asyncio.gather(*(
+            report_query.aggregate(
+                tenant_id, "Customer", [group, "count(name) as customers"], group_by=group
+            )
+            for group in ("customer_group", "territory")
+        ))
         
         return {
             "summary": {
-                "total_customers": len(data)
+                "total_customers": sum(int(row.get("customers") or 0) for row in by_group)
             },
-            "by_group": {},
-            "by_territory": {}
+            "by_group": {row.get("customer_group") or "Unknown": int(row.get("customers") or 0) for row in by_group},
+            "by_territory": {row.get("territory") or "Unknown": int(row.get("customers") or 0) for row in by_territory}
         }
         
     except Exception as e:
@@ -499,25 +588,20 @@ async def _generate_employees_report(
 ) -> Dict[str, Any]:
     """Generate employee report"""
     try:
-        employees = erpnext_adapter.proxy_request(
-            tenant_id=tenant_id,
-            path="resource/Employee",
-            method="GET",
-            params={
-                "filters": json.dumps([["status", "=", "Active"]]),
-                "fields": json.dumps(["name", "employee_name", "department", "designation"]),
-                "limit_page_length": 500
-            }
-        )
-        
-        data = employees.get("data", []) if isinstance(employees, dict) else []
+        filters = [["status", "=", "Active"]]
+        by_department, by_designation = await asyncio.gather(*(
+            report_query.aggregate(
+                tenant_id, "Employee", [group, "count(name) as employees"], filters, group_by=group
+            )
+            for group in ("department", "designation")
+        ))
         
         return {
             "summary": {
-                "total_employees": len(data)
+                "total_employees": sum(int(row.get("employees") or 0) for row in by_department)
             },
-            "by_department": {},
-            "by_designation": {}
+            "by_department": {row.get("department") or "Unknown": int(row.get("employees") or 0) for row in by_department},
+            "by_designation": {row.get("designation") or "Unknown": int(row.get("employees") or 0) for row in by_designation}
         }
         
     except Exception as e:
@@ -570,6 +570,7 @@ async def add_permissions_to_role(
     )
     
     db.commit()
+    rbac_service.invalidate_role_holders_cache(db, role.id)
     
     return {"message": f"Added {added_count} permission(s) to role", "added_count": added_count}
 
@@ -636,5 +637,6 @@ async def remove_permission_from_role(
     
     db.delete(role_perm)
     db.commit()
+    rbac_service.invalidate_role_holders_cache(db, role.id)
     
     return None
@@ -16,6 +16,7 @@ from sqlalchemy.orm import Session
 from ..dependencies.auth import get_current_user, require_tenant_access
 from ..database import get_db
 from ..services.tax_service import TaxService
+from ..services.tax_rule_cache import tax_rule_cache
 from ..models.tax import (
     TaxType, TaxRate, ItemTaxTemplate, TaxTransaction,
     WithholdingTaxConfig, TaxSettings, TaxFilingPeriod
@@ -160,6 +161,7 @@ async def create_tax_type(
     db.add(tax_type)
     db.commit()
     db.refresh(tax_type)
+    tax_rule_cache.invalidate(tenant_id)
     
     return {"message": "Tax type created", "tax_type_id": str(tax_type.id)}
 
@@ -289,6 +291,7 @@ async def create_tax_rate(
     db.add(rate)
     db.commit()
     db.refresh(rate)
+    tax_rule_cache.invalidate(tenant_id)
     
     return {"message": "Tax rate created", "tax_rate_id": str(rate.id)}
 
@@ -346,6 +349,7 @@ async def create_tax_template(
     db.add(template)
     db.commit()
     db.refresh(template)
+    tax_rule_cache.invalidate(tenant_id)
     
     return {"message": "Tax template created", "template_id": str(template.id)}
 
@@ -551,6 +555,7 @@ async def update_tax_settings(
     
     settings.updated_at = datetime.utcnow()
     db.commit()
+    tax_rule_cache.invalidate(tenant_id)
     
     return {"message": "Tax settings updated"}
 
@@ -648,6 +653,7 @@ async def setup_kenya_tax_defaults(
         db.add(wht)
     
     db.commit()
+    tax_rule_cache.invalidate(tenant_id)
     
     return {
         "message": "Kenya tax defaults configured",
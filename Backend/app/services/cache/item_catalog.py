@@ -0,0 +1,341 @@
+"""
+POS Item Catalogue Mirror
+Tenant-scoped copy of the ERPNext item catalogue kept in Redis and synced
+incrementally from ERPNext `modified` timestamps.
+
+Layout per tenant:
+    pos:catalog:{tenant}:items  HASH item_code -> normalized item JSON
+    pos:catalog:{tenant}:meta   HASH watermark, version, synced_at, full_synced_at, count
+    pos:catalog:{tenant}:lock   sync lock (SET NX EX) so one worker syncs at a time
+
+`version` only moves when the mirrored data actually changes, so it doubles
+as the ETag source for item listings.
+"""
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+ITEM_FIELDS = [
+    "name",
+    "item_code",
+    "item_name",
+    "item_group",
+    "standard_rate",
+    "stock_uom",
+    "is_stock_item",
+    "description",
+    "image",
+    "disabled",
+    "modified",
+]
+
+SYNC_LOCK_TTL = 120
+
+
+def normalize_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize an ERPNext Item row into the shape served to POS clients."""
+    item_code = item.get("item_code") or item.get("name")
+    return {
+        "item_code": item_code,
+        "item_name": item.get("item_name") or item_code,
+        "item_group": item.get("item_group"),
+        "standard_rate": item.get("standard_rate") or 0,
+        "stock_uom": item.get("stock_uom") or "Nos",
+        "is_stock_item": bool(item.get("is_stock_item")) if item.get("is_stock_item") is not None else None,
+        "description": item.get("description"),
+        "image": item.get("image"),
+        "modified": item.get("modified"),
+    }
+
+
+def public_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Strip sync bookkeeping fields from a mirrored item."""
+    return {k: v for k, v in item.items() if k != "modified"}
+
+
+class ItemCatalogMirror:
+    """Redis-backed, incrementally synced item catalogue per tenant"""
+
+    def __init__(self, redis_client=None, page_size: Optional[int] = None):
+        """
+        Initialize catalogue mirror
+
+        Args:
+            redis_client: redis.asyncio client (decode_responses=True)
+            page_size: ERPNext page size used while syncing
+        """
+        self.redis = redis_client
+        self.page_size = page_size or settings.POS_CATALOG_PAGE_SIZE
+        # tenant_id -> (version, items sorted by name); avoids re-reading the hash per request
+        self._snapshots: Dict[str, Tuple[int, List[Dict[str, Any]]]] = {}
+
+    @staticmethod
+    def _items_key(tenant_id: str) -> str:
+        return f"pos:catalog:{tenant_id}:items"
+
+    @staticmethod
+    def _meta_key(tenant_id: str) -> str:
+        return f"pos:catalog:{tenant_id}:meta"
+
+    @staticmethod
+    def _lock_key(tenant_id: str) -> str:
+        return f"pos:catalog:{tenant_id}:lock"
+
+    async def get_meta(self, tenant_id: str) -> Dict[str, Any]:
+        """Get sync metadata for a tenant (empty dict if never synced)"""
+        meta = await self.redis.hgetall(self._meta_key(tenant_id))
+        if not meta:
+            return {}
+        return {
+            "watermark": meta.get("watermark") or "",
+            "version": int(meta.get("version") or 0),
+            "synced_at": float(meta.get("synced_at") or 0),
+            "full_synced_at": float(meta.get("full_synced_at") or 0),
+            "count": int(meta.get("count") or 0),
+        }
+
+    async def fetch_from_erpnext(
+        self,
+        tenant_id: str,
+        erpnext_adapter,
+        modified_since: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Page through ERPNext items ordered by `modified`.
+
+        A full fetch skips disabled items; a delta fetch includes them so the
+        mirror can drop items that were disabled since the last sync.
+        """
+        filters = [["modified", ">=", modified_since]] if modified_since else [["disabled", "=", 0]]
+        rows: List[Dict[str, Any]] = []
+        start = 0
+        while True:
+            response = await erpnext_adapter.aproxy_request(
+                tenant_id=tenant_id,
+                path="resource/Item",
+                method="GET",
+                params={
+                    "fields": json.dumps(ITEM_FIELDS),
+                    "filters": json.dumps(filters),
+                    "order_by": "modified asc",
+                    "limit_start": start,
+                    "limit_page_length": self.page_size,
+                }
+            )
+            page = response.get("data", []) if isinstance(response, dict) else (response or [])
+            rows.extend(row for row in page if isinstance(row, dict))
+            if len(page) < self.page_size:
+                return rows
+            start += self.page_size
+
+    async def sync(self, tenant_id: str, erpnext_adapter, full: bool = False) -> Dict[str, int]:
+        """
+        Sync the mirror from ERPNext.
+
+        Delta syncs fetch items modified at or after the stored watermark.
+        Full syncs rebuild the hash, which is also how hard-deleted items are
+        dropped. The version is bumped only when mirrored data changes.
+
+        Returns:
+            Sync statistics (fetched, upserted, removed, version)
+        """
+        meta = await self.get_meta(tenant_id)
+        full = full or not meta
+        rows = await self.fetch_from_erpnext(
+            tenant_id, erpnext_adapter, None if full else meta["watermark"] or None
+        )
+        watermark = max((row.get("modified") or "" for row in rows), default="")
+        watermark = max(watermark, meta.get("watermark", ""))
+        now = time.time()
+        items_key = self._items_key(tenant_id)
+
+        if full:
+            catalogue = {}
+            for row in rows:
+                if row.get("disabled"):
+                    continue
+                item = normalize_item(row)
+                if item["item_code"]:
+                    catalogue[item["item_code"]] = json.dumps(item, sort_keys=True)
+
+            existing = await self.redis.hgetall(items_key)
+            changed = existing != catalogue
+            if changed:
+                if catalogue:
+                    staging_key = f"{items_key}:staging"
+                    await self.redis.delete(staging_key)
+                    await self.redis.hset(staging_key, mapping=catalogue)
+                    await self.redis.rename(staging_key, items_key)
+                else:
+                    await self.redis.delete(items_key)
+            upserted = len(set(catalogue.items()) - set(existing.items()))
+            removed = len(set(existing) - set(catalogue))
+            count = len(catalogue)
+        else:
+            codes = [row.get("item_code") or row.get("name") for row in rows]
+            codes = [code for code in codes if code]
+            current = dict(zip(codes, await self.redis.hmget(items_key, codes))) if codes else {}
+            to_set: Dict[str, str] = {}
+            to_remove: List[str] = []
+            for row in rows:
+                item = normalize_item(row)
+                code = item["item_code"]
+                if not code:
+                    continue
+                if row.get("disabled"):
+                    if current.get(code) is not None:
+                        to_remove.append(code)
+                    continue
+                encoded = json.dumps(item, sort_keys=True)
+                if current.get(code) != encoded:
+                    to_set[code] = encoded
+            if to_set:
+                await self.redis.hset(items_key, mapping=to_set)
+            if to_remove:
+                await self.redis.hdel(items_key, *to_remove)
+            changed = bool(to_set or to_remove)
+            upserted, removed = len(to_set), len(to_remove)
+            count = await self.redis.hlen(items_key)
+
+        version = meta.get("version", 0) + (1 if changed or not meta else 0)
+        mapping = {
+            "watermark": watermark,
+            "version": version,
+            "synced_at": now,
+            "count": count,
+            "full_synced_at": now if full else meta.get("full_synced_at", 0),
+        }
+        await self.redis.hset(self._meta_key(tenant_id), mapping=mapping)
+
+        stats = {"fetched": len(rows), "upserted": upserted, "removed": removed, "version": version}
+        logger.info(f"Catalogue {'full' if full else 'delta'} sync for tenant {tenant_id}: {stats}")
+        return stats
+
+    async def ensure_fresh(self, tenant_id: str, erpnext_adapter) -> bool:
+        """
+        Sync the mirror if it is older than the sync interval.
+
+        Only the worker holding the sync lock syncs; others keep serving the
+        current mirror. Returns False when the tenant has never been synced
+        and another worker is doing the first sync.
+        """
+        meta = await self.get_meta(tenant_id)
+        now = time.time()
+        if meta and now - meta["synced_at"] < settings.POS_CATALOG_SYNC_INTERVAL:
+            return True
+
+        lock_key = self._lock_key(tenant_id)
+        if not await self.redis.set(lock_key, "1", nx=True, ex=SYNC_LOCK_TTL):
+            return bool(meta)
+        try:
+            full = not meta or now - meta["full_synced_at"] >= settings.POS_CATALOG_FULL_SYNC_INTERVAL
+            await self.sync(tenant_id, erpnext_adapter, full=full)
+        finally:
+            await self.redis.delete(lock_key)
+        return True
+
+    async def upsert_items(self, tenant_id: str, items: List[Dict[str, Any]]) -> int:
+        """Write already-fetched ERPNext items into the mirror; returns items written"""
+        mapping = {}
+        for row in items:
+            item = normalize_item(row)
+            if item["item_code"] and not row.get("disabled"):
+                mapping[item["item_code"]] = json.dumps(item, sort_keys=True)
+        if not mapping:
+            return 0
+        await self.redis.hset(self._items_key(tenant_id), mapping=mapping)
+        await self.redis.hincrby(self._meta_key(tenant_id), "version", 1)
+        return len(mapping)
+
+    async def get_items(self, tenant_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Get every mirrored item sorted by name, or None if the tenant was never synced"""
+        meta = await self.get_meta(tenant_id)
+        if not meta:
+            return None
+        version = meta["version"]
+        snapshot = self._snapshots.get(tenant_id)
+        if snapshot and snapshot[0] == version:
+            return snapshot[1]
+
+        raw = await self.redis.hgetall(self._items_key(tenant_id))
+        items = [public_item(json.loads(value)) for value in raw.values()]
+        items.sort(key=lambda item: ((item.get("item_name") or "").lower(), item["item_code"]))
+        self._snapshots[tenant_id] = (version, items)
+        return items
+
+    async def query(
+        self,
+        tenant_id: str,
+        search: Optional[str] = None,
+        item_group: Optional[str] = None,
+        page: int = 1,
+        page_size: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Filter and paginate mirrored items.
+
+        Returns:
+            Dict with items, total, page, page_size and etag, or None if the
+            tenant has no mirror yet
+        """
+        items = await self.get_items(tenant_id)
+        if items is None:
+            return None
+        version = self._snapshots[tenant_id][0]
+        return paginate_items(items, search, item_group, page, page_size, etag_seed=f"{tenant_id}:{version}")
+
+    async def mark_stale(self, tenant_id: str) -> None:
+        """Force a delta sync on the next read"""
+        await self.redis.hset(self._meta_key(tenant_id), "synced_at", 0)
+
+    async def invalidate(self, tenant_id: str) -> None:
+        """Drop the tenant mirror entirely; the next read performs a full sync"""
+        self._snapshots.pop(tenant_id, None)
+        await self.redis.delete(self._items_key(tenant_id), self._meta_key(tenant_id))
+
+
+def paginate_items(
+    items: List[Dict[str, Any]],
+    search: Optional[str] = None,
+    item_group: Optional[str] = None,
+    page: int = 1,
+    page_size: Optional[int] = None,
+    etag_seed: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Filter items by search text / item group and slice out one page.
+
+    The ETag is derived from `etag_seed` (catalogue version) when given,
+    otherwise from the returned items themselves.
+    """
+    if search:
+        needle = search.lower()
+        items = [
+            item for item in items
+            if needle in (item.get("item_code") or "").lower() or needle in (item.get("item_name") or "").lower()
+        ]
+    if item_group:
+        items = [item for item in items if item.get("item_group") == item_group]
+
+    total = len(items)
+    if page_size:
+        start = (page - 1) * page_size
+        items = items[start:start + page_size]
+
+    query_key = f"{search or ''}|{item_group or ''}|{page}|{page_size or ''}"
+    seed = etag_seed if etag_seed is not None else json.dumps(items, sort_keys=True, default=str)
+    etag = '"' + hashlib.sha1(f"{seed}|{query_key}".encode()).hexdigest()[:20] + '"'
+
+    return {
+        "items": items,
+        "total": total,
+        "page": page,
+        "page_size": page_size or total,
+        "etag": etag,
+    }
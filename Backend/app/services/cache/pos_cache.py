@@ -9,9 +9,17 @@ from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Union
 from dataclasses import dataclass
 from redis.asyncio import Redis
+from redis.client import NEVER_DECODE
+
+from .item_catalog import ItemCatalogMirror
 
 logger = logging.getLogger(__name__)
 
+# Keys per DEL command when clearing a tag
+TAG_DELETE_BATCH = 1000
+# A tag set is pruned of expired members once it reaches this size (afterwards, twice its live size)
+TAG_PRUNE_MIN_SIZE = 1000
+
 
 @dataclass
 class CacheConfig:
@@ -29,10 +37,26 @@ class CacheConfig:
 class POSCacheService:
     """Redis-based caching service for POS data"""
 
-    def __init__(self, redis_client: Optional[Redis] = None, config: Optional[CacheConfig] = None):
+    def __init__(
+        self,
+        redis_client: Optional[Redis] = None,
+        config: Optional[CacheConfig] = None,
+        catalog: Optional[ItemCatalogMirror] = None
+    ):
         """Initialize cache service"""
         self.redis = redis_client
         self.config = config or CacheConfig()
+        # Items live in the tenant catalogue mirror shared with GET /items
+        self.catalog = catalog or ItemCatalogMirror(redis_client)
+        self._tag_ttl = max(
+            self.config.ttl_items,
+            self.config.ttl_customers,
+            self.config.ttl_pos_profiles,
+            self.config.ttl_frequent_items,
+            self.config.ttl_quick_actions
+        )
+        # tag set key -> size at which it is next pruned
+        self._tag_prune_at: Dict[str, int] = {}
         self._cache_stats = {
             'hits': 0,
             'misses': 0,
@@ -44,6 +68,9 @@ class POSCacheService:
         """
         Cache items for a POS profile
 
+        Items are written to the tenant catalogue mirror, which is shared by
+        every POS profile of the tenant.
+
         Args:
             tenant_id: Tenant identifier
             pos_profile_id: POS profile identifier
@@ -56,21 +83,9 @@ class POSCacheService:
             return False
 
         try:
-            key = f"pos:items:{tenant_id}:{pos_profile_id}"
-            data = {
-                'items': items[:self.config.max_items_per_profile],
-                'cached_at': datetime.now().isoformat(),
-                'count': len(items)
-            }
-
-            await self.redis.setex(
-                key,
-                self.config.ttl_items,
-                json.dumps(data)
-            )
-
+            written = await self.catalog.upsert_items(tenant_id, items)
             self._cache_stats['sets'] += 1
-            logger.debug(f"Cached {len(items)} items for profile {pos_profile_id}")
+            logger.debug(f"Cached {written} items for profile {pos_profile_id}")
             return True
 
         except Exception as e:
@@ -92,14 +107,12 @@ class POSCacheService:
             return None
 
         try:
-            key = f"pos:items:{tenant_id}:{pos_profile_id}"
-            data = await self.redis.get(key)
+            items = await self.catalog.get_items(tenant_id)
 
-            if data:
-                parsed_data = json.loads(data)
+            if items is not None:
                 self._cache_stats['hits'] += 1
                 logger.debug(f"Cache hit for items: profile {pos_profile_id}")
-                return parsed_data.get('items', [])
+                return items
             else:
                 self._cache_stats['misses'] += 1
                 logger.debug(f"Cache miss for items: profile {pos_profile_id}")
@@ -131,10 +144,12 @@ class POSCacheService:
                 'count': len(customers)
             }
 
-            await self.redis.setex(
+            await self.set_tagged(
                 key,
                 self.config.ttl_customers,
-                json.dumps(data)
+                json.dumps(data),
+                tenant_id,
+                tags=["customers"]
             )
 
             self._cache_stats['sets'] += 1
@@ -198,10 +213,12 @@ class POSCacheService:
                 'cached_at': datetime.now().isoformat()
             }
 
-            await self.redis.setex(
+            await self.set_tagged(
                 key,
                 self.config.ttl_pos_profiles,
-                json.dumps(data)
+                json.dumps(data),
+                tenant_id,
+                tags=["profile", f"profile:{profile_id}"]
             )
 
             self._cache_stats['sets'] += 1
@@ -267,10 +284,12 @@ class POSCacheService:
                 'count': len(frequent_items)
             }
 
-            await self.redis.setex(
+            await self.set_tagged(
                 key,
                 self.config.ttl_frequent_items,
-                json.dumps(data)
+                json.dumps(data),
+                tenant_id,
+                tags=["frequent_items", f"profile:{pos_profile_id}"]
             )
 
             self._cache_stats['sets'] += 1
@@ -335,10 +354,12 @@ class POSCacheService:
                 'cached_at': datetime.now().isoformat()
             }
 
-            await self.redis.setex(
+            await self.set_tagged(
                 key,
                 self.config.ttl_quick_actions,
-                json.dumps(cache_data)
+                json.dumps(cache_data),
+                tenant_id,
+                tags=["quick_actions", f"profile:{pos_profile_id}"]
             )
 
             self._cache_stats['sets'] += 1
@@ -381,6 +402,107 @@ class POSCacheService:
             logger.warning(f"Failed to get cached quick actions data for profile {pos_profile_id}: {e}")
             return None
 
+    def _tag_key(self, tenant_id: str, tag: Optional[str] = None) -> str:
+        """Redis set holding every cache key registered under a tag"""
+        return f"pos:tag:{tenant_id}:{tag}" if tag else f"pos:tag:{tenant_id}"
+
+    async def set_tagged(self, key: str, ttl: int, value: str, tenant_id: str, tags: Optional[List[str]] = None) -> None:
+        """
+        Store a cache entry and register it in the tenant tag set plus any extra tags
+
+        Tag sets let invalidation delete exactly the registered keys instead of
+        scanning the keyspace with KEYS. Each write extends the tag set's TTL,
+        so members whose entries expired are pruned once a set grows past
+        TAG_PRUNE_MIN_SIZE, keeping busy tags bounded by their live entries.
+
+        Args:
+            key: Cache key
+            ttl: Entry TTL in seconds
+            value: Serialized value
+            tenant_id: Tenant identifier (every entry is tagged with its tenant)
+            tags: Additional tags, e.g. "customers", "profile:<id>", "middleware:items"
+        """
+        tenant_tag = self._tag_key(tenant_id)
+        tag_keys = [self._tag_key(tenant_id, tag) for tag in tags or []]
+        # Tag sets outlive their members; stale members are harmless to DEL
+        tag_ttl = max(ttl, self._tag_ttl)
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.setex(key, ttl, value)
+        # The tenant tag also tracks the narrower tag sets so tenant-wide invalidation removes them
+        pipe.sadd(tenant_tag, key, *tag_keys)
+        pipe.expire(tenant_tag, tag_ttl)
+        pipe.scard(tenant_tag)
+        for tag_key in tag_keys:
+            pipe.sadd(tag_key, key)
+            pipe.expire(tag_key, tag_ttl)
+            pipe.scard(tag_key)
+        results = await pipe.execute()
+
+        sizes = results[3::3]
+        for tag_key, size in zip([tenant_tag, *tag_keys], sizes):
+            if size >= self._tag_prune_at.get(tag_key, TAG_PRUNE_MIN_SIZE):
+                await self._prune_tag(tag_key)
+
+    async def _prune_tag(self, tag_key: str) -> int:
+        """Drop members of a tag set whose keys no longer exist; returns the number removed"""
+        removed = 0
+        batch: List[str] = []
+
+        async def flush() -> int:
+            pipe = self.redis.pipeline(transaction=False)
+            for member in batch:
+                pipe.exists(member)
+            gone = [member for member, exists in zip(batch, await pipe.execute()) if not exists]
+            if gone:
+                await self.redis.srem(tag_key, *gone)
+            batch.clear()
+            return len(gone)
+
+        async for member in self.redis.sscan_iter(tag_key, count=TAG_DELETE_BATCH):
+            batch.append(member)
+            if len(batch) >= TAG_DELETE_BATCH:
+                removed += await flush()
+        if batch:
+            removed += await flush()
+
+        live = await self.redis.scard(tag_key)
+        self._tag_prune_at[tag_key] = max(TAG_PRUNE_MIN_SIZE, 2 * live)
+        return removed
+
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        """GET a binary value without the client's response decoding"""
+        return await self.redis.execute_command("GET", key, **{NEVER_DECODE: []})
+
+    async def invalidate_tags(self, tenant_id: str, *tags: str) -> int:
+        """
+        Delete every cache entry registered under the given tenant tags
+
+        Args:
+            tenant_id: Tenant identifier
+            tags: Tag names; no tags means every entry of the tenant
+
+        Returns:
+            Number of keys deleted
+        """
+        tag_keys = [self._tag_key(tenant_id, tag) for tag in tags] if tags else [self._tag_key(tenant_id)]
+
+        pipe = self.redis.pipeline(transaction=False)
+        for tag_key in tag_keys:
+            pipe.smembers(tag_key)
+        members = set().union(*(await pipe.execute()))
+
+        keys = list(members)
+        pipe = self.redis.pipeline(transaction=False)
+        for start in range(0, len(keys), TAG_DELETE_BATCH):
+            pipe.delete(*keys[start:start + TAG_DELETE_BATCH])
+        pipe.delete(*tag_keys)
+        results = await pipe.execute()
+        deleted = sum(results[:-1])
+
+        self._cache_stats['deletes'] += deleted
+        return deleted
+
     async def invalidate_tenant_cache(self, tenant_id: str) -> bool:
         """
         Invalidate all cache entries for a tenant
@@ -395,15 +517,11 @@ class POSCacheService:
             return False
 
         try:
-            # Get all keys matching the tenant pattern
-            pattern = f"pos:*:{tenant_id}:*"
-            keys = await self.redis.keys(pattern)
-
-            if keys:
-                await self.redis.delete(*keys)
-                self._cache_stats['deletes'] += len(keys)
-                logger.info(f"Invalidated {len(keys)} cache entries for tenant {tenant_id}")
+            deleted = await self.invalidate_tags(tenant_id)
+            if deleted:
+                logger.info(f"Invalidated {deleted} cache entries for tenant {tenant_id}")
 
+            await self.catalog.invalidate(tenant_id)
             return True
 
         except Exception as e:
@@ -414,6 +532,8 @@ class POSCacheService:
         """
         Invalidate cache entries for a specific POS profile
 
+        Items are tenant-wide (catalogue mirror) and are not affected.
+
         Args:
             tenant_id: Tenant identifier
             pos_profile_id: POS profile identifier
@@ -425,23 +545,9 @@ class POSCacheService:
             return False
 
         try:
-            # Get all keys matching the profile pattern
-            patterns = [
-                f"pos:items:{tenant_id}:{pos_profile_id}",
-                f"pos:frequent_items:{tenant_id}:{pos_profile_id}",
-                f"pos:quick_actions:{tenant_id}:{pos_profile_id}",
-                f"pos:profile:{tenant_id}:{pos_profile_id}"
-            ]
-
-            deleted_count = 0
-            for pattern in patterns:
-                keys = await self.redis.keys(pattern)
-                if keys:
-                    await self.redis.delete(*keys)
-                    deleted_count += len(keys)
+            deleted_count = await self.invalidate_tags(tenant_id, f"profile:{pos_profile_id}")
 
             if deleted_count > 0:
-                self._cache_stats['deletes'] += deleted_count
                 logger.info(f"Invalidated {deleted_count} cache entries for profile {pos_profile_id}")
 
             return True
@@ -473,7 +579,7 @@ class POSCacheService:
 
         try:
             # Cache customers
-            customers_data = await erpnext_adapter.proxy_request(
+            customers_data = await erpnext_adapter.aproxy_request(
                 tenant_id=tenant_id,
                 path="resource/Customer",
                 method="GET",
@@ -484,8 +590,8 @@ class POSCacheService:
                 await self.cache_customers(tenant_id, customers_data['data'])
                 stats['customers_cached'] = len(customers_data['data'])
 
-            # Get POS profiles and cache their items
-            profiles_data = await erpnext_adapter.proxy_request(
+            # Get POS profiles and cache them
+            profiles_data = await erpnext_adapter.aproxy_request(
                 tenant_id=tenant_id,
                 path="resource/POS Profile",
                 method="GET",
@@ -500,21 +606,9 @@ class POSCacheService:
                         await self.cache_pos_profile(tenant_id, profile_id, profile)
                         stats['profiles_cached'] += 1
 
-                        # Cache items for this profile (simplified - would need warehouse filtering)
-                        items_data = await erpnext_adapter.proxy_request(
-                            tenant_id=tenant_id,
-                            path="resource/Item",
-                            method="GET",
-                            params={
-                                "fields": '["name", "item_name", "standard_rate", "item_group"]',
-                                "filters": json.dumps([["disabled", "=", 0]]),
-                                "limit_page_length": 50
-                            }
-                        )
-
-                        if items_data and items_data.get('data'):
-                            await self.cache_items(tenant_id, profile_id, items_data['data'])
-                            stats['items_cached'] += len(items_data['data'])
+            # Items are tenant-wide: one full catalogue sync covers every profile
+            sync_stats = await self.catalog.sync(tenant_id, erpnext_adapter, full=True)
+            stats['items_cached'] = sync_stats['fetched']
 
             logger.info(f"Cache warming completed for tenant {tenant_id}: {stats}")
             return stats
@@ -0,0 +1,176 @@
+"""
+Rendered Receipt Cache
+Caches rendered receipts (HTML, thermal text, PDF) keyed by invoice version.
+
+Entries are content-addressed by (invoice name, `modified`, format, width,
+language): a changed invoice has a new `modified` and therefore new keys, so
+stale receipts are never served. Values are zlib-compressed and each tenant's
+entries are capped by an access-ordered sorted set (least recently used
+entries are evicted first).
+
+For submitted invoices the last seen `modified` is remembered for
+settings.RECEIPT_CACHE_VERSION_TTL seconds, so reprints within that window are
+served without fetching the invoice from ERPNext. Amending or editing an
+invoice through the API drops its version and entries immediately.
+"""
+import hashlib
+import logging
+import time
+import zlib
+from typing import Optional, Union
+
+from prometheus_client import Counter
+from redis.client import NEVER_DECODE
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_CACHE_REQUESTS = Counter(
+    "receipt_cache_requests_total",
+    "Rendered receipt cache lookups by result (hit, miss)",
+    ["format", "result"],
+)
+
+ReceiptContent = Union[str, bytes]
+
+
+class ReceiptCache:
+    """Redis-backed cache of rendered receipts"""
+
+    def __init__(self, redis_client=None):
+        self.redis = redis_client
+
+    @staticmethod
+    def _entry_key(tenant_id: str, invoice_id: str, modified: str, receipt_format: str, width: int, language: str) -> str:
+        digest = hashlib.sha256(
+            "\x1f".join([invoice_id, str(modified), receipt_format, str(width), language]).encode()
+        ).hexdigest()[:32]
+        return f"receipt:{tenant_id}:{digest}"
+
+    @staticmethod
+    def _lru_key(tenant_id: str) -> str:
+        return f"receipt:lru:{tenant_id}"
+
+    @staticmethod
+    def _invoice_key(tenant_id: str, invoice_id: str) -> str:
+        """Set of entry keys rendered for one invoice (all versions)"""
+        return f"receipt:inv:{tenant_id}:{invoice_id}"
+
+    @staticmethod
+    def _version_key(tenant_id: str, invoice_id: str) -> str:
+        return f"receipt:ver:{tenant_id}:{invoice_id}"
+
+    async def known_version(self, tenant_id: str, invoice_id: str) -> Optional[str]:
+        """Last seen `modified` of a submitted invoice, if still trusted"""
+        if self.redis is None:
+            return None
+        try:
+            return await self.redis.get(self._version_key(tenant_id, invoice_id))
+        except Exception as e:
+            logger.warning(f"Receipt cache version lookup failed: {e}")
+            return None
+
+    async def remember_version(self, tenant_id: str, invoice_id: str, modified: str) -> None:
+        if self.redis is None or not modified:
+            return
+        try:
+            await self.redis.setex(
+                self._version_key(tenant_id, invoice_id), settings.RECEIPT_CACHE_VERSION_TTL, str(modified)
+            )
+        except Exception as e:
+            logger.warning(f"Receipt cache version store failed: {e}")
+
+    async def get(
+        self, tenant_id: str, invoice_id: str, modified: str, receipt_format: str, width: int, language: str
+    ) -> Optional[ReceiptContent]:
+        """Cached rendering, or None (PDFs come back as bytes, other formats as text)"""
+        if self.redis is None:
+            return None
+        key = self._entry_key(tenant_id, invoice_id, modified, receipt_format, width, language)
+        try:
+            value = await self.redis.execute_command("GET", key, **{NEVER_DECODE: []})
+            if value is not None:
+                await self.redis.zadd(self._lru_key(tenant_id), {key: time.time()})
+        except Exception as e:
+            logger.warning(f"Receipt cache read failed: {e}")
+            value = None
+
+        if value is None:
+            RECEIPT_CACHE_REQUESTS.labels(format=receipt_format, result="miss").inc()
+            return None
+        RECEIPT_CACHE_REQUESTS.labels(format=receipt_format, result="hit").inc()
+        content = zlib.decompress(value)
+        return content if receipt_format == "pdf" else content.decode("utf-8")
+
+    async def set(
+        self,
+        tenant_id: str,
+        invoice_id: str,
+        modified: str,
+        receipt_format: str,
+        width: int,
+        language: str,
+        content: ReceiptContent,
+    ) -> None:
+        """Store a rendering and evict the tenant's least recently used entries over the cap"""
+        if self.redis is None or not modified:
+            return
+        key = self._entry_key(tenant_id, invoice_id, modified, receipt_format, width, language)
+        raw = content if isinstance(content, bytes) else content.encode("utf-8")
+        ttl = settings.RECEIPT_CACHE_TTL
+        lru_key = self._lru_key(tenant_id)
+        invoice_key = self._invoice_key(tenant_id, invoice_id)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.setex(key, ttl, zlib.compress(raw))
+            pipe.zadd(lru_key, {key: time.time()})
+            pipe.expire(lru_key, ttl)
+            pipe.sadd(invoice_key, key)
+            pipe.expire(invoice_key, ttl)
+            pipe.zcard(lru_key)
+            size = (await pipe.execute())[-1]
+
+            excess = size - settings.RECEIPT_CACHE_MAX_ENTRIES
+            if excess > 0:
+                evicted = [member for member, _ in await self.redis.zpopmin(lru_key, excess)]
+                if evicted:
+                    await self.redis.delete(*evicted)
+        except Exception as e:
+            logger.warning(f"Receipt cache write failed: {e}")
+
+    async def invalidate_invoice(self, tenant_id: str, invoice_id: str) -> int:
+        """
+        Drop every cached rendering and the remembered version of an invoice
+
+        Returns:
+            Number of entries deleted
+        """
+        if self.redis is None or not invoice_id:
+            return 0
+        invoice_key = self._invoice_key(tenant_id, invoice_id)
+        try:
+            keys = list(await self.redis.smembers(invoice_key))
+            pipe = self.redis.pipeline(transaction=False)
+            if keys:
+                pipe.delete(*keys)
+                pipe.zrem(self._lru_key(tenant_id), *keys)
+            pipe.delete(invoice_key, self._version_key(tenant_id, invoice_id))
+            results = await pipe.execute()
+            return results[0] if keys else 0
+        except Exception as e:
+            logger.warning(f"Receipt cache invalidation failed for {invoice_id}: {e}")
+            return 0
+
+    async def handle_invoice_created(self, event) -> None:
+        """An amended invoice supersedes the one it amends"""
+        amended_from = (event.data or {}).get("amended_from")
+        if amended_from:
+            await self.invalidate_invoice(event.tenant_id, amended_from)
+
+    async def start(self, bus) -> None:
+        """Subscribe to invoice events on the POS event bus"""
+        await bus.subscribe("invoice_created", self.handle_invoice_created, name="receipt_cache")
+
+
+receipt_cache = ReceiptCache()
@@ -106,6 +106,22 @@ class CacheService:
         except Exception as e:
             print(f"Cache invalidation error: {e}")
     
+    def invalidate_user_all_tenants(self, user_id: str):
+        """
+        Invalidate user's cached permissions in every tenant.
+
+        Args:
+            user_id: User UUID as string
+        """
+        if not self.enabled:
+            return
+
+        try:
+            for key in self.redis_client.scan_iter(f"rbac:user:{user_id}:tenant:*"):
+                self.redis_client.delete(key)
+        except Exception as e:
+            print(f"Cache invalidation error: {e}")
+
     def invalidate_role_cache(self, role_id: str):
         """
         Invalidate role's cached permissions.
@@ -1,6 +1,13 @@
 import re
 import html
+import time
+import asyncio
+import threading
+import httpx
 import requests
+from dataclasses import dataclass
+from prometheus_client import Counter, Gauge
+from requests.adapters import HTTPAdapter
 from requests.exceptions import ConnectionError, Timeout, RequestException
 from fastapi import HTTPException
 from app.config import settings
@@ -11,15 +18,67 @@ from decimal import Decimal
 import json
 
 
+ERPNEXT_REQUESTS = Counter(
+    "erpnext_requests_total",
+    "Requests proxied to ERPNext",
+    ["transport"],
+)
+ERPNEXT_LOGINS = Counter(
+    "erpnext_logins_total",
+    "Login round-trips made to ERPNext",
+    ["transport", "outcome"],
+)
+ERPNEXT_LOGINS_PER_1000 = Gauge(
+    "erpnext_logins_per_1000_requests",
+    "ERPNext logins per 1,000 proxied requests since process start",
+)
+
+
+@dataclass
+class _SiteSession:
+    """Cached ERPNext session cookies for one Frappe site."""
+    cookies: object
+    expires_at: float
+
+    def is_valid(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+
+def _convert_decimals(obj):
+    """Convert Decimal values to float for JSON serialization."""
+    if isinstance(obj, dict):
+        return {k: _convert_decimals(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [_convert_decimals(v) for v in obj]
+    elif isinstance(obj, tuple):
+        return tuple(_convert_decimals(v) for v in obj)
+    elif isinstance(obj, Decimal):
+        return float(obj)
+    return obj
+
+
 class ERPNextClientAdapter(EngineAdapter):
     def __init__(self, tenant_id: str = "demo-erpnext", **kwargs):
         super().__init__(tenant_id, **kwargs)
         self.base_url = settings.ERPNEXT_HOST
         self.session = requests.Session()
+        # Size the blocking pool like the async one so threads don't queue on a single socket
+        pool_adapter = HTTPAdapter(
+            pool_connections=settings.ERPNEXT_POOL_MAX_KEEPALIVE,
+            pool_maxsize=settings.ERPNEXT_POOL_MAX_CONNECTIONS,
+        )
+        self.session.mount("http://", pool_adapter)
+        self.session.mount("https://", pool_adapter)
         # Disable automatic Expect: 100-continue header which causes 417 errors
         self.session.headers.update({'Expect': ''})
-        self.cookie_jar = None
-        self._current_tenant = None  # Track tenant to re-login if changed
+        # Per-site session cache so interleaved tenants don't force a re-login
+        self._sessions: Dict[str, _SiteSession] = {}
+        self._sessions_lock = threading.Lock()
+        self._async_login_locks: Dict[str, asyncio.Lock] = {}
+        self._request_count = 0
+        self._login_count = 0
+        # Async transport is created lazily so it binds to the running event loop
+        self._async_client: Optional[httpx.AsyncClient] = None
     
     def _init_credentials(self, **kwargs):
         # Initialize ERPNext-specific credentials.
@@ -42,6 +101,142 @@ class ERPNextClientAdapter(EngineAdapter):
 
         return tenant_id
 
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """Return the shared pooled AsyncClient, creating it on first use."""
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.ERPNEXT_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.ERPNEXT_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.ERPNEXT_POOL_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(
+                    settings.ERPNEXT_TIMEOUT,
+                    connect=settings.ERPNEXT_CONNECT_TIMEOUT,
+                    pool=settings.ERPNEXT_POOL_TIMEOUT,
+                ),
+            )
+        return self._async_client
+
+    async def aclose(self):
+        """Close the async transport (called on application shutdown)."""
+        if self._async_client is not None and not self._async_client.is_closed:
+            await self._async_client.aclose()
+        self._async_client = None
+
+    def _uses_api_token(self) -> bool:
+        """Token auth skips the login round-trip entirely."""
+        return bool(settings.ERPNEXT_USE_API_TOKEN and settings.ERPNEXT_API_KEY and settings.ERPNEXT_API_SECRET)
+
+    def _store_session(self, site_name: str, cookies):
+        """Cache session cookies for a site in a form both transports can send."""
+        if isinstance(cookies, httpx.Cookies):
+            cookies = requests.utils.cookiejar_from_dict({c.name: c.value for c in cookies.jar})
+        with self._sessions_lock:
+            self._sessions[site_name] = _SiteSession(
+                cookies=cookies,
+                expires_at=time.monotonic() + settings.ERPNEXT_SESSION_TTL,
+            )
+
+    def _get_session(self, site_name: str) -> Optional[_SiteSession]:
+        """Return the cached session for a site, dropping it if expired."""
+        with self._sessions_lock:
+            session = self._sessions.get(site_name)
+            if session and not session.is_valid():
+                del self._sessions[site_name]
+                return None
+            return session
+
+    def invalidate_session(self, site_name: str):
+        """Forget the cached session for a site (next call logs in again)."""
+        with self._sessions_lock:
+            self._sessions.pop(site_name, None)
+
+    def _auth_headers(self, site_name: str) -> Dict[str, str]:
+        """Authorization or Cookie header for a site, whichever auth mode is active."""
+        if self._uses_api_token():
+            return {"Authorization": f"token {settings.ERPNEXT_API_KEY}:{settings.ERPNEXT_API_SECRET}"}
+        session = self._get_session(site_name)
+        if not session or not session.cookies:
+            return {}
+        return {"Cookie": "; ".join(f"{name}={value}" for name, value in session.cookies.items())}
+
+    def _record_request(self, transport: str):
+        self._request_count += 1
+        ERPNEXT_REQUESTS.labels(transport=transport).inc()
+        ERPNEXT_LOGINS_PER_1000.set(self._login_count * 1000 / self._request_count)
+
+    def _record_login(self, transport: str, success: bool):
+        self._login_count += 1
+        ERPNEXT_LOGINS.labels(transport=transport, outcome="success" if success else "failure").inc()
+
+    def session_stats(self) -> Dict:
+        """Login efficiency for this adapter since process start."""
+        return {
+            "auth_mode": "api_token" if self._uses_api_token() else "session",
+            "requests": self._request_count,
+            "logins": self._login_count,
+            "logins_per_1000_requests": round(self._login_count * 1000 / self._request_count, 2) if self._request_count else 0.0,
+            "cached_sites": len(self._sessions),
+        }
+
+    def _handle_login_response(self, resp, site_name: str):
+        """
+        Interpret a login response from either transport.
+
+        Returns:
+            tuple: (success: bool, error_message: Optional[str])
+        """
+        # In practice, ERPNext can sometimes return a "Logged In" message even when
+        # the HTTP status code isn't 200 (e.g., via intermediary/proxy quirks). Treat
+        # it as success to avoid breaking provisioning/health checks.
+        try:
+            response_data = resp.json() if resp.content else None
+            if isinstance(response_data, dict) and response_data.get("message") == "Logged In" and "exception" not in response_data:
+                self._store_session(site_name, resp.cookies)
+                return True, None
+        except Exception:
+            pass
+
+        if resp.status_code == 200:
+            # Check if response contains an exception (HTTP 200 but with error in body)
+            try:
+                response_data = resp.json()
+                if isinstance(response_data, dict):
+                    # Check for exceptions in the response
+                    if "exception" in response_data or "exc" in response_data:
+                        exception_msg = response_data.get("exception") or response_data.get("exc", "")
+                        if "OperationalError" in exception_msg or "Unknown column" in exception_msg:
+                            error_msg = f"Database schema issue detected. Site may need migration. Error: {exception_msg[:200]}"
+                            print(f"ERPNext Database Schema Issue for {site_name}: {error_msg}")
+                            return False, error_msg
+                    # Check for "Logged In" message which indicates success
+                    if response_data.get("message") == "Logged In" and "exception" not in response_data:
+                        self._store_session(site_name, resp.cookies)
+                        return True, None
+            except (ValueError, KeyError):
+                # If we can't parse JSON or check for exceptions, assume success if 200
+                pass
+            
+            # If we got here with 200 status, assume success
+            self._store_session(site_name, resp.cookies)
+            return True, None
+        
+        error_msg = f"ERPNext login failed (HTTP {resp.status_code})"
+        try:
+            error_data = resp.json()
+            if isinstance(error_data, dict) and "message" in error_data:
+                error_msg = error_data["message"]
+        except:
+            pass
+
+        if isinstance(error_msg, str) and error_msg.strip() == "Logged In":
+            self._store_session(site_name, resp.cookies)
+            return True, None
+
+        print(f"ERPNext Login Failed for {site_name}: {error_msg}")
+        return False, error_msg
+
     def _login(self, tenant_id: str = None):
         """
         Logins to ERPNext to get a session cookie.
@@ -65,60 +260,7 @@ class ERPNextClientAdapter(EngineAdapter):
                 },
                 timeout=10
             )
-
-            # In practice, ERPNext can sometimes return a "Logged In" message even when
-            # the HTTP status code isn't 200 (e.g., via intermediary/proxy quirks). Treat
-            # it as success to avoid breaking provisioning/health checks.
-            try:
-                response_data = resp.json() if resp.content else None
-                if isinstance(response_data, dict) and response_data.get("message") == "Logged In" and "exception" not in response_data:
-                    self.cookie_jar = resp.cookies
-                    self._current_tenant = site_name
-                    return True, None
-            except Exception:
-                pass
-
-            if resp.status_code == 200:
-                # Check if response contains an exception (HTTP 200 but with error in body)
-                try:
-                    response_data = resp.json()
-                    if isinstance(response_data, dict):
-                        # Check for exceptions in the response
-                        if "exception" in response_data or "exc" in response_data:
-                            exception_msg = response_data.get("exception") or response_data.get("exc", "")
-                            if "OperationalError" in exception_msg or "Unknown column" in exception_msg:
-                                error_msg = f"Database schema issue detected. Site may need migration. Error: {exception_msg[:200]}"
-                                print(f"ERPNext Database Schema Issue for {site_name}: {error_msg}")
-                                return False, error_msg
-                        # Check for "Logged In" message which indicates success
-                        if response_data.get("message") == "Logged In" and "exception" not in response_data:
-                            self.cookie_jar = resp.cookies
-                            self._current_tenant = site_name
-                            return True, None
-                except (ValueError, KeyError):
-                    # If we can't parse JSON or check for exceptions, assume success if 200
-                    pass
-                
-                # If we got here with 200 status, assume success
-                self.cookie_jar = resp.cookies
-                self._current_tenant = site_name
-                return True, None
-            
-            error_msg = f"ERPNext login failed (HTTP {resp.status_code})"
-            try:
-                error_data = resp.json()
-                if isinstance(error_data, dict) and "message" in error_data:
-                    error_msg = error_data["message"]
-            except:
-                pass
-
-            if isinstance(error_msg, str) and error_msg.strip() == "Logged In":
-                self.cookie_jar = resp.cookies
-                self._current_tenant = site_name
-                return True, None
-
-            print(f"ERPNext Login Failed for {site_name}: {error_msg}")
-            return False, error_msg
+            return self._handle_login_response(resp, site_name)
         except ConnectionError as e:
             error_msg = f"Cannot connect to ERPNext at {self.base_url}. Please ensure ERPNext is running."
             print(f"ERPNext Connection Error for {site_name}: {e}")
@@ -136,9 +278,67 @@ class ERPNextClientAdapter(EngineAdapter):
             print(f"ERPNext Login Exception for {site_name}: {e}")
             return False, error_msg
 
-    def proxy_request(self, tenant_id: str, path: str, method: str = "GET", params: dict = None, json_data: dict = None):
+    async def _alogin(self, tenant_id: str = None):
+        """
+        Async counterpart of `_login` using the pooled AsyncClient.
+        
+        Returns:
+            tuple: (success: bool, error_message: Optional[str])
         """
-        Proxies a request to the ERPNext/Frappe API using Cookie Auth with structured error handling.
+        site_name = self._resolve_site_name(tenant_id)
+        
+        try:
+            resp = await self._get_async_client().post(
+                f"{self.base_url}/api/method/login",
+                headers={"X-Frappe-Site-Name": site_name},
+                data={
+                    "usr": settings.ERPNEXT_USER,
+                    "pwd": settings.ERPNEXT_PASSWORD
+                },
+                timeout=10
+            )
+            return self._handle_login_response(resp, site_name)
+        except httpx.ConnectError as e:
+            error_msg = f"Cannot connect to ERPNext at {self.base_url}. Please ensure ERPNext is running."
+            print(f"ERPNext Connection Error for {site_name}: {e}")
+            return False, error_msg
+        except httpx.TimeoutException as e:
+            error_msg = f"ERPNext connection timeout. The server at {self.base_url} is not responding."
+            print(f"ERPNext Timeout for {site_name}: {e}")
+            return False, error_msg
+        except httpx.HTTPError as e:
+            error_msg = f"ERPNext request error: {str(e)}"
+            print(f"ERPNext Request Exception for {site_name}: {e}")
+            return False, error_msg
+        except Exception as e:
+            error_msg = f"Unexpected error connecting to ERPNext: {str(e)}"
+            print(f"ERPNext Login Exception for {site_name}: {e}")
+            return False, error_msg
+
+    def _prepare_request(self, site_name: str, path: str, params: dict, json_data: dict):
+        """Build URL, headers and JSON-safe payloads shared by both transports."""
+        url = f"{self.base_url}/api/{path}"
+        headers = {
+            "X-Frappe-Site-Name": site_name,
+            "Accept": "application/json",
+            "Content-Type": "application/json" if json_data else None
+        }
+        # Remove None values
+        headers = {k: v for k, v in headers.items() if v is not None}
+
+        if json_data:
+            json_data = _convert_decimals(json_data)
+        if params:
+            params = _convert_decimals(params)
+        return url, headers, params, json_data
+
+    def proxy_request(self, tenant_id: str, path: str, method: str = "GET", params: dict = None, json_data: dict = None, timeout: Optional[float] = None):
+        """
+        Proxies a request to the ERPNext/Frappe API using Cookie or API-token Auth with
+        structured error handling.
+
+        This is the blocking transport kept for sync callers (scripts, services running in
+        threads). Code running on the event loop should await `aproxy_request` instead.
         
         Args:
             tenant_id: Tenant identifier (site name)
@@ -146,12 +346,16 @@ class ERPNextClientAdapter(EngineAdapter):
             method: HTTP method
             params: Query parameters
             json_data: JSON request body
+            timeout: Per-call timeout in seconds (defaults to settings.ERPNEXT_TIMEOUT)
         """
         site_name = self._resolve_site_name(tenant_id)
+        use_token = self._uses_api_token()
+        self._record_request("sync")
         
-        # Re-login if tenant changed
-        if not self.cookie_jar or self._current_tenant != site_name:
+        # Log in only when this site has no live session
+        if not use_token and not self._get_session(site_name):
             login_success, login_error = self._login(site_name)
+            self._record_login("sync", login_success)
             if not login_success:
                 error_message = login_error or f"ERPNext login failed for tenant {site_name}"
                 raise HTTPException(
@@ -159,238 +363,30 @@ class ERPNextClientAdapter(EngineAdapter):
                     detail=error_message
                 )
         
-        url = f"{self.base_url}/api/{path}"
-        headers = {
-            "X-Frappe-Site-Name": site_name,
-            "Accept": "application/json",
-            "Content-Type": "application/json" if json_data else None
-        }
-        # Remove None values
-        headers = {k: v for k, v in headers.items() if v is not None}
-
-        # Helper to convert Decimal to float for JSON serialization
-        def _convert_decimals(obj):
-            if isinstance(obj, dict):
-                return {k: _convert_decimals(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [_convert_decimals(v) for v in obj]
-            elif isinstance(obj, tuple):
-                return tuple(_convert_decimals(v) for v in obj)
-            elif isinstance(obj, Decimal):
-                return float(obj)
-            return obj
-
-        if json_data:
-            # print(f"DEBUG: Converting json_data decimals. Type: {type(json_data)}")
-            json_data = _convert_decimals(json_data)
-        if params:
-            params = _convert_decimals(params)
+        url, headers, params, json_data = self._prepare_request(site_name, path, params, json_data)
+        timeout = timeout or settings.ERPNEXT_TIMEOUT
 
         try:
             resp = self.session.request(
                 method, url,
-                headers=headers,
+                headers={**headers, **self._auth_headers(site_name)},
                 params=params,
                 json=json_data,
-                cookies=self.cookie_jar,
-                timeout=30
+                timeout=timeout
             )
 
-            def _clean_message(msg: object) -> str:
-                if msg is None:
-                    return ""
-                if not isinstance(msg, str):
-                    msg = str(msg)
-                # ERPNext often returns HTML in `_server_messages`
-                text = html.unescape(msg)
-                text = re.sub(r"<[^>]+>", " ", text)
-                text = re.sub(r"\s+", " ", text).strip()
-                return text
-
-            def _parse_stock_shortage_message(message: str) -> Optional[Dict[str, object]]:
-                """Parse ERPNext negative stock error text into structured fields.
-
-                Variants seen in ERPNext/Frappe:
-                - '3.0 units of ITEM-001 needed in Warehouse Finished Goods - AST for Sales Invoice ACC-SINV-2026-00066 to complete this transaction.'
-                - '4.0 units of Item 100ml: Paint 100ml needed in Warehouse Finished Goods - AST on 2026-01-21 15:50:48.63 for Sales Invoice Walk-In Customer to complete this transaction.'
-                """
-                msg = _clean_message(message)
-
-                m = re.search(
-                    r"(?P<required>\d+(?:\.\d+)?)\s+units?(?:\s+of\s+(?P<item>.+?))?\s+needed in Warehouse\s+(?P<rest>.+)$",
-                    msg,
-                    flags=re.IGNORECASE,
-                )
-                if not m:
-                    return None
-
-                try:
-                    required_qty = float(m.group("required"))
-                except Exception:
-                    required_qty = None
-
-                raw_item = (m.group("item") or "").strip() or None
-                item_code = None
-                item_name = None
-                if raw_item:
-                    m_item = re.match(r"Item\s+(?P<code>[^:]+)\s*:\s*(?P<name>.+)$", raw_item, flags=re.IGNORECASE)
-                    if m_item:
-                        item_code = (m_item.group("code") or "").strip() or None
-                        item_name = (m_item.group("name") or "").strip() or None
-                    else:
-                        # Best-effort: some messages just put the item code here
-                        item_code = raw_item
-
-                rest = (m.group("rest") or "").strip()
-                rest = re.split(r"\s+to complete\b", rest, maxsplit=1, flags=re.IGNORECASE)[0].strip()
-
-                posting_datetime = None
-                voucher_type = None
-                voucher_no = None
-                party = None
-
-                warehouse_part = rest
-                for_part = None
-
-                if " for " in rest:
-                    warehouse_part, for_part = rest.split(" for ", 1)
-                    warehouse_part = warehouse_part.strip()
-                    for_part = (for_part or "").strip()
-
-                if " on " in warehouse_part:
-                    wh, after_on = warehouse_part.split(" on ", 1)
-                    warehouse_part = wh.strip()
-                    after_on = (after_on or "").strip()
-                    if " for " in after_on and not for_part:
-                        dt, fp = after_on.split(" for ", 1)
-                        posting_datetime = dt.strip() or None
-                        for_part = fp.strip()
-                    else:
-                        posting_datetime = after_on or None
-
-                # Parse the "for ..." section if present
-                if for_part:
-                    # Sales Invoice is the common POS case (two-word doctype)
-                    if for_part.lower().startswith("sales invoice "):
-                        voucher_type = "Sales Invoice"
-                        remainder = for_part[len("Sales Invoice "):].strip()
-                        if remainder:
-                            if re.match(r"^[A-Z0-9]+-[A-Z0-9-]+$", remainder):
-                                voucher_no = remainder
-                            else:
-                                party = remainder
-                    else:
-                        # Generic fallback: last token as voucher, rest as type
-                        parts = for_part.split()
-                        if len(parts) >= 2:
-                            candidate = parts[-1]
-                            voucher_type = " ".join(parts[:-1])
-                            if re.match(r"^[A-Z0-9]+-[A-Z0-9-]+$", candidate):
-                                voucher_no = candidate
-                            else:
-                                party = candidate
-
-                warehouse = (warehouse_part or "").strip() or None
-                if not warehouse or required_qty is None:
-                    return None
-
-                return {
-                    "item": raw_item,
-                    "item_code": item_code,
-                    "item_name": item_name,
-                    "warehouse": warehouse,
-                    "required_qty": required_qty,
-                    "posting_datetime": posting_datetime,
-                    "voucher_type": voucher_type,
-                    "voucher_no": voucher_no,
-                    "party": party,
-                }
-
-            def _extract_frappe_error(detail: object) -> Dict[str, Optional[str]]:
-                """Extract a concise error message from common Frappe/ERPNext error payloads."""
-                result: Dict[str, Optional[str]] = {"message": None, "exc_type": None}
-                if not isinstance(detail, dict):
-                    result["message"] = str(detail)
-                    return result
-
-                exc_type = detail.get("exc_type") or detail.get("exception_type")
-                if isinstance(exc_type, str):
-                    result["exc_type"] = exc_type
-
-                # Prefer server messages (often contains the user-friendly error)
-                server_messages = detail.get("_server_messages")
-                if isinstance(server_messages, str) and server_messages.startswith("["):
-                    try:
-                        import json
-                        parsed = json.loads(server_messages)
-                        if isinstance(parsed, list) and parsed:
-                            # Each entry can be plain text or a JSON-stringified object
-                            first = parsed[0]
-                            if isinstance(first, str) and first.strip().startswith("{"):
-                                try:
-                                    msg_obj = json.loads(first)
-                                    if isinstance(msg_obj, dict):
-                                        msg = msg_obj.get("message") or msg_obj.get("title")
-                                        if isinstance(msg, str) and msg.strip():
-                                            result["message"] = msg
-                                            return result
-                                except Exception:
-                                    pass
-                            if isinstance(first, str) and first.strip():
-                                result["message"] = first
-                                return result
-                    except Exception:
-                        pass
-
-                # Next best: one-line exception
-                exception_line = detail.get("exception")
-                if isinstance(exception_line, str) and exception_line.strip():
-                    result["message"] = exception_line
-                    return result
-
-                # Then: explicit message field
-                msg = detail.get("message")
-                if isinstance(msg, str) and msg.strip():
-                    result["message"] = msg
-                    return result
-
-                # Fallback: traceback-ish string. Avoid returning a full traceback if possible.
-                exc = detail.get("exc")
-                if isinstance(exc, str) and exc.strip():
-                    # Sometimes `exc` is a JSON list-string containing the traceback.
-                    if exc.startswith("["):
-                        try:
-                            import json
-                            exc_list = json.loads(exc)
-                            if isinstance(exc_list, list) and exc_list:
-                                exc = exc_list[0] if isinstance(exc_list[0], str) else str(exc_list[0])
-                        except Exception:
-                            pass
-
-                    # If it contains a traceback, keep only the last non-empty line.
-                    if "Traceback" in exc:
-                        lines = [ln.strip() for ln in exc.splitlines() if ln.strip()]
-                        if lines:
-                            result["message"] = lines[-1]
-                            return result
-
-                    result["message"] = exc
-                    return result
-
-                result["message"] = "Unknown error"
-                return result
-            
-            # Handle authentication errors
-            if resp.status_code == 401 or resp.status_code == 403:
+            # Handle authentication errors: refresh the site session once and retry
+            if (resp.status_code == 401 or resp.status_code == 403) and not use_token:
+                self.invalidate_session(site_name)
                 login_success, login_error = self._login(site_name)
+                self._record_login("sync", login_success)
                 if login_success:
                     resp = self.session.request(
                         method, url, 
-                        headers=headers,
+                        headers={**headers, **self._auth_headers(site_name)},
                         params=params, 
                         json=json_data, 
-                        cookies=self.cookie_jar,
-                        timeout=30
+                        timeout=timeout
                     )
                 else:
                     error_message = login_error or "ERPNext authentication failed"
@@ -399,201 +395,115 @@ class ERPNextClientAdapter(EngineAdapter):
                         detail=error_message
                     )
 
-            # Handle not found
-            if resp.status_code == 404:
-                raise HTTPException(
-                    status_code=404,
-                    detail={
-                        "type": "not_found",
-                        "message": "Resource not found"
-                    }
-                )
-            
-            # Handle validation errors (400)
-            if resp.status_code == 400:
-                try:
-                    error_detail = resp.json()
-                    extracted = _extract_frappe_error(error_detail)
-                    error_msg = _clean_message(extracted.get("message") or "Validation error")
-                except (ValueError, KeyError):
-                    error_msg = _clean_message(resp.text or "Validation error")
-
-                shortage = _parse_stock_shortage_message(error_msg)
-                if shortage:
-                    raise HTTPException(
-                        status_code=400,
-                        detail={
-                            "type": "insufficient_stock",
-                            "message": error_msg,
-                            "errors": [
-                                {
-                                    "item_code": shortage.get("item_code") or shortage.get("item"),
-                                    "item_name": shortage.get("item_name"),
-                                    "warehouse": shortage.get("warehouse"),
-                                    "required_qty": shortage.get("required_qty"),
-                                    "available_qty": None,
-                                    "posting_datetime": shortage.get("posting_datetime"),
-                                    "voucher_type": shortage.get("voucher_type"),
-                                    "voucher_no": shortage.get("voucher_no"),
-                                    "party": shortage.get("party"),
-                                }
-                            ],
-                        },
-                    )
-                
-                raise HTTPException(
-                    status_code=400, 
-                    detail={
-                        "type": "validation_error",
-                        "message": error_msg
-                    }
-                )
-            
-            # Handle permission denied
-            if resp.status_code == 403:
-                raise HTTPException(
-                    status_code=403,
-                    detail={
-                        "type": "permission_denied",
-                        "message": "You don't have permission to perform this action"
-                    }
-                )
-            
-            # Handle conflict (duplicate, constraint violation, etc)
-            if resp.status_code == 409:
-                try:
-                    error_detail = resp.json()
-                    error_msg = error_detail.get("message", "Conflict")
-                except (ValueError, KeyError):
-                    error_msg = "Resource conflict"
+            return self._parse_response(resp)
 
-                raise HTTPException(
-                    status_code=409,
-                    detail={
-                        "type": "conflict",
-                        "message": error_msg
-                    }
-                )
+        except Timeout:
+            raise HTTPException(
+                status_code=504, 
+                detail=f"ERPNext request timeout. The server at {self.base_url} is not responding."
+            )
+        except ConnectionError as e:
+            raise HTTPException(
+                status_code=503, 
+                detail=f"Cannot connect to ERPNext at {self.base_url}. Please ensure ERPNext is running and accessible. Error: {str(e)}"
+            )
+        except HTTPException:
+            raise
+        except RequestException as e:
+            raise HTTPException(
+                status_code=503,
+                detail=f"ERPNext connection error: {str(e)}"
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"Unexpected error communicating with ERPNext: {str(e)}"
+            )
 
-            # Handle expectation failed (417)
-            if resp.status_code == 417:
-                try:
-                    error_detail = resp.json()
-                    extracted = _extract_frappe_error(error_detail)
-                    error_msg = _clean_message(extracted.get("message") or "Expectation Failed")
-                except (ValueError, KeyError):
-                    error_msg = _clean_message(resp.text or "Expectation Failed")
-
-                shortage = _parse_stock_shortage_message(error_msg)
-                if shortage:
-                    raise HTTPException(
-                        status_code=417,
-                        detail={
-                            "type": "insufficient_stock",
-                            "message": error_msg,
-                            "errors": [
-                                {
-                                    "item_code": shortage.get("item_code") or shortage.get("item"),
-                                    "item_name": shortage.get("item_name"),
-                                    "warehouse": shortage.get("warehouse"),
-                                    "required_qty": shortage.get("required_qty"),
-                                    "available_qty": None,
-                                    "posting_datetime": shortage.get("posting_datetime"),
-                                    "voucher_type": shortage.get("voucher_type"),
-                                    "voucher_no": shortage.get("voucher_no"),
-                                    "party": shortage.get("party"),
-                                }
-                            ],
-                            "raw_response": error_detail if 'error_detail' in locals() else None,
-                        },
-                    )
+    async def aproxy_request(self, tenant_id: str, path: str, method: str = "GET", params: dict = None, json_data: dict = None, timeout: Optional[float] = None):
+        """
+        Async variant of `proxy_request` over a bounded, keep-alive httpx pool.
 
-                raise HTTPException(
-                    status_code=417,
-                    detail={
-                        "type": "expectation_failed",
-                        "message": error_msg,
-                        "raw_response": error_detail if 'error_detail' in locals() else None,
-                    }
-                )
-            
-            # Handle general server errors (417 is Expectation Failed, often validation errors)
-            if resp.status_code >= 400:
-                try:
-                    error_detail = resp.json()
-                    extracted = _extract_frappe_error(error_detail)
-                    error_msg = _clean_message(extracted.get("message") or "Unknown error")
-                except (ValueError, KeyError):
-                    error_msg = _clean_message(resp.text or "Unknown error")
-
-                shortage = _parse_stock_shortage_message(error_msg)
-                if shortage:
-                    raise HTTPException(
-                        status_code=resp.status_code,
-                        detail={
-                            "type": "insufficient_stock",
-                            "message": error_msg,
-                            "errors": [
-                                {
-                                    "item_code": shortage.get("item_code") or shortage.get("item"),
-                                    "item_name": shortage.get("item_name"),
-                                    "warehouse": shortage.get("warehouse"),
-                                    "required_qty": shortage.get("required_qty"),
-                                    "available_qty": None,
-                                    "posting_datetime": shortage.get("posting_datetime"),
-                                    "voucher_type": shortage.get("voucher_type"),
-                                    "voucher_no": shortage.get("voucher_no"),
-                                    "party": shortage.get("party"),
-                                }
-                            ],
-                            "status_code": resp.status_code,
-                            "raw_response": error_detail if 'error_detail' in locals() else None,
-                        },
-                    )
-                
-                raise HTTPException(
-                    status_code=resp.status_code, 
-                    detail={
-                        "type": "erp_error",
-                        "message": error_msg,
-                        "status_code": resp.status_code,
-                        "raw_response": error_detail if 'error_detail' in locals() else None
-                    }
-                )
-            
-            # Parse ERPNext response
-            # ERPNext returns {"message": {...}} for success or {"data": {...}}
-            try:
-                response_json = resp.json()
-                # print(f"DEBUG_ERPNEXT_RESPONSE: {json.dumps(response_json)}")
+        Same arguments, return shape and HTTPException mapping as `proxy_request`, but it
+        never blocks the event loop. When every pooled connection is busy the call waits up
+        to settings.ERPNEXT_POOL_TIMEOUT for one before failing with 503.
+        """
+        site_name = self._resolve_site_name(tenant_id)
+        use_token = self._uses_api_token()
+        self._record_request("async")
+        login_lock = self._async_login_locks.setdefault(site_name, asyncio.Lock())
 
-                # If already has "data", return as-is (Prioritize data over message)
-                if isinstance(response_json, dict) and "data" in response_json:
-                    return response_json
+        # Log in only when this site has no live session; the per-site lock stops
+        # concurrent callers for the same site from all logging in at once
+        if not use_token and not self._get_session(site_name):
+            async with login_lock:
+                if not self._get_session(site_name):
+                    login_success, login_error = await self._alogin(site_name)
+                    self._record_login("async", login_success)
+                    if not login_success:
+                        error_message = login_error or f"ERPNext login failed for tenant {site_name}"
+                        raise HTTPException(
+                            status_code=503,
+                            detail=error_message
+                        )
 
-                # If response has "message" key, extract it (ERPNext standard format)
-                if isinstance(response_json, dict) and "message" in response_json:
-                    return {"data": response_json["message"]}
+        url, headers, params, json_data = self._prepare_request(site_name, path, params, json_data)
+        client = self._get_async_client()
+        request_timeout = timeout or httpx.USE_CLIENT_DEFAULT
 
-                # Otherwise wrap in "data"
-                return {"data": response_json}
-            except (ValueError, KeyError):
-                # If not JSON, return as text wrapped in data
-                return {"data": resp.text} if resp.text else {"data": None}
+        async def _send():
+            return await client.request(
+                method, url,
+                headers={**headers, **self._auth_headers(site_name)},
+                params=params,
+                json=json_data,
+                timeout=request_timeout
+            )
 
-        except Timeout:
+        try:
+            sent_with = self._get_session(site_name)
+            resp = await _send()
+
+            # Handle authentication errors: refresh the site session once and retry
+            if (resp.status_code == 401 or resp.status_code == 403) and not use_token:
+                async with login_lock:
+                    current = self._get_session(site_name)
+                    if current is not None and current is not sent_with:
+                        # Another caller already refreshed this site's session
+                        login_success, login_error = True, None
+                    else:
+                        self.invalidate_session(site_name)
+                        login_success, login_error = await self._alogin(site_name)
+                        self._record_login("async", login_success)
+                if login_success:
+                    resp = await _send()
+                else:
+                    error_message = login_error or "ERPNext authentication failed"
+                    raise HTTPException(
+                        status_code=401,
+                        detail=error_message
+                    )
+
+            return self._parse_response(resp)
+
+        except httpx.PoolTimeout:
             raise HTTPException(
-                status_code=504, 
+                status_code=503,
+                detail="ERPNext connection pool exhausted. Too many concurrent requests."
+            )
+        except httpx.TimeoutException:
+            raise HTTPException(
+                status_code=504,
                 detail=f"ERPNext request timeout. The server at {self.base_url} is not responding."
             )
-        except ConnectionError as e:
+        except httpx.ConnectError as e:
             raise HTTPException(
-                status_code=503, 
+                status_code=503,
                 detail=f"Cannot connect to ERPNext at {self.base_url}. Please ensure ERPNext is running and accessible. Error: {str(e)}"
             )
         except HTTPException:
             raise
-        except RequestException as e:
+        except httpx.HTTPError as e:
             raise HTTPException(
                 status_code=503,
                 detail=f"ERPNext connection error: {str(e)}"
@@ -604,6 +514,377 @@ class ERPNextClientAdapter(EngineAdapter):
                 detail=f"Unexpected error communicating with ERPNext: {str(e)}"
             )
 
+    def _parse_response(self, resp) -> Dict:
+        """
+        Map an ERPNext response (requests or httpx) to the normalized payload,
+        raising HTTPException with structured detail for error statuses.
+        """
+        def _clean_message(msg: object) -> str:
+            if msg is None:
+                return ""
+            if not isinstance(msg, str):
+                msg = str(msg)
+            # ERPNext often returns HTML in `_server_messages`
+            text = html.unescape(msg)
+            text = re.sub(r"<[^>]+>", " ", text)
+            text = re.sub(r"\s+", " ", text).strip()
+            return text
+
+        def _parse_stock_shortage_message(message: str) -> Optional[Dict[str, object]]:
+            """Parse ERPNext negative stock error text into structured fields.
+
+            Variants seen in ERPNext/Frappe:
+            - '3.0 units of ITEM-001 needed in Warehouse Finished Goods - AST for Sales Invoice ACC-SINV-2026-00066 to complete this transaction.'
+            - '4.0 units of Item 100ml: Paint 100ml needed in Warehouse Finished Goods - AST on 2026-01-21 15:50:48.63 for Sales Invoice Walk-In Customer to complete this transaction.'
+            """
+            msg = _clean_message(message)
+
+            m = re.search(
+                r"(?P<required>\d+(?:\.\d+)?)\s+units?(?:\s+of\s+(?P<item>.+?))?\s+needed in Warehouse\s+(?P<rest>.+)$",
+                msg,
+                flags=re.IGNORECASE,
+            )
+            if not m:
+                return None
+
+            try:
+                required_qty = float(m.group("required"))
+            except Exception:
+                required_qty = None
+
+            raw_item = (m.group("item") or "").strip() or None
+            item_code = None
+            item_name = None
+            if raw_item:
+                m_item = re.match(r"Item\s+(?P<code>[^:]+)\s*:\s*(?P<name>.+)$", raw_item, flags=re.IGNORECASE)
+                if m_item:
+                    item_code = (m_item.group("code") or "").strip() or None
+                    item_name = (m_item.group("name") or "").strip() or None
+                else:
+                    # Best-effort: some messages just put the item code here
+                    item_code = raw_item
+
+            rest = (m.group("rest") or "").strip()
+            rest = re.split(r"\s+to complete\b", rest, maxsplit=1, flags=re.IGNORECASE)[0].strip()
+
+            posting_datetime = None
+            voucher_type = None
+            voucher_no = None
+            party = None
+
+            warehouse_part = rest
+            for_part = None
+
+            if " for " in rest:
+                warehouse_part, for_part = rest.split(" for ", 1)
+                warehouse_part = warehouse_part.strip()
+                for_part = (for_part or "").strip()
+
+            if " on " in warehouse_part:
+                wh, after_on = warehouse_part.split(" on ", 1)
+                warehouse_part = wh.strip()
+                after_on = (after_on or "").strip()
+                if " for " in after_on and not for_part:
+                    dt, fp = after_on.split(" for ", 1)
+                    posting_datetime = dt.strip() or None
+                    for_part = fp.strip()
+                else:
+                    posting_datetime = after_on or None
+
+            # Parse the "for ..." section if present
+            if for_part:
+                # Sales Invoice is the common POS case (two-word doctype)
+                if for_part.lower().startswith("sales invoice "):
+                    voucher_type = "Sales Invoice"
+                    remainder = for_part[len("Sales Invoice "):].strip()
+                    if remainder:
+                        if re.match(r"^[A-Z0-9]+-[A-Z0-9-]+$", remainder):
+                            voucher_no = remainder
+                        else:
+                            party = remainder
+                else:
+                    # Generic fallback: last token as voucher, rest as type
+                    parts = for_part.split()
+                    if len(parts) >= 2:
+                        candidate = parts[-1]
+                        voucher_type = " ".join(parts[:-1])
+                        if re.match(r"^[A-Z0-9]+-[A-Z0-9-]+$", candidate):
+                            voucher_no = candidate
+                        else:
+                            party = candidate
+
+            warehouse = (warehouse_part or "").strip() or None
+            if not warehouse or required_qty is None:
+                return None
+
+            return {
+                "item": raw_item,
+                "item_code": item_code,
+                "item_name": item_name,
+                "warehouse": warehouse,
+                "required_qty": required_qty,
+                "posting_datetime": posting_datetime,
+                "voucher_type": voucher_type,
+                "voucher_no": voucher_no,
+                "party": party,
+            }
+
+        def _extract_frappe_error(detail: object) -> Dict[str, Optional[str]]:
+            """Extract a concise error message from common Frappe/ERPNext error payloads."""
+            result: Dict[str, Optional[str]] = {"message": None, "exc_type": None}
+            if not isinstance(detail, dict):
+                result["message"] = str(detail)
+                return result
+
+            exc_type = detail.get("exc_type") or detail.get("exception_type")
+            if isinstance(exc_type, str):
+                result["exc_type"] = exc_type
+
+            # Prefer server messages (often contains the user-friendly error)
+            server_messages = detail.get("_server_messages")
+            if isinstance(server_messages, str) and server_messages.startswith("["):
+                try:
+                    import json
+                    parsed = json.loads(server_messages)
+                    if isinstance(parsed, list) and parsed:
+                        # Each entry can be plain text or a JSON-stringified object
+                        first = parsed[0]
+                        if isinstance(first, str) and first.strip().startswith("{"):
+                            try:
+                                msg_obj = json.loads(first)
+                                if isinstance(msg_obj, dict):
+                                    msg = msg_obj.get("message") or msg_obj.get("title")
+                                    if isinstance(msg, str) and msg.strip():
+                                        result["message"] = msg
+                                        return result
+                            except Exception:
+                                pass
+                        if isinstance(first, str) and first.strip():
+                            result["message"] = first
+                            return result
+                except Exception:
+                    pass
+
+            # Next best: one-line exception
+            exception_line = detail.get("exception")
+            if isinstance(exception_line, str) and exception_line.strip():
+                result["message"] = exception_line
+                return result
+
+            # Then: explicit message field
+            msg = detail.get("message")
+            if isinstance(msg, str) and msg.strip():
+                result["message"] = msg
+                return result
+
+            # Fallback: traceback-ish string. Avoid returning a full traceback if possible.
+            exc = detail.get("exc")
+            if isinstance(exc, str) and exc.strip():
+                # Sometimes `exc` is a JSON list-string containing the traceback.
+                if exc.startswith("["):
+                    try:
+                        import json
+                        exc_list = json.loads(exc)
+                        if isinstance(exc_list, list) and exc_list:
+                            exc = exc_list[0] if isinstance(exc_list[0], str) else str(exc_list[0])
+                    except Exception:
+                        pass
+
+                # If it contains a traceback, keep only the last non-empty line.
+                if "Traceback" in exc:
+                    lines = [ln.strip() for ln in exc.splitlines() if ln.strip()]
+                    if lines:
+                        result["message"] = lines[-1]
+                        return result
+
+                result["message"] = exc
+                return result
+
+            result["message"] = "Unknown error"
+            return result
+
+        # Handle not found
+        if resp.status_code == 404:
+            raise HTTPException(
+                status_code=404,
+                detail={
+                    "type": "not_found",
+                    "message": "Resource not found"
+                }
+            )
+        
+        # Handle validation errors (400)
+        if resp.status_code == 400:
+            try:
+                error_detail = resp.json()
+                extracted = _extract_frappe_error(error_detail)
+                error_msg = _clean_message(extracted.get("message") or "Validation error")
+            except (ValueError, KeyError):
+                error_msg = _clean_message(resp.text or "Validation error")
+
+            shortage = _parse_stock_shortage_message(error_msg)
+            if shortage:
+                raise HTTPException(
+                    status_code=400,
+                    detail={
+                        "type": "insufficient_stock",
+                        "message": error_msg,
+                        "errors": [
+                            {
+                                "item_code": shortage.get("item_code") or shortage.get("item"),
+                                "item_name": shortage.get("item_name"),
+                                "warehouse": shortage.get("warehouse"),
+                                "required_qty": shortage.get("required_qty"),
+                                "available_qty": None,
+                                "posting_datetime": shortage.get("posting_datetime"),
+                                "voucher_type": shortage.get("voucher_type"),
+                                "voucher_no": shortage.get("voucher_no"),
+                                "party": shortage.get("party"),
+                            }
+                        ],
+                    },
+                )
+            
+            raise HTTPException(
+                status_code=400, 
+                detail={
+                    "type": "validation_error",
+                    "message": error_msg
+                }
+            )
+        
+        # Handle permission denied
+        if resp.status_code == 403:
+            raise HTTPException(
+                status_code=403,
+                detail={
+                    "type": "permission_denied",
+                    "message": "You don't have permission to perform this action"
+                }
+            )
+        
+        # Handle conflict (duplicate, constraint violation, etc)
+        if resp.status_code == 409:
+            try:
+                error_detail = resp.json()
+                error_msg = error_detail.get("message", "Conflict")
+            except (ValueError, KeyError):
+                error_msg = "Resource conflict"
+
+            raise HTTPException(
+                status_code=409,
+                detail={
+                    "type": "conflict",
+                    "message": error_msg
+                }
+            )
+
+        # Handle expectation failed (417)
+        if resp.status_code == 417:
+            try:
+                error_detail = resp.json()
+                extracted = _extract_frappe_error(error_detail)
+                error_msg = _clean_message(extracted.get("message") or "Expectation Failed")
+            except (ValueError, KeyError):
+                error_msg = _clean_message(resp.text or "Expectation Failed")
+
+            shortage = _parse_stock_shortage_message(error_msg)
+            if shortage:
+                raise HTTPException(
+                    status_code=417,
+                    detail={
+                        "type": "insufficient_stock",
+                        "message": error_msg,
+                        "errors": [
+                            {
+                                "item_code": shortage.get("item_code") or shortage.get("item"),
+                                "item_name": shortage.get("item_name"),
+                                "warehouse": shortage.get("warehouse"),
+                                "required_qty": shortage.get("required_qty"),
+                                "available_qty": None,
+                                "posting_datetime": shortage.get("posting_datetime"),
+                                "voucher_type": shortage.get("voucher_type"),
+                                "voucher_no": shortage.get("voucher_no"),
+                                "party": shortage.get("party"),
+                            }
+                        ],
+                        "raw_response": error_detail if 'error_detail' in locals() else None,
+                    },
+                )
+
+            raise HTTPException(
+                status_code=417,
+                detail={
+                    "type": "expectation_failed",
+                    "message": error_msg,
+                    "raw_response": error_detail if 'error_detail' in locals() else None,
+                }
+            )
+        
+        # Handle general server errors (417 is Expectation Failed, often validation errors)
+        if resp.status_code >= 400:
+            try:
+                error_detail = resp.json()
+                extracted = _extract_frappe_error(error_detail)
+                error_msg = _clean_message(extracted.get("message") or "Unknown error")
+            except (ValueError, KeyError):
+                error_msg = _clean_message(resp.text or "Unknown error")
+
+            shortage = _parse_stock_shortage_message(error_msg)
+            if shortage:
+                raise HTTPException(
+                    status_code=resp.status_code,
+                    detail={
+                        "type": "insufficient_stock",
+                        "message": error_msg,
+                        "errors": [
+                            {
+                                "item_code": shortage.get("item_code") or shortage.get("item"),
+                                "item_name": shortage.get("item_name"),
+                                "warehouse": shortage.get("warehouse"),
+                                "required_qty": shortage.get("required_qty"),
+                                "available_qty": None,
+                                "posting_datetime": shortage.get("posting_datetime"),
+                                "voucher_type": shortage.get("voucher_type"),
+                                "voucher_no": shortage.get("voucher_no"),
+                                "party": shortage.get("party"),
+                            }
+                        ],
+                        "status_code": resp.status_code,
+                        "raw_response": error_detail if 'error_detail' in locals() else None,
+                    },
+                )
+            
+            raise HTTPException(
+                status_code=resp.status_code, 
+                detail={
+                    "type": "erp_error",
+                    "message": error_msg,
+                    "status_code": resp.status_code,
+                    "raw_response": error_detail if 'error_detail' in locals() else None
+                }
+            )
+        
+        # Parse ERPNext response
+        # ERPNext returns {"message": {...}} for success or {"data": {...}}
+        try:
+            response_json = resp.json()
+            # print(f"DEBUG_ERPNEXT_RESPONSE: {json.dumps(response_json)}")
+
+            # If already has "data", return as-is (Prioritize data over message)
+            if isinstance(response_json, dict) and "data" in response_json:
+                return response_json
+
+            # If response has "message" key, extract it (ERPNext standard format)
+            if isinstance(response_json, dict) and "message" in response_json:
+                return {"data": response_json["message"]}
+
+            # Otherwise wrap in "data"
+            return {"data": response_json}
+        except (ValueError, KeyError):
+            # If not JSON, return as text wrapped in data
+            return {"data": resp.text} if resp.text else {"data": None}
+
     def list_resource(self, doctype: str, tenant_id: str = "default"):
         """
         List all docs of a doctype.
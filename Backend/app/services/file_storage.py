@@ -0,0 +1,258 @@
+"""
+File Storage Service
+Streaming, content-addressed file storage with a Postgres metadata index.
+
+Uploads are read in settings.FILE_UPLOAD_CHUNK_SIZE chunks, hashed (SHA-256)
+as they arrive and written to a temporary file off the event loop, so memory
+use does not depend on file size. The finished file becomes the tenant's blob
+for that hash; identical uploads share one blob (reference counted in
+stored_blobs). Listing and lookups go through the stored_files index (keyset
+pagination, newest first) instead of scanning the tenant directory.
+
+Downloads are served by StoredFileResponse: HTTP Range / If-Range, a
+content-hash ETag with If-None-Match, and zero-copy delivery either through
+the ASGI pathsend extension or an nginx X-Accel-Redirect.
+"""
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from fastapi import UploadFile
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from app.config import settings
+from app.models.file_storage import StoredBlob, StoredFile
+
+logger = logging.getLogger(__name__)
+
+
+class FileTooLarge(Exception):
+    """Upload exceeded the size limit"""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"File too large. Maximum size: {max_size / 1024 / 1024}MB")
+        self.max_size = max_size
+
+
+def _insert(db: Session):
+    """Dialect insert construct (both support ON CONFLICT upserts)"""
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+
+def encode_cursor(stored: StoredFile) -> str:
+    raw = f"{stored.uploaded_at.isoformat()}|{stored.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    uploaded_at, file_id = raw.split("|", 1)
+    return datetime.fromisoformat(uploaded_at), file_id
+
+
+class FileStorage:
+    """Tenant file storage rooted at a directory"""
+
+    def __init__(self, root: str, chunk_size: Optional[int] = None):
+        self.root = root
+        self.chunk_size = chunk_size or settings.FILE_UPLOAD_CHUNK_SIZE
+
+    def blob_path(self, tenant_id: str, content_hash: str) -> str:
+        return os.path.join(self.root, tenant_id, "blobs", content_hash[:2], content_hash)
+
+    @staticmethod
+    def etag(stored: StoredFile) -> str:
+        return f'"{stored.content_hash}"'
+
+    async def save_upload(
+        self,
+        db: Session,
+        tenant_id: str,
+        upload: UploadFile,
+        *,
+        max_size: int,
+        mime_type: str,
+        category: str,
+        uploaded_by: str,
+    ) -> StoredFile:
+        """
+        Stream an upload to disk and index it
+
+        Raises:
+            FileTooLarge: The upload exceeded max_size (nothing is stored)
+        """
+        tmp_dir = os.path.join(self.root, tenant_id, "tmp")
+        await asyncio.to_thread(os.makedirs, tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, f"{uuid.uuid4().hex}.part")
+
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            handle = await asyncio.to_thread(open, tmp_path, "wb")
+            try:
+                while chunk := await upload.read(self.chunk_size):
+                    size += len(chunk)
+                    if size > max_size:
+                        raise FileTooLarge(max_size)
+                    hasher.update(chunk)
+                    await asyncio.to_thread(handle.write, chunk)
+            finally:
+                await asyncio.to_thread(handle.close)
+
+            content_hash = hasher.hexdigest()
+            now = datetime.now(timezone.utc)
+
+            # Take (or create) the blob row first: it is locked until commit, so a
+            # concurrent delete of the same content cannot remove the file under us
+            stmt = _insert(db)(StoredBlob).values(
+                tenant_id=tenant_id, content_hash=content_hash, size_bytes=size, ref_count=1, created_at=now
+            )
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["tenant_id", "content_hash"],
+                set_={"ref_count": StoredBlob.ref_count + 1},
+            ))
+
+            blob_path = self.blob_path(tenant_id, content_hash)
+            if await asyncio.to_thread(os.path.exists, blob_path):
+                await asyncio.to_thread(os.remove, tmp_path)
+            else:
+                await asyncio.to_thread(os.makedirs, os.path.dirname(blob_path), exist_ok=True)
+                await asyncio.to_thread(os.replace, tmp_path, blob_path)
+
+            stored = StoredFile(
+                id=str(uuid.uuid4()),
+                tenant_id=tenant_id,
+                content_hash=content_hash,
+                original_filename=upload.filename,
+                extension=os.path.splitext(upload.filename)[1].lower()[:16],
+                mime_type=mime_type,
+                size_bytes=size,
+                category=category,
+                uploaded_by=uploaded_by,
+                uploaded_at=now,
+            )
+            db.add(stored)
+            db.commit()
+            db.refresh(stored)
+            return stored
+        except BaseException:
+            db.rollback()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, db: Session, tenant_id: str, file_id: str) -> Optional[StoredFile]:
+        return db.execute(
+            select(StoredFile).where(StoredFile.tenant_id == tenant_id, StoredFile.id == file_id)
+        ).scalar_one_or_none()
+
+    def list(
+        self,
+        db: Session,
+        tenant_id: str,
+        category: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        offset: int = 0,
+    ) -> Tuple[List[StoredFile], Optional[str]]:
+        """
+        Newest files first
+
+        Pass the returned cursor back to get the next page; `offset` is only
+        honoured without a cursor.
+
+        Returns:
+            (files, next cursor or None)
+        """
+        query = select(StoredFile).where(StoredFile.tenant_id == tenant_id)
+        if category:
+            query = query.where(StoredFile.category == category)
+        if cursor:
+            query = query.where(tuple_(StoredFile.uploaded_at, StoredFile.id) < decode_cursor(cursor))
+        elif offset:
+            query = query.offset(offset)
+
+        rows = db.execute(
+            query.order_by(StoredFile.uploaded_at.desc(), StoredFile.id.desc()).limit(limit + 1)
+        ).scalars().all()
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return list(rows[:limit]), next_cursor
+
+    def count(self, db: Session, tenant_id: str, category: Optional[str] = None) -> int:
+        query = select(func.count()).select_from(StoredFile).where(StoredFile.tenant_id == tenant_id)
+        if category:
+            query = query.where(StoredFile.category == category)
+        return db.execute(query).scalar_one()
+
+    def delete(self, db: Session, tenant_id: str, file_id: str) -> bool:
+        """Remove a file; its blob is deleted with the last file referencing it"""
+        stored = self.get(db, tenant_id, file_id)
+        if stored is None:
+            return False
+
+        blob = db.execute(
+            select(StoredBlob)
+            .where(StoredBlob.tenant_id == tenant_id, StoredBlob.content_hash == stored.content_hash)
+            .with_for_update()
+        ).scalar_one_or_none()
+        db.delete(stored)
+        if blob is not None:
+            blob.ref_count -= 1
+            if blob.ref_count <= 0:
+                db.delete(blob)
+                # Removed while the row lock is held, before a new upload can re-add it
+                blob_path = self.blob_path(tenant_id, stored.content_hash)
+                if os.path.exists(blob_path):
+                    os.remove(blob_path)
+        db.commit()
+        return True
+
+
+class StoredFileResponse(FileResponse):
+    """FileResponse with a content-hash ETag, conditional GET and zero-copy sends"""
+
+    def __init__(self, path: str, etag: str, accel_path: Optional[str] = None, **kwargs):
+        super().__init__(path, headers={"etag": etag, "cache-control": "private, no-cache"}, **kwargs)
+        self.etag = etag
+        self.accel_path = accel_path
+
+    def _should_use_range(self, http_if_range: str, stat_result: os.stat_result) -> bool:
+        return http_if_range == self.etag
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        headers = Headers(scope=scope)
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or self.etag in [t.strip() for t in if_none_match.split(",")]):
+            response = Response(status_code=304, headers={"etag": self.etag, "cache-control": "private, no-cache"})
+            return await response(scope, receive, send)
+
+        if self.accel_path:
+            # nginx serves the file itself (sendfile, ranges) from an internal location
+            response = Response(media_type=self.media_type, headers={
+                **{k: v for k, v in self.headers.items() if k in ("etag", "content-disposition", "cache-control")},
+                "x-accel-redirect": self.accel_path,
+            })
+            return await response(scope, receive, send)
+
+        if (
+            "http.response.pathsend" in scope.get("extensions", {})
+            and "range" not in headers
+            and scope["method"].upper() != "HEAD"
+        ):
+            stat_result = self.stat_result or await asyncio.to_thread(os.stat, self.path)
+            self.set_stat_headers(stat_result)
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,174 @@
+"""
+Metrics Aggregator
+Runs dashboard module collectors concurrently with per-module timeouts and
+serves each module from a short-lived in-process cache, stale-while-revalidate.
+
+A module whose cached value is fresh is served directly. A stale value is
+served immediately while one background refresh runs. With no usable value
+the collector is awaited up to its timeout; if it is slower, the module is
+reported as timed out with its fallback value, and the refresh keeps running
+so the next request gets the result. Concurrent requests share one refresh
+per tenant/module/parameters.
+"""
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_MODULE_RESULTS = Counter(
+    "dashboard_module_results_total",
+    "Dashboard module lookups by result (fresh, stale, collected, timeout, error)",
+    ["module", "result"],
+)
+DASHBOARD_MODULE_DURATION = Histogram(
+    "dashboard_module_collect_seconds",
+    "Time spent running a dashboard module collector",
+    ["module"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+
+@dataclass
+class MetricsCollector:
+    """A module collector and its caching policy"""
+    name: str
+    collect: Callable[..., Awaitable[Dict[str, Any]]]
+    ttl: float
+    fallback: Dict[str, Any]
+    params: Tuple[str, ...] = ()  # Keyword arguments the collector takes besides tenant_id
+    timeout: Optional[float] = None
+
+
+@dataclass
+class _CacheEntry:
+    value: Dict[str, Any]
+    cached_at: float
+    fresh_until: float
+    expires_at: float
+
+
+@dataclass
+class ModuleResult:
+    value: Dict[str, Any]
+    status: str  # fresh | stale | collected | timeout | error
+    cached_at: Optional[float] = None
+
+
+class MetricsAggregator:
+    """Concurrent, cached fan-out over registered metric collectors"""
+
+    def __init__(self, max_entries: int = 10000):
+        self._collectors: Dict[str, MetricsCollector] = {}
+        self._cache: Dict[Tuple, _CacheEntry] = {}
+        self._refreshing: Dict[Tuple, asyncio.Task] = {}
+        self.max_entries = max_entries
+
+    def register(
+        self,
+        name: str,
+        collect: Callable[..., Awaitable[Dict[str, Any]]],
+        ttl: float,
+        fallback: Dict[str, Any],
+        params: Tuple[str, ...] = (),
+        timeout: Optional[float] = None,
+    ) -> None:
+        """Register a module collector called as `collect(tenant_id, **params)`"""
+        self._collectors[name] = MetricsCollector(name, collect, ttl, fallback, params, timeout)
+
+    @property
+    def modules(self) -> List[str]:
+        return list(self._collectors)
+
+    def invalidate(self, tenant_id: str) -> None:
+        """Drop every cached module value for a tenant"""
+        for key in [key for key in self._cache if key[0] == tenant_id]:
+            self._cache.pop(key, None)
+
+    async def collect(self, tenant_id: str, modules: List[str], **params: Any) -> Dict[str, ModuleResult]:
+        """
+        Collect the given modules concurrently
+
+        Args:
+            tenant_id: Tenant identifier
+            modules: Registered module names
+            **params: Parameters offered to collectors (each takes only those it declared)
+
+        Returns:
+            Module name -> ModuleResult
+        """
+        results = await asyncio.gather(*(self._get(name, tenant_id, params) for name in modules))
+        return dict(zip(modules, results))
+
+    async def _get(self, name: str, tenant_id: str, params: Dict[str, Any]) -> ModuleResult:
+        collector = self._collectors[name]
+        kwargs = {param: params.get(param) for param in collector.params}
+        key = (tenant_id, name, tuple(sorted(kwargs.items())))
+        now = time.time()
+
+        entry = self._cache.get(key)
+        if entry and now < entry.fresh_until:
+            DASHBOARD_MODULE_RESULTS.labels(module=name, result="fresh").inc()
+            return ModuleResult(entry.value, "fresh", entry.cached_at)
+        if entry and now < entry.expires_at:
+            self._refresh(collector, key, tenant_id, kwargs)
+            DASHBOARD_MODULE_RESULTS.labels(module=name, result="stale").inc()
+            return ModuleResult(entry.value, "stale", entry.cached_at)
+
+        task = self._refresh(collector, key, tenant_id, kwargs)
+        timeout = collector.timeout or settings.DASHBOARD_MODULE_TIMEOUT
+        try:
+            value = await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dashboard module '{name}' exceeded {timeout}s for tenant {tenant_id}")
+            DASHBOARD_MODULE_RESULTS.labels(module=name, result="timeout").inc()
+            return ModuleResult(dict(collector.fallback), "timeout")
+        except Exception as e:
+            logger.error(f"Dashboard module '{name}' failed for tenant {tenant_id}: {e}")
+            DASHBOARD_MODULE_RESULTS.labels(module=name, result="error").inc()
+            return ModuleResult(dict(collector.fallback), "error")
+        DASHBOARD_MODULE_RESULTS.labels(module=name, result="collected").inc()
+        return ModuleResult(value, "collected", time.time())
+
+    def _refresh(self, collector: MetricsCollector, key: Tuple, tenant_id: str, kwargs: Dict[str, Any]) -> asyncio.Task:
+        """Start (or join) the single in-flight refresh for a cache key"""
+        task = self._refreshing.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(collector, key, tenant_id, kwargs))
+            # Background refreshes may finish with nobody awaiting them
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._refreshing[key] = task
+        return task
+
+    async def _run(self, collector: MetricsCollector, key: Tuple, tenant_id: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            value = await collector.collect(tenant_id, **kwargs)
+        except Exception as e:
+            # Keep serving the previous value (if any) until it expires
+            logger.warning(f"Dashboard module '{collector.name}' refresh failed: {e}")
+            raise
+        finally:
+            DASHBOARD_MODULE_DURATION.labels(module=collector.name).observe(time.perf_counter() - started)
+            self._refreshing.pop(key, None)
+
+        now = time.time()
+        jitter = settings.POS_CACHE_TTL_JITTER
+        fresh_ttl = collector.ttl * random.uniform(1 - jitter, 1 + jitter)
+        if len(self._cache) >= self.max_entries and key not in self._cache:
+            oldest = min(self._cache, key=lambda k: self._cache[k].expires_at)
+            self._cache.pop(oldest, None)
+        self._cache[key] = _CacheEntry(
+            value=value,
+            cached_at=now,
+            fresh_until=now + fresh_ttl,
+            expires_at=now + fresh_ttl + collector.ttl * settings.DASHBOARD_METRICS_STALE_FACTOR,
+        )
+        return value
@@ -0,0 +1,355 @@
+"""
+Notification Service
+Durable user notifications with real-time push.
+
+Notifications live in Postgres (app.models.notifications) with a per-user
+counter row holding the total and unread counts, so badge counts are a primary
+key lookup and listing is a keyset scan of the (user_id, created_at, id) index.
+
+Every change is published to the user's Redis channel
+(`notifications:{user_id}`). Each API process runs one NotificationHub that
+subscribes to the channels of users with an open stream on that process and
+fans messages out to their SSE / WebSocket connections, so a notification
+created on any worker reaches clients connected to every worker. Without Redis
+events are delivered to the local process only.
+"""
+import asyncio
+import base64
+import json
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.notifications import Notification, NotificationCounter
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_STREAMS = Gauge(
+    "notification_streams",
+    "Open notification streams (SSE and WebSocket) on this process",
+)
+NOTIFICATION_EVENTS_DROPPED = Counter(
+    "notification_events_dropped_total",
+    "Notification events dropped because a stream's queue was full",
+)
+
+
+def _insert(db: Session):
+    """Dialect insert construct (both support ON CONFLICT upserts)"""
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def serialize(notification: Notification) -> Dict[str, Any]:
+    return {
+        "id": notification.id,
+        "user_id": notification.user_id,
+        "tenant_id": notification.tenant_id,
+        "title": notification.title,
+        "message": notification.message,
+        "type": notification.type,
+        "is_read": notification.is_read,
+        "action_url": notification.action_url,
+        "created_at": _isoformat(notification.created_at),
+        "read_at": _isoformat(notification.read_at),
+        "expires_at": _isoformat(notification.expires_at),
+    }
+
+
+def encode_cursor(notification: Notification) -> str:
+    raw = f"{notification.created_at.isoformat()}|{notification.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    created_at, notification_id = raw.split("|", 1)
+    return datetime.fromisoformat(created_at), notification_id
+
+
+class NotificationHub:
+    """Fans a user's notification events out to the streams open on this process"""
+
+    def __init__(self, redis_client=None, queue_size: Optional[int] = None):
+        self.redis = redis_client
+        self.queue_size = queue_size or settings.NOTIFICATION_STREAM_QUEUE_SIZE
+        self._streams: Dict[str, Set[asyncio.Queue]] = {}
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def channel(user_id: str) -> str:
+        return f"notifications:{user_id}"
+
+    async def publish(self, user_id: str, event: Dict[str, Any]) -> None:
+        if self.redis is None:
+            self._deliver(user_id, event)
+            return
+        try:
+            await self.redis.publish(self.channel(user_id), json.dumps(event, default=str))
+        except Exception as e:
+            logger.warning(f"Notification publish failed for {user_id}: {e}")
+
+    def _deliver(self, user_id: str, event: Dict[str, Any]) -> None:
+        for queue in self._streams.get(user_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A stalled client loses pushes, not the notifications themselves
+                NOTIFICATION_EVENTS_DROPPED.inc()
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: str) -> AsyncIterator[asyncio.Queue]:
+        """Queue receiving the user's events while the context is open"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        async with self._lock:
+            first = user_id not in self._streams
+            self._streams.setdefault(user_id, set()).add(queue)
+            if first and self.redis is not None:
+                if self._pubsub is None:
+                    self._pubsub = self.redis.pubsub()
+                await self._pubsub.subscribe(self.channel(user_id))
+                if self._reader is None or self._reader.done():
+                    self._reader = asyncio.create_task(self._read())
+        NOTIFICATION_STREAMS.inc()
+        try:
+            yield queue
+        finally:
+            NOTIFICATION_STREAMS.dec()
+            async with self._lock:
+                streams = self._streams.get(user_id)
+                if streams is not None:
+                    streams.discard(queue)
+                    if not streams:
+                        del self._streams[user_id]
+                        if self._pubsub is not None:
+                            try:
+                                await self._pubsub.unsubscribe(self.channel(user_id))
+                            except Exception as e:
+                                logger.warning(f"Notification unsubscribe failed for {user_id}: {e}")
+
+    async def _read(self) -> None:
+        """Dispatch Redis messages while any local stream is open"""
+        prefix = self.channel("")
+        while self._streams:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Notification subscription read failed: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if not message or message.get("type") != "message":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            try:
+                event = json.loads(message["data"])
+            except (TypeError, ValueError):
+                continue
+            self._deliver(channel[len(prefix):], event)
+
+    async def shutdown(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._reader = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+            self._pubsub = None
+
+
+class NotificationService:
+    """Notification store plus push of every change to the user's streams"""
+
+    def __init__(self, hub: Optional[NotificationHub] = None):
+        self.hub = hub or NotificationHub()
+
+    def _adjust_counter(self, db: Session, user_id: str, total: int = 0, unread: int = 0) -> None:
+        stmt = _insert(db)(NotificationCounter).values(
+            user_id=user_id, total_count=max(total, 0), unread_count=max(unread, 0)
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={
+                "total_count": NotificationCounter.total_count + total,
+                "unread_count": NotificationCounter.unread_count + unread,
+            },
+        ))
+
+    def counts(self, db: Session, user_id: str) -> Tuple[int, int]:
+        """(total, unread) for a user"""
+        row = db.execute(
+            select(NotificationCounter.total_count, NotificationCounter.unread_count)
+            .where(NotificationCounter.user_id == user_id)
+        ).first()
+        return (max(row[0], 0), max(row[1], 0)) if row else (0, 0)
+
+    def unread_count(self, db: Session, user_id: str) -> int:
+        return self.counts(db, user_id)[1]
+
+    async def _publish(self, db: Session, user_id: str, event: str, **data: Any) -> None:
+        await self.hub.publish(user_id, {"event": event, **data, "unread_count": self.unread_count(db, user_id)})
+
+    async def create(
+        self,
+        db: Session,
+        *,
+        user_id: str,
+        title: str,
+        message: str,
+        type: str = "info",
+        tenant_id: Optional[str] = None,
+        action_url: Optional[str] = None,
+        expires_at: Optional[datetime] = None,
+    ) -> Notification:
+        notification = Notification(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            tenant_id=tenant_id,
+            title=title,
+            message=message,
+            type=type,
+            action_url=action_url,
+            is_read=False,
+            created_at=datetime.now(timezone.utc),
+            expires_at=expires_at,
+        )
+        db.add(notification)
+        self._adjust_counter(db, user_id, total=1, unread=1)
+        db.commit()
+        db.refresh(notification)
+        await self._publish(db, user_id, "notification", notification=serialize(notification))
+        return notification
+
+    def get(self, db: Session, user_id: str, notification_id: str) -> Optional[Notification]:
+        return db.execute(
+            select(Notification).where(Notification.user_id == user_id, Notification.id == notification_id)
+        ).scalar_one_or_none()
+
+    def list(
+        self,
+        db: Session,
+        user_id: str,
+        unread_only: bool = False,
+        type: Optional[str] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        offset: int = 0,
+    ) -> Tuple[List[Notification], Optional[str]]:
+        """
+        Newest notifications first
+
+        Pass the returned cursor back to get the next page; `offset` is only
+        honoured without a cursor.
+
+        Returns:
+            (notifications, next cursor or None)
+        """
+        query = self._filtered(select(Notification), user_id, unread_only, type)
+        if cursor:
+            query = query.where(tuple_(Notification.created_at, Notification.id) < decode_cursor(cursor))
+        elif offset:
+            query = query.offset(offset)
+
+        rows = db.execute(
+            query.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(limit + 1)
+        ).scalars().all()
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return list(rows[:limit]), next_cursor
+
+    def count(self, db: Session, user_id: str, unread_only: bool = False, type: Optional[str] = None) -> int:
+        """Matching notifications; served from the counter row unless filtered by type"""
+        if type is None:
+            total, unread = self.counts(db, user_id)
+            return unread if unread_only else total
+        query = self._filtered(select(func.count()).select_from(Notification), user_id, unread_only, type)
+        return db.execute(query).scalar_one()
+
+    @staticmethod
+    def _filtered(query, user_id: str, unread_only: bool, type: Optional[str]):
+        query = query.where(Notification.user_id == user_id)
+        if unread_only:
+            query = query.where(Notification.is_read.is_(False))
+        if type:
+            query = query.where(Notification.type == type)
+        return query
+
+    async def mark_read(self, db: Session, user_id: str, notification_id: str) -> Optional[Notification]:
+        """Mark one notification read; None if it does not exist"""
+        result = db.execute(
+            update(Notification)
+            .where(
+                Notification.user_id == user_id,
+                Notification.id == notification_id,
+                Notification.is_read.is_(False),
+            )
+            .values(is_read=True, read_at=datetime.now(timezone.utc))
+        )
+        if result.rowcount:
+            self._adjust_counter(db, user_id, unread=-result.rowcount)
+        db.commit()
+        notification = self.get(db, user_id, notification_id)
+        if result.rowcount:
+            await self._publish(db, user_id, "read", ids=[notification_id])
+        return notification
+
+    async def mark_all_read(self, db: Session, user_id: str) -> int:
+        result = db.execute(
+            update(Notification)
+            .where(Notification.user_id == user_id, Notification.is_read.is_(False))
+            .values(is_read=True, read_at=datetime.now(timezone.utc))
+        )
+        if result.rowcount:
+            self._adjust_counter(db, user_id, unread=-result.rowcount)
+        db.commit()
+        if result.rowcount:
+            await self._publish(db, user_id, "read", all=True)
+        return result.rowcount
+
+    async def delete(self, db: Session, user_id: str, notification_id: str) -> bool:
+        was_read = db.execute(
+            delete(Notification)
+            .where(Notification.user_id == user_id, Notification.id == notification_id)
+            .returning(Notification.is_read)
+        ).scalars().all()
+        if was_read:
+            self._adjust_counter(db, user_id, total=-1, unread=0 if was_read[0] else -1)
+        db.commit()
+        if was_read:
+            await self._publish(db, user_id, "deleted", ids=[notification_id])
+        return bool(was_read)
+
+    async def clear(self, db: Session, user_id: str) -> int:
+        was_read = db.execute(
+            delete(Notification).where(Notification.user_id == user_id).returning(Notification.is_read)
+        ).scalars().all()
+        if was_read:
+            self._adjust_counter(db, user_id, total=-len(was_read), unread=-was_read.count(False))
+        db.commit()
+        if was_read:
+            await self._publish(db, user_id, "deleted", all=True)
+        return len(was_read)
+
+
+notification_service = NotificationService()
@@ -0,0 +1,106 @@
+"""
+Two-tier cache for resolved RBAC permissions.
+
+Tier 1 is a per-process LRU of compiled matchers, so repeated checks for the
+same (user, tenant) cost a dict lookup. Tier 2 is the shared Redis cache in
+`cache_service`, so a cold worker rebuilds a matcher from one Redis GET
+instead of the role/override/owner queries.
+
+Invalidation deletes both tiers for the affected user. Other workers drop
+their local copy when RBAC_LOCAL_CACHE_TTL expires, which bounds
+cross-process staleness.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.cache_service import cache_service
+from app.services.permission_matcher import PermissionMatcher
+
+
+class PermissionCache:
+    """In-process LRU of PermissionMatchers backed by the Redis permission cache"""
+
+    def __init__(self, max_size: Optional[int] = None, local_ttl: Optional[int] = None):
+        self.max_size = max_size or settings.RBAC_LOCAL_CACHE_SIZE
+        self.local_ttl = settings.RBAC_LOCAL_CACHE_TTL if local_ttl is None else local_ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, PermissionMatcher]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "redis_hits": 0, "misses": 0}
+
+    @staticmethod
+    def _key(user_id, tenant_id) -> Tuple[str, str]:
+        return str(user_id), str(tenant_id) if tenant_id else "system"
+
+    def get_or_load(self, user_id, tenant_id, loader: Callable[[], List[str]]) -> PermissionMatcher:
+        """
+        Get the matcher for (user, tenant), loading it through the tiers.
+
+        Args:
+            user_id: User UUID
+            tenant_id: Tenant UUID (None for system-level permissions)
+            loader: Resolves permission codes from the database on a full miss
+        """
+        key = self._key(user_id, tenant_id)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._stats["local_hits"] += 1
+                return entry[1]
+
+        codes = cache_service.get_user_permissions_cached(*key)
+        if codes is not None:
+            self._stats["redis_hits"] += 1
+        else:
+            self._stats["misses"] += 1
+            codes = loader()
+            cache_service.set_user_permissions_cached(
+                *key, list(codes), ttl=settings.RBAC_PERMISSION_CACHE_TTL
+            )
+
+        matcher = PermissionMatcher(codes)
+        with self._lock:
+            self._entries[key] = (now + self.local_ttl, matcher)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return matcher
+
+    def invalidate(self, user_id, tenant_id=None):
+        """
+        Drop cached permissions for a user.
+
+        A tenant-scoped change drops that tenant only; a system-level change
+        (tenant_id None) affects every tenant the user belongs to.
+        """
+        user_key = str(user_id)
+        with self._lock:
+            if tenant_id:
+                self._entries.pop(self._key(user_id, tenant_id), None)
+            else:
+                for key in [k for k in self._entries if k[0] == user_key]:
+                    del self._entries[key]
+
+        if tenant_id:
+            cache_service.invalidate_user_cache(*self._key(user_id, tenant_id))
+        else:
+            cache_service.invalidate_user_all_tenants(user_key)
+
+    def invalidate_all(self):
+        """Drop every cached permission set (role definitions changed)."""
+        with self._lock:
+            self._entries.clear()
+        cache_service.flush_all()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "local_entries": len(self._entries)}
+
+
+# Singleton instance
+permission_cache = PermissionCache()
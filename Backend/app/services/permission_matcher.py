@@ -0,0 +1,114 @@
+"""
+Compiled permission matching for RBAC.
+
+A PermissionMatcher indexes one effective permission set:
+- exact codes in a set (O(1) lookup)
+- `module:resource:action` wildcards in a segment trie, where a `*` segment
+  matches one or more segments (the same strings `fnmatch` accepts, since
+  fnmatch's `*` also spans `:`)
+- anything else (`*` inside a segment, `?`, `[...]`) in one combined regex
+  built with `fnmatch.translate`
+
+Matchers are immutable and built once per permission set, then reused for
+every check against that set.
+"""
+import fnmatch
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+# Stored in place of the permission list for SUPER_ADMIN users
+ALL_PERMISSIONS = "*"
+
+_WILDCARD_SEGMENT = "*"
+_SPECIAL_CHARS = ("*", "?", "[")
+
+
+class _TrieNode:
+    __slots__ = ("children", "wildcard", "terminal")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.wildcard: Optional["_TrieNode"] = None
+        self.terminal = False
+
+
+def _is_segment_pattern(code: str) -> bool:
+    """True if every wildcard in `code` is a whole `*` segment."""
+    for segment in code.split(":"):
+        if segment != _WILDCARD_SEGMENT and any(ch in segment for ch in _SPECIAL_CHARS):
+            return False
+    return True
+
+
+class PermissionMatcher:
+    """Precompiled matcher for one effective permission set"""
+
+    __slots__ = ("codes", "match_all", "_exact", "_trie", "_pattern")
+
+    def __init__(self, codes: Iterable[str]):
+        self.codes: Tuple[str, ...] = tuple(sorted(set(codes)))
+        self.match_all = ALL_PERMISSIONS in self.codes
+        self._exact = frozenset(code for code in self.codes if not any(ch in code for ch in _SPECIAL_CHARS))
+        self._trie: Optional[_TrieNode] = None
+        irregular = []
+
+        for code in self.codes:
+            if code in self._exact:
+                continue
+            if _is_segment_pattern(code):
+                self._insert(code.split(":"))
+            else:
+                irregular.append(code)
+
+        self._pattern = (
+            re.compile("|".join(f"(?:{fnmatch.translate(code)})" for code in irregular))
+            if irregular else None
+        )
+
+    def _insert(self, segments):
+        if self._trie is None:
+            self._trie = _TrieNode()
+        node = self._trie
+        for segment in segments:
+            if segment == _WILDCARD_SEGMENT:
+                if node.wildcard is None:
+                    node.wildcard = _TrieNode()
+                node = node.wildcard
+            else:
+                node = node.children.setdefault(segment, _TrieNode())
+        node.terminal = True
+
+    @staticmethod
+    def _walk(node: _TrieNode, segments, index: int) -> bool:
+        if index == len(segments):
+            return node.terminal
+        child = node.children.get(segments[index])
+        if child is not None and PermissionMatcher._walk(child, segments, index + 1):
+            return True
+        if node.wildcard is not None:
+            # `*` consumes one or more segments
+            for end in range(index + 1, len(segments) + 1):
+                if PermissionMatcher._walk(node.wildcard, segments, end):
+                    return True
+        return False
+
+    def matches(self, required: str) -> bool:
+        """Check whether `required` is granted by this permission set"""
+        if self.match_all or required in self._exact:
+            return True
+        if self._trie is not None and self._walk(self._trie, required.split(":"), 0):
+            return True
+        return bool(self._pattern and self._pattern.match(required))
+
+
+@lru_cache(maxsize=256)
+def _compile(codes: FrozenSet[str]) -> PermissionMatcher:
+    return PermissionMatcher(codes)
+
+
+def compile_permissions(codes: Iterable[str]) -> PermissionMatcher:
+    """Get a (memoized) matcher for a permission set"""
+    if isinstance(codes, PermissionMatcher):
+        return codes
+    return _compile(frozenset(codes))
@@ -7,21 +7,33 @@ Provides:
 - Retry logic and failure handling
 - Webhook signature verification
 - Rate limiting
+
+Deliveries go through the shared WebhookDispatcher
+(app.services.webhook_dispatcher), which also serves the POS webhooks: it
+owns the HTTP pools, per-webhook queues and circuit breakers, retries,
+optional batching and the capped delivery history read back here.
 """
 
+import asyncio
 import hashlib
 import hmac
 import logging
-import json
 from datetime import datetime, timedelta
 from enum import Enum
-from typing import Dict, List, Optional, Any, Callable
+from typing import Dict, List, Optional, Any
 from dataclasses import dataclass, field
 from uuid import uuid4
 
-import httpx
 from pydantic import BaseModel
 
+from app.services.webhook_dispatcher import (
+    WebhookDispatcher,
+    WebhookEndpoint,
+    WebhookJob,
+    sign_payload,
+    webhook_dispatcher
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -118,6 +130,10 @@ class WebhookConfig:
     # Rate limiting
     rate_limit_per_minute: int = 60
 
+    # Batching: coalesce up to batch_size queued events into one request
+    batch_size: int = 1
+    batch_window_seconds: float = 1.0
+
 
 @dataclass
 class WebhookDelivery:
@@ -160,29 +176,27 @@ class WebhookManager:
     """
     Manages webhooks and event dispatching.
     
-    In production, this would store data in database
-    and use a queue for reliable delivery.
+    In production, this would store data in database.
     """
     
-    def __init__(self):
+    def __init__(self, dispatcher: Optional[WebhookDispatcher] = None):
         # In-memory storage (replace with DB in production)
         self._webhooks: Dict[str, WebhookConfig] = {}
-        self._deliveries: Dict[str, WebhookDelivery] = {}
         self._tenant_webhooks: Dict[str, List[str]] = {}  # tenant_id -> webhook_ids
         
-        # HTTP client
-        self._client: Optional[httpx.AsyncClient] = None
-    
-    @property
-    def client(self) -> httpx.AsyncClient:
-        if self._client is None:
-            self._client = httpx.AsyncClient(timeout=30.0)
-        return self._client
+        # Shared delivery engine
+        self.dispatcher = dispatcher or webhook_dispatcher
+        self.dispatcher.add_listener(self._on_attempt)
     
     async def close(self):
-        if self._client:
-            await self._client.aclose()
-            self._client = None
+        """
+        Detach from the dispatcher: drop this manager's listener and endpoints.
+
+        The dispatcher is shared, so it is shut down by the application, not here.
+        """
+        self.dispatcher.remove_listener(self._on_attempt)
+        for webhook_id in list(self._webhooks):
+            self.dispatcher.remove_endpoint(webhook_id)
     
     # ==================== Webhook Management ====================
     
@@ -194,7 +208,8 @@ class WebhookManager:
         events: List[WebhookEvent],
         secret: Optional[str] = None,
         custom_headers: Optional[Dict[str, str]] = None,
-        created_by: str = ""
+        created_by: str = "",
+        batch_size: int = 1
     ) -> WebhookConfig:
         """Register a new webhook"""
         webhook_id = str(uuid4())
@@ -211,10 +226,12 @@ class WebhookManager:
             secret=secret,
             events=events,
             custom_headers=custom_headers or {},
-            created_by=created_by
+            created_by=created_by,
+            batch_size=batch_size
         )
         
         self._webhooks[webhook_id] = webhook
+        self._register_endpoint(webhook)
         
         if tenant_id not in self._tenant_webhooks:
             self._tenant_webhooks[tenant_id] = []
@@ -248,8 +265,22 @@ class WebhookManager:
         if custom_headers is not None:
             webhook.custom_headers = custom_headers
         
+        self._register_endpoint(webhook)
         return webhook
     
+    def _register_endpoint(self, webhook: WebhookConfig):
+        self.dispatcher.register_endpoint(WebhookEndpoint(
+            id=webhook.id,
+            url=webhook.url,
+            secret=webhook.secret,
+            headers=webhook.custom_headers,
+            timeout=webhook.timeout_seconds,
+            max_attempts=webhook.max_retries,
+            retry_delay=webhook.retry_interval_seconds,
+            batch_size=webhook.batch_size,
+            batch_window=webhook.batch_window_seconds
+        ))
+    
     def delete_webhook(self, webhook_id: str) -> bool:
         """Delete a webhook"""
         webhook = self._webhooks.get(webhook_id)
@@ -264,6 +295,7 @@ class WebhookManager:
             ]
         
         del self._webhooks[webhook_id]
+        self.dispatcher.remove_endpoint(webhook_id)
         logger.info(f"Webhook deleted: {webhook_id}")
         return True
     
@@ -295,29 +327,35 @@ class WebhookManager:
         tenant_id: str,
         event: WebhookEvent,
         data: Dict[str, Any],
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        wait: bool = True
     ) -> List[WebhookDelivery]:
-        """Dispatch an event to all subscribed webhooks"""
+        """
+        Dispatch an event to all subscribed webhooks
+
+        With wait=True the returned deliveries reflect each webhook's first
+        attempt; otherwise they are returned as queued (pending).
+        """
         webhooks = self.get_webhooks_for_event(tenant_id, event)
         
         if not webhooks:
             return []
         
-        deliveries = []
-        for webhook in webhooks:
-            delivery = await self._send_webhook(webhook, event, data, metadata)
-            deliveries.append(delivery)
+        jobs = [self._build_job(webhook, event, data, metadata) for webhook in webhooks]
+        futures = [await self.dispatcher.submit(job) for job in jobs]
         
-        return deliveries
+        if wait:
+            jobs = await asyncio.gather(*futures)
+        return [self._delivery_from_job(job) for job in jobs]
     
-    async def _send_webhook(
+    def _build_job(
         self,
         webhook: WebhookConfig,
         event: WebhookEvent,
         data: Dict[str, Any],
         metadata: Optional[Dict[str, Any]] = None
-    ) -> WebhookDelivery:
-        """Send a webhook request"""
+    ) -> WebhookJob:
+        """Create the dispatcher job for one webhook"""
         delivery_id = str(uuid4())
         
         # Create payload
@@ -330,126 +368,94 @@ class WebhookManager:
             metadata=metadata
         )
         
-        payload_json = payload.model_dump_json()
-        
-        # Create delivery record
-        delivery = WebhookDelivery(
+        return WebhookJob(
             id=delivery_id,
-            webhook_id=webhook.id,
+            endpoint_id=webhook.id,
+            event=event.value,
             tenant_id=webhook.tenant_id,
-            event=event,
             payload=payload.model_dump()
         )
+    
+    def _delivery_from_job(self, job: WebhookJob) -> WebhookDelivery:
+        """Delivery record for a dispatcher job"""
+        return WebhookDelivery(
+            id=job.id,
+            webhook_id=job.endpoint_id,
+            tenant_id=job.tenant_id,
+            event=WebhookEvent(job.event),
+            payload=job.payload,
+            status={
+                'delivered': DeliveryStatus.DELIVERED,
+                'retrying': DeliveryStatus.RETRYING,
+                'failed': DeliveryStatus.FAILED
+            }.get(job.status, DeliveryStatus.PENDING),
+            response_status_code=job.response_code,
+            response_body=job.response_body,
+            response_time_ms=job.response_time_ms,
+            attempt_number=job.attempt,
+            next_retry_at=datetime.utcfromtimestamp(job.next_retry_at) if job.next_retry_at else None,
+            error_message=job.error_message,
+            created_at=datetime.utcfromtimestamp(job.created_at),
+            delivered_at=datetime.utcfromtimestamp(job.delivered_at) if job.delivered_at else None
+        )
+    
+    async def _on_attempt(self, job: WebhookJob):
+        """Track failures of our webhooks after each delivery attempt"""
+        webhook = self._webhooks.get(job.endpoint_id)
+        if not webhook:
+            return
         
-        # Generate signature
-        signature = self._generate_signature(webhook.secret, payload_json)
-        
-        # Prepare headers
-        headers = {
-            "Content-Type": "application/json",
-            "X-Webhook-ID": webhook.id,
-            "X-Webhook-Event": event.value,
-            "X-Webhook-Signature": signature,
-            "X-Webhook-Timestamp": str(int(datetime.utcnow().timestamp())),
-            **webhook.custom_headers
-        }
-        
-        # Send request
-        start_time = datetime.utcnow()
-        
-        try:
-            response = await self.client.post(
-                webhook.url,
-                content=payload_json,
-                headers=headers,
-                timeout=webhook.timeout_seconds
-            )
-            
-            response_time = (datetime.utcnow() - start_time).total_seconds() * 1000
-            
-            delivery.response_status_code = response.status_code
-            delivery.response_body = response.text[:1000]  # Limit stored response
-            delivery.response_time_ms = int(response_time)
-            delivery.delivered_at = datetime.utcnow()
-            
-            if 200 <= response.status_code < 300:
-                delivery.status = DeliveryStatus.DELIVERED
-                webhook.consecutive_failures = 0
-                logger.info(f"Webhook delivered: {webhook.name} -> {event.value}")
-            else:
-                delivery.status = DeliveryStatus.FAILED
-                delivery.error_message = f"HTTP {response.status_code}"
-                self._handle_failure(webhook, delivery)
-        
-        except httpx.TimeoutException:
-            delivery.status = DeliveryStatus.FAILED
-            delivery.error_message = "Request timeout"
-            self._handle_failure(webhook, delivery)
-            logger.error(f"Webhook timeout: {webhook.name}")
-        
-        except Exception as e:
-            delivery.status = DeliveryStatus.FAILED
-            delivery.error_message = str(e)
-            self._handle_failure(webhook, delivery)
-            logger.error(f"Webhook error: {webhook.name} - {e}")
-        
-        # Update webhook last triggered
         webhook.last_triggered = datetime.utcnow()
+        if job.status == 'delivered':
+            webhook.consecutive_failures = 0
+            logger.info(f"Webhook delivered: {webhook.name} -> {job.event}")
+            return
         
-        # Store delivery
-        self._deliveries[delivery_id] = delivery
-        
-        return delivery
-    
-    def _handle_failure(self, webhook: WebhookConfig, delivery: WebhookDelivery):
-        """Handle webhook delivery failure"""
         webhook.consecutive_failures += 1
-        
-        # Check if should retry
-        if delivery.attempt_number < webhook.max_retries:
-            delivery.status = DeliveryStatus.RETRYING
-            delivery.next_retry_at = datetime.utcnow() + timedelta(
-                seconds=webhook.retry_interval_seconds * delivery.attempt_number
-            )
+        logger.error(f"Webhook error: {webhook.name} - {job.error_message}")
         
         # Suspend webhook after too many failures
-        if webhook.consecutive_failures >= 10:
+        if webhook.consecutive_failures >= 10 and webhook.status == WebhookStatus.ACTIVE:
             webhook.status = WebhookStatus.SUSPENDED
             logger.warning(f"Webhook suspended due to failures: {webhook.name}")
     
     async def retry_delivery(self, delivery_id: str) -> Optional[WebhookDelivery]:
         """Retry a failed delivery"""
-        delivery = self._deliveries.get(delivery_id)
-        if not delivery:
+        job = self.dispatcher.find(delivery_id)
+        if not job:
             return None
         
-        if delivery.status not in [DeliveryStatus.FAILED, DeliveryStatus.RETRYING]:
-            return delivery
+        if job.status not in ['failed', 'retrying']:
+            return self._delivery_from_job(job)
         
-        webhook = self._webhooks.get(delivery.webhook_id)
+        webhook = self._webhooks.get(job.endpoint_id)
         if not webhook or webhook.status != WebhookStatus.ACTIVE:
             return None
         
-        # Increment attempt
-        delivery.attempt_number += 1
-        
-        # Re-send
-        return await self._send_webhook(
+        # Re-send as the next attempt
+        retry = self._build_job(
             webhook,
-            delivery.event,
-            delivery.payload["data"],
-            delivery.payload.get("metadata")
+            WebhookEvent(job.event),
+            job.payload["data"],
+            job.payload.get("metadata")
         )
+        retry.attempt = job.attempt + 1
+        future = await self.dispatcher.submit(retry)
+        return self._delivery_from_job(await future)
+    
+    def _latest_attempts(self, webhook_ids: List[str]) -> List[WebhookJob]:
+        """Most recent recorded attempt of each delivery"""
+        latest: Dict[str, WebhookJob] = {}
+        for webhook_id in webhook_ids:
+            for job in self.dispatcher.recent(webhook_id):
+                latest.setdefault(job.id, job)
+        return list(latest.values())
     
     # ==================== Signature Verification ====================
     
     def _generate_signature(self, secret: str, payload: str) -> str:
         """Generate HMAC signature for payload"""
-        return hmac.new(
-            secret.encode(),
-            payload.encode(),
-            hashlib.sha256
-        ).hexdigest()
+        return sign_payload(secret, payload)
     
     def verify_signature(
         self,
@@ -473,18 +479,20 @@ class WebhookManager:
         limit: int = 50
     ) -> List[WebhookDelivery]:
         """Get delivery history for a webhook"""
-        deliveries = [
-            d for d in self._deliveries.values()
-            if d.webhook_id == webhook_id
+        return [
+            self._delivery_from_job(job)
+            for job in self.dispatcher.recent(webhook_id, limit)
         ]
-        deliveries.sort(key=lambda x: x.created_at, reverse=True)
-        return deliveries[:limit]
     
     def get_pending_retries(self) -> List[WebhookDelivery]:
         """Get deliveries pending retry"""
         now = datetime.utcnow()
+        deliveries = [
+            self._delivery_from_job(job)
+            for job in self._latest_attempts(list(self._webhooks))
+        ]
         return [
-            d for d in self._deliveries.values()
+            d for d in deliveries
             if d.status == DeliveryStatus.RETRYING
             and d.next_retry_at
             and d.next_retry_at <= now
@@ -499,9 +507,10 @@ class WebhookManager:
         cutoff = datetime.utcnow() - timedelta(days=days)
         
         deliveries = [
-            d for d in self._deliveries.values()
-            if d.tenant_id == tenant_id and d.created_at >= cutoff
+            self._delivery_from_job(job)
+            for job in self._latest_attempts(self._tenant_webhooks.get(tenant_id, []))
         ]
+        deliveries = [d for d in deliveries if d.created_at >= cutoff]
         
         total = len(deliveries)
         delivered = sum(1 for d in deliveries if d.status == DeliveryStatus.DELIVERED)
@@ -9,14 +9,26 @@ from fastapi import HTTPException
 class AccountingIntegrationService:
     """Service for validating accounting setup and accounts"""
     
-    def __init__(self, pos_service):
+    def __init__(self, pos_service, known_accounts: Optional[Set[str]] = None):
         """
         Initialize Accounting Integration Service
         
         Args:
             pos_service: POS service instance for ERPNext queries
+            known_accounts: Already-fetched account names for the company. When given,
+                existence checks run against this set instead of re-listing accounts.
         """
         self.pos_service = pos_service
+        self.known_accounts = known_accounts
+    
+    async def _validate_accounts_exist(self, account_list: List[str], company: str) -> bool:
+        """Check accounts exist, preferring the preloaded account set."""
+        if not self.known_accounts:
+            return await self.pos_service.validate_accounts_exist(account_list, company)
+        missing = set(account_list) - self.known_accounts
+        if missing:
+            raise ValueError(f"Account validation failed: Accounts not found: {', '.join(missing)}")
+        return True
     
     async def validate_chart_of_accounts(
         self,
@@ -106,7 +118,7 @@ class AccountingIntegrationService:
         # Validate all accounts exist
         account_list = list(income_accounts)
         try:
-            await self.pos_service.validate_accounts_exist(account_list, company)
+            await self._validate_accounts_exist(account_list, company)
         except ValueError as e:
             raise HTTPException(
                 status_code=400,
@@ -143,7 +155,7 @@ class AccountingIntegrationService:
         account_list = list(expense_accounts)
         if account_list:
             try:
-                await self.pos_service.validate_accounts_exist(account_list, company)
+                await self._validate_accounts_exist(account_list, company)
             except ValueError as e:
                 raise HTTPException(
                     status_code=400,
@@ -168,7 +180,7 @@ class AccountingIntegrationService:
             True if valid, raises HTTPException if not
         """
         try:
-            await self.pos_service.validate_accounts_exist([vat_account], company)
+            await self._validate_accounts_exist([vat_account], company)
             return True
         except ValueError as e:
             raise HTTPException(
@@ -196,7 +208,7 @@ class AccountingIntegrationService:
             return True
         
         try:
-            await self.pos_service.validate_accounts_exist(account_list, company)
+            await self._validate_accounts_exist(account_list, company)
             return True
         except ValueError as e:
             raise HTTPException(
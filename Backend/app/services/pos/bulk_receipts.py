@@ -0,0 +1,195 @@
+"""
+Bulk Receipt Pipeline
+Fetches invoices in batches and renders receipts off the event loop.
+
+Invoices are read in chunks with `name in [...]` list queries: one query for
+the Sales Invoice rows and one per child table (items, taxes, payments), so a
+chunk of 100 invoices costs four ERPNext calls instead of a hundred. Chunks
+are fetched concurrently (bounded) while earlier chunks render.
+
+Rendering (thermal text, HTML with QR codes, reportlab PDFs) is CPU-bound and
+runs in a process pool of settings.RECEIPT_RENDER_WORKERS processes; with 0
+workers it runs in a thread instead. Results are produced in request order so
+they can be streamed as they become ready.
+"""
+import asyncio
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.pos.receipt_service import ReceiptService
+
+logger = logging.getLogger(__name__)
+
+# (child doctype, field on the parent document)
+RECEIPT_CHILD_TABLES = (
+    ("Sales Invoice Item", "items"),
+    ("Sales Taxes and Charges", "taxes"),
+    ("Sales Invoice Payment", "payments"),
+)
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+
+def render_receipts(
+    invoices: List[Dict[str, Any]], receipt_format: str, width: int, language: str
+) -> List[Tuple[bool, str]]:
+    """Render receipts; runs in a worker process. Returns (success, content or error) per invoice"""
+    receipt_service = ReceiptService()
+    rendered = []
+    for invoice in invoices:
+        try:
+            if receipt_format == "thermal":
+                content = receipt_service.generate_thermal_receipt(invoice_data=invoice, width=width, language=language)
+            else:  # html
+                content = receipt_service.generate_html_receipt(invoice_data=invoice, language=language)
+            rendered.append((True, content))
+        except Exception as e:
+            rendered.append((False, str(e)))
+    return rendered
+
+
+def render_merged_pdf(invoices: List[Dict[str, Any]], language: str) -> bytes:
+    return ReceiptService().generate_pdf_receipts(invoices, language=language)
+
+
+def _get_render_pool() -> Optional[ProcessPoolExecutor]:
+    global _render_pool
+    if _render_pool is None and settings.RECEIPT_RENDER_WORKERS > 0:
+        _render_pool = ProcessPoolExecutor(max_workers=settings.RECEIPT_RENDER_WORKERS)
+    return _render_pool
+
+
+async def run_in_render_pool(fn, *args):
+    """Run a picklable rendering function in the process pool (or a thread when disabled)"""
+    pool = _get_render_pool()
+    if pool is None:
+        return await asyncio.to_thread(fn, *args)
+    return await asyncio.get_running_loop().run_in_executor(pool, partial(fn, *args))
+
+
+def shutdown_render_pool() -> None:
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+
+
+class BulkReceiptPipeline:
+    """Batched invoice fetch plus pooled rendering for bulk receipt requests"""
+
+    def __init__(self, pos_service, batch_size: Optional[int] = None, concurrency: Optional[int] = None):
+        self.pos_service = pos_service
+        self.batch_size = batch_size or settings.RECEIPT_BULK_BATCH_SIZE
+        self.concurrency = concurrency or settings.RECEIPT_BULK_FETCH_CONCURRENCY
+
+    def _chunks(self, invoice_ids: List[str]) -> List[List[str]]:
+        return [invoice_ids[i:i + self.batch_size] for i in range(0, len(invoice_ids), self.batch_size)]
+
+    async def _list(self, doctype: str, filters: List[List[Any]], limit: int, **params: Any) -> List[Dict[str, Any]]:
+        result = await self.pos_service._request(
+            method="GET",
+            endpoint=f"/api/resource/{doctype}",
+            params={
+                "filters": json.dumps(filters),
+                "fields": json.dumps(["*"]),
+                "limit_page_length": limit,
+                **params
+            }
+        )
+        rows = result.get("data") if isinstance(result, dict) else None
+        return rows if isinstance(rows, list) else []
+
+    async def _fetch_chunk(self, chunk: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch a chunk of invoices with their child tables, keyed by name"""
+        try:
+            parents, *children = await asyncio.gather(
+                self._list("Sales Invoice", [["name", "in", chunk]], len(chunk)),
+                *(
+                    self._list(doctype, [["parent", "in", chunk]], 0, parent="Sales Invoice", order_by="idx asc")
+                    for doctype, _ in RECEIPT_CHILD_TABLES
+                )
+            )
+        except Exception as e:
+            # Some deployments deny list access to child doctypes; fall back to documents
+            logger.warning(f"Batched invoice fetch failed, fetching {len(chunk)} invoices individually: {e}")
+            return await self._fetch_individually(chunk)
+
+        invoices = {row["name"]: {**row, **{field: [] for _, field in RECEIPT_CHILD_TABLES}} for row in parents}
+        for (_, field), rows in zip(RECEIPT_CHILD_TABLES, children):
+            for row in rows:
+                invoice = invoices.get(row.get("parent"))
+                if invoice is not None:
+                    invoice[field].append(row)
+        return invoices
+
+    async def _fetch_individually(self, chunk: List[str]) -> Dict[str, Dict[str, Any]]:
+        async def fetch(invoice_id: str) -> Optional[Dict[str, Any]]:
+            try:
+                result = await self.pos_service._request(
+                    method="GET",
+                    endpoint=f"/api/resource/Sales Invoice/{invoice_id}"
+                )
+            except Exception as e:
+                logger.warning(f"Failed to fetch invoice {invoice_id}: {e}")
+                return None
+            return result.get("data") if isinstance(result, dict) else None
+
+        documents = await asyncio.gather(*(fetch(invoice_id) for invoice_id in chunk))
+        return {invoice_id: doc for invoice_id, doc in zip(chunk, documents) if doc}
+
+    def _fetch_all(self, invoice_ids: List[str]) -> List[Tuple[List[str], asyncio.Task]]:
+        """Start fetching every chunk (bounded); tasks complete in any order"""
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(chunk: List[str]) -> Dict[str, Dict[str, Any]]:
+            async with slots:
+                return await self._fetch_chunk(chunk)
+
+        return [(chunk, asyncio.create_task(fetch(chunk))) for chunk in self._chunks(invoice_ids)]
+
+    async def iter_receipts(
+        self, invoice_ids: List[str], receipt_format: str = "thermal", width: int = 80, language: str = "en"
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield one result per requested invoice, in request order
+
+        Each result is {"invoice_id", "success", "content"} or {"invoice_id", "success", "error"}.
+        """
+        fetches = self._fetch_all(invoice_ids)
+        try:
+            for chunk, task in fetches:
+                invoices = await task
+                found = [invoices[invoice_id] for invoice_id in chunk if invoice_id in invoices]
+                rendered = iter(await run_in_render_pool(render_receipts, found, receipt_format, width, language))
+                for invoice_id in chunk:
+                    if invoice_id not in invoices:
+                        yield {"invoice_id": invoice_id, "success": False, "error": "Invoice not found"}
+                        continue
+                    success, content = next(rendered)
+                    if success:
+                        yield {"invoice_id": invoice_id, "success": True, "content": content}
+                    else:
+                        yield {"invoice_id": invoice_id, "success": False, "error": content}
+        finally:
+            for _, task in fetches:
+                task.cancel()
+
+    async def merged_pdf(self, invoice_ids: List[str], language: str = "en") -> Tuple[bytes, List[str]]:
+        """
+        Render every found invoice into one PDF, a page per receipt
+
+        Returns:
+            (PDF bytes, invoice ids that were not found)
+        """
+        invoices: Dict[str, Dict[str, Any]] = {}
+        for _, task in self._fetch_all(invoice_ids):
+            invoices.update(await task)
+        missing = [invoice_id for invoice_id in invoice_ids if invoice_id not in invoices]
+        found = [invoices[invoice_id] for invoice_id in invoice_ids if invoice_id in invoices]
+        if not found:
+            return b"", missing
+        return await run_in_render_pool(render_merged_pdf, found, language), missing
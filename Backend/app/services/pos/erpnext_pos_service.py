@@ -2,6 +2,8 @@
 ERPNext PoS Service Implementation - Multi-tenant aware
 """
 import re
+import time
+import asyncio
 import httpx
 from typing import List, Optional, Dict, Any
 from datetime import datetime
@@ -13,11 +15,21 @@ from app.config import settings
 class ErpnextPosService(PosServiceBase):
     """ERPNext implementation of PoS service with multi-tenant support"""
     
-    def __init__(self, tenant_id: str, base_url: str, company_name: str = None, username: str = None, password: str = None):
+    def __init__(
+        self,
+        tenant_id: str,
+        base_url: str,
+        company_name: str = None,
+        username: str = None,
+        password: str = None,
+        client: Optional[httpx.AsyncClient] = None
+    ):
         """
         Initialize ERPNext PoS Service with tenant isolation.
 
         Uses session-based authentication (cookies) instead of API keys.
+        Session cookies are held per instance and sent explicitly, so one
+        pooled client can be shared by every tenant's service.
 
         Args:
             tenant_id: Tenant identifier for multi-tenant isolation
@@ -25,14 +37,19 @@ class ErpnextPosService(PosServiceBase):
             company_name: Company name for tenant filtering
             username: ERPNext username (defaults to settings.ERPNEXT_USER)
             password: ERPNext password (defaults to settings.ERPNEXT_PASSWORD)
+            client: Shared AsyncClient (owned by the caller); a private one is created if omitted
         """
         self.tenant_id = tenant_id  # Store tenant_id for audit logging and filtering
         self.company_name = company_name  # Store company name for filtering
         self.base_url = base_url.rstrip('/')
         self.username = username or settings.ERPNEXT_USER
         self.password = password or settings.ERPNEXT_PASSWORD
-        self.client = httpx.AsyncClient(timeout=30.0, follow_redirects=True)
+        self._owns_client = client is None
+        self.client = client or httpx.AsyncClient(timeout=30.0, follow_redirects=True)
         self._logged_in = False
+        self._session_cookies: Dict[str, str] = {}
+        self._session_expires_at = 0.0
+        self._login_lock = asyncio.Lock()
         self._site_name = self._resolve_site_name(tenant_id)
     
     def _resolve_site_name(self, tenant_id: Optional[str]) -> str:
@@ -82,47 +99,59 @@ class ErpnextPosService(PosServiceBase):
         Returns:
             bool: True if login successful, False otherwise
         """
-        if self._logged_in:
-            return True
-        
-        try:
-            headers = {"X-Frappe-Site-Name": self._site_name}
-            response = await self.client.post(
-                f"{self.base_url}/api/method/login",
-                headers=headers,
-                data={
-                    "usr": self.username,
-                    "pwd": self.password
-                }
-            )
-            
-            if response.status_code == 200:
-                try:
-                    response_data = response.json()
-                    if isinstance(response_data, dict):
-                        # Check for exceptions
-                        if "exception" in response_data or "exc" in response_data:
-                            return False
-                        # Check for "Logged In" message
-                        if response_data.get("message") == "Logged In":
-                            self._logged_in = True
-                            return True
-                except (ValueError, KeyError):
-                    pass
-                
-                # If we got 200, assume success
-                self._logged_in = True
+        async with self._login_lock:
+            # Another request may have logged in while we waited
+            if self.has_session():
                 return True
-            
-            return False
-        except Exception as e:
-            print(f"ERPNext POS Service Login Error for {self._site_name}: {e}")
-            return False
+
+            try:
+                headers = {"X-Frappe-Site-Name": self._site_name}
+                response = await self.client.post(
+                    f"{self.base_url}/api/method/login",
+                    headers=headers,
+                    data={
+                        "usr": self.username,
+                        "pwd": self.password
+                    }
+                )
+
+                if response.status_code == 200:
+                    try:
+                        response_data = response.json()
+                        if isinstance(response_data, dict):
+                            # Check for exceptions
+                            if "exception" in response_data or "exc" in response_data:
+                                return False
+                    except (ValueError, KeyError):
+                        pass
+
+                    # "Logged In", or any other 200, is a success
+                    self._store_session(response)
+                    return True
+
+                return False
+            except Exception as e:
+                print(f"ERPNext POS Service Login Error for {self._site_name}: {e}")
+                return False
+
+    def _store_session(self, response: httpx.Response):
+        """Keep the login cookies for this site until ERPNEXT_SESSION_TTL elapses"""
+        self._session_cookies = dict(response.cookies.items())
+        self._session_expires_at = time.monotonic() + settings.ERPNEXT_SESSION_TTL
+        self._logged_in = True
+
+    def has_session(self) -> bool:
+        """True while a login session is held and has not expired"""
+        return self._logged_in and time.monotonic() < self._session_expires_at
+
+    def _invalidate_session(self):
+        self._logged_in = False
+        self._session_cookies = {}
     
     async def _request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
         """Make HTTP request to ERPNext using session-based authentication"""
-        # Ensure we're logged in
-        if not self._logged_in:
+        # Ensure we're logged in (sessions are refreshed lazily once expired)
+        if not self.has_session():
             login_success = await self._login()
             if not login_success:
                 raise HTTPException(
@@ -133,7 +162,9 @@ class ErpnextPosService(PosServiceBase):
         headers = kwargs.pop('headers', {})
         headers['X-Frappe-Site-Name'] = self._site_name
         headers.setdefault('Content-Type', 'application/json')
-        
+        self._set_cookie_header(headers)
+        sent_cookies = self._session_cookies
+
         try:
             response = await self.client.request(
                 method,
@@ -144,11 +175,13 @@ class ErpnextPosService(PosServiceBase):
             
             # Handle authentication errors (401/403)
             if response.status_code in (401, 403):
-                # Try to re-login
-                self._logged_in = False
+                # Try to re-login (unless a concurrent request already did)
+                if self._session_cookies is sent_cookies:
+                    self._invalidate_session()
                 login_success = await self._login()
                 if login_success:
                     # Retry the request
+                    self._set_cookie_header(headers)
                     response = await self.client.request(
                         method,
                         f"{self.base_url}{endpoint}",
@@ -187,13 +220,18 @@ class ErpnextPosService(PosServiceBase):
                 detail=f"Cannot connect to ERPNext: {str(e)}"
             )
     
+    def _set_cookie_header(self, headers: Dict[str, str]):
+        if self._session_cookies:
+            headers['Cookie'] = "; ".join(f"{name}={value}" for name, value in self._session_cookies.items())
+
     async def __aenter__(self):
         """Async context manager entry"""
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Async context manager exit - close client"""
-        await self.client.aclose()
+        """Async context manager exit - close client (unless it is shared)"""
+        if self._owns_client:
+            await self.client.aclose()
     
     # ==================== Profile Management ====================
     
@@ -708,15 +746,18 @@ class ErpnextPosService(PosServiceBase):
         import os
         if not os.getenv("SKIP_POS_STOCK_VALIDATION", "false").lower() == "true":
             payments = profile.get('payments', [])
-            for payment in payments:
-                mode_of_payment = payment.get('mode_of_payment')
-                if mode_of_payment and company:
-                    try:
-                        account = await self.get_payment_account(mode_of_payment, company)
-                        payment_accounts[mode_of_payment] = account
-                    except Exception as e:
-                        # Log but don't fail - will be caught during validation
-                        print(f"Warning: Could not resolve account for {mode_of_payment}: {e}")
+            modes = [p.get('mode_of_payment') for p in payments if p.get('mode_of_payment')] if company else []
+            # Resolve every payment mode's account concurrently
+            accounts = await asyncio.gather(
+                *(self.get_payment_account(mode, company) for mode in modes),
+                return_exceptions=True
+            )
+            for mode_of_payment, account in zip(modes, accounts):
+                if isinstance(account, Exception):
+                    # Log but don't fail - will be caught during validation
+                    print(f"Warning: Could not resolve account for {mode_of_payment}: {account}")
+                    continue
+                payment_accounts[mode_of_payment] = account
         else:
             # In demo mode, use placeholder accounts
             payments = profile.get('payments', [])
@@ -1,20 +1,79 @@
 """
 Event Bus for PoS
 Manages event publishing, subscription, and asynchronous processing
+
+Events are dispatched highest-priority first by a pool of
+EVENT_BUS_WORKERS workers from a bounded queue (EVENT_BUS_QUEUE_SIZE). When
+the queue is full, EVENT_BUS_OVERFLOW_POLICY decides what happens:
+"drop_lowest" evicts the lowest-priority queued event if the new one
+outranks it (otherwise the new event is dropped, except CRITICAL events,
+which wait for space); "block" makes publishers wait.
+
+Redis persistence (event history) is batched by a background flusher, so
+`publish` does not wait on it.
+
+With EVENT_BUS_DISTRIBUTED, published events are not queued locally but
+appended to the shared `event_bus:deliveries` stream before `publish`
+returns, and read back through a Redis consumer group, so every uvicorn
+worker shares the handler load. An entry is acknowledged only after all its
+handlers succeeded; entries whose handlers failed, or left pending by a
+crashed or stalled worker, are reclaimed with XAUTOCLAIM after
+EVENT_BUS_CLAIM_IDLE_MS, giving at-least-once delivery.
 """
 import asyncio
+import heapq
+import itertools
 import json
 import logging
+import os
+import socket
+import time
 from datetime import datetime
-from typing import Dict, Any, List, Optional, Callable, Awaitable
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
 from dataclasses import dataclass, asdict
 from enum import Enum
 import uuid
 
+from prometheus_client import Counter, Gauge, Histogram
+
+from app.config import settings
 from app.services.pos.plugin_registry import PluginHook
 
 logger = logging.getLogger(__name__)
 
+EVENT_TTL = 86400  # 24 hours
+EVENT_STREAM_MAXLEN = 1000  # Keep last 1000 events per stream
+EVENT_DELIVERY_STREAM = "event_bus:deliveries"
+
+EVENT_BUS_QUEUE_DEPTH = Gauge(
+    "pos_event_bus_queue_depth",
+    "Events waiting for a worker",
+)
+EVENT_BUS_PUBLISHED = Counter(
+    "pos_event_bus_published_total",
+    "Events published by priority",
+    ["priority"],
+)
+EVENT_BUS_DROPPED = Counter(
+    "pos_event_bus_dropped_total",
+    "Events dropped because the queue was full, by priority",
+    ["priority"],
+)
+EVENT_HANDLER_DURATION = Histogram(
+    "pos_event_handler_duration_seconds",
+    "Event handler latency by event name",
+    ["event"],
+)
+EVENT_BUS_PERSISTED = Counter(
+    "pos_event_bus_persisted_total",
+    "Events written to Redis by outcome",
+    ["outcome"],
+)
+EVENT_BUS_RECLAIMED = Counter(
+    "pos_event_bus_reclaimed_total",
+    "Stream entries reclaimed from idle consumers",
+)
+
 
 class EventPriority(Enum):
     """Event priority levels"""
@@ -94,17 +153,65 @@ class EventHandler:
         return True
 
 
+class _EventQueue(asyncio.PriorityQueue):
+    """Bounded priority queue of (-priority, sequence, event, stream id); FIFO within a priority"""
+
+    def __init__(self, maxsize: int = 0):
+        super().__init__(maxsize)
+        self._sequence = itertools.count()
+
+    def entry(self, event: Event, message_id: Optional[str] = None):
+        return (-event.priority.value, next(self._sequence), event, message_id)
+
+    def evict_lowest(self, below: EventPriority) -> Optional[Tuple[Event, Optional[str]]]:
+        """Remove the newest entry of the lowest queued priority, if lower than `below`"""
+        if not self._queue:
+            return None
+        lowest = max(self._queue)
+        if -lowest[0] >= below.value:
+            return None
+        self._queue.remove(lowest)
+        heapq.heapify(self._queue)
+        self.task_done()
+        return lowest[2], lowest[3]
+
+
 class EventBus:
     """Central event bus for the POS system"""
 
-    def __init__(self, redis_client=None, enable_persistence: bool = True):
+    def __init__(
+        self,
+        redis_client=None,
+        enable_persistence: bool = True,
+        workers: Optional[int] = None,
+        max_queue_size: Optional[int] = None,
+        overflow_policy: Optional[str] = None,
+        distributed: Optional[bool] = None,
+        consumer_group: Optional[str] = None,
+        consumer_name: Optional[str] = None
+    ):
         self.handlers: Dict[str, List[EventHandler]] = {}
         self.hooks: Dict[str, PluginHook] = {}
         self.redis = redis_client
         self.enable_persistence = enable_persistence
-        self.processing_queue: asyncio.Queue = asyncio.Queue()
+        self.workers = workers or settings.EVENT_BUS_WORKERS
+        self.overflow_policy = overflow_policy or settings.EVENT_BUS_OVERFLOW_POLICY
+        self.processing_queue = _EventQueue(max_queue_size or settings.EVENT_BUS_QUEUE_SIZE)
         self.is_processing = False
-        self._processing_task = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._persist_buffer: List[Event] = []
+        self._persist_wakeup = asyncio.Event()
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._dropped = 0
+
+        # Consumer-group delivery (only active once a Redis client is set)
+        if distributed is None:
+            distributed = settings.EVENT_BUS_DISTRIBUTED
+        self.consumer_group = (consumer_group or settings.EVENT_BUS_CONSUMER_GROUP) if distributed else None
+        self.consumer_name = consumer_name or f"{socket.gethostname()}-{os.getpid()}"
+        self._consumer_task: Optional[asyncio.Task] = None
+        self._in_flight: set = set()
+        self._reclaim_cursor = "0-0"
 
         # Initialize standard hooks
         self._init_standard_hooks()
@@ -231,6 +338,7 @@ class EventBus:
             id="",
             name=event_name,
             data=data,
+            timestamp=None,
             source=source,
             tenant_id=tenant_id,
             priority=priority,
@@ -238,42 +346,103 @@ class EventBus:
             metadata=metadata
         )
 
-        # Add to processing queue
-        await self.processing_queue.put(event)
+        EVENT_BUS_PUBLISHED.labels(priority=priority.name).inc()
+        if self.distributed:
+            # Handed to the consumer group; any worker may process it
+            await self._append_delivery(event)
+        else:
+            # Add to processing queue
+            await self._enqueue(event)
 
-        # Persist event if enabled
+        # Persist event if enabled (written in batches by the flusher)
         if self.enable_persistence and self.redis:
-            await self._persist_event(event)
+            self._buffer_for_redis(event)
 
         logger.debug(f"Published event '{event_name}' with ID {event.id}")
         return event.id
 
-    async def _start_processing(self):
-        """Start the event processing loop"""
-        self.is_processing = True
-        logger.info("Event bus processing started")
+    @property
+    def distributed(self) -> bool:
+        """Whether events are delivered through the Redis consumer group"""
+        return bool(self.consumer_group and self.redis)
+
+    def _buffer_for_redis(self, event: Event):
+        self._persist_buffer.append(event)
+        if len(self._persist_buffer) >= settings.EVENT_BUS_PERSIST_BATCH:
+            self._persist_wakeup.set()
+        self._ensure_flusher()
+
+    async def _append_delivery(self, event: Event):
+        """Add an event to the consumer group's stream"""
+        try:
+            await self.redis.xadd(
+                EVENT_DELIVERY_STREAM,
+                {'event': json.dumps(event.to_dict())},
+                maxlen=settings.EVENT_BUS_STREAM_MAXLEN,
+                approximate=True
+            )
+        except Exception as e:
+            # Stream unavailable: handle in this worker rather than lose the event
+            logger.warning(f"Failed to append event '{event.name}' to the delivery stream: {e}")
+            await self._enqueue(event)
+
+    async def _enqueue(self, event: Event, message_id: Optional[str] = None) -> bool:
+        """Queue an event for the workers, applying the overflow policy when full"""
+        queue = self.processing_queue
+        if queue.full() and self.overflow_policy != "block":
+            evicted = queue.evict_lowest(below=event.priority)
+            if evicted is not None:
+                self._record_drop(*evicted)
+            elif event.priority != EventPriority.CRITICAL:
+                self._record_drop(event, message_id)
+                return False
+
+        await queue.put(queue.entry(event, message_id))
+        EVENT_BUS_QUEUE_DEPTH.set(queue.qsize())
+        return True
+
+    def _record_drop(self, event: Event, message_id: Optional[str] = None):
+        if message_id:
+            # Left pending in the consumer group; reclaimed once it goes idle
+            self._in_flight.discard(message_id)
+            logger.info(f"Event queue full, deferred stream entry {message_id} ('{event.name}')")
+            return
+        self._dropped += 1
+        EVENT_BUS_DROPPED.labels(priority=event.priority.name).inc()
+        logger.warning(f"Event queue full, dropped '{event.name}' ({event.id}, {event.priority.name})")
 
+    async def _start_processing(self):
+        """Worker loop: process events in priority order"""
         while self.is_processing:
             try:
                 # Get next event from queue
-                event = await self.processing_queue.get()
+                _, _, event, message_id = await self.processing_queue.get()
+                EVENT_BUS_QUEUE_DEPTH.set(self.processing_queue.qsize())
 
-                # Process the event
-                await self._process_event(event)
-
-                # Mark task as done
-                self.processing_queue.task_done()
+                try:
+                    # Process the event; failed stream entries stay pending for reclaim
+                    handled = await self._process_event(event)
+                    if message_id:
+                        if handled:
+                            await self._ack(message_id)
+                        else:
+                            self._in_flight.discard(message_id)
+                finally:
+                    # Mark task as done
+                    self.processing_queue.task_done()
 
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Error processing event: {e}")
 
-    async def _process_event(self, event: Event):
-        """Process a single event"""
+    async def _process_event(self, event: Event) -> bool:
+        """Process a single event; False if any handler failed"""
         logger.debug(f"Processing event '{event.name}' ({event.id})")
 
         if event.name not in self.handlers:
             logger.debug(f"No handlers registered for event '{event.name}'")
-            return
+            return True
 
         # Get matching handlers
         matching_handlers = [
@@ -283,7 +452,7 @@ class EventBus:
 
         if not matching_handlers:
             logger.debug(f"No matching handlers for event '{event.name}'")
-            return
+            return True
 
         # Execute handlers concurrently
         tasks = []
@@ -292,38 +461,179 @@ class EventBus:
             tasks.append(task)
 
         # Wait for all handlers to complete
-        await asyncio.gather(*tasks, return_exceptions=True)
+        results = await asyncio.gather(*tasks, return_exceptions=True)
 
         logger.debug(f"Event '{event.name}' processed by {len(matching_handlers)} handlers")
+        return all(result is True for result in results)
 
-    async def _execute_handler(self, handler: EventHandler, event: Event):
-        """Execute a single event handler"""
+    async def _execute_handler(self, handler: EventHandler, event: Event) -> bool:
+        """Execute a single event handler; False if it raised"""
+        started = time.perf_counter()
         try:
             logger.debug(f"Executing handler '{handler.name}' for event '{event.name}'")
             await handler.handler(event)
+            return True
         except Exception as e:
             logger.error(f"Handler '{handler.name}' failed for event '{event.name}': {e}")
+            return False
+        finally:
+            EVENT_HANDLER_DURATION.labels(event=event.name).observe(time.perf_counter() - started)
 
-    async def _persist_event(self, event: Event):
-        """Persist event to Redis for durability"""
-        if not self.redis:
+    async def _ensure_consumer_group(self):
+        try:
+            await self.redis.xgroup_create(
+                EVENT_DELIVERY_STREAM, self.consumer_group, id="0", mkstream=True
+            )
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def _queue_room(self) -> int:
+        if self.processing_queue.maxsize <= 0:
+            return settings.EVENT_BUS_STREAM_BATCH
+        return min(
+            settings.EVENT_BUS_STREAM_BATCH,
+            self.processing_queue.maxsize - self.processing_queue.qsize()
+        )
+
+    async def _consume_stream(self):
+        """Read new and reclaimed entries from the consumer group into the local queue"""
+        last_reclaim = 0.0
+        while self.is_processing:
+            try:
+                now = time.monotonic()
+                if now - last_reclaim >= settings.EVENT_BUS_RECLAIM_INTERVAL:
+                    last_reclaim = now
+                    await self._reclaim_pending()
+
+                # Backpressure: only read what the local queue can take
+                room = self._queue_room()
+                if room <= 0:
+                    await asyncio.sleep(0.05)
+                    continue
+
+                response = await self.redis.xreadgroup(
+                    self.consumer_group,
+                    self.consumer_name,
+                    {EVENT_DELIVERY_STREAM: ">"},
+                    count=room,
+                    block=settings.EVENT_BUS_STREAM_BLOCK_MS
+                )
+                if not response:
+                    # Block timed out; don't spin if the client returned early
+                    await asyncio.sleep(0.01)
+                for _, messages in response or []:
+                    await self._deliver_messages(messages)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event stream consumer failed: {e}")
+                await asyncio.sleep(1)
+
+    async def _reclaim_pending(self):
+        """Take over entries another consumer read but never acknowledged"""
+        room = self._queue_room()
+        if room <= 0:
             return
 
+        result = await self.redis.xautoclaim(
+            EVENT_DELIVERY_STREAM,
+            self.consumer_group,
+            self.consumer_name,
+            min_idle_time=settings.EVENT_BUS_CLAIM_IDLE_MS,
+            start_id=self._reclaim_cursor,
+            count=room
+        )
+        self._reclaim_cursor, messages = result[0], result[1]
+        messages = [(message_id, fields) for message_id, fields in messages if message_id not in self._in_flight]
+        if messages:
+            EVENT_BUS_RECLAIMED.inc(len(messages))
+            logger.info(f"Reclaimed {len(messages)} pending events from idle consumers")
+        await self._deliver_messages(messages)
+
+    async def _deliver_messages(self, messages):
+        for message_id, fields in messages:
+            if message_id in self._in_flight:
+                continue
+            try:
+                event = Event.from_dict(json.loads(fields["event"]))
+            except Exception as e:
+                # Trimmed or malformed entries can never succeed; don't redeliver them
+                logger.warning(f"Discarding unreadable stream entry {message_id}: {e}")
+                await self._ack(message_id)
+                continue
+
+            self._in_flight.add(message_id)
+            await self._enqueue(event, message_id)
+
+    async def _ack(self, message_id: str):
+        self._in_flight.discard(message_id)
         try:
-            key = f"events:{event.tenant_id or 'global'}:{event.id}"
-            await self.redis.setex(key, 86400, json.dumps(event.to_dict()))  # 24 hour TTL
-
-            # Also add to event stream for the tenant
-            stream_key = f"event_stream:{event.tenant_id or 'global'}"
-            await self.redis.xadd(stream_key, {
-                'event_id': event.id,
-                'event_name': event.name,
-                'timestamp': event.timestamp.isoformat(),
-                'data': json.dumps(event.data)
-            }, maxlen=1000)  # Keep last 1000 events
+            await self.redis.xack(EVENT_DELIVERY_STREAM, self.consumer_group, message_id)
+        except Exception as e:
+            logger.warning(f"Failed to acknowledge stream entry {message_id}: {e}")
+
+    def _ensure_flusher(self):
+        if self._flusher_task is None or self._flusher_task.done():
+            self._flusher_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        """Write buffered events every EVENT_BUS_PERSIST_INTERVAL, or as soon as a batch fills"""
+        while True:
+            try:
+                await asyncio.wait_for(self._persist_wakeup.wait(), settings.EVENT_BUS_PERSIST_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._persist_wakeup.clear()
+            await self.flush_persisted()
+
+    async def flush_persisted(self):
+        """Persist buffered events to Redis"""
+        while self._persist_buffer:
+            batch = self._persist_buffer[:settings.EVENT_BUS_PERSIST_BATCH]
+            del self._persist_buffer[:len(batch)]
+            await self._persist_events(batch)
+
+    async def _persist_events(self, events: List[Event]):
+        """Persist a batch of events in one pipeline round-trip"""
+        if not self.redis or not events:
+            return
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for event in events:
+                payload = json.dumps(event.to_dict())
+                key = f"events:{event.tenant_id or 'global'}:{event.id}"
+                pipe.setex(key, EVENT_TTL, payload)
+
+                # Also add to event stream for the tenant
+                stream_key = f"event_stream:{event.tenant_id or 'global'}"
+                pipe.xadd(stream_key, {
+                    'event_id': event.id,
+                    'event_name': event.name,
+                    'timestamp': event.timestamp.isoformat(),
+                    'data': json.dumps(event.data)
+                }, maxlen=EVENT_STREAM_MAXLEN)
+            await pipe.execute()
+            EVENT_BUS_PERSISTED.labels(outcome="success").inc(len(events))
 
         except Exception as e:
-            logger.warning(f"Failed to persist event {event.id}: {e}")
+            EVENT_BUS_PERSISTED.labels(outcome="failure").inc(len(events))
+            logger.warning(f"Failed to persist {len(events)} events: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue and worker state"""
+        return {
+            "workers": len(self._worker_tasks),
+            "queue_depth": self.processing_queue.qsize(),
+            "queue_capacity": self.processing_queue.maxsize,
+            "overflow_policy": self.overflow_policy,
+            "dropped": self._dropped,
+            "pending_persistence": len(self._persist_buffer),
+            "distributed": self.distributed,
+            "in_flight": len(self._in_flight),
+        }
 
     def get_registered_events(self) -> Dict[str, int]:
         """Get list of registered events with handler counts"""
@@ -395,33 +705,56 @@ class EventBus:
                 continue
 
             # Re-publish the event
-            await self.processing_queue.put(event)
-            replayed_count += 1
+            if await self._enqueue(event):
+                replayed_count += 1
 
         logger.info(f"Replayed {replayed_count} events")
         return replayed_count
 
     async def start_processing(self):
-        """Start the event processing loop"""
-        if self._processing_task is None:
-            self._processing_task = asyncio.create_task(self._start_processing())
-            logger.info("Event bus processing started")
+        """Start the worker pool"""
+        if not self._worker_tasks:
+            self.is_processing = True
+            self._worker_tasks = [
+                asyncio.create_task(self._start_processing())
+                for _ in range(self.workers)
+            ]
+            logger.info(f"Event bus processing started with {self.workers} workers")
+
+            if self.distributed:
+                await self._ensure_consumer_group()
+                self._consumer_task = asyncio.create_task(self._consume_stream())
+                logger.info(
+                    f"Event bus consuming '{EVENT_DELIVERY_STREAM}' as "
+                    f"{self.consumer_group}/{self.consumer_name}"
+                )
 
     async def shutdown(self):
         """Shutdown the event bus"""
         logger.info("Shutting down event bus...")
-        self.is_processing = False
 
-        if self._processing_task:
+        if self._consumer_task:
+            # Stop reading; anything not yet acknowledged is reclaimed by other workers
+            self._consumer_task.cancel()
+            await asyncio.gather(self._consumer_task, return_exceptions=True)
+            self._consumer_task = None
+
+        if self._worker_tasks:
             # Wait for processing queue to be empty
             await self.processing_queue.join()
 
-            # Cancel the processing task
-            self._processing_task.cancel()
-            try:
-                await self._processing_task
-            except asyncio.CancelledError:
-                pass
+            # Cancel the workers
+            self.is_processing = False
+            for task in self._worker_tasks:
+                task.cancel()
+            await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+            self._worker_tasks = []
+
+        if self._flusher_task:
+            self._flusher_task.cancel()
+            await asyncio.gather(self._flusher_task, return_exceptions=True)
+            self._flusher_task = None
+        await self.flush_persisted()
 
         logger.info("Event bus shut down")
 
@@ -2,7 +2,7 @@
 Inventory Integration Service for PoS
 Validates stock availability, reserves stock, updates stock ledger
 """
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from fastapi import HTTPException
 from decimal import Decimal
 
@@ -24,7 +24,8 @@ class InventoryIntegrationService:
     async def validate_stock_availability(
         self,
         items: List[Dict],
-        warehouse: str
+        warehouse: str,
+        item_details: Optional[Dict[str, Dict]] = None
     ) -> bool:
         """
         Validate stock availability for items
@@ -32,11 +33,13 @@ class InventoryIntegrationService:
         Args:
             items: List of items with item_code and qty
             warehouse: Warehouse name
+            item_details: Already-fetched Item rows keyed by item_code (skips per-item lookups)
             
         Returns:
             True if all items have sufficient stock, raises HTTPException if not
         """
         errors: List[Dict] = []
+        projected_qtys = await self._get_bin_projected_qtys(items, warehouse)
         
         for item in items:
             item_code = item.get("item_code")
@@ -47,23 +50,29 @@ class InventoryIntegrationService:
                 continue
 
             # Skip stock validation for non-stock/service items
-            try:
-                item_detail = self.erpnext_adapter.proxy_request(
-                    tenant_id=self.tenant_id,
-                    path=f"resource/Item/{item_code}",
-                    method="GET",
-                )
-                if isinstance(item_detail, dict) and "data" in item_detail:
-                    item_detail = item_detail.get("data")
-                if isinstance(item_detail, dict) and not bool(item_detail.get("is_stock_item", True)):
+            if item_details is not None and item_code in item_details:
+                if not bool(item_details[item_code].get("is_stock_item", True)):
                     continue
-            except Exception:
-                # If we can't read the item, proceed with validation (fail closed later if stock APIs fail)
-                pass
+            else:
+                try:
+                    item_detail = self.erpnext_adapter.proxy_request(
+                        tenant_id=self.tenant_id,
+                        path=f"resource/Item/{item_code}",
+                        method="GET",
+                    )
+                    if isinstance(item_detail, dict) and "data" in item_detail:
+                        item_detail = item_detail.get("data")
+                    if isinstance(item_detail, dict) and not bool(item_detail.get("is_stock_item", True)):
+                        continue
+                except Exception:
+                    # If we can't read the item, proceed with validation (fail closed later if stock APIs fail)
+                    pass
             
             # Get stock balance (fail closed; don't let unknown checks reach ERPNext submit)
             try:
-                stock_qty = self._get_stock_qty(item_code=item_code, warehouse=item_warehouse)
+                stock_qty = projected_qtys.get((item_code, item_warehouse))
+                if stock_qty is None:
+                    stock_qty = self._get_stock_qty(item_code=item_code, warehouse=item_warehouse)
 
                 if stock_qty < qty:
                     # For development/demo purposes, allow negative stock or warn instead of blocking
@@ -127,6 +136,46 @@ class InventoryIntegrationService:
         except Exception:
             return Decimal("0")
 
+    async def _get_bin_projected_qtys(self, items: List[Dict], warehouse: str) -> Dict[Tuple[str, str], Decimal]:
+        """Prefetch Bin projected qty for the whole basket in one query.
+
+        Pairs without a Bin row are left out so the per-item fallbacks still apply.
+        """
+        import json
+
+        pairs = {(item.get("item_code"), item.get("warehouse") or warehouse) for item in items if item.get("item_code")}
+        if not pairs:
+            return {}
+
+        try:
+            bin_result = await self.erpnext_adapter.aproxy_request(
+                tenant_id=self.tenant_id,
+                path="resource/Bin",
+                method="GET",
+                params={
+                    "filters": json.dumps(
+                        [
+                            ["item_code", "in", sorted({code for code, _ in pairs})],
+                            ["warehouse", "in", sorted({wh for _, wh in pairs})],
+                        ]
+                    ),
+                    "fields": json.dumps(["item_code", "warehouse", "projected_qty", "actual_qty"]),
+                    "limit_page_length": 0,
+                },
+            )
+        except Exception:
+            return {}
+
+        bins = bin_result.get("data", []) if isinstance(bin_result, dict) else []
+        projected: Dict[Tuple[str, str], Decimal] = {}
+        for b in bins or []:
+            key = (b.get("item_code"), b.get("warehouse"))
+            if key not in pairs:
+                continue
+            value = b.get("projected_qty") if b.get("projected_qty") is not None else b.get("actual_qty")
+            projected[key] = Decimal(str(value or 0))
+        return projected
+
     def _get_bin_projected_qty(self, item_code: str, warehouse: str) -> Optional[Decimal]:
         import json
 
@@ -0,0 +1,319 @@
+"""
+Invoice Preparation Service for PoS
+Resolves everything a Sales Invoice needs before it is posted: POS profile,
+company, transaction warehouse, chart of accounts, payment-mode accounts,
+customer and item details.
+
+Independent ERPNext lookups run concurrently, item details for the whole
+basket come from a single filtered `resource/Item` query, and the
+profile-level context is cached per POS profile so checkout latency stays
+roughly flat as basket size grows.
+"""
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+ITEM_DETAIL_FIELDS = ["name", "item_name", "standard_rate", "valuation_rate", "is_stock_item"]
+
+
+@dataclass
+class ProfileContext:
+    """Profile-level data shared by every invoice posted through a POS profile."""
+    pos_profile_id: str
+    company: str
+    company_names: List[str]
+    profile: Dict
+    warehouse: str
+    payment_accounts: Dict[str, str]
+    account_names: Set[str]
+    account_types: Dict[str, Optional[str]]
+    account_is_group: Dict[str, Optional[int]]
+    loaded_at: float
+    # False when a lookup failed and a fallback was used; such contexts are not cached
+    complete: bool = True
+
+    def is_fresh(self) -> bool:
+        return time.monotonic() - self.loaded_at < settings.POS_PROFILE_CONTEXT_TTL
+
+
+# (tenant_id, pos_profile_id) -> ProfileContext
+_profile_context_cache: Dict[Tuple[str, str], ProfileContext] = {}
+
+
+def invalidate_profile_context(tenant_id: str, pos_profile_id: Optional[str] = None):
+    """Drop cached profile context for one profile, or every profile of a tenant."""
+    if pos_profile_id:
+        _profile_context_cache.pop((tenant_id, pos_profile_id), None)
+        return
+    for key in [k for k in _profile_context_cache if k[0] == tenant_id]:
+        _profile_context_cache.pop(key, None)
+
+
+class InvoicePreparationService:
+    """Batched, concurrent resolution of Sales Invoice inputs"""
+
+    def __init__(self, erpnext_adapter, tenant_id: str, pos_service):
+        """
+        Initialize Invoice Preparation Service
+
+        Args:
+            erpnext_adapter: ERPNext client adapter (async transport is used)
+            tenant_id: Tenant identifier
+            pos_service: POS service instance for profile lookups
+        """
+        self.erpnext_adapter = erpnext_adapter
+        self.tenant_id = tenant_id
+        self.pos_service = pos_service
+
+    async def get_profile_context(self, pos_profile_id: str, default_company: str) -> ProfileContext:
+        """
+        Get profile, company, warehouse and account mapping for a POS profile.
+
+        Served from the per-profile cache when fresh; otherwise loaded with
+        concurrent ERPNext lookups.
+        """
+        key = (self.tenant_id, pos_profile_id)
+        cached = _profile_context_cache.get(key)
+        if cached and cached.is_fresh():
+            return cached
+
+        context = await self._load_profile_context(pos_profile_id, default_company)
+        if context.complete:
+            _profile_context_cache[key] = context
+        return context
+
+    async def _load_profile_context(self, pos_profile_id: str, default_company: str) -> ProfileContext:
+        company_names, profile = await asyncio.gather(
+            self._list_company_names(),
+            self.pos_service.get_pos_profile_details(pos_profile_id),
+            return_exceptions=True,
+        )
+
+        if isinstance(profile, BaseException):
+            logger.error(f"Failed to fetch required POS Profile {pos_profile_id}: {str(profile)}")
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "type": "pos_profile_not_found",
+                    "message": f"POS Profile {pos_profile_id} not found or inaccessible",
+                    "pos_profile_id": pos_profile_id
+                }
+            )
+        complete = True
+        if isinstance(company_names, BaseException):
+            # Proceed with resolved company even if ERPNext lookup fails
+            company_names = []
+            complete = False
+
+        warehouse = profile.get('warehouse')
+        if not warehouse:
+            logger.error(f"POS Profile {pos_profile_id} does not have a warehouse configured")
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "type": "pos_profile_invalid",
+                    "message": f"POS Profile {pos_profile_id} must have a warehouse configured",
+                    "pos_profile_id": pos_profile_id
+                }
+            )
+
+        company = default_company
+        if company not in company_names and company_names:
+            company = company_names[0]
+        # Override company if profile has a valid company
+        profile_company = profile.get('company')
+        if profile_company and (not company_names or profile_company in company_names):
+            company = profile_company
+
+        (warehouse, warehouse_resolved), accounts = await asyncio.gather(
+            self._resolve_transaction_warehouse(warehouse),
+            self._list_accounts(company),
+        )
+        if accounts is None:
+            accounts = []
+            complete = False
+        complete = complete and warehouse_resolved
+
+        account_types = {acc["name"]: acc.get("account_type") for acc in accounts}
+        account_is_group = {acc["name"]: acc.get("is_group") for acc in accounts}
+
+        payment_accounts = profile.get('payment_accounts', {})
+        if not payment_accounts:
+            logger.warning(f"POS Profile {pos_profile_id} has no payment accounts configured")
+
+        return ProfileContext(
+            pos_profile_id=pos_profile_id,
+            company=company,
+            company_names=company_names,
+            profile=profile,
+            warehouse=warehouse,
+            payment_accounts=payment_accounts,
+            account_names=set(account_types),
+            account_types=account_types,
+            account_is_group=account_is_group,
+            loaded_at=time.monotonic(),
+            complete=complete,
+        )
+
+    async def _list_company_names(self) -> List[str]:
+        response = await self.erpnext_adapter.aproxy_request(
+            tenant_id=self.tenant_id,
+            path="resource/Company",
+            method="GET",
+            params={"limit_page_length": 100}
+        )
+        data = response.get("data", []) if isinstance(response, dict) else []
+        return [c.get("name") for c in data if isinstance(c, dict) and c.get("name")]
+
+    async def _list_accounts(self, company: str) -> Optional[List[Dict]]:
+        """Fetch the company chart of accounts once for fallback mapping and validation (None if the lookup failed)."""
+        try:
+            response = await self.erpnext_adapter.aproxy_request(
+                tenant_id=self.tenant_id,
+                path="resource/Account",
+                method="GET",
+                params={
+                    "filters": json.dumps([["company", "=", company]]),
+                    "fields": '["name","account_type","is_group"]',
+                    "limit_page_length": 10000
+                }
+            )
+        except Exception as e:
+            logger.warning(f"Failed to load account list for fallback mapping: {e}")
+            return None
+        data = response.get("data", []) if isinstance(response, dict) else []
+        return [acc for acc in data if isinstance(acc, dict) and acc.get("name")]
+
+    async def _resolve_transaction_warehouse(self, warehouse: str) -> Tuple[str, bool]:
+        """
+        Ensure the warehouse is not a group node, resolving a child warehouse if it is.
+
+        Returns:
+            (warehouse, resolved); resolved is False when the lookup failed and
+            the configured warehouse is used unchecked
+        """
+        try:
+            wh_doc = await self.erpnext_adapter.aproxy_request(
+                tenant_id=self.tenant_id,
+                path=f"resource/Warehouse/{warehouse}",
+                method="GET"
+            )
+            wh_data = wh_doc.get("data") if isinstance(wh_doc, dict) else wh_doc
+            if not (isinstance(wh_data, dict) and wh_data.get("is_group") == 1):
+                return warehouse, True
+
+            logger.warning(f"Warehouse {warehouse} is a group; resolving a child warehouse")
+            child_response = await self.erpnext_adapter.aproxy_request(
+                tenant_id=self.tenant_id,
+                path="resource/Warehouse",
+                method="GET",
+                params={
+                    "filters": json.dumps([
+                        ["parent_warehouse", "=", warehouse],
+                        ["is_group", "=", 0]
+                    ]),
+                    "fields": '["name"]',
+                    "limit_page_length": 1
+                }
+            )
+            child_list = child_response.get("data", []) if isinstance(child_response, dict) else []
+            if child_list:
+                logger.info(f"Using child warehouse: {child_list[0].get('name')}")
+                return child_list[0].get("name"), True
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "type": "warehouse_group_not_allowed",
+                    "message": f"Warehouse {warehouse} is a group and has no child warehouses for transactions"
+                }
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.warning(f"Failed to validate warehouse group status: {e}")
+            return warehouse, False
+
+    async def fetch_item_details(self, item_codes: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch details for every item in the basket with one `name in [...]` query.
+
+        Returns:
+            Mapping of item_code -> item fields; raises 404 for the first unknown code
+        """
+        unique_codes = list(dict.fromkeys(item_codes))
+        if not unique_codes:
+            return {}
+
+        response = await self.erpnext_adapter.aproxy_request(
+            tenant_id=self.tenant_id,
+            path="resource/Item",
+            method="GET",
+            params={
+                "filters": json.dumps([["name", "in", unique_codes]]),
+                "fields": json.dumps(ITEM_DETAIL_FIELDS),
+                "limit_page_length": len(unique_codes)
+            }
+        )
+        data = response.get("data", []) if isinstance(response, dict) else []
+        details = {row["name"]: row for row in data if isinstance(row, dict) and row.get("name")}
+
+        for item_code in unique_codes:
+            if item_code not in details:
+                logger.error(f"Item {item_code} not found for tenant {self.tenant_id}")
+                raise HTTPException(
+                    status_code=404,
+                    detail={
+                        "type": "item_not_found",
+                        "message": f"Item {item_code} not found",
+                        "item_code": item_code
+                    }
+                )
+        return details
+
+    async def ensure_customer(self, customer: str, customer_type: str) -> None:
+        """Validate the customer exists, auto-creating new walk-in customers."""
+        try:
+            await self.erpnext_adapter.aproxy_request(
+                tenant_id=self.tenant_id,
+                path=f"resource/Customer/{customer}",
+                method="GET"
+            )
+            logger.info(f"Customer {customer} validated for tenant {self.tenant_id}")
+            return
+        except HTTPException as e:
+            if e.status_code != 404:
+                raise
+
+        logger.warning(f"Customer {customer} not found; creating new customer")
+        customer_group = customer_type if customer_type in ["Direct", "Fundi", "Sales Team", "Wholesaler"] else "Direct"
+        try:
+            await self.erpnext_adapter.aproxy_request(
+                tenant_id=self.tenant_id,
+                path="resource/Customer",
+                method="POST",
+                json_data={
+                    "customer_name": customer,
+                    "customer_group": customer_group,
+                    "customer_type": "Individual"
+                }
+            )
+            logger.info(f"Customer {customer} created for tenant {self.tenant_id}")
+        except Exception as create_error:
+            logger.error(f"Failed to create customer {customer}: {create_error}")
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "type": "customer_not_found",
+                    "message": f"Customer {customer} not found and could not be created",
+                    "customer": customer
+                }
+            )
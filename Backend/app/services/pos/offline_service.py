@@ -5,17 +5,34 @@ Manages offline transaction queuing, conflict resolution, and data synchronizati
 import asyncio
 import json
 import uuid
+import zlib
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 import logging
+from prometheus_client import Counter
+from sqlalchemy import delete, func, select
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.config import settings
+from app.database import get_db, AsyncSessionLocal
+from app.models.offline_queue import OfflineTransactionSpill
 from app.models.payment_reference import PaymentReference
 
 logger = logging.getLogger(__name__)
 
+OFFLINE_SPILLED = Counter(
+    "pos_offline_transactions_spilled_total",
+    "Offline transactions written to the disk-backed overflow segment",
+)
+OFFLINE_PROMOTED = Counter(
+    "pos_offline_transactions_promoted_total",
+    "Offline transactions moved from the overflow segment back into Redis",
+)
+
+PACK_VERSION = 1
+
 
 @dataclass
 class OfflineTransaction:
@@ -31,6 +48,8 @@ class OfflineTransaction:
     error_message: Optional[str] = None
     last_attempt: Optional[datetime] = None
     priority: int = 1  # 1=low, 2=normal, 3=high, 4=critical
+    idempotency_key: Optional[str] = None
+    sequence: int = 0  # Position in the tenant's queue
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization"""
@@ -50,6 +69,115 @@ class OfflineTransaction:
             data['last_attempt'] = datetime.fromisoformat(data['last_attempt'])
         return cls(**data)
 
+    def pack(self) -> str:
+        """Compact positional encoding used for queue storage"""
+        return json.dumps([
+            PACK_VERSION, self.id, self.tenant_id, self.transaction_type, self.data,
+            self.created_at.timestamp(), self.retry_count, self.max_retries, self.status,
+            self.error_message, self.last_attempt.timestamp() if self.last_attempt else None,
+            self.priority, self.idempotency_key, self.sequence,
+        ], separators=(',', ':'), default=str)
+
+    @classmethod
+    def unpack(cls, raw) -> 'OfflineTransaction':
+        """Decode `pack()` output (optionally zlib-compressed) or a legacy to_dict() document"""
+        if isinstance(raw, bytes):
+            raw = zlib.decompress(raw).decode()
+        value = json.loads(raw)
+        if isinstance(value, dict):
+            return cls.from_dict(value)
+        (_, tx_id, tenant_id, transaction_type, data, created_at, retry_count, max_retries,
+         status, error_message, last_attempt, priority, idempotency_key, sequence) = value
+        return cls(
+            id=tx_id,
+            tenant_id=tenant_id,
+            transaction_type=transaction_type,
+            data=data,
+            created_at=datetime.fromtimestamp(created_at),
+            retry_count=retry_count,
+            max_retries=max_retries,
+            status=status,
+            error_message=error_message,
+            last_attempt=datetime.fromtimestamp(last_attempt) if last_attempt else None,
+            priority=priority,
+            idempotency_key=idempotency_key,
+            sequence=sequence
+        )
+
+
+class OfflineSpillStore:
+    """Postgres overflow segment for the offline queue
+
+    Rows keep the queue sequence they were assigned in Redis so promotion and
+    cursor reads preserve order across both segments.
+    """
+
+    def __init__(self, session_factory=None):
+        self.session_factory = session_factory or AsyncSessionLocal
+
+    async def append(self, transaction: OfflineTransaction):
+        async with self.session_factory() as db:
+            db.add(OfflineTransactionSpill(
+                tenant_id=transaction.tenant_id,
+                sequence=transaction.sequence,
+                transaction_id=transaction.id,
+                payload=zlib.compress(transaction.pack().encode()),
+                created_at=transaction.created_at.astimezone()
+            ))
+            await db.commit()
+
+    async def read(self, tenant_id: str, after: int, limit: int) -> List[OfflineTransaction]:
+        """Spilled transactions with a sequence greater than `after`, oldest first"""
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(OfflineTransactionSpill.payload)
+                .where(OfflineTransactionSpill.tenant_id == tenant_id, OfflineTransactionSpill.sequence > after)
+                .order_by(OfflineTransactionSpill.sequence)
+                .limit(limit)
+            )
+            return [OfflineTransaction.unpack(payload) for payload in result.scalars()]
+
+    @asynccontextmanager
+    async def claim(self, tenant_id: str, limit: int) -> AsyncIterator[List[OfflineTransaction]]:
+        """
+        Claim the oldest spilled transactions, oldest first
+
+        The rows are deleted in a transaction that only commits when the
+        block exits cleanly; an exception rolls the delete back so the
+        transactions stay spilled.
+        """
+        oldest = (
+            select(OfflineTransactionSpill.sequence)
+            .where(OfflineTransactionSpill.tenant_id == tenant_id)
+            .order_by(OfflineTransactionSpill.sequence)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        async with self.session_factory() as db:
+            result = await db.execute(
+                delete(OfflineTransactionSpill)
+                .where(OfflineTransactionSpill.tenant_id == tenant_id, OfflineTransactionSpill.sequence.in_(oldest))
+                .returning(OfflineTransactionSpill.payload)
+            )
+            transactions = [OfflineTransaction.unpack(payload) for payload in result.scalars()]
+            try:
+                yield sorted(transactions, key=lambda tx: tx.sequence)
+            except BaseException:
+                await db.rollback()
+                raise
+            await db.commit()
+
+    async def stats(self, tenant_id: str) -> Tuple[int, Optional[datetime]]:
+        """Number of spilled transactions and the creation time of the oldest"""
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(func.count(), func.min(OfflineTransactionSpill.created_at))
+                .where(OfflineTransactionSpill.tenant_id == tenant_id)
+            )
+            count, oldest = result.one()
+            return count, oldest
+
 
 @dataclass
 class SyncConflict:
@@ -70,21 +198,54 @@ class SyncConflict:
 
 
 class OfflineService:
-    """Service for managing offline operations and synchronization"""
+    """Service for managing offline operations and synchronization
 
-    def __init__(self, erpnext_adapter=None, redis_client=None):
+    Each tenant's queue is a hash of transaction id -> packed transaction
+    (`offline:tx:{tenant}`) plus a sorted set of pending ids scored by a
+    per-tenant sequence (`offline:queue:{tenant}`), so lookups and removal are
+    O(1)/O(log n) instead of rewriting a list.  Transactions that exhaust their
+    retries move to `offline:failed:{tenant}` rather than being discarded.
+
+    Redis holds a bounded hot segment of `max_queue_size` transactions.  Beyond
+    that, new transactions spill into the disk-backed `spill_store` and are
+    promoted back, in order, as sync drains the hot segment; nothing is dropped.
+    """
+
+    def __init__(self, erpnext_adapter=None, redis_client=None, spill_store: Optional[OfflineSpillStore] = None):
         """Initialize offline service"""
         self.erpnext_adapter = erpnext_adapter
         self.redis_client = redis_client
-        self.max_queue_size = 1000  # Maximum offline transactions per tenant
+        self.spill_store = spill_store
+        self.max_queue_size = settings.OFFLINE_QUEUE_HOT_LIMIT  # Redis hot segment size per tenant
         self.max_sync_batch = 50     # Maximum transactions to sync at once
 
+    @staticmethod
+    def _tx_key(tenant_id: str) -> str:
+        return f"offline:tx:{tenant_id}"
+
+    @staticmethod
+    def _queue_key(tenant_id: str) -> str:
+        return f"offline:queue:{tenant_id}"
+
+    @staticmethod
+    def _failed_key(tenant_id: str) -> str:
+        return f"offline:failed:{tenant_id}"
+
+    @staticmethod
+    def _spilled_key(tenant_id: str) -> str:
+        return f"offline:spilled:{tenant_id}"
+
+    @staticmethod
+    def _lock_key(tenant_id: str, transaction_id: str) -> str:
+        return f"offline:lock:{tenant_id}:{transaction_id}"
+
     async def queue_transaction(
         self,
         tenant_id: str,
         transaction_type: str,
         data: Dict[str, Any],
-        priority: int = 2
+        priority: int = 2,
+        idempotency_key: Optional[str] = None
     ) -> str:
         """
         Queue a transaction for offline processing
@@ -94,11 +255,14 @@ class OfflineService:
             transaction_type: Type of transaction ('invoice', 'payment', etc.)
             data: Transaction data
             priority: Transaction priority (1-4)
+            idempotency_key: Client-generated key identifying the sale; defaults
+                to the transaction id. Re-queuing the same key is a no-op.
 
         Returns:
             Transaction ID
         """
         transaction_id = str(uuid.uuid4())
+        idempotency_key = idempotency_key or data.get('idempotency_key') or transaction_id
 
         transaction = OfflineTransaction(
             id=transaction_id,
@@ -106,16 +270,39 @@ class OfflineService:
             transaction_type=transaction_type,
             data=data,
             created_at=datetime.now(),
-            priority=priority
+            priority=priority,
+            idempotency_key=idempotency_key
         )
 
         # Store in Redis for fast access
         if self.redis_client:
-            key = f"offline:queue:{tenant_id}"
-            await self.redis_client.lpush(key, json.dumps(transaction.to_dict()))
-
-            # Trim queue to prevent unlimited growth
-            await self.redis_client.ltrim(key, 0, self.max_queue_size - 1)
+            # A till retrying an upload must not enqueue the same sale twice
+            key_map = f"offline:keys:{tenant_id}"
+            existing = await self.redis_client.hget(key_map, idempotency_key)
+            if existing:
+                logger.info(f"Offline transaction {idempotency_key} already queued as {existing}")
+                return existing
+
+            transaction.sequence = await self.redis_client.incr(f"offline:seq:{tenant_id}")
+
+            # Once anything has spilled, newer transactions follow it so order is kept
+            hot_full = await self.redis_client.zcard(self._queue_key(tenant_id)) >= self.max_queue_size
+            spilled = int(await self.redis_client.get(self._spilled_key(tenant_id)) or 0)
+            if self.spill_store and (hot_full or spilled):
+                await self.spill_store.append(transaction)
+                pipe = self.redis_client.pipeline()
+                pipe.incr(self._spilled_key(tenant_id))
+                pipe.hset(key_map, idempotency_key, transaction_id)
+                await pipe.execute()
+                OFFLINE_SPILLED.inc()
+            else:
+                if hot_full:
+                    logger.warning(f"Offline queue for tenant {tenant_id} is over {self.max_queue_size} with no spill store")
+                pipe = self.redis_client.pipeline()
+                pipe.hset(self._tx_key(tenant_id), transaction_id, transaction.pack())
+                pipe.zadd(self._queue_key(tenant_id), {transaction_id: transaction.sequence})
+                pipe.hset(key_map, idempotency_key, transaction_id)
+                await pipe.execute()
 
         logger.info(f"Queued offline transaction {transaction_id} for tenant {tenant_id}")
         return transaction_id
@@ -123,30 +310,48 @@ class OfflineService:
     async def get_pending_transactions(
         self,
         tenant_id: str,
-        limit: int = 100
+        limit: int = 100,
+        cursor: int = 0
     ) -> List[OfflineTransaction]:
         """
-        Get pending offline transactions for a tenant
+        Get pending offline transactions for a tenant, oldest first
 
         Args:
             tenant_id: Tenant identifier
             limit: Maximum transactions to return
+            cursor: Only return transactions queued after this sequence; pass
+                the last returned transaction's `sequence` to read the next page
 
         Returns:
             List of pending transactions
         """
+        transactions = await self._read_hot(tenant_id, limit, cursor)
+
+        if self.spill_store and self.redis_client and len(transactions) < limit:
+            if int(await self.redis_client.get(self._spilled_key(tenant_id)) or 0):
+                after = transactions[-1].sequence if transactions else cursor
+                transactions.extend(await self.spill_store.read(tenant_id, after, limit - len(transactions)))
+
+        return transactions
+
+    async def _read_hot(self, tenant_id: str, limit: int, cursor: int = 0) -> List[OfflineTransaction]:
+        """Pending transactions held in the Redis segment"""
         transactions = []
 
         if self.redis_client:
-            key = f"offline:queue:{tenant_id}"
-            # Get transactions from Redis (they come out in reverse order)
-            raw_transactions = await self.redis_client.lrange(key, 0, limit - 1)
-
-            for raw_tx in reversed(raw_transactions):
+            transaction_ids = await self.redis_client.zrangebyscore(
+                self._queue_key(tenant_id), f"({cursor}", "+inf", start=0, num=limit
+            )
+            if not transaction_ids:
+                return transactions
+            raw_transactions = await self.redis_client.hmget(self._tx_key(tenant_id), transaction_ids)
+
+            for raw_tx in raw_transactions:
+                if raw_tx is None:
+                    continue
                 try:
-                    tx_data = json.loads(raw_tx)
-                    transaction = OfflineTransaction.from_dict(tx_data)
-                    if transaction.status == 'pending':
+                    transaction = OfflineTransaction.unpack(raw_tx)
+                    if transaction.status in ('pending', 'failed'):
                         transactions.append(transaction)
                 except Exception as e:
                     logger.warning(f"Failed to parse offline transaction: {e}")
@@ -154,6 +359,34 @@ class OfflineService:
 
         return transactions
 
+    async def _promote_spilled(self, tenant_id: str) -> int:
+        """Move the oldest spilled transactions into free hot-segment slots"""
+        if not (self.spill_store and self.redis_client):
+            return 0
+        if not int(await self.redis_client.get(self._spilled_key(tenant_id)) or 0):
+            return 0
+        room = self.max_queue_size - await self.redis_client.zcard(self._queue_key(tenant_id))
+        if room <= 0:
+            return 0
+
+        async with self.spill_store.claim(tenant_id, room) as promoted:
+            if not promoted:
+                # The counter drifted (e.g. a crash between writes); resync it
+                count, _ = await self.spill_store.stats(tenant_id)
+                await self.redis_client.set(self._spilled_key(tenant_id), count)
+                return 0
+
+            # Write the hot segment before the spill rows are deleted (on commit);
+            # if the pipeline fails the claim rolls back and nothing is lost
+            pipe = self.redis_client.pipeline()
+            for transaction in promoted:
+                pipe.hset(self._tx_key(tenant_id), transaction.id, transaction.pack())
+                pipe.zadd(self._queue_key(tenant_id), {transaction.id: transaction.sequence})
+            pipe.decrby(self._spilled_key(tenant_id), len(promoted))
+            await pipe.execute()
+        OFFLINE_PROMOTED.inc(len(promoted))
+        return len(promoted)
+
     async def process_transaction(
         self,
         transaction: OfflineTransaction
@@ -198,11 +431,38 @@ class OfflineService:
             logger.error(f"Error processing offline transaction {transaction.id}: {e}")
             return False, str(e)
 
+    async def _find_existing(
+        self,
+        tenant_id: str,
+        doctype: str,
+        filters: List[List[Any]]
+    ) -> Optional[str]:
+        """Return the name of an ERPNext document matching `filters`, if any"""
+        result = await self.erpnext_adapter.aproxy_request(
+            tenant_id=tenant_id,
+            path=f"resource/{doctype}",
+            method="GET",
+            params={
+                "filters": json.dumps(filters),
+                "fields": json.dumps(["name"]),
+                "limit_page_length": 1,
+            }
+        )
+        rows = result.get('data', []) if isinstance(result, dict) else (result or [])
+        if rows and isinstance(rows[0], dict):
+            return rows[0].get('name')
+        return None
+
     async def _process_invoice_transaction(
         self,
         transaction: OfflineTransaction
     ) -> Tuple[bool, Optional[str]]:
-        """Process offline invoice transaction"""
+        """Process offline invoice transaction
+
+        The idempotency key travels as the invoice's `offline_pos_name`, so an
+        invoice already posted by an earlier, interrupted sync is found and
+        reused instead of being created twice.
+        """
         try:
             invoice_data = transaction.data
 
@@ -214,11 +474,22 @@ class OfflineService:
 
             # Process invoice through ERPNext
             if self.erpnext_adapter:
-                result = await self.erpnext_adapter.proxy_request(
+                key = transaction.idempotency_key or transaction.id
+                existing = await self._find_existing(
+                    transaction.tenant_id, "Sales Invoice", [["offline_pos_name", "=", key]]
+                )
+                if existing:
+                    logger.info(f"Offline transaction {transaction.id} already posted as {existing}")
+                    transaction.data['created_invoice_id'] = existing
+                    return True, None
+
+                payload = {k: v for k, v in invoice_data.items() if k != 'idempotency_key'}
+                payload['offline_pos_name'] = key
+                result = await self.erpnext_adapter.aproxy_request(
                     tenant_id=transaction.tenant_id,
                     path="resource/Sales Invoice",
                     method="POST",
-                    json_data=invoice_data
+                    json_data=payload
                 )
 
                 if result and result.get('data'):
@@ -257,17 +528,31 @@ class OfflineService:
         self,
         transaction: OfflineTransaction
     ) -> Tuple[bool, Optional[str]]:
-        """Process offline stock adjustment transaction"""
+        """Process offline stock adjustment transaction
+
+        Stock Entry has no offline reference field, so the idempotency key is
+        recorded in its remarks and looked up there before posting.
+        """
         try:
             stock_data = transaction.data
 
             # Process stock adjustment through ERPNext
             if self.erpnext_adapter:
-                result = await self.erpnext_adapter.proxy_request(
+                marker = f"Offline ref: {transaction.idempotency_key or transaction.id}"
+                existing = await self._find_existing(
+                    transaction.tenant_id, "Stock Entry", [["remarks", "like", f"%{marker}%"]]
+                )
+                if existing:
+                    logger.info(f"Offline transaction {transaction.id} already posted as {existing}")
+                    return True, None
+
+                payload = {k: v for k, v in stock_data.items() if k != 'idempotency_key'}
+                payload['remarks'] = f"{payload['remarks']}\n{marker}" if payload.get('remarks') else marker
+                result = await self.erpnext_adapter.aproxy_request(
                     tenant_id=transaction.tenant_id,
                     path="resource/Stock Entry",
                     method="POST",
-                    json_data=stock_data
+                    json_data=payload
                 )
 
                 if result and result.get('data'):
@@ -286,7 +571,13 @@ class OfflineService:
         max_batch_size: int = None
     ) -> Dict[str, Any]:
         """
-        Synchronize all pending offline transactions
+        Synchronize pending offline transactions
+
+        Transactions are grouped by POS profile; groups sync concurrently (up to
+        OFFLINE_SYNC_CONCURRENCY) while each group is replayed strictly in queue
+        order.  A failure stops the rest of its group for this run so later sales
+        never overtake an earlier one.  Each transaction is claimed with a short
+        Redis lock so overlapping syncs cannot post it twice.
 
         Args:
             tenant_id: Tenant identifier
@@ -302,34 +593,39 @@ class OfflineService:
             'processed': 0,
             'successful': 0,
             'failed': 0,
+            'skipped': 0,
             'errors': [],
             'start_time': datetime.now().isoformat()
         }
 
         try:
-            # Get pending transactions
-            transactions = await self.get_pending_transactions(tenant_id, max_batch_size)
+            # Refill the hot segment from the overflow, then sync from it
+            await self._promote_spilled(tenant_id)
+            transactions = await self._read_hot(tenant_id, max_batch_size)
 
+            groups: Dict[str, List[OfflineTransaction]] = {}
             for transaction in transactions:
-                success, error = await self.process_transaction(transaction)
-
-                results['processed'] += 1
-                if success:
-                    results['successful'] += 1
-                    # Remove from queue
-                    await self._remove_transaction_from_queue(tenant_id, transaction.id)
-                else:
-                    results['failed'] += 1
-                    results['errors'].append({
-                        'transaction_id': transaction.id,
-                        'error': error,
-                        'retry_count': transaction.retry_count
-                    })
-
-                    # If max retries reached, remove from queue
-                    if transaction.retry_count >= transaction.max_retries:
-                        await self._remove_transaction_from_queue(tenant_id, transaction.id)
-                        logger.warning(f"Removing transaction {transaction.id} after {transaction.retry_count} failed attempts")
+                profile = transaction.data.get('pos_profile_id') or transaction.data.get('pos_profile') or ''
+                groups.setdefault(profile, []).append(transaction)
+
+            semaphore = asyncio.Semaphore(max(1, settings.OFFLINE_SYNC_CONCURRENCY))
+
+            async def sync_group(group: List[OfflineTransaction]):
+                async with semaphore:
+                    for position, transaction in enumerate(group):
+                        if not await self._claim(transaction):
+                            results['skipped'] += len(group) - position
+                            return
+                        try:
+                            success, error = await self.process_transaction(transaction)
+                            await self._record_outcome(tenant_id, transaction, success, results, error)
+                        finally:
+                            await self._release(transaction)
+                        if not success:
+                            results['skipped'] += len(group) - position - 1
+                            return
+
+            await asyncio.gather(*(sync_group(group) for group in groups.values()))
 
             results['end_time'] = datetime.now().isoformat()
             results['duration_seconds'] = (datetime.fromisoformat(results['end_time']) - datetime.fromisoformat(results['start_time'])).total_seconds()
@@ -345,13 +641,70 @@ class OfflineService:
 
         return results
 
+    async def _claim(self, transaction: OfflineTransaction) -> bool:
+        """Take the per-transaction sync lock; False if another sync holds it"""
+        if not self.redis_client:
+            return True
+        return bool(await self.redis_client.set(
+            self._lock_key(transaction.tenant_id, transaction.id), "1",
+            nx=True, ex=settings.OFFLINE_SYNC_LOCK_TTL
+        ))
+
+    async def _release(self, transaction: OfflineTransaction):
+        if self.redis_client:
+            await self.redis_client.delete(self._lock_key(transaction.tenant_id, transaction.id))
+
+    async def _record_outcome(
+        self,
+        tenant_id: str,
+        transaction: OfflineTransaction,
+        success: bool,
+        results: Dict[str, Any],
+        error: Optional[str]
+    ):
+        """Update counters and the queue after one transaction was processed"""
+        results['processed'] += 1
+        if success:
+            results['successful'] += 1
+            # Remove from queue
+            await self._remove_transaction_from_queue(tenant_id, transaction.id)
+            return
+
+        results['failed'] += 1
+        results['errors'].append({
+            'transaction_id': transaction.id,
+            'error': error,
+            'retry_count': transaction.retry_count
+        })
+
+        if transaction.retry_count >= transaction.max_retries:
+            # Park it for manual review instead of retrying forever
+            await self._move_to_failed(tenant_id, transaction)
+            logger.warning(f"Parking transaction {transaction.id} after {transaction.retry_count} failed attempts")
+        elif self.redis_client:
+            await self.redis_client.hset(self._tx_key(tenant_id), transaction.id, transaction.pack())
+
+    async def _move_to_failed(self, tenant_id: str, transaction: OfflineTransaction):
+        """Take a transaction out of the pending queue, keeping its record"""
+        if self.redis_client:
+            pipe = self.redis_client.pipeline()
+            pipe.hset(self._tx_key(tenant_id), transaction.id, transaction.pack())
+            pipe.zrem(self._queue_key(tenant_id), transaction.id)
+            pipe.zadd(self._failed_key(tenant_id), {transaction.id: transaction.created_at.timestamp()})
+            await pipe.execute()
+
     async def _remove_transaction_from_queue(self, tenant_id: str, transaction_id: str):
         """Remove a transaction from the Redis queue"""
         if self.redis_client:
-            key = f"offline:queue:{tenant_id}"
-            # This is a simplified removal - in production, you'd need more sophisticated queue management
-            # For now, we'll rely on the queue being rebuilt during sync
-            pass
+            raw_tx = await self.redis_client.hget(self._tx_key(tenant_id), transaction_id)
+            pipe = self.redis_client.pipeline()
+            pipe.zrem(self._queue_key(tenant_id), transaction_id)
+            pipe.hdel(self._tx_key(tenant_id), transaction_id)
+            if raw_tx:
+                key = OfflineTransaction.unpack(raw_tx).idempotency_key
+                if key:
+                    pipe.hdel(f"offline:keys:{tenant_id}", key)
+            await pipe.execute()
 
     async def get_sync_status(self, tenant_id: str) -> Dict[str, Any]:
         """
@@ -361,32 +714,43 @@ class OfflineService:
             tenant_id: Tenant identifier
 
         Returns:
-            Sync status information
+            Sync status information, including queue size and age metrics
         """
-        pending_count = 0
-        oldest_transaction = None
+        hot_count = 0
+        spilled_count = 0
+        failed_count = 0
+        oldest_created = None
 
         if self.redis_client:
-            key = f"offline:queue:{tenant_id}"
-            queue_length = await self.redis_client.llen(key)
-            pending_count = queue_length
+            hot_count = await self.redis_client.zcard(self._queue_key(tenant_id))
+            failed_count = await self.redis_client.zcard(self._failed_key(tenant_id))
 
             # Get oldest transaction
-            if queue_length > 0:
-                oldest_raw = await self.redis_client.lindex(key, -1)  # Last item in queue
+            if hot_count > 0:
+                oldest_ids = await self.redis_client.zrange(self._queue_key(tenant_id), 0, 0)
+                oldest_raw = await self.redis_client.hget(self._tx_key(tenant_id), oldest_ids[0]) if oldest_ids else None
                 if oldest_raw:
                     try:
-                        oldest_data = json.loads(oldest_raw)
-                        oldest_transaction = oldest_data.get('created_at')
-                    except:
+                        oldest_created = OfflineTransaction.unpack(oldest_raw).created_at
+                    except ValueError:
                         pass
 
+            if self.spill_store and int(await self.redis_client.get(self._spilled_key(tenant_id)) or 0):
+                spilled_count, spilled_oldest = await self.spill_store.stats(tenant_id)
+                if oldest_created is None and spilled_oldest is not None:
+                    oldest_created = spilled_oldest.astimezone().replace(tzinfo=None)
+
+        pending_count = hot_count + spilled_count
         return {
             'tenant_id': tenant_id,
             'pending_transactions': pending_count,
-            'oldest_transaction': oldest_transaction,
+            'hot_transactions': hot_count,
+            'spilled_transactions': spilled_count,
+            'failed_transactions': failed_count,
+            'oldest_transaction': oldest_created.isoformat() if oldest_created else None,
+            'oldest_age_seconds': (datetime.now() - oldest_created).total_seconds() if oldest_created else 0,
             'queue_size_limit': self.max_queue_size,
-            'is_over_limit': pending_count >= self.max_queue_size,
+            'is_over_limit': spilled_count > 0 or pending_count >= self.max_queue_size,
             'last_sync': None  # Would need to track this separately
         }
 
@@ -396,7 +760,10 @@ class OfflineService:
         max_age_days: int = 30
     ) -> int:
         """
-        Clear old completed/failed transactions
+        Clear old failed transactions
+
+        Completed transactions are removed as soon as they sync, so only the
+        parked failures in `offline:failed:{tenant}` accumulate.
 
         Args:
             tenant_id: Tenant identifier
@@ -405,10 +772,18 @@ class OfflineService:
         Returns:
             Number of transactions cleared
         """
-        # This would need more sophisticated queue management
-        # For now, return 0 as placeholder
-        logger.info(f"Clear old transactions for tenant {tenant_id} (placeholder)")
-        return 0
+        if not self.redis_client:
+            return 0
+
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).timestamp()
+        expired = await self.redis_client.zrangebyscore(self._failed_key(tenant_id), "-inf", cutoff)
+        for transaction_id in expired:
+            await self._remove_transaction_from_queue(tenant_id, transaction_id)
+        if expired:
+            await self.redis_client.zrem(self._failed_key(tenant_id), *expired)
+
+        logger.info(f"Cleared {len(expired)} old offline transactions for tenant {tenant_id}")
+        return len(expired)
 
     async def detect_conflicts(
         self,
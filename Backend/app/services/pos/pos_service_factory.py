@@ -7,8 +7,7 @@ from app.database import get_db
 from app.dependencies.auth import get_current_token_payload, require_tenant_access
 from app.models.iam import Tenant
 from .pos_service_base import PosServiceBase
-from .erpnext_pos_service import ErpnextPosService
-from app.config import settings
+from .pos_service_registry import pos_service_registry
 
 
 async def get_pos_service(
@@ -20,6 +19,8 @@ async def get_pos_service(
     Factory function to get appropriate PoS service based on tenant.
     
     Now properly extracts tenant from JWT and ensures multi-tenant isolation.
+    Services are long-lived and shared per tenant (see pos_service_registry),
+    so requests reuse pooled connections and the tenant's ERPNext session.
     
     Args:
         token_payload: JWT payload containing tenant_id
@@ -45,12 +46,9 @@ async def get_pos_service(
     engine = tenant.engine or "erpnext"
     
     if engine == "erpnext":
-        return ErpnextPosService(
-            tenant_id=tenant_id,  # Pass tenant_id for multi-tenancy
-            company_name=tenant.name,  # Pass tenant's company name
-            base_url=settings.ERPNEXT_HOST,
-            username=settings.ERPNEXT_USER,
-            password=settings.ERPNEXT_PASSWORD
+        return pos_service_registry.get(
+            tenant_id,  # Pass tenant_id for multi-tenancy
+            company_name=tenant.name  # Pass tenant's company name
         )
     else:
         raise HTTPException(
@@ -0,0 +1,164 @@
+"""
+PoS Service Registry
+Process-wide pool of long-lived ErpnextPosService instances, one per
+(tenant, company).
+
+Every instance shares one pooled httpx.AsyncClient and keeps its own ERPNext
+session cookies, so a POS request reuses both the TCP connection and the
+login of earlier requests for the same tenant. Sessions are refreshed lazily
+by the service when ERPNEXT_SESSION_TTL expires; tenants idle for longer than
+POS_SERVICE_IDLE_TTL are evicted, and the registry holds at most
+POS_SERVICE_MAX_INSTANCES services (least recently used evicted first).
+"""
+import threading
+import time
+from collections import OrderedDict
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Dict, Optional, Tuple
+
+import httpx
+from prometheus_client import Counter, Gauge
+
+from app.config import settings
+from .erpnext_pos_service import ErpnextPosService
+
+
+POS_SERVICE_LOOKUPS = Counter(
+    "pos_service_registry_lookups_total",
+    "POS service lookups by result (reused, created)",
+    ["result"],
+)
+POS_SERVICE_LOGINS_AVOIDED = Counter(
+    "pos_service_registry_logins_avoided_total",
+    "POS requests served by an instance that already held a valid ERPNext session",
+)
+POS_SERVICE_EVICTIONS = Counter(
+    "pos_service_registry_evictions_total",
+    "POS service instances evicted by reason (idle, capacity)",
+    ["reason"],
+)
+POS_SERVICE_INSTANCES = Gauge(
+    "pos_service_registry_instances",
+    "Live POS service instances in this process",
+)
+
+
+class PosServiceRegistry:
+    """Per-tenant cache of ErpnextPosService instances over one shared client"""
+
+    def __init__(self, idle_ttl: Optional[int] = None, max_instances: Optional[int] = None):
+        self.idle_ttl = settings.POS_SERVICE_IDLE_TTL if idle_ttl is None else idle_ttl
+        self.max_instances = max_instances or settings.POS_SERVICE_MAX_INSTANCES
+        # (tenant_id, company_name) -> (last_used, service)
+        self._services: "OrderedDict[Tuple[str, Optional[str]], Tuple[float, ErpnextPosService]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._stats = {"reused": 0, "created": 0, "logins_avoided": 0, "evicted": 0}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared pooled AsyncClient, creating it on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.ERPNEXT_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.ERPNEXT_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.ERPNEXT_POOL_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(
+                    settings.ERPNEXT_TIMEOUT,
+                    connect=settings.ERPNEXT_CONNECT_TIMEOUT,
+                    pool=settings.ERPNEXT_POOL_TIMEOUT,
+                ),
+                follow_redirects=True,
+                # Sessions belong to the services; the shared jar must never
+                # carry one tenant's cookies into another tenant's request
+                cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+            )
+        return self._client
+
+    def get(self, tenant_id: str, company_name: Optional[str] = None) -> ErpnextPosService:
+        """
+        Get the POS service for a tenant, creating it on first use.
+
+        Args:
+            tenant_id: Tenant identifier
+            company_name: Tenant's company name (part of the key, so a renamed
+                company gets a fresh instance)
+        """
+        key = (str(tenant_id), company_name)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._services.get(key)
+            if entry:
+                service = entry[1]
+                self._services[key] = (now, service)
+                self._services.move_to_end(key)
+                self._stats["reused"] += 1
+                POS_SERVICE_LOOKUPS.labels(result="reused").inc()
+                if service.has_session():
+                    self._stats["logins_avoided"] += 1
+                    POS_SERVICE_LOGINS_AVOIDED.inc()
+                return service
+
+            service = ErpnextPosService(
+                tenant_id=str(tenant_id),
+                company_name=company_name,
+                base_url=settings.ERPNEXT_HOST,
+                username=settings.ERPNEXT_USER,
+                password=settings.ERPNEXT_PASSWORD,
+                client=self._get_client(),
+            )
+            self._services[key] = (now, service)
+            while len(self._services) > self.max_instances:
+                self._services.popitem(last=False)
+                self._record_eviction("capacity")
+            self._stats["created"] += 1
+            POS_SERVICE_LOOKUPS.labels(result="created").inc()
+            POS_SERVICE_INSTANCES.set(len(self._services))
+            return service
+
+    def _evict_idle(self, now: float):
+        # Entries are in last-used order, so idle ones are at the front
+        while self._services:
+            key, (last_used, _) = next(iter(self._services.items()))
+            if now - last_used < self.idle_ttl:
+                break
+            del self._services[key]
+            self._record_eviction("idle")
+        POS_SERVICE_INSTANCES.set(len(self._services))
+
+    def _record_eviction(self, reason: str):
+        self._stats["evicted"] += 1
+        POS_SERVICE_EVICTIONS.labels(reason=reason).inc()
+
+    def invalidate(self, tenant_id: str):
+        """Drop every service of a tenant (e.g. after its credentials or company change)."""
+        with self._lock:
+            for key in [k for k in self._services if k[0] == str(tenant_id)]:
+                del self._services[key]
+            POS_SERVICE_INSTANCES.set(len(self._services))
+
+    async def aclose(self):
+        """Drop all services and close the shared client (called on application shutdown)."""
+        with self._lock:
+            self._services.clear()
+            POS_SERVICE_INSTANCES.set(0)
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    def stats(self) -> Dict:
+        """Reuse efficiency for this registry since process start."""
+        with self._lock:
+            lookups = self._stats["reused"] + self._stats["created"]
+            return {
+                **self._stats,
+                "instances": len(self._services),
+                "reuse_rate": round(self._stats["reused"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Singleton instance
+pos_service_registry = PosServiceRegistry()
@@ -13,7 +13,7 @@ import logging
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 
@@ -351,6 +351,23 @@ class ReceiptService:
             invoice_data: Invoice data dictionary
             language: Language code
 
+        Returns:
+            PDF content as bytes
+        """
+        return self.generate_pdf_receipts([invoice_data], language=language)
+
+    def generate_pdf_receipts(
+        self,
+        invoices: List[Dict[str, Any]],
+        language: str = "en"
+    ) -> bytes:
+        """
+        Generate one PDF with a page per receipt
+
+        Args:
+            invoices: Invoice data dictionaries
+            language: Language code
+
         Returns:
             PDF content as bytes
         """
@@ -359,6 +376,19 @@ class ReceiptService:
         styles = getSampleStyleSheet()
         story = []
 
+        for index, invoice_data in enumerate(invoices):
+            if index:
+                story.append(PageBreak())
+            story.extend(self._pdf_story(invoice_data, styles))
+
+        doc.build(story)
+        buffer.seek(0)
+        return buffer.getvalue()
+
+    def _pdf_story(self, invoice_data: Dict[str, Any], styles) -> List[Any]:
+        """Flowables for a single receipt"""
+        story = []
+
         # Company header
         company_name = invoice_data.get("company", DEFAULT_COMPANY_NAME)
         title_style = ParagraphStyle(
@@ -434,9 +464,7 @@ class ReceiptService:
             story.append(Paragraph(f"Tax: {float(tax_total):.2f}", totals_style))
         story.append(Paragraph(f"<b>GRAND TOTAL: {float(grand_total):.2f}</b>", styles['Heading3']))
 
-        doc.build(story)
-        buffer.seek(0)
-        return buffer.getvalue()
+        return story
 
     def send_receipt_email(
         self,
@@ -0,0 +1,541 @@
+"""
+POS Sales Fact Store
+Postgres copy of submitted POS invoices with hourly rollups, kept current
+from `invoice_created` events plus an ERPNext `modified`-watermark backfill.
+
+Tables:
+    pos_sales_facts       one row per invoice (totals, lines, payments)
+    pos_sales_rollups     hourly amount/quantity/transactions per POS profile and
+                          dimension: profile, item, payment_mode, cashier
+    pos_sales_sync_state  backfill watermark per tenant
+
+Ingesting an invoice subtracts the contribution of the previously stored
+version before adding the new one, so re-deliveries, amendments and
+cancellations keep the rollups exact. Daily figures are summed from the
+hourly rollups.
+"""
+import asyncio
+import json
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.pos_analytics import PosSalesFact, PosSalesRollup, PosSalesSyncState
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_KEY = ["tenant_id", "bucket_date", "bucket_hour", "pos_profile", "dimension", "dimension_key"]
+
+# (dimension, key) -> [label, amount, quantity, transactions]
+Contributions = Dict[Tuple[str, str], List[Any]]
+
+
+def _parse_hour(posting_time: Any) -> int:
+    try:
+        return int(str(posting_time or "0").split(":")[0]) % 24
+    except ValueError:
+        return 0
+
+
+def fact_from_invoice(tenant_id: str, invoice: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+    """Map an ERPNext Sales Invoice document to pos_sales_facts column values"""
+    name = invoice.get("name")
+    posting_date = invoice.get("posting_date")
+    if not name or not posting_date:
+        return None
+    lines = [
+        [
+            item.get("item_code") or "",
+            item.get("item_name") or item.get("item_code") or "",
+            float(item.get("qty") or 0),
+            float(item.get("amount") or 0),
+        ]
+        for item in invoice.get("items") or [] if isinstance(item, dict)
+    ]
+    payments = [
+        [payment.get("mode_of_payment") or "Unknown", float(payment.get("amount") or 0)]
+        for payment in invoice.get("payments") or [] if isinstance(payment, dict)
+    ]
+    return {
+        "tenant_id": tenant_id,
+        "invoice": name,
+        "posting_date": date.fromisoformat(str(posting_date)[:10]),
+        "posting_hour": _parse_hour(invoice.get("posting_time")),
+        "pos_profile": invoice.get("pos_profile") or "",
+        "customer": invoice.get("customer"),
+        "cashier": invoice.get("owner") or "",
+        "net_total": float(invoice.get("net_total") or 0),
+        "tax_total": float(invoice.get("total_taxes_and_charges") or 0),
+        "grand_total": float(invoice.get("grand_total") or 0),
+        "docstatus": int(invoice.get("docstatus", 1) or 0),
+        "modified": str(invoice.get("modified") or ""),
+        "lines": json.dumps(lines),
+        "payments": json.dumps(payments),
+    }
+
+
+def contributions(fact: Optional[Mapping[str, Any]]) -> Contributions:
+    """What one stored invoice adds to its hourly rollup bucket"""
+    if not fact or fact["docstatus"] != 1:
+        return {}
+    out: Contributions = {}
+
+    def add(dimension: str, key: str, label: str, amount: float, quantity: float, transactions: int):
+        entry = out.setdefault((dimension, key), [label, 0.0, 0.0, 0])
+        entry[1] += amount
+        entry[2] += quantity
+        entry[3] += transactions
+
+    add("profile", fact["pos_profile"], fact["pos_profile"], fact["net_total"], 0, 1)
+    add("cashier", fact["cashier"], fact["cashier"], fact["net_total"], 0, 1)
+    for item_code, item_name, qty, amount in json.loads(fact["lines"]):
+        add("item", item_code, item_name, amount, qty, 0)
+    for mode, amount in json.loads(fact["payments"]):
+        add("payment_mode", mode, mode, amount, 0, 1)
+    # An item counts once per invoice however many lines it has
+    for (dimension, _), entry in out.items():
+        if dimension == "item":
+            entry[3] = 1
+    return out
+
+
+def _row_dict(row: PosSalesFact) -> Dict[str, Any]:
+    return {column.name: getattr(row, column.name) for column in PosSalesFact.__table__.columns}
+
+
+def _insert(db: Session):
+    """Dialect insert construct (both support ON CONFLICT upserts)"""
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+
+def _period_start(day: date, grain: str) -> date:
+    if grain == "week":
+        return day - timedelta(days=day.weekday())
+    if grain == "month":
+        return day.replace(day=1)
+    return day
+
+
+class SalesFactStore:
+    """Incrementally maintained POS sales facts and rollups per tenant"""
+
+    def __init__(self, session_factory=None, page_size: Optional[int] = None):
+        """
+        Initialize the fact store
+
+        Args:
+            session_factory: Callable returning a SQLAlchemy Session (defaults to SessionLocal)
+            page_size: ERPNext page size used by the backfill
+        """
+        self.session_factory = session_factory or SessionLocal
+        self.page_size = page_size or settings.POS_ANALYTICS_PAGE_SIZE
+        self._sync_locks: Dict[str, asyncio.Lock] = {}
+
+    # Ingestion
+
+    def ingest(self, db: Session, tenant_id: str, invoices: List[Mapping[str, Any]]) -> int:
+        """
+        Upsert invoices into the fact table and adjust rollups by the difference
+
+        An invoice is skipped unless its `modified` is newer than the stored
+        copy, which makes event re-delivery and overlapping backfills no-ops.
+
+        Returns:
+            Number of invoices whose facts changed
+        """
+        insert = _insert(db)
+        changed = 0
+        for invoice in invoices:
+            if invoice.get("is_pos") in (0, "0", False):
+                continue
+            new = fact_from_invoice(tenant_id, invoice)
+            if new is None:
+                continue
+
+            existing = self._locked_fact(db, tenant_id, new["invoice"])
+            if existing is None:
+                claimed = db.execute(
+                    insert(PosSalesFact).values(**new).on_conflict_do_nothing(index_elements=["tenant_id", "invoice"])
+                ).rowcount
+                if claimed:
+                    self._apply(db, new, contributions(new), 1)
+                    changed += 1
+                    continue
+                # Another worker stored it first; continue as an update against its row
+                existing = self._locked_fact(db, tenant_id, new["invoice"])
+
+            if new["modified"] <= existing.modified:
+                continue
+            old = _row_dict(existing)
+            self._apply(db, old, contributions(old), -1)
+            self._apply(db, new, contributions(new), 1)
+            for column, value in new.items():
+                setattr(existing, column, value)
+            changed += 1
+
+        db.commit()
+        return changed
+
+    @staticmethod
+    def _locked_fact(db: Session, tenant_id: str, invoice: str) -> Optional[PosSalesFact]:
+        return db.execute(
+            select(PosSalesFact)
+            .where(PosSalesFact.tenant_id == tenant_id, PosSalesFact.invoice == invoice)
+            .with_for_update()
+        ).scalar_one_or_none()
+
+    def _apply(self, db: Session, fact: Mapping[str, Any], delta: Contributions, sign: int):
+        """Add (sign=1) or remove (sign=-1) an invoice's contributions from its bucket"""
+        insert = _insert(db)
+        for (dimension, key), (label, amount, quantity, transactions) in delta.items():
+            stmt = insert(PosSalesRollup).values(
+                tenant_id=fact["tenant_id"],
+                bucket_date=fact["posting_date"],
+                bucket_hour=fact["posting_hour"],
+                pos_profile=fact["pos_profile"],
+                dimension=dimension,
+                dimension_key=key,
+                label=label,
+                amount=sign * amount,
+                quantity=sign * quantity,
+                transactions=sign * transactions,
+            )
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=ROLLUP_KEY,
+                set_={
+                    "label": stmt.excluded.label,
+                    "amount": PosSalesRollup.amount + stmt.excluded.amount,
+                    "quantity": PosSalesRollup.quantity + stmt.excluded.quantity,
+                    "transactions": PosSalesRollup.transactions + stmt.excluded.transactions,
+                },
+            ))
+
+    async def _run(self, fn, *args):
+        """Call fn(db, *args) with a fresh session in a worker thread (the ORM session is blocking)"""
+        def work():
+            with self.session_factory() as db:
+                return fn(db, *args)
+
+        return await asyncio.to_thread(work)
+
+    async def handle_invoice_created(self, event) -> None:
+        """Event bus handler: record a freshly created invoice"""
+        if not event.tenant_id or not isinstance(event.data, dict):
+            return
+        await self._run(self.ingest, event.tenant_id, [event.data])
+
+    async def start(self, bus) -> None:
+        """Subscribe to invoice events on the POS event bus"""
+        await bus.subscribe("invoice_created", self.handle_invoice_created, name="sales_fact_store")
+
+    # Backfill
+
+    async def backfill(self, tenant_id: str, erpnext_adapter) -> Dict[str, Any]:
+        """
+        Pull POS invoices modified at or after the watermark from ERPNext
+
+        The first run for a tenant covers POS_ANALYTICS_BACKFILL_DAYS of
+        postings. Invoice names are listed page by page and only documents
+        newer than the stored facts are fetched, concurrently. The watermark
+        advances after each committed page, but never past an invoice that
+        could not be fetched, so the next run lists it again.
+        """
+        watermark = await self._run(self._load_watermark, tenant_id)
+
+        filters: List[List[Any]] = [["is_pos", "=", 1], ["docstatus", "in", [1, 2]]]
+        if watermark:
+            filters.append(["modified", ">=", watermark])
+        else:
+            since = date.today() - timedelta(days=settings.POS_ANALYTICS_BACKFILL_DAYS)
+            filters.append(["posting_date", ">=", since.isoformat()])
+
+        semaphore = asyncio.Semaphore(max(1, settings.POS_ANALYTICS_FETCH_CONCURRENCY))
+
+        async def fetch(name: str) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                response = await erpnext_adapter.aproxy_request(
+                    tenant_id=tenant_id,
+                    path=f"resource/Sales Invoice/{name}",
+                    method="GET"
+                )
+            return response.get("data") if isinstance(response, dict) else None
+
+        listed = fetched = changed = 0
+        start = 0
+        # `modified` of the oldest invoice that could not be fetched
+        blocked_at: Optional[str] = None
+        while True:
+            response = await erpnext_adapter.aproxy_request(
+                tenant_id=tenant_id,
+                path="resource/Sales Invoice",
+                method="GET",
+                params={
+                    "fields": json.dumps(["name", "modified"]),
+                    "filters": json.dumps(filters),
+                    "order_by": "modified asc",
+                    "limit_start": start,
+                    "limit_page_length": self.page_size,
+                }
+            )
+            page = response.get("data", []) if isinstance(response, dict) else (response or [])
+            rows = [row for row in page if isinstance(row, dict) and row.get("name")]
+            listed += len(rows)
+
+            known = await self._run(self._known_versions, tenant_id, [row["name"] for row in rows]) if rows else {}
+            stale = [row for row in rows if str(row.get("modified") or "") > known.get(row["name"], "")]
+            results = await asyncio.gather(*(fetch(row["name"]) for row in stale))
+            docs = [doc for doc in results if doc]
+            missed = [str(row.get("modified") or "") for row, doc in zip(stale, results) if not doc]
+            if missed:
+                blocked_at = min([blocked_at, *missed] if blocked_at else missed)
+
+            listed_up_to = max([watermark] + [str(row.get("modified") or "") for row in rows])
+            if blocked_at is not None:
+                # Rows are listed with `modified >=`, so the unfetched invoice is listed again
+                listed_up_to = max(watermark, min(listed_up_to, blocked_at))
+            fetched += len(docs)
+            changed += await self._run(self._ingest_page, tenant_id, docs, listed_up_to)
+            watermark = listed_up_to
+
+            if len(page) < self.page_size:
+                break
+            start += self.page_size
+
+        stats = {"listed": listed, "fetched": fetched, "changed": changed, "watermark": watermark}
+        logger.info(f"Sales fact backfill for tenant {tenant_id}: {stats}")
+        return stats
+
+    @staticmethod
+    def _load_watermark(db: Session, tenant_id: str) -> str:
+        state = db.get(PosSalesSyncState, tenant_id)
+        return state.watermark if state else ""
+
+    @staticmethod
+    def _known_versions(db: Session, tenant_id: str, invoices: List[str]) -> Dict[str, str]:
+        """invoice -> stored `modified` for the invoices already in the fact table"""
+        return dict(db.execute(
+            select(PosSalesFact.invoice, PosSalesFact.modified).where(
+                PosSalesFact.tenant_id == tenant_id,
+                PosSalesFact.invoice.in_(invoices)
+            )
+        ).all())
+
+    def _ingest_page(self, db: Session, tenant_id: str, docs: List[Mapping[str, Any]], watermark: str) -> int:
+        changed = self.ingest(db, tenant_id, docs)
+        self._save_state(db, tenant_id, watermark)
+        return changed
+
+    @staticmethod
+    def _save_state(db: Session, tenant_id: str, watermark: str):
+        state = db.get(PosSalesSyncState, tenant_id) or PosSalesSyncState(tenant_id=tenant_id)
+        state.watermark = watermark
+        state.synced_at = datetime.now(timezone.utc)
+        db.add(state)
+        db.commit()
+
+    @staticmethod
+    def _synced_at(db: Session, tenant_id: str) -> Optional[datetime]:
+        state = db.get(PosSalesSyncState, tenant_id)
+        return state.synced_at if state else None
+
+    async def ensure_fresh(self, tenant_id: str, erpnext_adapter) -> bool:
+        """
+        Run a backfill if the last one is older than POS_ANALYTICS_SYNC_INTERVAL
+
+        Concurrent callers for the same tenant do not wait for a running
+        backfill; they read the facts as they are. Returns False only when the
+        tenant has never been backfilled and that first backfill did not finish.
+        """
+        synced_at = await self._run(self._synced_at, tenant_id)
+        if synced_at is not None:
+            if synced_at.tzinfo is None:
+                synced_at = synced_at.replace(tzinfo=timezone.utc)
+            if (datetime.now(timezone.utc) - synced_at).total_seconds() < settings.POS_ANALYTICS_SYNC_INTERVAL:
+                return True
+
+        lock = self._sync_locks.setdefault(tenant_id, asyncio.Lock())
+        if lock.locked():
+            return synced_at is not None
+        async with lock:
+            try:
+                await self.backfill(tenant_id, erpnext_adapter)
+            except Exception as e:
+                logger.warning(f"Sales fact backfill failed for tenant {tenant_id}: {e}")
+                return synced_at is not None
+        return True
+
+    # Queries
+
+    @staticmethod
+    def _fact_filters(tenant_id: str, date_from: date, date_to: date, pos_profile: Optional[str]):
+        filters = [
+            PosSalesFact.tenant_id == tenant_id,
+            PosSalesFact.docstatus == 1,
+            PosSalesFact.posting_date >= date_from,
+            PosSalesFact.posting_date <= date_to,
+        ]
+        if pos_profile:
+            filters.append(PosSalesFact.pos_profile == pos_profile)
+        return filters
+
+    @staticmethod
+    def _rollup_filters(tenant_id: str, dimension: str, date_from: date, date_to: date, pos_profile: Optional[str]):
+        filters = [
+            PosSalesRollup.tenant_id == tenant_id,
+            PosSalesRollup.dimension == dimension,
+            PosSalesRollup.bucket_date >= date_from,
+            PosSalesRollup.bucket_date <= date_to,
+        ]
+        if pos_profile:
+            filters.append(PosSalesRollup.pos_profile == pos_profile)
+        return filters
+
+    def summary(
+        self, db: Session, tenant_id: str, date_from: date, date_to: date, pos_profile: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Sales, transaction, tax and unique-customer totals for a date range"""
+        sales, transactions, tax, customers = db.execute(
+            select(
+                func.coalesce(func.sum(PosSalesFact.net_total), 0),
+                func.count(),
+                func.coalesce(func.sum(PosSalesFact.tax_total), 0),
+                func.count(func.distinct(PosSalesFact.customer)),
+            ).where(*self._fact_filters(tenant_id, date_from, date_to, pos_profile))
+        ).one()
+        return {
+            "total_sales": round(float(sales), 2),
+            "total_transactions": int(transactions),
+            "avg_transaction": round(float(sales) / transactions, 2) if transactions else 0,
+            "total_vat": round(float(tax), 2),
+            "total_customers": int(customers),
+        }
+
+    def series(
+        self,
+        db: Session,
+        tenant_id: str,
+        date_from: date,
+        date_to: date,
+        pos_profile: Optional[str] = None,
+        grain: str = "day",
+        dimension: str = "profile",
+        by_key: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Rollup totals over time
+
+        Args:
+            grain: hour, day, week or month
+            dimension: Rollup dimension to read; "profile" gives overall sales
+            by_key: Keep one series per dimension key instead of summing them
+        """
+        columns = [PosSalesRollup.bucket_date]
+        if grain == "hour":
+            columns.append(PosSalesRollup.bucket_hour)
+        if by_key:
+            columns.append(PosSalesRollup.dimension_key)
+        rows = db.execute(
+            select(*columns, func.sum(PosSalesRollup.amount), func.sum(PosSalesRollup.transactions))
+            .where(*self._rollup_filters(tenant_id, dimension, date_from, date_to, pos_profile))
+            .group_by(*columns)
+        ).all()
+
+        periods: Dict[Tuple, List[float]] = {}
+        for row in rows:
+            bucket = [_period_start(row[0], grain).isoformat()]
+            if grain == "hour":
+                bucket.append(row[1])
+            if by_key:
+                bucket.append(row[len(columns) - 1])
+            totals = periods.setdefault(tuple(bucket), [0.0, 0])
+            totals[0] += float(row[-2] or 0)
+            totals[1] += int(row[-1] or 0)
+
+        result = []
+        for bucket, (amount, transactions) in sorted(periods.items()):
+            entry: Dict[str, Any] = {"date": bucket[0]}
+            if grain == "hour":
+                entry["hour"] = bucket[1]
+            if by_key:
+                entry["key"] = bucket[-1]
+            entry.update({"sales": round(amount, 2), "transactions": transactions})
+            result.append(entry)
+        return result
+
+    def top(
+        self,
+        db: Session,
+        tenant_id: str,
+        dimension: str,
+        date_from: date,
+        date_to: date,
+        pos_profile: Optional[str] = None,
+        limit: Optional[int] = None,
+        ascending: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Dimension keys ranked by amount (items, payment modes, cashiers, profiles)"""
+        amount = func.sum(PosSalesRollup.amount)
+        stmt = (
+            select(
+                PosSalesRollup.dimension_key,
+                func.max(PosSalesRollup.label),
+                amount,
+                func.sum(PosSalesRollup.quantity),
+                func.sum(PosSalesRollup.transactions),
+            )
+            .where(*self._rollup_filters(tenant_id, dimension, date_from, date_to, pos_profile))
+            .group_by(PosSalesRollup.dimension_key)
+            .having(func.sum(PosSalesRollup.transactions) > 0)
+            .order_by(amount.asc() if ascending else amount.desc(), PosSalesRollup.dimension_key)
+        )
+        if limit:
+            stmt = stmt.limit(limit)
+        return [
+            {
+                "key": key,
+                "name": label or key,
+                "amount": round(float(total or 0), 2),
+                "quantity": round(float(quantity or 0), 3),
+                "transactions": int(transactions or 0),
+            }
+            for key, label, total, quantity, transactions in db.execute(stmt).all()
+        ]
+
+    def customers(
+        self,
+        db: Session,
+        tenant_id: str,
+        date_from: date,
+        date_to: date,
+        pos_profile: Optional[str] = None,
+        limit: int = 10,
+    ) -> Dict[str, Any]:
+        """Per-customer spend and visit counts from the fact table"""
+        spend = func.sum(PosSalesFact.net_total)
+        rows = db.execute(
+            select(PosSalesFact.customer, spend, func.count())
+            .where(*self._fact_filters(tenant_id, date_from, date_to, pos_profile), PosSalesFact.customer.isnot(None))
+            .group_by(PosSalesFact.customer)
+            .order_by(spend.desc())
+        ).all()
+        repeat = [row for row in rows if row[2] > 1]
+        total_spend = sum(float(row[1] or 0) for row in rows)
+        return {
+            "unique_customers": len(rows),
+            "repeat_customers": len(repeat),
+            "avg_spend_per_customer": round(total_spend / len(rows), 2) if rows else 0,
+            "top_customers": [
+                {"customer": customer, "sales": round(float(total or 0), 2), "transactions": int(count)}
+                for customer, total, count in rows[:limit]
+            ],
+        }
+
+
+# Global fact store instance
+sales_fact_store = SalesFactStore()
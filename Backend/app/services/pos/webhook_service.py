@@ -1,17 +1,29 @@
 """
 Webhook Service for PoS
 Manages webhook registration, delivery, and retry logic
+
+Deliveries are handed to the shared WebhookDispatcher
+(app.services.webhook_dispatcher), which gives every webhook its own queue,
+worker and circuit breaker, retries failures with jittered backoff from
+Redis, optionally batches events per endpoint and keeps a capped delivery
+history. Subscribers are looked up through a (tenant, event) index.
 """
-import asyncio
 import json
 import secrets
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional, Callable
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass, asdict
-import httpx
 from pydantic import BaseModel, Field
 
+from app.services.webhook_dispatcher import (
+    WebhookDispatcher,
+    WebhookEndpoint,
+    WebhookJob,
+    sign_payload,
+    webhook_dispatcher
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -30,6 +42,8 @@ class WebhookConfig(BaseModel):
         description="Retry policy configuration"
     )
     timeout: int = Field(30, description="Request timeout in seconds")
+    batch_size: int = Field(1, description="Coalesce up to this many queued events into one request")
+    batch_window: float = Field(1.0, description="Seconds to wait for a batch to fill")
 
 
 @dataclass
@@ -60,17 +74,47 @@ class WebhookDelivery:
         data['created_at'] = self.created_at.isoformat()
         return data
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'WebhookDelivery':
+        """Create delivery from dictionary"""
+        # Convert ISO strings back to datetime
+        if data.get('delivered_at'):
+            data['delivered_at'] = datetime.fromisoformat(data['delivered_at'])
+        if data.get('next_retry_at'):
+            data['next_retry_at'] = datetime.fromisoformat(data['next_retry_at'])
+        data['created_at'] = datetime.fromisoformat(data['created_at'])
+        return cls(**data)
+
+    @classmethod
+    def from_job(cls, job: WebhookJob) -> 'WebhookDelivery':
+        """Create delivery from a dispatcher job"""
+        return cls(
+            id=job.id,
+            webhook_id=job.endpoint_id,
+            event_name=job.event,
+            payload=job.payload.get('data', job.payload),
+            attempt_number=job.attempt,
+            status='success' if job.status == 'delivered' else job.status,
+            response_code=job.response_code,
+            response_body=job.response_body,
+            error_message=job.error_message,
+            delivered_at=datetime.fromtimestamp(job.delivered_at) if job.delivered_at else None,
+            next_retry_at=datetime.fromtimestamp(job.next_retry_at) if job.next_retry_at else None,
+            created_at=datetime.fromtimestamp(job.created_at),
+            signature=job.headers.get('X-Signature', '')
+        )
+
 
 class WebhookService:
     """Service for managing webhooks and event delivery"""
 
-    def __init__(self, redis_client=None):
+    def __init__(self, redis_client=None, dispatcher: Optional[WebhookDispatcher] = None):
         self.redis = redis_client
+        self.dispatcher = dispatcher or webhook_dispatcher
         self.webhooks: Dict[str, WebhookConfig] = {}
-        self.delivery_queue: asyncio.Queue = asyncio.Queue()
+        # (tenant_id, event_name) -> webhook IDs
+        self._index: Dict[Tuple[str, str], List[str]] = {}
         self.is_processing = False
-        self.client = httpx.AsyncClient(timeout=30.0)
-        self._processing_task = None
 
     async def register_webhook(
         self,
@@ -94,7 +138,7 @@ class WebhookService:
         # Validate configuration
         await self._validate_webhook_config(config)
 
-        self.webhooks[webhook_id] = config
+        self._add_webhook(tenant_id, webhook_id, config)
 
         # Persist to Redis if available
         if self.redis:
@@ -122,7 +166,9 @@ class WebhookService:
         if webhook_id not in self.webhooks:
             return False
 
+        self._unindex_webhook(webhook_id)
         del self.webhooks[webhook_id]
+        self.dispatcher.remove_endpoint(webhook_id)
 
         # Remove from Redis
         if self.redis:
@@ -131,6 +177,54 @@ class WebhookService:
         logger.info(f"Unregistered webhook '{webhook_id}'")
         return True
 
+    def _add_webhook(self, tenant_id: str, webhook_id: str, config: WebhookConfig):
+        self._unindex_webhook(webhook_id)
+        self.webhooks[webhook_id] = config
+        for event_name in set(config.events):
+            self._index.setdefault((tenant_id, event_name), []).append(webhook_id)
+
+        self.dispatcher.register_endpoint(WebhookEndpoint(
+            id=webhook_id,
+            url=config.url,
+            secret=config.secret,
+            timeout=config.timeout,
+            max_attempts=config.retry_policy['max_retries'],
+            retry_delay=config.retry_policy['retry_delay'],
+            backoff_factor=config.retry_policy['backoff_factor'],
+            batch_size=config.batch_size,
+            batch_window=config.batch_window
+        ))
+
+    def _unindex_webhook(self, webhook_id: str):
+        config = self.webhooks.get(webhook_id)
+        if not config:
+            return
+        tenant_id = webhook_id.split(':', 1)[0]
+        for event_name in set(config.events):
+            webhook_ids = self._index.get((tenant_id, event_name), [])
+            if webhook_id in webhook_ids:
+                webhook_ids.remove(webhook_id)
+            if not webhook_ids:
+                self._index.pop((tenant_id, event_name), None)
+
+    async def _load_webhooks(self):
+        """Restore webhooks registered before a restart, so persisted retries can be delivered"""
+        if not self.redis:
+            return
+
+        try:
+            async for key in self.redis.scan_iter(match="webhook:*"):
+                webhook_id = key[len("webhook:"):]
+                if webhook_id in self.webhooks:
+                    continue
+                data = await self.redis.get(key)
+                if not data:
+                    continue
+                config = WebhookConfig(**json.loads(data)['config'])
+                self._add_webhook(webhook_id.split(':', 1)[0], webhook_id, config)
+        except Exception as e:
+            logger.warning(f"Failed to restore registered webhooks: {e}")
+
     async def trigger_webhook(
         self,
         event_name: str,
@@ -150,28 +244,31 @@ class WebhookService:
         """
         triggered_webhooks = []
 
-        for webhook_id, config in self.webhooks.items():
-            # Check if webhook is for this tenant and event
-            if not webhook_id.startswith(f"{tenant_id}:"):
-                continue
-
-            if not config.enabled or event_name not in config.events:
+        for webhook_id in list(self._index.get((tenant_id, event_name), ())):
+            config = self.webhooks[webhook_id]
+            if not config.enabled:
                 continue
 
-            # Create delivery attempt
-            delivery = WebhookDelivery(
+            created_at = datetime.now()
+            signature = self._generate_signature(payload, config.secret)
+            job = WebhookJob(
                 id=f"{webhook_id}:{secrets.token_hex(8)}",
-                webhook_id=webhook_id,
-                event_name=event_name,
-                payload=payload,
-                attempt_number=1,
-                status='pending',
-                created_at=datetime.now(),
-                signature=self._generate_signature(payload, config.secret)
+                endpoint_id=webhook_id,
+                event=event_name,
+                tenant_id=tenant_id,
+                payload={
+                    'event': event_name,
+                    'timestamp': created_at.isoformat(),
+                    'attempt': 1,
+                    'signature': signature,
+                    'data': payload
+                },
+                headers={'X-Event': event_name, 'X-Signature': signature},
+                created_at=created_at.timestamp()
             )
 
-            # Add to delivery queue
-            await self.delivery_queue.put(delivery)
+            # Add to the endpoint's delivery queue
+            await self.dispatcher.submit(job)
             triggered_webhooks.append(webhook_id)
 
         if triggered_webhooks:
@@ -179,138 +276,10 @@ class WebhookService:
 
         return triggered_webhooks
 
-    async def _start_processing(self):
-        """Start the webhook delivery processing loop"""
-        self.is_processing = True
-        logger.info("Webhook delivery processing started")
-
-        while self.is_processing:
-            try:
-                # Get next delivery from queue
-                delivery = await self.delivery_queue.get()
-
-                # Process the delivery
-                await self._process_delivery(delivery)
-
-                # Mark task as done
-                self.delivery_queue.task_done()
-
-            except Exception as e:
-                logger.error(f"Error processing webhook delivery: {e}")
-
-    async def _process_delivery(self, delivery: WebhookDelivery):
-        """Process a webhook delivery"""
-        logger.debug(f"Processing webhook delivery {delivery.id}")
-
-        config = self.webhooks.get(delivery.webhook_id)
-        if not config:
-            logger.warning(f"Webhook config not found for {delivery.webhook_id}")
-            return
-
-        try:
-            # Prepare payload
-            webhook_payload = {
-                'event': delivery.event_name,
-                'timestamp': delivery.created_at.isoformat(),
-                'attempt': delivery.attempt_number,
-                'signature': delivery.signature,
-                'data': delivery.payload
-            }
-
-            # Send webhook
-            headers = {
-                'Content-Type': 'application/json',
-                'User-Agent': 'MoranERP-Webhook/1.0',
-                'X-Webhook-ID': delivery.webhook_id,
-                'X-Event': delivery.event_name,
-                'X-Signature': delivery.signature
-            }
-
-            response = await self.client.post(
-                config.url,
-                json=webhook_payload,
-                headers=headers,
-                timeout=config.timeout
-            )
-
-            delivery.response_code = response.status_code
-            delivery.response_body = response.text
-            delivery.delivered_at = datetime.now()
-
-            if response.status_code >= 200 and response.status_code < 300:
-                delivery.status = 'success'
-                logger.info(f"Webhook delivery {delivery.id} successful (status: {response.status_code})")
-            else:
-                # Handle failure with retry logic
-                await self._handle_delivery_failure(delivery, config, f"HTTP {response.status_code}: {response.text}")
-
-        except httpx.TimeoutException:
-            await self._handle_delivery_failure(delivery, config, "Request timeout")
-        except httpx.RequestError as e:
-            await self._handle_delivery_failure(delivery, config, f"Request error: {str(e)}")
-        except Exception as e:
-            await self._handle_delivery_failure(delivery, config, f"Unexpected error: {str(e)}")
-
-        # Persist delivery status
-        await self._persist_delivery(delivery)
-
-    async def _handle_delivery_failure(
-        self,
-        delivery: WebhookDelivery,
-        config: WebhookConfig,
-        error_message: str
-    ):
-        """Handle webhook delivery failure"""
-        delivery.error_message = error_message
-
-        if delivery.attempt_number < config.retry_policy['max_retries']:
-            # Schedule retry
-            retry_delay = (
-                config.retry_policy['retry_delay'] *
-                (config.retry_policy['backoff_factor'] ** (delivery.attempt_number - 1))
-            )
-
-            delivery.status = 'retrying'
-            delivery.next_retry_at = datetime.now() + timedelta(seconds=retry_delay)
-            delivery.attempt_number += 1
-
-            # Re-queue delivery
-            await asyncio.sleep(retry_delay)
-            await self.delivery_queue.put(delivery)
-
-            logger.warning(f"Webhook delivery {delivery.id} failed, retrying in {retry_delay}s (attempt {delivery.attempt_number})")
-        else:
-            delivery.status = 'failed'
-            logger.error(f"Webhook delivery {delivery.id} failed permanently after {delivery.attempt_number} attempts")
-
-    async def _persist_delivery(self, delivery: WebhookDelivery):
-        """Persist delivery status to Redis"""
-        if not self.redis:
-            return
-
-        try:
-            key = f"webhook_delivery:{delivery.id}"
-            await self.redis.setex(
-                key,
-                86400 * 7,  # Keep for 7 days
-                json.dumps(delivery.to_dict())
-            )
-        except Exception as e:
-            logger.warning(f"Failed to persist delivery {delivery.id}: {e}")
-
     def _generate_signature(self, payload: Dict[str, Any], secret: str) -> str:
         """Generate webhook signature for verification"""
-        import hmac
-        import hashlib
-
         payload_str = json.dumps(payload, sort_keys=True)
-        signature = hmac.new(
-            secret.encode(),
-            payload_str.encode(),
-            hashlib.sha256
-        ).hexdigest()
-
-        return f"sha256={signature}"
+        return f"sha256={sign_payload(secret, payload_str)}"
 
     async def _validate_webhook_config(self, config: WebhookConfig):
         """Validate webhook configuration"""
@@ -325,7 +294,7 @@ class WebhookService:
 
         # Test URL accessibility
         try:
-            await self.client.head(config.url, timeout=5)
+            await self.dispatcher.client_for(config.url).head(config.url, timeout=5)
         except Exception:
             logger.warning(f"Webhook URL {config.url} is not accessible during registration")
 
@@ -343,34 +312,8 @@ class WebhookService:
         limit: int = 50
     ) -> List[WebhookDelivery]:
         """Get delivery history for a webhook"""
-        deliveries = []
-
-        if self.redis:
-            try:
-                # Get all delivery keys for this webhook
-                pattern = f"webhook_delivery:{webhook_id}:*"
-                keys = await self.redis.keys(pattern)
-
-                for key in keys[:limit]:
-                    data = await self.redis.get(key)
-                    if data:
-                        delivery_data = json.loads(data)
-                        # Convert ISO strings back to datetime
-                        if delivery_data.get('delivered_at'):
-                            delivery_data['delivered_at'] = datetime.fromisoformat(delivery_data['delivered_at'])
-                        if delivery_data.get('next_retry_at'):
-                            delivery_data['next_retry_at'] = datetime.fromisoformat(delivery_data['next_retry_at'])
-                        delivery_data['created_at'] = datetime.fromisoformat(delivery_data['created_at'])
-
-                        deliveries.append(WebhookDelivery(**delivery_data))
-
-                # Sort by creation time (newest first)
-                deliveries.sort(key=lambda d: d.created_at, reverse=True)
-
-            except Exception as e:
-                logger.warning(f"Failed to get delivery history for {webhook_id}: {e}")
-
-        return deliveries
+        jobs = await self.dispatcher.get_history(webhook_id, limit)
+        return [WebhookDelivery.from_job(job) for job in jobs]
 
     async def test_webhook(self, webhook_id: str) -> Dict[str, Any]:
         """
@@ -431,36 +374,34 @@ class WebhookService:
             stats['events_subscribed'].update(config.events)
 
         stats['events_subscribed'] = list(stats['events_subscribed'])
-
-        # Get delivery stats from Redis
-        if self.redis:
-            try:
-                pattern = f"webhook_delivery:{tenant_id}:*:*"
-                keys = await self.redis.keys(pattern)
-
-                for key in keys[:1000]:  # Limit to avoid performance issues
-                    data = await self.redis.get(key)
-                    if data:
-                        delivery_data = json.loads(data)
-                        stats['deliveries']['total'] += 1
-
-                        status = delivery_data.get('status')
-                        if status == 'success':
-                            stats['deliveries']['successful'] += 1
-                        elif status == 'failed':
-                            stats['deliveries']['failed'] += 1
-                        elif status in ['pending', 'retrying']:
-                            stats['deliveries']['pending'] += 1
-
-            except Exception as e:
-                logger.warning(f"Failed to get webhook stats: {e}")
+        stats['open_circuits'] = sum(
+            1 for webhook_id in webhooks if self.dispatcher.is_circuit_open(webhook_id)
+        )
+        stats['queued'] = sum(self.dispatcher.queued(webhook_id) for webhook_id in webhooks)
+
+        # Latest recorded attempt of each delivery
+        latest: Dict[str, str] = {}
+        for webhook_id in webhooks:
+            for job in await self.dispatcher.get_history(webhook_id, 1000):
+                latest.setdefault(job.id, job.status)
+
+        for status in latest.values():
+            stats['deliveries']['total'] += 1
+            if status == 'delivered':
+                stats['deliveries']['successful'] += 1
+            elif status == 'failed':
+                stats['deliveries']['failed'] += 1
+            elif status in ['pending', 'retrying']:
+                stats['deliveries']['pending'] += 1
 
         return stats
 
     async def start_processing(self):
-        """Start the webhook delivery processing loop"""
-        if self._processing_task is None:
-            self._processing_task = asyncio.create_task(self._start_processing())
+        """Restore persisted webhooks and start the dispatcher"""
+        if not self.is_processing:
+            self.is_processing = True
+            await self._load_webhooks()
+            await self.dispatcher.start()
             logger.info("Webhook delivery processing started")
 
     async def shutdown(self):
@@ -468,19 +409,8 @@ class WebhookService:
         logger.info("Shutting down webhook service...")
         self.is_processing = False
 
-        if self._processing_task:
-            # Wait for delivery queue to be empty
-            await self.delivery_queue.join()
-
-            # Cancel the processing task
-            self._processing_task.cancel()
-            try:
-                await self._processing_task
-            except asyncio.CancelledError:
-                pass
-
-        # Close HTTP client
-        await self.client.aclose()
+        # Drain queued deliveries and close the dispatcher's clients
+        await self.dispatcher.shutdown()
 
         logger.info("Webhook service shut down")
 
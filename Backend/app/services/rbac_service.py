@@ -3,10 +3,11 @@ from sqlalchemy.orm import Session
 from sqlalchemy import select, and_, or_
 from datetime import datetime
 import uuid
-import fnmatch
 
 from app.models.rbac import Role, Permission, UserRole, PermissionOverride, RolePermission, RoleAuditLog
 from app.models.iam import User, Tenant
+from app.services.permission_cache import permission_cache
+from app.services.permission_matcher import ALL_PERMISSIONS, PermissionMatcher, compile_permissions
 
 
 class RBACService:
@@ -40,6 +41,53 @@ class RBACService:
         Returns:
             True if user has permission, False otherwise
         """
+        matcher = self.get_permission_matcher(db, user_id, tenant_id)
+        return matcher.matches(permission)
+    
+    def get_permission_matcher(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        tenant_id: Optional[uuid.UUID]
+    ) -> PermissionMatcher:
+        """
+        Get the compiled permission matcher for a user in tenant context.
+        
+        Served from the permission cache (process LRU, then Redis); the
+        database is only queried on a full miss.
+        
+        Args:
+            db: Database session
+            user_id: User UUID
+            tenant_id: Tenant UUID (None for system-level permissions)
+        
+        Returns:
+            PermissionMatcher for the user's effective permissions
+        """
+        return permission_cache.get_or_load(
+            user_id, tenant_id, lambda: self._resolve_permission_codes(db, user_id, tenant_id)
+        )
+    
+    def invalidate_permission_cache(self, user_id: uuid.UUID, tenant_id: Optional[uuid.UUID] = None):
+        """Drop cached permissions after a user's roles or overrides change."""
+        permission_cache.invalidate(user_id, tenant_id)
+    
+    def invalidate_role_holders_cache(self, db: Session, role_id: uuid.UUID):
+        """Drop cached permissions for every active holder of a role after its permissions change."""
+        holders = db.query(UserRole.user_id, UserRole.tenant_id).filter(
+            UserRole.role_id == role_id,
+            UserRole.is_active == True
+        ).all()
+        for holder_user_id, holder_tenant_id in holders:
+            permission_cache.invalidate(holder_user_id, holder_tenant_id)
+    
+    def _resolve_permission_codes(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        tenant_id: Optional[uuid.UUID]
+    ) -> List[str]:
+        """Resolve permission codes from the database (SUPER_ADMIN resolves to all)."""
         # Check if user is SUPER_ADMIN
         super_admin_role = db.query(Role).filter(Role.code == 'SUPER_ADMIN').first()
         if super_admin_role:
@@ -49,13 +97,10 @@ class RBACService:
                 UserRole.is_active == True
             ).first()
             if has_super_admin and not has_super_admin.is_expired:
-                return True
+                return [ALL_PERMISSIONS]
         
         # Get user's effective permissions
-        effective_permissions = self.get_effective_permissions(db, user_id, tenant_id)
-        
-        # Check if permission matches (with wildcard support)
-        return self.check_permission_match(effective_permissions, permission)
+        return sorted(self.get_effective_permissions(db, user_id, tenant_id))
     
     def get_user_roles(self, db: Session, user_id: uuid.UUID, tenant_id: Optional[uuid.UUID]) -> List[Role]:
         """
@@ -187,26 +232,17 @@ class RBACService:
         - crm:leads:* matches crm:leads:create, crm:leads:edit
         - *:*:* matches everything
         
+        Matching goes through a compiled PermissionMatcher (exact set plus
+        segment trie), memoized per permission set.
+        
         Args:
-            user_permissions: List of user's permission codes
+            user_permissions: List of user's permission codes (or a PermissionMatcher)
             required: Required permission code
         
         Returns:
             True if match found, False otherwise
         """
-        for user_perm in user_permissions:
-            # Exact match
-            if user_perm == required:
-                return True
-            
-            # Wildcard match
-            if '*' in user_perm:
-                # Convert permission pattern to regex-like pattern
-                # crm:*:create -> crm:*:create
-                if fnmatch.fnmatch(required, user_perm):
-                    return True
-        
-        return False
+        return compile_permissions(user_permissions).matches(required)
     
     def assign_role(
         self, 
@@ -272,6 +308,7 @@ class RBACService:
         
         db.commit()
         db.refresh(user_role)
+        self.invalidate_permission_cache(user_id, tenant_id)
         
         return user_role
     
@@ -324,6 +361,7 @@ class RBACService:
         )
         
         db.commit()
+        self.invalidate_permission_cache(user_id, tenant_id)
         
         return True
     
@@ -379,6 +417,7 @@ class RBACService:
         
         db.commit()
         db.refresh(override)
+        self.invalidate_permission_cache(user_id, tenant_id)
         
         return override
     
@@ -434,6 +473,7 @@ class RBACService:
         
         db.commit()
         db.refresh(override)
+        self.invalidate_permission_cache(user_id, tenant_id)
         
         return override
     
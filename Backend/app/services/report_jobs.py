@@ -0,0 +1,171 @@
+"""
+Report Jobs
+Generates large report exports in the background and hands back a download handle.
+
+A submitted job is recorded in Redis (shared by all API workers) and runs as
+an asyncio task that streams the report dataset page by page into a file under
+settings.REPORT_EXPORT_DIR. The file is written to a temporary name and renamed
+once complete, so a download never sees a partial export. Job records and
+their files expire after settings.REPORT_JOB_TTL seconds.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from prometheus_client import Counter
+
+from app.config import settings
+from app.services.report_query import REPORT_DATASETS, ReportQuery, encode_pages, report_query
+
+logger = logging.getLogger(__name__)
+
+REPORT_JOBS = Counter(
+    "report_jobs_total",
+    "Background report jobs by outcome",
+    ["report_type", "status"],
+)
+
+EXPORT_FORMATS = {"csv": "csv", "json": "json"}
+
+
+class ReportJobManager:
+    """Runs report exports as background jobs"""
+
+    def __init__(self, query: Optional[ReportQuery] = None, redis_client=None, export_dir: Optional[str] = None):
+        self.query = query or report_query
+        self.redis_client = redis_client
+        self.export_dir = export_dir or settings.REPORT_EXPORT_DIR
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _job_key(self, tenant_id: str, job_id: str) -> str:
+        return f"report:job:{tenant_id}:{job_id}"
+
+    def file_path(self, tenant_id: str, job_id: str, format: str) -> str:
+        return os.path.join(self.export_dir, tenant_id, f"{job_id}.{EXPORT_FORMATS[format]}")
+
+    async def submit(
+        self,
+        tenant_id: str,
+        report_type: str,
+        date_from: Optional[str],
+        date_to: Optional[str],
+        format: str = "csv",
+    ) -> Dict[str, Any]:
+        """
+        Queue a report export
+
+        Returns:
+            The job record (status "queued")
+        """
+        if report_type not in REPORT_DATASETS:
+            raise ValueError(f"Report type '{report_type}' cannot be exported")
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Format '{format}' not supported for exports")
+
+        await asyncio.to_thread(self.cleanup_expired)
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "report_type": report_type,
+            "format": format,
+            "date_from": date_from or "",
+            "date_to": date_to or "",
+            "status": "queued",
+            "rows": 0,
+            "size": 0,
+            "error": "",
+            "created_at": time.time(),
+        }
+        key = self._job_key(tenant_id, job_id)
+        await self.redis_client.hset(key, mapping=job)
+        await self.redis_client.expire(key, settings.REPORT_JOB_TTL)
+
+        task = asyncio.create_task(self._run(tenant_id, job))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        REPORT_JOBS.labels(report_type=report_type, status="queued").inc()
+        return job
+
+    async def get(self, tenant_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job record, or None if unknown or expired"""
+        job = await self.redis_client.hgetall(self._job_key(tenant_id, job_id))
+        if not job:
+            return None
+        job["rows"] = int(job.get("rows", 0))
+        job["size"] = int(job.get("size", 0))
+        job["created_at"] = float(job.get("created_at", 0))
+        return job
+
+    async def _update(self, tenant_id: str, job_id: str, **fields: Any) -> None:
+        await self.redis_client.hset(self._job_key(tenant_id, job_id), mapping=fields)
+
+    async def _run(self, tenant_id: str, job: Dict[str, Any]) -> None:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(settings.REPORT_JOB_CONCURRENCY)
+
+        job_id, format = job["job_id"], job["format"]
+        dataset = REPORT_DATASETS[job["report_type"]]
+        filters = dataset.build_filters(job["date_from"] or None, job["date_to"] or None)
+        path = self.file_path(tenant_id, job_id, format)
+        partial = f"{path}.part"
+        rows = 0
+
+        async def counted_pages():
+            nonlocal rows
+            async for page in self.query.iter_pages(tenant_id, dataset.doctype, dataset.fields, filters):
+                rows += len(page)
+                yield page
+
+        async with self._slots:
+            await self._update(tenant_id, job_id, status="running")
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(partial, "w", encoding="utf-8", newline="") as handle:
+                    async for chunk in encode_pages(counted_pages(), dataset.fields, format):
+                        await asyncio.to_thread(handle.write, chunk)
+                os.replace(partial, path)
+            except Exception as e:
+                logger.error(f"Report job {job_id} for tenant {tenant_id} failed: {e}")
+                await self._update(tenant_id, job_id, status="failed", error=str(e))
+                REPORT_JOBS.labels(report_type=job["report_type"], status="failed").inc()
+                return
+            finally:
+                if os.path.exists(partial):
+                    os.remove(partial)
+
+        await self._update(
+            tenant_id, job_id,
+            status="completed",
+            rows=rows,
+            size=os.path.getsize(path),
+            completed_at=time.time(),
+        )
+        REPORT_JOBS.labels(report_type=job["report_type"], status="completed").inc()
+
+    def cleanup_expired(self) -> int:
+        """Delete export files older than the job TTL; returns the number removed"""
+        if not os.path.isdir(self.export_dir):
+            return 0
+        cutoff = time.time() - settings.REPORT_JOB_TTL
+        removed = 0
+        for tenant_dir in os.scandir(self.export_dir):
+            if not tenant_dir.is_dir():
+                continue
+            for entry in os.scandir(tenant_dir.path):
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+        return removed
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+
+report_jobs = ReportJobManager()
@@ -0,0 +1,220 @@
+"""
+Report Query Layer
+Pushes report aggregation down to ERPNext and streams raw report rows.
+
+Totals and breakdowns are computed by ERPNext with aggregate fields and
+`group_by` through `frappe.client.get_list`, so a report moves a handful of
+rows instead of every invoice or ledger entry. Row-level exports page through
+a doctype with keyset pagination (`name > last_seen`, ordered by name), which
+stays cheap on deep pages and never skips or repeats rows when earlier pages
+change, and are encoded page by page for streaming.
+"""
+import csv
+import io
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReportDataset:
+    """Row source for a report export"""
+    doctype: str
+    fields: List[str]
+    filters: List[List[Any]] = field(default_factory=list)
+    date_field: Optional[str] = "posting_date"
+
+    def build_filters(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[List[Any]]:
+        filters = [list(f) for f in self.filters]
+        if self.date_field and date_from:
+            filters.append([self.date_field, ">=", date_from])
+        if self.date_field and date_to:
+            filters.append([self.date_field, "<=", date_to])
+        return filters
+
+
+REPORT_DATASETS: Dict[str, ReportDataset] = {
+    "sales": ReportDataset(
+        "Sales Invoice",
+        ["name", "posting_date", "customer", "net_total", "total_taxes_and_charges", "grand_total", "status"],
+        filters=[["docstatus", "=", 1]],
+    ),
+    "inventory": ReportDataset(
+        "Bin",
+        ["name", "item_code", "warehouse", "actual_qty", "projected_qty", "reserved_qty", "valuation_rate", "stock_value"],
+        date_field=None,
+    ),
+    "finance": ReportDataset(
+        "GL Entry",
+        ["name", "posting_date", "account", "debit", "credit", "voucher_type", "voucher_no"],
+        filters=[["is_cancelled", "=", 0]],
+    ),
+    "purchases": ReportDataset(
+        "Purchase Invoice",
+        ["name", "posting_date", "supplier", "grand_total", "status"],
+        filters=[["docstatus", "=", 1]],
+    ),
+    "customers": ReportDataset(
+        "Customer",
+        ["name", "customer_name", "customer_group", "territory"],
+        date_field=None,
+    ),
+    "employees": ReportDataset(
+        "Employee",
+        ["name", "employee_name", "department", "designation"],
+        filters=[["status", "=", "Active"]],
+        date_field=None,
+    ),
+}
+
+
+class ReportQuery:
+    """Aggregate and keyset-paged list queries against ERPNext"""
+
+    def __init__(self, erpnext_adapter=None, page_size: Optional[int] = None):
+        if erpnext_adapter is None:
+            from app.services.erpnext_client import erpnext_adapter
+        self.erpnext_adapter = erpnext_adapter
+        self.page_size = page_size or settings.REPORT_PAGE_SIZE
+
+    async def aggregate(
+        self,
+        tenant_id: str,
+        doctype: str,
+        fields: List[str],
+        filters: Optional[List[List[Any]]] = None,
+        group_by: Optional[str] = None,
+        order_by: Optional[str] = None,
+        limit: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """
+        Run an aggregate query in ERPNext
+
+        Args:
+            tenant_id: Tenant identifier
+            doctype: ERPNext doctype
+            fields: Plain or aggregate fields, e.g. "sum(grand_total) as total"
+            filters: ERPNext filter list
+            group_by: Field to group by (one row per group)
+            order_by: Ordering, may refer to aggregate aliases
+            limit: Maximum rows (0 = all groups)
+
+        Returns:
+            Result rows
+        """
+        params = {
+            "doctype": doctype,
+            "fields": json.dumps(fields),
+            "filters": json.dumps(filters or []),
+            "limit_page_length": limit,
+        }
+        if group_by:
+            params["group_by"] = group_by
+        if order_by:
+            params["order_by"] = order_by
+
+        response = await self.erpnext_adapter.aproxy_request(
+            tenant_id=tenant_id,
+            path="method/frappe.client.get_list",
+            method="GET",
+            params=params,
+        )
+        rows = response.get("data") if isinstance(response, dict) else None
+        return rows if isinstance(rows, list) else []
+
+    async def totals(
+        self, tenant_id: str, doctype: str, fields: List[str], filters: Optional[List[List[Any]]] = None
+    ) -> Dict[str, Any]:
+        """Single-row aggregate (no grouping); missing sums come back as 0"""
+        rows = await self.aggregate(tenant_id, doctype, fields, filters, limit=1)
+        row = rows[0] if rows else {}
+        return {key: value or 0 for key, value in row.items()}
+
+    async def iter_pages(
+        self,
+        tenant_id: str,
+        doctype: str,
+        fields: List[str],
+        filters: Optional[List[List[Any]]] = None,
+        page_size: Optional[int] = None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yield pages of rows ordered by name, using the last name seen as the cursor
+
+        `fields` must include "name".
+        """
+        page_size = page_size or self.page_size
+        last_name = None
+        while True:
+            page_filters = list(filters or [])
+            if last_name is not None:
+                page_filters.append(["name", ">", last_name])
+
+            response = await self.erpnext_adapter.aproxy_request(
+                tenant_id=tenant_id,
+                path=f"resource/{doctype}",
+                method="GET",
+                params={
+                    "filters": json.dumps(page_filters),
+                    "fields": json.dumps(fields),
+                    "order_by": "name asc",
+                    "limit_page_length": page_size,
+                },
+            )
+            rows = response.get("data", []) if isinstance(response, dict) else []
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            last_name = rows[-1]["name"]
+
+    async def stream_dataset(
+        self,
+        tenant_id: str,
+        report_type: str,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        format: str = "csv",
+    ) -> AsyncIterator[str]:
+        """Encode a report dataset as CSV or a JSON array, one chunk per page"""
+        dataset = REPORT_DATASETS[report_type]
+        pages = self.iter_pages(tenant_id, dataset.doctype, dataset.fields, dataset.build_filters(date_from, date_to))
+        async for chunk in encode_pages(pages, dataset.fields, format):
+            yield chunk
+
+
+async def encode_pages(
+    pages: AsyncIterator[List[Dict[str, Any]]], fields: List[str], format: str
+) -> AsyncIterator[str]:
+    """Encode row pages as CSV (with header) or as a single JSON array"""
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        yield buffer.getvalue()
+        async for rows in pages:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
+        return
+
+    first = True
+    yield "["
+    async for rows in pages:
+        body = ",".join(json.dumps(row, default=str) for row in rows)
+        yield body if first else "," + body
+        first = False
+    yield "]"
+
+
+def rounded(value: Any) -> float:
+    return round(float(value or 0), 2)
+
+
+report_query = ReportQuery()
@@ -0,0 +1,263 @@
+"""
+Compiled tax rules, cached per tenant for the whole process.
+
+TaxService is built per request and used to resolve templates with two
+queries (TaxType, TaxRate) per template rate. A tenant's tax types, active
+rates, active templates and rounding settings are now loaded together (one
+query each) and compiled into an immutable TaxTable that every request in the
+process shares, so pricing a basket does not touch the database.
+
+Each table carries the tenant's version stamp at load time; invalidation bumps
+the version so a table compiled concurrently with a write is never cached.
+Writes through the tax router invalidate the tenant in this process; other
+workers drop their copy when TAX_RULE_CACHE_TTL expires, which bounds
+cross-process staleness (as with the RBAC permission cache).
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP, ROUND_UP
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.tax import ItemTaxTemplate, TaxRate, TaxSettings, TaxType
+
+
+def _key(value: Any) -> Optional[str]:
+    """Canonical string form of an id (UUIDs lower-cased and hyphenated)"""
+    if value is None or value == "":
+        return None
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return str(value)
+
+
+@dataclass(frozen=True)
+class CompiledTaxType:
+    id: str
+    code: str
+    name: str
+    is_compound: bool
+    is_active: bool
+    output_account_id: Optional[str]
+
+
+@dataclass(frozen=True)
+class CompiledTaxRate:
+    id: str
+    tax_type_id: str
+    rate_percentage: Decimal
+    rate_type: str
+    fixed_amount: Optional[Decimal]
+    is_default: bool
+
+
+@dataclass(frozen=True)
+class TaxRule:
+    """A rate applied to an item, with its tax type and ordering"""
+    tax_type: CompiledTaxType
+    tax_rate: CompiledTaxRate
+    priority: int = 0
+
+    @property
+    def rate_type(self) -> str:
+        return self.tax_rate.rate_type
+
+    @property
+    def fixed_amount(self) -> Optional[Decimal]:
+        return self.tax_rate.fixed_amount
+
+
+@dataclass(frozen=True)
+class TaxTable:
+    """Everything needed to tax a basket for one tenant"""
+    tenant_id: str
+    version: int
+    prices_include_tax: bool
+    rounding_method: str
+    rounding_precision: int
+    default_template_id: Optional[str]
+    # Active templates by id; None means the template has no rates configured
+    templates: Mapping[str, Optional[Tuple[TaxRule, ...]]]
+    default_rules: Tuple[TaxRule, ...]
+
+    def rules_for(self, template_id: Optional[str] = None) -> Tuple[TaxRule, ...]:
+        """Rules for an item: its template, else the tenant's default template, else default rates"""
+        for key in (_key(template_id), self.default_template_id):
+            if key is not None and key in self.templates:
+                rules = self.templates[key]
+                return self.default_rules if rules is None else rules
+        return self.default_rules
+
+    def round(self, amount: Decimal) -> Decimal:
+        precision = Decimal(10) ** -self.rounding_precision
+        if self.rounding_method == "floor":
+            return amount.quantize(precision, rounding=ROUND_DOWN)
+        elif self.rounding_method == "ceil":
+            return amount.quantize(precision, rounding=ROUND_UP)
+        else:  # round
+            return amount.quantize(precision, rounding=ROUND_HALF_UP)
+
+
+def _decimal(value: Any) -> Optional[Decimal]:
+    return None if value is None else Decimal(str(value))
+
+
+def compile_tax_table(
+    tenant_id: str,
+    version: int,
+    tax_settings: Optional[Any],
+    type_rate_rows: Iterable[Tuple[Any, Optional[Any]]],
+    templates: Iterable[Any],
+) -> TaxTable:
+    """
+    Build a TaxTable from loaded rows.
+
+    Args:
+        tax_settings: The tenant's TaxSettings (None for defaults)
+        type_rate_rows: (TaxType, active TaxRate or None) for every tax type
+        templates: Active ItemTaxTemplates
+    """
+    tax_types: Dict[str, CompiledTaxType] = {}
+    tax_rates: Dict[str, CompiledTaxRate] = {}
+    for tax_type, tax_rate in type_rate_rows:
+        type_id = _key(tax_type.id)
+        if type_id not in tax_types:
+            tax_types[type_id] = CompiledTaxType(
+                id=type_id,
+                code=tax_type.code,
+                name=tax_type.name,
+                is_compound=bool(tax_type.is_compound),
+                is_active=tax_type.is_active is not False,
+                output_account_id=tax_type.output_account_id,
+            )
+        if tax_rate is not None:
+            tax_rates[_key(tax_rate.id)] = CompiledTaxRate(
+                id=_key(tax_rate.id),
+                tax_type_id=type_id,
+                rate_percentage=_decimal(tax_rate.rate_percentage),
+                rate_type=tax_rate.rate_type or "percentage",
+                fixed_amount=_decimal(tax_rate.fixed_amount),
+                is_default=bool(tax_rate.is_default),
+            )
+
+    compiled_templates: Dict[str, Optional[Tuple[TaxRule, ...]]] = {}
+    for template in templates:
+        if not template.tax_rates:
+            compiled_templates[_key(template.id)] = None
+            continue
+        rules = []
+        for rate_config in template.tax_rates:
+            tax_type = tax_types.get(_key(rate_config.get("tax_type_id")))
+            tax_rate = tax_rates.get(_key(rate_config.get("tax_rate_id")))
+            if tax_type and tax_rate:
+                rules.append(TaxRule(tax_type, tax_rate, rate_config.get("priority", 0)))
+        compiled_templates[_key(template.id)] = tuple(sorted(rules, key=lambda rule: rule.priority))
+
+    default_rules = tuple(
+        TaxRule(tax_types[rate.tax_type_id], rate)
+        for rate in tax_rates.values()
+        if rate.is_default and tax_types[rate.tax_type_id].is_active
+    )
+
+    def setting(name: str, default: Any) -> Any:
+        value = getattr(tax_settings, name, None)
+        return default if value is None else value
+
+    return TaxTable(
+        tenant_id=str(tenant_id),
+        version=version,
+        prices_include_tax=bool(setting("prices_include_tax", True)),
+        rounding_method=setting("tax_rounding_method", "round"),
+        rounding_precision=int(setting("tax_rounding_precision", 2)),
+        default_template_id=_key(getattr(tax_settings, "default_item_tax_template_id", None)),
+        templates=MappingProxyType(compiled_templates),
+        default_rules=default_rules,
+    )
+
+
+def load_tax_table(db: Session, tenant_id: str, version: int) -> TaxTable:
+    """Load and compile a tenant's tax configuration"""
+    type_rate_rows = db.query(TaxType, TaxRate).outerjoin(
+        TaxRate,
+        and_(
+            TaxRate.tax_type_id == TaxType.id,
+            TaxRate.tenant_id == TaxType.tenant_id,
+            TaxRate.is_active == True
+        )
+    ).filter(TaxType.tenant_id == tenant_id).all()
+
+    templates = db.query(ItemTaxTemplate).filter(
+        ItemTaxTemplate.tenant_id == tenant_id,
+        ItemTaxTemplate.is_active == True
+    ).all()
+
+    tax_settings = db.query(TaxSettings).filter(TaxSettings.tenant_id == tenant_id).first()
+
+    return compile_tax_table(tenant_id, version, tax_settings, type_rate_rows, templates)
+
+
+class TaxRuleCache:
+    """In-process LRU of compiled TaxTables, one per tenant"""
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[int] = None, loader=load_tax_table):
+        self.max_size = max_size or settings.TAX_RULE_CACHE_SIZE
+        self.ttl = settings.TAX_RULE_CACHE_TTL if ttl is None else ttl
+        self.loader = loader
+        self._entries: "OrderedDict[str, Tuple[float, TaxTable]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, db: Session, tenant_id) -> TaxTable:
+        """The tenant's compiled table, loading it on a miss"""
+        key = str(tenant_id)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+            version = self._versions.get(key, 0)
+
+        table = self.loader(db, key, version)
+
+        with self._lock:
+            # Skip caching if the rules changed while this table was loading
+            if self._versions.get(key, 0) == version:
+                self._entries[key] = (now + self.ttl, table)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return table
+
+    def invalidate(self, tenant_id) -> None:
+        """Drop a tenant's table after its tax configuration changed"""
+        key = str(tenant_id)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def invalidate_all(self) -> None:
+        with self._lock:
+            for key in self._entries:
+                self._versions[key] = self._versions.get(key, 0) + 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "entries": len(self._entries)}
+
+
+# Singleton instance
+tax_rule_cache = TaxRuleCache()
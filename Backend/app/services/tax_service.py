@@ -7,16 +7,17 @@ Author: MoranERP Team
 """
 
 from typing import Dict, Any, Optional, List, Tuple
-from decimal import Decimal, ROUND_HALF_UP, ROUND_UP, ROUND_DOWN
+from decimal import Decimal
 from datetime import datetime, date
 from dataclasses import dataclass
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_
 
 from ..models.tax import (
-    TaxType, TaxRate, ItemTaxTemplate, TaxTransaction,
+    TaxType, TaxRate, TaxTransaction,
     WithholdingTaxConfig, TaxSettings, TaxFilingPeriod
 )
+from .tax_rule_cache import TaxRule, TaxTable, tax_rule_cache
 
 import logging
 
@@ -53,7 +54,7 @@ class TaxService:
         self.db = db
         self.tenant_id = tenant_id
         self._settings: Optional[TaxSettings] = None
-        self._tax_cache: Dict[str, Any] = {}
+        self._tax_table: Optional[TaxTable] = None
     
     @property
     def settings(self) -> TaxSettings:
@@ -71,6 +72,13 @@ class TaxService:
         
         return self._settings
     
+    @property
+    def tax_table(self) -> TaxTable:
+        """Compiled tax rules for the tenant (pinned for the life of this service)"""
+        if self._tax_table is None:
+            self._tax_table = tax_rule_cache.get(self.db, self.tenant_id)
+        return self._tax_table
+    
     # ==================== TAX CALCULATION ====================
     
     def calculate_item_taxes(
@@ -93,7 +101,7 @@ class TaxService:
             is_purchase: True if this is a purchase (affects tax direction)
             prices_include_tax: Override settings for tax-inclusive pricing
         """
-        include_tax = prices_include_tax if prices_include_tax is not None else self.settings.prices_include_tax
+        include_tax = prices_include_tax if prices_include_tax is not None else self.tax_table.prices_include_tax
         
         # Get applicable tax rates
         tax_rates = self._get_applicable_tax_rates(item_code, item_tax_template_id)
@@ -120,27 +128,25 @@ class TaxService:
         item_code: str,
         base_amount: Decimal,
         quantity: Decimal,
-        tax_rates: List[Dict]
+        tax_rates: Tuple[TaxRule, ...]
     ) -> TaxCalculation:
         """Calculate taxes when prices don't include tax (add tax on top)"""
         taxes = []
         total_tax = Decimal(0)
         
-        # Sort by priority if specified
-        sorted_rates = sorted(tax_rates, key=lambda x: x.get("priority", 0))
-        
         taxable_amount = base_amount
         
-        for rate_info in sorted_rates:
-            tax_type = rate_info["tax_type"]
-            tax_rate = rate_info["tax_rate"]
+        # Rules are compiled in priority order
+        for rule in tax_rates:
+            tax_type = rule.tax_type
+            tax_rate = rule.tax_rate
             
             if tax_type.is_compound:
                 # Compound tax: apply on (base + previous taxes)
                 taxable_amount = base_amount + total_tax
             
-            if rate_info.get("rate_type") == "fixed":
-                tax_amount = rate_info["fixed_amount"] * quantity
+            if rule.rate_type == "fixed":
+                tax_amount = rule.fixed_amount * quantity
             else:
                 tax_amount = taxable_amount * (tax_rate.rate_percentage / 100)
             
@@ -175,16 +181,15 @@ class TaxService:
         item_code: str,
         gross_amount: Decimal,
         quantity: Decimal,
-        tax_rates: List[Dict]
+        tax_rates: Tuple[TaxRule, ...]
     ) -> TaxCalculation:
         """Calculate taxes when prices include tax (extract tax from total)"""
         taxes = []
         
         # Calculate total tax rate
         total_rate = sum(
-            Decimal(str(r["tax_rate"].rate_percentage))
-            for r in tax_rates
-            if r.get("rate_type") != "fixed"
+            (rule.tax_rate.rate_percentage for rule in tax_rates if rule.rate_type != "fixed"),
+            Decimal(0)
         )
         
         # Calculate base amount
@@ -198,15 +203,13 @@ class TaxService:
         base_amount = self._round_tax(base_amount)
         total_tax = gross_amount - base_amount
         
-        # Allocate tax to each type
-        sorted_rates = sorted(tax_rates, key=lambda x: x.get("priority", 0))
-        
-        for rate_info in sorted_rates:
-            tax_type = rate_info["tax_type"]
-            tax_rate = rate_info["tax_rate"]
+        # Allocate tax to each type (rules are compiled in priority order)
+        for rule in tax_rates:
+            tax_type = rule.tax_type
+            tax_rate = rule.tax_rate
             
-            if rate_info.get("rate_type") == "fixed":
-                tax_amount = rate_info["fixed_amount"] * quantity
+            if rule.rate_type == "fixed":
+                tax_amount = rule.fixed_amount * quantity
             else:
                 # Proportional allocation of extracted tax
                 rate_proportion = tax_rate.rate_percentage / total_rate if total_rate > 0 else 0
@@ -245,6 +248,9 @@ class TaxService:
         """
         Calculate taxes for an entire invoice.
         
+        Every line is evaluated against the same compiled tax table, so the
+        basket costs no queries once the tenant's rules are cached.
+        
         Args:
             line_items: List of items with {item_code, amount, quantity, tax_template_id}
             is_purchase: True for purchase invoices
@@ -284,86 +290,13 @@ class TaxService:
         self,
         item_code: str,
         tax_template_id: Optional[str] = None
-    ) -> List[Dict]:
+    ) -> Tuple[TaxRule, ...]:
         """Get applicable tax rates for an item"""
-        
-        # Check cache
-        cache_key = f"{item_code}:{tax_template_id or 'default'}"
-        if cache_key in self._tax_cache:
-            return self._tax_cache[cache_key]
-        
-        result = []
-        
-        # Get template
-        template = None
-        if tax_template_id:
-            template = self.db.query(ItemTaxTemplate).filter(
-                ItemTaxTemplate.id == tax_template_id,
-                ItemTaxTemplate.tenant_id == self.tenant_id,
-                ItemTaxTemplate.is_active == True
-            ).first()
-        
-        if not template and self.settings.default_item_tax_template_id:
-            template = self.db.query(ItemTaxTemplate).filter(
-                ItemTaxTemplate.id == self.settings.default_item_tax_template_id,
-                ItemTaxTemplate.tenant_id == self.tenant_id,
-                ItemTaxTemplate.is_active == True
-            ).first()
-        
-        if template and template.tax_rates:
-            # Use template rates
-            for rate_config in template.tax_rates:
-                tax_type = self.db.query(TaxType).filter(
-                    TaxType.id == rate_config.get("tax_type_id"),
-                    TaxType.tenant_id == self.tenant_id
-                ).first()
-                
-                tax_rate = self.db.query(TaxRate).filter(
-                    TaxRate.id == rate_config.get("tax_rate_id"),
-                    TaxRate.tenant_id == self.tenant_id
-                ).first()
-                
-                if tax_type and tax_rate and tax_rate.is_active:
-                    result.append({
-                        "tax_type": tax_type,
-                        "tax_rate": tax_rate,
-                        "priority": rate_config.get("priority", 0),
-                        "rate_type": tax_rate.rate_type,
-                        "fixed_amount": tax_rate.fixed_amount,
-                    })
-        else:
-            # Use default rates
-            default_rates = self.db.query(TaxRate).filter(
-                TaxRate.tenant_id == self.tenant_id,
-                TaxRate.is_default == True,
-                TaxRate.is_active == True
-            ).all()
-            
-            for rate in default_rates:
-                tax_type = rate.tax_type
-                if tax_type and tax_type.is_active:
-                    result.append({
-                        "tax_type": tax_type,
-                        "tax_rate": rate,
-                        "priority": 0,
-                        "rate_type": rate.rate_type,
-                        "fixed_amount": rate.fixed_amount,
-                    })
-        
-        self._tax_cache[cache_key] = result
-        return result
+        return self.tax_table.rules_for(tax_template_id)
     
     def _round_tax(self, amount: Decimal) -> Decimal:
         """Round tax amount according to settings"""
-        precision = Decimal(10) ** -self.settings.tax_rounding_precision
-        method = self.settings.tax_rounding_method
-        
-        if method == "floor":
-            return amount.quantize(precision, rounding=ROUND_DOWN)
-        elif method == "ceil":
-            return amount.quantize(precision, rounding=ROUND_UP)
-        else:  # round
-            return amount.quantize(precision, rounding=ROUND_HALF_UP)
+        return self.tax_table.round(amount)
     
     # ==================== WITHHOLDING TAX ====================
     
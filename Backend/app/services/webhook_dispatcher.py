@@ -0,0 +1,560 @@
+"""
+Webhook Dispatcher
+Shared delivery engine for outgoing webhooks.
+
+The POS WebhookService and the plugin WebhookManager keep their own
+registration APIs and payload formats, and hand every delivery to this
+dispatcher as a WebhookJob:
+
+- One pooled httpx.AsyncClient per destination host
+  (WEBHOOK_HOST_MAX_CONNECTIONS), and at most WEBHOOK_MAX_CONCURRENCY
+  requests in flight overall.
+- A bounded queue (WEBHOOK_ENDPOINT_QUEUE_SIZE), worker and circuit breaker
+  per endpoint, so a slow or failing subscriber only delays its own
+  deliveries. The breaker opens after WEBHOOK_CIRCUIT_FAILURE_THRESHOLD
+  consecutive failures and defers deliveries for WEBHOOK_CIRCUIT_COOLDOWN
+  seconds.
+- Endpoints with batch_size > 1 have queued events coalesced into a single
+  request of up to batch_size events, waiting at most batch_window seconds
+  for a batch to fill.
+- Failed attempts are retried with jittered exponential backoff from the
+  `webhook_retries` sorted set (in memory without Redis), so pending
+  retries survive restarts.
+- The last WEBHOOK_HISTORY_SIZE attempts per endpoint are kept in a capped
+  list (`webhook_history:{endpoint_id}` in Redis, plus an in-process copy).
+
+Every request body is signed with the endpoint secret as an HMAC-SHA256 hex
+digest in the X-Webhook-Signature header.
+"""
+import asyncio
+import hashlib
+import heapq
+import hmac
+import itertools
+import json
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field, asdict, replace
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from uuid import uuid4
+
+import httpx
+from prometheus_client import Counter
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_RETRY_KEY = "webhook_retries"
+WEBHOOK_HISTORY_KEY = "webhook_history:{endpoint_id}"
+
+WEBHOOK_DELIVERIES = Counter(
+    "webhook_deliveries_total",
+    "Webhook delivery attempts by outcome (delivered, retrying, failed, deferred, dropped)",
+    ["outcome"],
+)
+WEBHOOK_REQUESTS = Counter(
+    "webhook_requests_total",
+    "Webhook HTTP requests by kind (single, batch)",
+    ["kind"],
+)
+
+
+def sign_payload(secret: str, body: str) -> str:
+    """HMAC-SHA256 hex digest of a request body"""
+    return hmac.new(secret.encode(), body.encode(), hashlib.sha256).hexdigest()
+
+
+@dataclass
+class WebhookEndpoint:
+    """Delivery settings for one subscriber URL"""
+    id: str
+    url: str
+    secret: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    timeout: float = 30.0
+    max_attempts: int = 3
+    retry_delay: float = 60.0
+    backoff_factor: float = 2.0
+    batch_size: int = 1
+    batch_window: float = 1.0
+
+
+@dataclass
+class WebhookJob:
+    """One event on its way to one endpoint (timestamps are epoch seconds)"""
+    endpoint_id: str
+    event: str
+    payload: Dict[str, Any]
+    tenant_id: Optional[str] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+    id: str = field(default_factory=lambda: str(uuid4()))
+    attempt: int = 1
+    status: str = "pending"  # pending, delivered, retrying, failed
+    response_code: Optional[int] = None
+    response_body: Optional[str] = None
+    response_time_ms: Optional[int] = None
+    error_message: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    delivered_at: Optional[float] = None
+    next_retry_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'WebhookJob':
+        return cls(**data)
+
+
+class _CircuitBreaker:
+    """Consecutive-failure circuit breaker for one webhook endpoint"""
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        """Closed, or open long enough that a probe request may go through"""
+        return self.opened_at is None or self.retry_after() <= 0
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return self.opened_at + self.cooldown - time.monotonic()
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class WebhookDispatcher:
+    """Queues, sends, retries and records webhook jobs for every registered endpoint"""
+
+    def __init__(self, redis_client=None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.redis = redis_client
+        self.transport = transport
+        self.endpoints: Dict[str, WebhookEndpoint] = {}
+        # (scheme, host, port) -> pooled client
+        self._clients: Dict[Tuple[str, str, int], httpx.AsyncClient] = {}
+        self._send_slots = asyncio.Semaphore(settings.WEBHOOK_MAX_CONCURRENCY)
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._breakers: Dict[str, _CircuitBreaker] = {}
+        self._history: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._listeners: List[Callable[[WebhookJob], Awaitable[None]]] = []
+        self._local_retries: List[Tuple[float, int, WebhookJob]] = []
+        self._retry_sequence = itertools.count()
+        self._poller_task: Optional[asyncio.Task] = None
+
+    # ==================== Endpoints ====================
+
+    def register_endpoint(self, endpoint: WebhookEndpoint):
+        """Add or replace an endpoint"""
+        self.endpoints[endpoint.id] = endpoint
+
+    def remove_endpoint(self, endpoint_id: str):
+        """Forget an endpoint; jobs still queued for it are discarded"""
+        self.endpoints.pop(endpoint_id, None)
+        self._breakers.pop(endpoint_id, None)
+        self._queues.pop(endpoint_id, None)
+        task = self._workers.pop(endpoint_id, None)
+        if task:
+            task.cancel()
+
+    def add_listener(self, listener: Callable[[WebhookJob], Awaitable[None]]):
+        """Call `listener` with each job after every delivery attempt"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[WebhookJob], Awaitable[None]]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def is_circuit_open(self, endpoint_id: str) -> bool:
+        breaker = self._breakers.get(endpoint_id)
+        return bool(breaker and breaker.is_open)
+
+    def queued(self, endpoint_id: str) -> int:
+        queue = self._queues.get(endpoint_id)
+        return queue.qsize() if queue else 0
+
+    def client_for(self, url: str) -> httpx.AsyncClient:
+        """Pooled client for the URL's host, created on first use"""
+        parts = urlsplit(url)
+        default_port = 443 if parts.scheme == "https" else 80
+        key = (parts.scheme, parts.hostname or "", parts.port or default_port)
+
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=30.0,
+                limits=httpx.Limits(
+                    max_connections=settings.WEBHOOK_HOST_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.WEBHOOK_HOST_MAX_CONNECTIONS
+                ),
+                transport=self.transport
+            )
+            self._clients[key] = client
+        return client
+
+    # ==================== Queueing ====================
+
+    async def submit(self, job: WebhookJob) -> asyncio.Future:
+        """
+        Queue a job on its endpoint
+
+        Returns:
+            Future resolving to a snapshot of the job after its first attempt
+            (or once it is deferred or dropped)
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[job.id] = future
+        await self._enqueue(job)
+        return future
+
+    async def _enqueue(self, job: WebhookJob) -> bool:
+        if job.endpoint_id not in self.endpoints:
+            logger.warning(f"Webhook endpoint {job.endpoint_id} not registered, dropping job {job.id}")
+            job.status = 'failed'
+            job.error_message = 'Endpoint not registered'
+            self._resolve(job)
+            return False
+
+        queue = self._queues.get(job.endpoint_id)
+        if queue is None:
+            queue = asyncio.Queue(settings.WEBHOOK_ENDPOINT_QUEUE_SIZE)
+            self._queues[job.endpoint_id] = queue
+
+        try:
+            queue.put_nowait(job)
+        except asyncio.QueueFull:
+            job.status = 'failed'
+            job.error_message = 'Endpoint delivery queue full'
+            WEBHOOK_DELIVERIES.labels(outcome="dropped").inc()
+            logger.error(f"Webhook job {job.id} dropped: queue for {job.endpoint_id} is full")
+            await self._finish(job)
+            return False
+
+        worker = self._workers.get(job.endpoint_id)
+        if worker is None or worker.done():
+            self._workers[job.endpoint_id] = asyncio.create_task(self._endpoint_worker(job.endpoint_id))
+        return True
+
+    async def _endpoint_worker(self, endpoint_id: str):
+        """Deliver one endpoint's queue in order"""
+        queue = self._queues[endpoint_id]
+
+        while True:
+            jobs = [await queue.get()]
+            try:
+                endpoint = self.endpoints.get(endpoint_id)
+                if endpoint and endpoint.batch_size > 1:
+                    await self._fill_batch(queue, jobs, endpoint)
+                await self._deliver(endpoint, jobs)
+            except Exception as e:
+                logger.error(f"Error delivering webhooks to {endpoint_id}: {e}")
+            finally:
+                for _ in jobs:
+                    queue.task_done()
+
+    async def _fill_batch(self, queue: asyncio.Queue, jobs: List[WebhookJob], endpoint: WebhookEndpoint):
+        """Take up to batch_size jobs, waiting at most batch_window for more to arrive"""
+        deadline = time.monotonic() + endpoint.batch_window
+        while len(jobs) < endpoint.batch_size:
+            try:
+                jobs.append(queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                jobs.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    # ==================== Delivery ====================
+
+    def _breaker(self, endpoint_id: str) -> _CircuitBreaker:
+        breaker = self._breakers.get(endpoint_id)
+        if breaker is None:
+            breaker = _CircuitBreaker(
+                settings.WEBHOOK_CIRCUIT_FAILURE_THRESHOLD,
+                settings.WEBHOOK_CIRCUIT_COOLDOWN
+            )
+            self._breakers[endpoint_id] = breaker
+        return breaker
+
+    def _render(self, endpoint: WebhookEndpoint, jobs: List[WebhookJob]) -> Tuple[str, Dict[str, str]]:
+        """Request body and headers for a single job or a batch"""
+        payloads = [
+            {**job.payload, 'attempt': job.attempt} if 'attempt' in job.payload else job.payload
+            for job in jobs
+        ]
+        if len(jobs) == 1:
+            job = jobs[0]
+            body = json.dumps(payloads[0], default=str)
+            event, delivery_id, job_headers = job.event, job.id, job.headers
+        else:
+            body = json.dumps({'batch': True, 'count': len(jobs), 'events': payloads}, default=str)
+            event, delivery_id, job_headers = 'batch', ','.join(job.id for job in jobs), {}
+
+        headers = {
+            'Content-Type': 'application/json',
+            'User-Agent': 'MoranERP-Webhook/1.0',
+            **endpoint.headers,
+            **job_headers,
+            'X-Webhook-ID': endpoint.id,
+            'X-Webhook-Event': event,
+            'X-Webhook-Delivery': delivery_id,
+            'X-Webhook-Attempt': str(max(job.attempt for job in jobs)),
+            'X-Webhook-Timestamp': str(int(time.time())),
+            'X-Webhook-Signature': sign_payload(endpoint.secret, body)
+        }
+        return body, headers
+
+    async def _deliver(self, endpoint: Optional[WebhookEndpoint], jobs: List[WebhookJob]):
+        if endpoint is None:
+            for job in jobs:
+                job.status = 'failed'
+                job.error_message = 'Endpoint not registered'
+                self._resolve(job)
+            return
+
+        breaker = self._breaker(endpoint.id)
+        if not breaker.allow():
+            # Circuit open: hold the jobs until the endpoint may be probed again
+            for job in jobs:
+                job.status = 'retrying'
+                job.error_message = 'Circuit open'
+                WEBHOOK_DELIVERIES.labels(outcome="deferred").inc()
+                await self._schedule_retry(job, breaker.retry_after())
+                self._resolve(job)
+            return
+
+        body, headers = self._render(endpoint, jobs)
+        WEBHOOK_REQUESTS.labels(kind="batch" if len(jobs) > 1 else "single").inc()
+
+        response = None
+        error = None
+        started = time.perf_counter()
+        try:
+            async with self._send_slots:
+                response = await self.client_for(endpoint.url).post(
+                    endpoint.url,
+                    content=body,
+                    headers=headers,
+                    timeout=endpoint.timeout
+                )
+            if not 200 <= response.status_code < 300:
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+        except httpx.TimeoutException:
+            error = "Request timeout"
+        except httpx.RequestError as e:
+            error = f"Request error: {str(e)}"
+        except Exception as e:
+            error = f"Unexpected error: {str(e)}"
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+
+        if error is None:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+        for job in jobs:
+            job.response_time_ms = elapsed_ms
+            if response is not None:
+                job.response_code = response.status_code
+                job.response_body = response.text[:1000]  # Limit stored response
+                job.delivered_at = time.time()
+
+            if error is None:
+                job.status = 'delivered'
+                job.error_message = None
+                job.next_retry_at = None
+                WEBHOOK_DELIVERIES.labels(outcome="delivered").inc()
+                logger.info(f"Webhook job {job.id} delivered to {endpoint.id} (status: {response.status_code})")
+                await self._finish(job)
+            elif job.attempt < endpoint.max_attempts:
+                # Exponential backoff with jitter so failed bursts don't retry in lockstep
+                retry_delay = endpoint.retry_delay * (endpoint.backoff_factor ** (job.attempt - 1))
+                retry_delay = random.uniform(retry_delay / 2, retry_delay)
+
+                job.status = 'retrying'
+                job.error_message = error
+                job.next_retry_at = time.time() + retry_delay
+                WEBHOOK_DELIVERIES.labels(outcome="retrying").inc()
+                logger.warning(f"Webhook job {job.id} failed ({error}), retrying in {retry_delay:.1f}s (attempt {job.attempt + 1})")
+                await self._finish(job)
+                await self._schedule_retry(replace(job, attempt=job.attempt + 1, status='pending'), retry_delay)
+            else:
+                job.status = 'failed'
+                job.error_message = error
+                job.next_retry_at = None
+                WEBHOOK_DELIVERIES.labels(outcome="failed").inc()
+                logger.error(f"Webhook job {job.id} failed permanently after {job.attempt} attempts: {error}")
+                await self._finish(job)
+
+    async def _finish(self, job: WebhookJob):
+        """Record an attempt, notify listeners and release anyone waiting on the job"""
+        await self._record(job)
+        for listener in self._listeners:
+            try:
+                await listener(job)
+            except Exception as e:
+                logger.warning(f"Webhook listener failed for job {job.id}: {e}")
+        self._resolve(job)
+
+    def _resolve(self, job: WebhookJob):
+        future = self._waiters.pop(job.id, None)
+        if future and not future.done():
+            future.set_result(replace(job))
+
+    # ==================== Retries ====================
+
+    async def _schedule_retry(self, job: WebhookJob, delay: float):
+        """Park a job until it is due, in Redis when available so it survives restarts"""
+        delay = max(delay, 0.0)
+        due = time.time() + delay
+
+        if self.redis:
+            try:
+                await self.redis.zadd(WEBHOOK_RETRY_KEY, {json.dumps(job.to_dict()): due})
+                return
+            except Exception as e:
+                logger.warning(f"Failed to persist retry for webhook job {job.id}, keeping it in memory: {e}")
+
+        heapq.heappush(self._local_retries, (due, next(self._retry_sequence), job))
+
+    async def _requeue_due_retries(self):
+        """Move retries whose backoff has elapsed back onto their endpoint queues"""
+        now = time.time()
+        while self._local_retries and self._local_retries[0][0] <= now:
+            _, _, job = heapq.heappop(self._local_retries)
+            await self._enqueue(job)
+
+        if not self.redis:
+            return
+
+        # Retries for endpoints registered on other processes are left in the set
+        # for those processes; `skipped` pages past them
+        skipped = 0
+        while True:
+            members = await self.redis.zrangebyscore(WEBHOOK_RETRY_KEY, "-inf", now, start=skipped, num=100)
+            for member in members:
+                try:
+                    job = WebhookJob.from_dict(json.loads(member))
+                except Exception as e:
+                    if await self.redis.zrem(WEBHOOK_RETRY_KEY, member):
+                        logger.warning(f"Discarding unreadable webhook retry: {e}")
+                    continue
+                if job.endpoint_id not in self.endpoints:
+                    skipped += 1
+                    continue
+                # ZREM decides ownership when several processes poll the same set
+                if await self.redis.zrem(WEBHOOK_RETRY_KEY, member):
+                    await self._enqueue(job)
+            if len(members) < 100:
+                break
+
+    async def _poll_retries(self):
+        while True:
+            try:
+                await self._requeue_due_retries()
+            except Exception as e:
+                logger.error(f"Error requeueing webhook retries: {e}")
+            await asyncio.sleep(settings.WEBHOOK_RETRY_POLL_INTERVAL)
+
+    # ==================== History ====================
+
+    async def _record(self, job: WebhookJob):
+        entry = job.to_dict()
+        history = self._history.get(job.endpoint_id)
+        if history is None:
+            history = deque(maxlen=settings.WEBHOOK_HISTORY_SIZE)
+            self._history[job.endpoint_id] = history
+        history.appendleft(entry)
+
+        if not self.redis:
+            return
+
+        try:
+            key = WEBHOOK_HISTORY_KEY.format(endpoint_id=job.endpoint_id)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.lpush(key, json.dumps(entry))
+            pipe.ltrim(key, 0, settings.WEBHOOK_HISTORY_SIZE - 1)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record webhook job {job.id}: {e}")
+
+    def recent(self, endpoint_id: str, limit: Optional[int] = None) -> List[WebhookJob]:
+        """Attempts recorded by this process, newest first"""
+        entries = list(self._history.get(endpoint_id, ()))[:limit]
+        return [WebhookJob.from_dict(dict(entry)) for entry in entries]
+
+    async def get_history(self, endpoint_id: str, limit: int = 50) -> List[WebhookJob]:
+        """Attempts for an endpoint across processes (from Redis when available), newest first"""
+        if self.redis:
+            try:
+                key = WEBHOOK_HISTORY_KEY.format(endpoint_id=endpoint_id)
+                entries = await self.redis.lrange(key, 0, limit - 1)
+                return [WebhookJob.from_dict(json.loads(entry)) for entry in entries]
+            except Exception as e:
+                logger.warning(f"Failed to read webhook history for {endpoint_id}: {e}")
+        return self.recent(endpoint_id, limit)
+
+    def find(self, job_id: str) -> Optional[WebhookJob]:
+        """Latest recorded attempt of a job in this process"""
+        for history in self._history.values():
+            for entry in history:
+                if entry['id'] == job_id:
+                    return WebhookJob.from_dict(dict(entry))
+        return None
+
+    # ==================== Lifecycle ====================
+
+    async def start(self):
+        """Start the retry poller"""
+        if self._poller_task is None:
+            self._poller_task = asyncio.create_task(self._poll_retries())
+            logger.info("Webhook dispatcher started")
+
+    async def shutdown(self):
+        """Drain endpoint queues, stop workers and close pooled clients"""
+        if self._poller_task:
+            # Parked retries stay in Redis for the next start
+            self._poller_task.cancel()
+            await asyncio.gather(self._poller_task, return_exceptions=True)
+            self._poller_task = None
+
+        await asyncio.gather(*(queue.join() for queue in self._queues.values()))
+
+        for task in self._workers.values():
+            task.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        self._workers.clear()
+
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+
+# Global dispatcher shared by every webhook API
+webhook_dispatcher = WebhookDispatcher()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark: KEYS-pattern invalidation vs tag-set invalidation.
+
+Fills Redis with `--keys` POS cache entries spread over `--tenants` tenants
+(registered in tag sets via POSCacheService.set_tagged), then invalidates
+one tenant's profile entries both ways:
+
+- keys: the previous `redis.keys("pos:profile:{tenant}:*")` + DEL
+        (scans the whole keyspace; Redis is blocked for other clients meanwhile)
+- tags: `POSCacheService.invalidate_tags(tenant, "profile")`
+
+Uses a dedicated logical DB by default so it never touches live cache data.
+
+Usage (from Backend/):
+    python scripts/benchmark_cache_invalidation.py --keys 100000 --tenants 100 --redis-url redis://localhost:6379/15
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from redis.asyncio import Redis  # noqa: E402
+
+from app.services.cache.pos_cache import POSCacheService  # noqa: E402
+
+
+async def populate(cache: POSCacheService, total: int, tenants: int):
+    per_tenant = total // tenants
+    for t in range(tenants):
+        tenant_id = f"bench-{t}"
+        for i in range(per_tenant):
+            profile_id = f"P{i % 10}"
+            await cache.set_tagged(
+                f"pos:profile:{tenant_id}:{profile_id}:{i}", 3600, "{}", tenant_id,
+                tags=["profile", f"profile:{profile_id}"]
+            )
+
+
+async def time_keys_invalidation(redis, tenant_id: str) -> float:
+    started = time.perf_counter()
+    keys = await redis.keys(f"pos:profile:{tenant_id}:*")
+    if keys:
+        await redis.delete(*keys)
+    return time.perf_counter() - started
+
+
+async def time_tag_invalidation(cache: POSCacheService, tenant_id: str) -> float:
+    started = time.perf_counter()
+    await cache.invalidate_tags(tenant_id, "profile")
+    return time.perf_counter() - started
+
+
+async def run(redis, args):
+    cache = POSCacheService(redis)
+    await redis.flushdb()
+    print(f"populating {args.keys} keys across {args.tenants} tenants ...")
+    await populate(cache, args.keys, args.tenants)
+    print(f"dbsize: {await redis.dbsize()}")
+
+    keys_times, tag_times = [], []
+    for t in range(args.rounds):
+        keys_times.append(await time_keys_invalidation(redis, f"bench-{2 * t}"))
+        tag_times.append(await time_tag_invalidation(cache, f"bench-{2 * t + 1}"))
+
+    for label, times in (("KEYS + DEL", keys_times), ("tag sets", tag_times)):
+        print(f"  {label:<11} avg {sum(times) / len(times) * 1000:8.2f} ms   max {max(times) * 1000:8.2f} ms")
+
+    await redis.flushdb()
+
+
+async def main(args):
+    redis = Redis.from_url(args.redis_url, decode_responses=True)
+    try:
+        await run(redis, args)
+    finally:
+        await redis.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=100000)
+    parser.add_argument("--tenants", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15", help="FLUSHDB is run on this database")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the ERPNext transports.
+
+Starts a stub ERPNext server that answers every resource call after a fixed
+latency, then issues N concurrent requests from inside one event loop:
+
+- sync:  await-less `erpnext_adapter.proxy_request` calls from async handlers
+         (the old pattern - each call blocks the loop)
+- async: `await erpnext_adapter.aproxy_request` over the pooled httpx client
+
+Usage (from Backend/):
+    python scripts/benchmark_erpnext_transport.py --requests 200 --concurrency 50 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+
+def build_stub_app(latency: float) -> FastAPI:
+    stub = FastAPI()
+
+    @stub.post("/api/method/login")
+    async def login():
+        response = JSONResponse({"message": "Logged In"})
+        response.set_cookie("sid", "bench")
+        return response
+
+    @stub.get("/api/resource/{doctype}")
+    async def resource(doctype: str):
+        await asyncio.sleep(latency)
+        return {"data": [{"name": f"{doctype}-1"}]}
+
+    return stub
+
+
+def start_stub_server(latency: float) -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    config = uvicorn.Config(build_stub_app(latency), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def run_sync_transport(adapter, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def handler():
+        async with semaphore:
+            adapter.proxy_request("bench-site", "resource/Item")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handler() for _ in range(total)))
+    return time.perf_counter() - started
+
+
+async def run_async_transport(adapter, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def handler():
+        async with semaphore:
+            await adapter.aproxy_request("bench-site", "resource/Item")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handler() for _ in range(total)))
+    return time.perf_counter() - started
+
+
+async def main(args):
+    from app.services.erpnext_client import ERPNextClientAdapter
+
+    base_url = start_stub_server(args.latency)
+    adapter = ERPNextClientAdapter()
+    adapter.base_url = base_url
+
+    # Warm both transports so login and connection setup aren't measured
+    adapter.proxy_request("bench-site", "resource/Item")
+    await adapter.aproxy_request("bench-site", "resource/Item")
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, upstream latency {args.latency * 1000:.0f} ms")
+    for label, runner in (("sync proxy_request", run_sync_transport), ("async aproxy_request", run_async_transport)):
+        elapsed = await runner(adapter, args.requests, args.concurrency)
+        print(f"  {label:<22} {elapsed:7.2f} s  {args.requests / elapsed:8.1f} req/s")
+
+    stats = adapter.session_stats()
+    print(f"  logins per 1,000 requests: {stats['logins_per_1000_requests']} ({stats['auth_mode']} auth)")
+
+    await adapter.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub ERPNext latency in seconds")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Permission-check throughput benchmark for RBACService.has_permission.
+
+Compares:
+- uncached: resolve the permission set, then `check_permission_match`
+            (what every guarded request did before the permission cache)
+- cached:   `rbac_service.has_permission` served from the in-process LRU
+
+By default the database is simulated: resolving a permission set sleeps
+`--resolve-ms` and returns `--permissions` codes (owners get the whole
+permission table). Pass `--user-id` (and `--tenant-id`) to resolve against
+the configured database instead.
+
+Usage (from Backend/):
+    python scripts/benchmark_permission_checks.py --checks 20000 --permissions 400
+    python scripts/benchmark_permission_checks.py --user-id <uuid> --tenant-id <uuid>
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+MODULES = ["crm", "pos", "inventory", "accounting", "hr", "iam", "reports", "sales"]
+RESOURCES = ["leads", "items", "invoices", "profiles", "users", "roles", "stock", "payments"]
+ACTIONS = ["view", "create", "edit", "delete", "approve"]
+
+
+def build_permission_set(size: int):
+    codes = [f"{m}:{r}:{a}" for m in MODULES for r in RESOURCES for a in ACTIONS]
+    random.shuffle(codes)
+    codes = codes[:size]
+    # A handful of wildcard grants, as seeded roles use
+    codes += ["reports:*:view", "crm:leads:*", "pos:*:*"]
+    return codes
+
+
+def run(label, fn, checks, required):
+    started = time.perf_counter()
+    for i in range(checks):
+        fn(required[i % len(required)])
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<10} {elapsed:7.3f} s  {checks / elapsed:12,.0f} checks/s")
+
+
+def main(args):
+    from app.services.rbac_service import rbac_service
+    from app.services.permission_cache import permission_cache
+
+    required = [f"{random.choice(MODULES)}:{random.choice(RESOURCES)}:{random.choice(ACTIONS)}" for _ in range(256)]
+
+    if args.user_id:
+        from app.database import SessionLocal
+        db = SessionLocal()
+        user_id = uuid.UUID(args.user_id)
+        tenant_id = uuid.UUID(args.tenant_id) if args.tenant_id else None
+        resolve = lambda: rbac_service._resolve_permission_codes(db, user_id, tenant_id)
+        patcher = None
+    else:
+        db = None
+        user_id, tenant_id = uuid.uuid4(), uuid.uuid4()
+        codes = build_permission_set(args.permissions)
+
+        def resolve():
+            time.sleep(args.resolve_ms / 1000)
+            return list(codes)
+
+        patcher = patch.object(rbac_service, "_resolve_permission_codes", lambda *a: resolve())
+        patcher.start()
+
+    uncached_checks = max(1, args.checks // 100) if args.resolve_ms or args.user_id else args.checks
+    print(f"{len(resolve())} effective permissions, {args.checks} checks")
+    run("uncached", lambda perm: rbac_service.check_permission_match(resolve(), perm), uncached_checks, required)
+
+    permission_cache.invalidate(user_id, tenant_id)
+    run("cached", lambda perm: rbac_service.has_permission(db, user_id, tenant_id, perm), args.checks, required)
+    print(f"  cache stats: {permission_cache.stats()}")
+
+    if patcher:
+        patcher.stop()
+    if db is not None:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checks", type=int, default=20000)
+    parser.add_argument("--permissions", type=int, default=300, help="simulated effective permission count")
+    parser.add_argument("--resolve-ms", type=float, default=3.0, help="simulated database cost of resolving permissions")
+    parser.add_argument("--user-id", help="resolve a real user against the configured database")
+    parser.add_argument("--tenant-id")
+    main(parser.parse_args())
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: compiled PermissionMatcher vs the fnmatch loop.
+
+For effective permission sets of increasing size (owners get the whole
+permission table), times:
+- legacy:   the previous `check_permission_match` (fnmatch per wildcard, per check)
+- compiled: `PermissionMatcher.matches` (exact set + segment trie)
+- build:    one-off cost of compiling the set
+
+Usage (from Backend/):
+    python scripts/benchmark_permission_matcher.py --sizes 50 300 1000 --wildcard-ratio 0.2
+"""
+import argparse
+import fnmatch
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.permission_matcher import PermissionMatcher  # noqa: E402
+
+
+def legacy_check_permission_match(user_permissions, required):
+    for user_perm in user_permissions:
+        if user_perm == required:
+            return True
+        if '*' in user_perm:
+            if fnmatch.fnmatch(required, user_perm):
+                return True
+    return False
+
+
+def build_codes(size: int, wildcard_ratio: float):
+    codes = set()
+    while len(codes) < size:
+        module, resource, action = f"m{random.randrange(40)}", f"r{random.randrange(60)}", f"a{random.randrange(8)}"
+        if random.random() < wildcard_ratio:
+            resource, action = random.choice([("*", action), (resource, "*")])
+        codes.add(f"{module}:{resource}:{action}")
+    return list(codes)
+
+
+def main(args):
+    random.seed(7)
+    print(f"{'set size':>8}  {'legacy us/check':>16}  {'compiled us/check':>18}  {'speedup':>8}  {'build ms':>9}")
+    for size in args.sizes:
+        codes = build_codes(size, args.wildcard_ratio)
+        # Mix of granted and denied lookups; denied ones are the legacy worst case
+        required = [f"m{random.randrange(40)}:r{random.randrange(60)}:a{random.randrange(8)}" for _ in range(200)]
+
+        matcher = PermissionMatcher(codes)
+        assert all(matcher.matches(r) == legacy_check_permission_match(codes, r) for r in required)
+
+        legacy = timeit.timeit(lambda: [legacy_check_permission_match(codes, r) for r in required], number=args.rounds)
+        compiled = timeit.timeit(lambda: [matcher.matches(r) for r in required], number=args.rounds)
+        build = timeit.timeit(lambda: PermissionMatcher(codes), number=10) / 10
+
+        checks = args.rounds * len(required)
+        print(f"{size:>8}  {legacy / checks * 1e6:>16.2f}  {compiled / checks * 1e6:>18.3f}  "
+              f"{legacy / compiled:>7.0f}x  {build * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 100, 300, 1000])
+    parser.add_argument("--wildcard-ratio", type=float, default=0.1)
+    parser.add_argument("--rounds", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,104 @@
+"""Unit tests for the bulk receipt pipeline."""
+import json
+
+import pytest
+
+from app.config import settings
+from app.services.pos import bulk_receipts
+from app.services.pos.bulk_receipts import BulkReceiptPipeline
+
+
+def _invoice(name):
+    return {
+        "name": name,
+        "company": "Test Company",
+        "customer": "Walk-in",
+        "posting_date": "2026-03-02",
+        "net_total": 100.0,
+        "total_taxes_and_charges": 16.0,
+        "grand_total": 116.0,
+    }
+
+
+class FakePosService:
+    """Serves Sales Invoice and child-table list queries plus single documents."""
+
+    def __init__(self, names, deny_children=False):
+        self.invoices = {name: _invoice(name) for name in names}
+        self.deny_children = deny_children
+        self.requests = []
+
+    async def _request(self, method, endpoint, **kwargs):
+        self.requests.append(endpoint)
+        doctype = endpoint[len("/api/resource/"):]
+        if "/" in doctype:
+            name = doctype.split("/", 1)[1]
+            invoice = self.invoices.get(name)
+            return {"data": {**invoice, "items": [{"item_name": "Tea", "qty": 1, "rate": 100.0}]} if invoice else None}
+
+        field, _, names = json.loads(kwargs["params"]["filters"])[0]
+        if doctype == "Sales Invoice":
+            return {"data": [self.invoices[name] for name in names if name in self.invoices]}
+        if self.deny_children:
+            raise PermissionError("Not permitted")
+        rows = {
+            "Sales Invoice Item": lambda parent: {"parent": parent, "item_name": "Tea", "qty": 1, "rate": 100.0, "amount": 100.0},
+            "Sales Taxes and Charges": lambda parent: {"parent": parent, "description": "VAT 16%", "tax_amount": 16.0},
+            "Sales Invoice Payment": lambda parent: {"parent": parent, "mode_of_payment": "Cash", "amount": 116.0},
+        }[doctype]
+        return {"data": [rows(name) for name in names if name in self.invoices]}
+
+
+@pytest.fixture(autouse=True)
+def _thread_rendering(monkeypatch):
+    monkeypatch.setattr(settings, "RECEIPT_RENDER_WORKERS", 0)
+
+
+class TestBulkReceiptPipeline:
+    """Test suite for BulkReceiptPipeline."""
+
+    @pytest.mark.asyncio
+    async def test_batched_fetch_keeps_request_order(self):
+        names = [f"SINV-{n}" for n in range(5)]
+        pos_service = FakePosService(names)
+        pipeline = BulkReceiptPipeline(pos_service, batch_size=3)
+
+        receipts = [r async for r in pipeline.iter_receipts(["SINV-4", "MISSING"] + names[:4], "thermal", 48)]
+
+        assert [r["invoice_id"] for r in receipts] == ["SINV-4", "MISSING", "SINV-0", "SINV-1", "SINV-2", "SINV-3"]
+        assert [r["success"] for r in receipts] == [True, False, True, True, True, True]
+        assert receipts[1]["error"] == "Invoice not found"
+        assert "Tea" in receipts[0]["content"] and "VAT 16%" in receipts[0]["content"]
+        # Two chunks x (invoices + three child tables), no per-invoice GETs
+        assert len(pos_service.requests) == 8
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_documents_when_child_lists_are_denied(self):
+        pos_service = FakePosService(["SINV-1", "SINV-2"], deny_children=True)
+        pipeline = BulkReceiptPipeline(pos_service)
+
+        receipts = [r async for r in pipeline.iter_receipts(["SINV-1", "SINV-2"], "html")]
+
+        assert all(r["success"] for r in receipts)
+        assert "/api/resource/Sales Invoice/SINV-2" in pos_service.requests
+
+    @pytest.mark.asyncio
+    async def test_merged_pdf_has_a_page_per_receipt(self):
+        pipeline = BulkReceiptPipeline(FakePosService(["SINV-1", "SINV-2", "SINV-3"]))
+
+        pdf, missing = await pipeline.merged_pdf(["SINV-1", "SINV-2", "GONE", "SINV-3"])
+
+        assert pdf.startswith(b"%PDF")
+        assert pdf.count(b"/Type /Page\n") == 3
+        assert missing == ["GONE"]
+
+    @pytest.mark.asyncio
+    async def test_renders_in_process_pool(self, monkeypatch):
+        monkeypatch.setattr(settings, "RECEIPT_RENDER_WORKERS", 1)
+        pipeline = BulkReceiptPipeline(FakePosService(["SINV-1"]))
+        try:
+            [receipt] = [r async for r in pipeline.iter_receipts(["SINV-1"], "thermal")]
+        finally:
+            bulk_receipts.shutdown_render_pool()
+
+        assert receipt["success"] is True
@@ -0,0 +1,43 @@
+"""Unit tests for database engine configuration."""
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from app import database
+from app.config import settings
+
+
+def _checkout_count(label):
+    return REGISTRY.get_sample_value("db_pool_checkout_wait_seconds_count", {"engine": label}) or 0
+
+
+class TestDatabaseEngine:
+    """Test suite for engine/pool settings."""
+
+    def test_sync_engine_uses_configured_pool(self):
+        """Pool sizing, pre-ping and recycle come from settings."""
+        pool = database.engine.pool
+        assert isinstance(pool, database.InstrumentedQueuePool)
+        assert pool.size() == settings.DB_POOL_SIZE
+        assert pool._max_overflow == settings.DB_MAX_OVERFLOW
+        assert pool._recycle == settings.DB_POOL_RECYCLE
+        assert pool._pre_ping == settings.DB_POOL_PRE_PING
+
+    def test_async_engine_uses_asyncpg(self):
+        """The async path runs on asyncpg with the same pool settings."""
+        assert database.async_engine.dialect.driver == "asyncpg"
+        assert isinstance(database.async_engine.pool, database.InstrumentedAsyncQueuePool)
+        assert database.async_engine.pool.size() == settings.DB_POOL_SIZE
+
+    def test_checkout_wait_is_recorded(self):
+        """Each pool checkout observes the checkout-wait histogram."""
+        engine = create_engine("sqlite://", poolclass=database.InstrumentedQueuePool, pool_size=1)
+        before = _checkout_count("sync")
+
+        with engine.connect() as conn:
+            conn.execute(text("select 1"))
+        with engine.connect() as conn:
+            conn.execute(text("select 1"))
+
+        after = _checkout_count("sync")
+        assert after - before == 2
+        engine.dispose()
@@ -118,7 +118,7 @@ class TestRequireAnyPermission:
         # Mock rbac_service
         with patch('app.dependencies.permissions.rbac_service') as mock_rbac:
             # User has first permission but not second
-            mock_rbac.has_permission.side_effect = [True, False]
+            mock_rbac.get_permission_matcher.return_value.matches.side_effect = [True, False]
             
             permission_checker = require_any_permission(["crm:leads:view", "crm:leads:create"])
             result = await permission_checker(payload=payload, db=mock_db)
@@ -137,7 +137,7 @@ class TestRequireAnyPermission:
         
         # Mock rbac_service
         with patch('app.dependencies.permissions.rbac_service') as mock_rbac:
-            mock_rbac.has_permission.return_value = False
+            mock_rbac.get_permission_matcher.return_value.matches.return_value = False
             
             permission_checker = require_any_permission(["crm:leads:view", "crm:leads:create"])
             
@@ -181,7 +181,7 @@ class TestRequireAllPermissions:
         try:
             # Mock rbac_service
             with patch('app.dependencies.permissions.rbac_service') as mock_rbac:
-                mock_rbac.has_permission.return_value = True
+                mock_rbac.get_permission_matcher.return_value.matches.return_value = True
                 
                 permission_checker = require_all_permissions(["crm:leads:view", "crm:leads:create"])
                 result = await permission_checker(payload=payload, db=mock_db)
@@ -204,7 +204,7 @@ class TestRequireAllPermissions:
             # Mock rbac_service
             with patch('app.dependencies.permissions.rbac_service') as mock_rbac:
                 # User has first but not second
-                mock_rbac.has_permission.side_effect = [True, False]
+                mock_rbac.get_permission_matcher.return_value.matches.side_effect = [True, False]
                 
                 permission_checker = require_all_permissions(["crm:leads:view", "crm:leads:create"])
                 
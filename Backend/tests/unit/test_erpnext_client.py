@@ -1,5 +1,6 @@
 """Unit tests for ERPNext client adapter."""
 import json
+import httpx
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from fastapi import HTTPException
@@ -24,7 +25,7 @@ class TestERPNextClientAdapter:
         """Test adapter initialization."""
         assert adapter.base_url == "http://localhost:8080"
         assert adapter.session is not None
-        assert adapter._current_tenant is None
+        assert adapter._sessions == {}
     
     def test_resolve_site_name_with_uuid(self, adapter):
         """Test site name resolution with UUID tenant_id."""
@@ -54,9 +55,7 @@ class TestERPNextClientAdapter:
         
         result = adapter._login("test-tenant")
         assert result is True
-        assert adapter.cookie_jar == mock_response.cookies
-        # _current_tenant is set to resolved site name, not the input tenant_id
-        assert adapter._current_tenant is not None
+        assert adapter._sessions["test-tenant"].cookies == mock_response.cookies
     
     @patch('app.services.erpnext_client.requests.Session')
     def test_login_failure(self, mock_session_class, adapter):
@@ -87,8 +86,7 @@ class TestERPNextClientAdapter:
     def test_proxy_request_success(self, mock_login, adapter):
         """Test successful proxy request."""
         mock_login.return_value = True
-        adapter.cookie_jar = {"sid": "test-session-id"}
-        adapter._current_tenant = "moran.localhost"
+        adapter._store_session("test-tenant", {"sid": "test-session-id"})
         
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -102,8 +100,7 @@ class TestERPNextClientAdapter:
     def test_proxy_request_error_handling(self, mock_login, adapter):
         """Test proxy request error handling."""
         mock_login.return_value = True
-        adapter.cookie_jar = {"sid": "test-session-id"}
-        adapter._current_tenant = "moran.localhost"
+        adapter._store_session("test-tenant", {"sid": "test-session-id"})
         
         mock_response = MagicMock()
         mock_response.status_code = 400
@@ -119,8 +116,7 @@ class TestERPNextClientAdapter:
     def test_proxy_request_non_json_error(self, mock_login, adapter):
         """Test proxy request with non-JSON error response."""
         mock_login.return_value = True
-        adapter.cookie_jar = {"sid": "test-session-id"}
-        adapter._current_tenant = "moran.localhost"
+        adapter._store_session("test-tenant", {"sid": "test-session-id"})
         
         mock_response = MagicMock()
         mock_response.status_code = 500
@@ -137,8 +133,7 @@ class TestERPNextClientAdapter:
     def test_proxy_request_stock_shortage_normalized(self, mock_login, adapter):
         """Stock shortage (negative stock) should normalize into insufficient_stock."""
         mock_login.return_value = True
-        adapter.cookie_jar = {"sid": "test-session-id"}
-        adapter._current_tenant = "test-tenant"
+        adapter._store_session("test-tenant", {"sid": "test-session-id"})
 
         msg = (
             "<strong>3.0 units of ITEM-001 needed in Warehouse Finished Goods - AST "
@@ -169,8 +164,7 @@ class TestERPNextClientAdapter:
     def test_proxy_request_stock_shortage_with_datetime_and_customer(self, mock_login, adapter):
         """Stock shortage variant with posting datetime and customer should parse consistently."""
         mock_login.return_value = True
-        adapter.cookie_jar = {"sid": "test-session-id"}
-        adapter._current_tenant = "test-tenant"
+        adapter._store_session("test-tenant", {"sid": "test-session-id"})
 
         msg = (
             "4.0 units of Item 100ml: Paint 100ml needed in Warehouse Finished Goods - AST "
@@ -261,6 +255,152 @@ class TestERPNextClientAdapter:
         )
 
 
+class TestERPNextAsyncTransport:
+    """Test suite for the pooled async transport (aproxy_request)."""
+
+    @pytest.fixture
+    def adapter(self):
+        adapter = ERPNextClientAdapter(tenant_id="test-tenant")
+        adapter.base_url = "http://erpnext.test"
+        return adapter
+
+    def _use_transport(self, adapter, handler):
+        adapter._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    @pytest.mark.asyncio
+    async def test_aproxy_request_logs_in_once_and_sends_cookie(self, adapter):
+        """Login happens once; later calls reuse the session cookie."""
+        calls = {"login": 0, "resource": 0}
+
+        def handler(request):
+            if request.url.path == "/api/method/login":
+                calls["login"] += 1
+                return httpx.Response(200, json={"message": "Logged In"}, headers={"set-cookie": "sid=abc; Path=/"})
+            calls["resource"] += 1
+            assert request.headers["cookie"] == "sid=abc"
+            assert request.headers["x-frappe-site-name"] == "custom-site"
+            return httpx.Response(200, json={"data": [{"name": "ITEM-001"}]})
+
+        self._use_transport(adapter, handler)
+        first = await adapter.aproxy_request("custom-site", "resource/Item")
+        second = await adapter.aproxy_request("custom-site", "resource/Item")
+
+        assert first == {"data": [{"name": "ITEM-001"}]}
+        assert second == first
+        assert calls == {"login": 1, "resource": 2}
+        await adapter.aclose()
+
+    @pytest.mark.asyncio
+    async def test_aproxy_request_relogs_in_on_403(self, adapter):
+        """An expired session is refreshed and the request retried once."""
+        adapter._store_session("custom-site", {"sid": "stale"})
+        calls = {"login": 0}
+
+        def handler(request):
+            if request.url.path == "/api/method/login":
+                calls["login"] += 1
+                return httpx.Response(200, json={"message": "Logged In"}, headers={"set-cookie": "sid=fresh; Path=/"})
+            if request.headers.get("cookie") == "sid=stale":
+                return httpx.Response(403, json={"message": "Not permitted"})
+            return httpx.Response(200, json={"message": {"ok": True}})
+
+        self._use_transport(adapter, handler)
+        result = await adapter.aproxy_request("custom-site", "method/ping")
+
+        assert result == {"data": {"ok": True}}
+        assert calls["login"] == 1
+        await adapter.aclose()
+
+    @pytest.mark.asyncio
+    async def test_aproxy_request_maps_errors_like_sync_transport(self, adapter):
+        """Error statuses raise the same structured HTTPException as proxy_request."""
+        adapter._store_session("custom-site", {"sid": "abc"})
+        self._use_transport(adapter, lambda request: httpx.Response(404, json={}))
+
+        with pytest.raises(HTTPException) as exc_info:
+            await adapter.aproxy_request("custom-site", "resource/Item/missing")
+        assert exc_info.value.status_code == 404
+        assert exc_info.value.detail["type"] == "not_found"
+        await adapter.aclose()
+
+    @pytest.mark.asyncio
+    async def test_aproxy_request_timeout_maps_to_504(self, adapter):
+        """Transport timeouts surface as 504."""
+        adapter._store_session("custom-site", {"sid": "abc"})
+
+        def handler(request):
+            raise httpx.ReadTimeout("timed out", request=request)
+
+        self._use_transport(adapter, handler)
+        with pytest.raises(HTTPException) as exc_info:
+            await adapter.aproxy_request("custom-site", "resource/Item", timeout=0.1)
+        assert exc_info.value.status_code == 504
+        await adapter.aclose()
+
+    @pytest.mark.asyncio
+    async def test_interleaved_sites_keep_their_own_sessions(self, adapter):
+        """Alternating tenants reuse per-site sessions instead of re-logging in."""
+        logins = []
+
+        def handler(request):
+            site = request.headers["x-frappe-site-name"]
+            if request.url.path == "/api/method/login":
+                logins.append(site)
+                return httpx.Response(200, json={"message": "Logged In"}, headers={"set-cookie": f"sid={site}; Path=/"})
+            assert request.headers["cookie"] == f"sid={site}"
+            return httpx.Response(200, json={"data": []})
+
+        self._use_transport(adapter, handler)
+        for _ in range(5):
+            await adapter.aproxy_request("site-a", "resource/Item")
+            await adapter.aproxy_request("site-b", "resource/Item")
+
+        assert sorted(logins) == ["site-a", "site-b"]
+        stats = adapter.session_stats()
+        assert stats["requests"] == 10
+        assert stats["logins"] == 2
+        assert stats["logins_per_1000_requests"] == 200.0
+        await adapter.aclose()
+
+    @pytest.mark.asyncio
+    async def test_expired_session_logs_in_again(self, adapter):
+        """A cached session past its TTL is dropped and refreshed."""
+        logins = []
+
+        def handler(request):
+            if request.url.path == "/api/method/login":
+                logins.append(1)
+                return httpx.Response(200, json={"message": "Logged In"}, headers={"set-cookie": "sid=new; Path=/"})
+            return httpx.Response(200, json={"data": []})
+
+        adapter._store_session("custom-site", {"sid": "old"})
+        adapter._sessions["custom-site"].expires_at = 0
+        self._use_transport(adapter, handler)
+        await adapter.aproxy_request("custom-site", "resource/Item")
+
+        assert len(logins) == 1
+        assert adapter._sessions["custom-site"].cookies["sid"] == "new"
+        await adapter.aclose()
+
+    @pytest.mark.asyncio
+    async def test_api_token_auth_never_logs_in(self, adapter):
+        """With API-token auth enabled no login round-trip is made."""
+        def handler(request):
+            assert request.url.path != "/api/method/login"
+            assert request.headers["authorization"] == "token key:secret"
+            return httpx.Response(200, json={"data": []})
+
+        self._use_transport(adapter, handler)
+        with patch.object(settings, "ERPNEXT_USE_API_TOKEN", True), \
+             patch.object(settings, "ERPNEXT_API_KEY", "key"), \
+             patch.object(settings, "ERPNEXT_API_SECRET", "secret"):
+            await adapter.aproxy_request("site-a", "resource/Item")
+            await adapter.aproxy_request("site-b", "resource/Item")
+
+        assert adapter.session_stats()["logins"] == 0
+        await adapter.aclose()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
@@ -0,0 +1,182 @@
+"""Unit tests for the POS event bus dispatcher."""
+import asyncio
+import time
+
+import fakeredis
+import pytest
+
+from app.services.pos.event_bus import EventBus, EventPriority
+
+
+async def _recorder(bus, event_name, seen, delay=0.0):
+    async def handler(event):
+        await asyncio.sleep(delay)
+        seen.append(event.data["n"])
+
+    await bus.subscribe(event_name, handler)
+
+
+class TestEventBus:
+    """Test suite for EventBus."""
+
+    @pytest.mark.asyncio
+    async def test_higher_priority_events_dispatched_first(self):
+        """Queued events are processed by priority, FIFO within a priority."""
+        bus = EventBus(workers=1, enable_persistence=False)
+        seen = []
+        await _recorder(bus, "sale", seen)
+
+        await bus.publish("sale", {"n": "low"}, priority=EventPriority.LOW)
+        await bus.publish("sale", {"n": "normal-1"})
+        await bus.publish("sale", {"n": "critical"}, priority=EventPriority.CRITICAL)
+        await bus.publish("sale", {"n": "normal-2"})
+
+        await bus.start_processing()
+        await bus.shutdown()
+        assert seen == ["critical", "normal-1", "normal-2", "low"]
+
+    @pytest.mark.asyncio
+    async def test_full_queue_drops_lowest_priority(self):
+        """A full queue evicts lower-priority events and rejects equal ones."""
+        bus = EventBus(workers=1, max_queue_size=2, enable_persistence=False)
+        seen = []
+        await _recorder(bus, "sale", seen)
+
+        await bus.publish("sale", {"n": "low"}, priority=EventPriority.LOW)
+        await bus.publish("sale", {"n": "normal"})
+        await bus.publish("sale", {"n": "high"}, priority=EventPriority.HIGH)
+        await bus.publish("sale", {"n": "normal-late"})
+
+        assert bus.stats()["dropped"] == 2
+        await bus.start_processing()
+        await bus.shutdown()
+        assert seen == ["high", "normal"]
+
+    @pytest.mark.asyncio
+    async def test_worker_pool_runs_events_concurrently(self):
+        """Slow handlers don't serialize the whole bus."""
+        bus = EventBus(workers=4, enable_persistence=False)
+        seen = []
+        await _recorder(bus, "sale", seen, delay=0.1)
+        await bus.start_processing()
+
+        started = time.perf_counter()
+        for n in range(4):
+            await bus.publish("sale", {"n": n})
+        await bus.processing_queue.join()
+
+        assert time.perf_counter() - started < 0.3
+        assert sorted(seen) == [0, 1, 2, 3]
+        await bus.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_persistence_is_batched_off_publish(self):
+        """publish doesn't touch Redis; the flusher writes events and stream entries."""
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        bus = EventBus(redis_client=redis, workers=1)
+
+        event_ids = [await bus.publish("sale", {"n": n}, tenant_id="t1") for n in range(3)]
+        assert await redis.exists(f"events:t1:{event_ids[0]}") == 0
+
+        await bus.shutdown()
+        assert await redis.exists(*[f"events:t1:{event_id}" for event_id in event_ids]) == 3
+        recent = await bus.get_recent_events("t1")
+        assert [event.id for event in recent] == event_ids[::-1]
+
+
+class TestEventBusConsumerGroup:
+    """Test suite for cross-worker delivery through the Redis consumer group."""
+
+    @pytest.mark.asyncio
+    async def test_events_are_shared_across_workers_exactly_once(self):
+        """Each published event is handled by one of the buses sharing the group."""
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        seen_a, seen_b = [], []
+        bus_a = EventBus(redis_client=redis, distributed=True, consumer_name="a", enable_persistence=False)
+        bus_b = EventBus(redis_client=redis, distributed=True, consumer_name="b", enable_persistence=False)
+        await _recorder(bus_a, "sale", seen_a)
+        await _recorder(bus_b, "sale", seen_b)
+        await bus_a.start_processing()
+        await bus_b.start_processing()
+
+        for n in range(10):
+            await bus_a.publish("sale", {"n": n})
+        for _ in range(50):
+            if len(seen_a) + len(seen_b) == 10:
+                break
+            await asyncio.sleep(0.05)
+
+        await bus_a.shutdown()
+        await bus_b.shutdown()
+        assert sorted(seen_a + seen_b) == list(range(10))
+        pending = await redis.xpending("event_bus:deliveries", "pos-event-bus")
+        assert pending["pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_unacknowledged_entries_are_reclaimed(self, monkeypatch):
+        """Entries read by a consumer that died are redelivered to a live one."""
+        from app.config import settings
+        monkeypatch.setattr(settings, "EVENT_BUS_CLAIM_IDLE_MS", 0)
+
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        publisher = EventBus(redis_client=redis, distributed=True, consumer_name="dead", enable_persistence=False)
+        await publisher._ensure_consumer_group()
+        await publisher.publish("sale", {"n": "orphan"})
+        await publisher.shutdown()
+        # Read without processing or acknowledging, as a crashed worker would
+        await redis.xreadgroup("pos-event-bus", "dead", {"event_bus:deliveries": ">"})
+
+        seen = []
+        survivor = EventBus(redis_client=redis, distributed=True, consumer_name="alive", enable_persistence=False)
+        await _recorder(survivor, "sale", seen)
+        await survivor.start_processing()
+        for _ in range(50):
+            if seen:
+                break
+            await asyncio.sleep(0.05)
+        await survivor.shutdown()
+
+        assert seen == ["orphan"]
+        pending = await redis.xpending("event_bus:deliveries", "pos-event-bus")
+        assert pending["pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_publish_appends_to_stream_before_returning(self):
+        """A published event is in the shared stream even if the publisher dies right after."""
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        bus = EventBus(redis_client=redis, distributed=True, consumer_name="a", enable_persistence=False)
+
+        await bus.publish("sale", {"n": 1})
+
+        assert await redis.xlen("event_bus:deliveries") == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_handlers_leave_entry_pending_for_retry(self, monkeypatch):
+        """Entries are acknowledged only once their handlers succeed."""
+        from app.config import settings
+        monkeypatch.setattr(settings, "EVENT_BUS_CLAIM_IDLE_MS", 0)
+        monkeypatch.setattr(settings, "EVENT_BUS_RECLAIM_INTERVAL", 0.05)
+        monkeypatch.setattr(settings, "EVENT_BUS_STREAM_BLOCK_MS", 10)
+
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        bus = EventBus(redis_client=redis, distributed=True, consumer_name="a", enable_persistence=False)
+        attempts = []
+
+        async def flaky(event):
+            attempts.append(event.data["n"])
+            if len(attempts) == 1:
+                raise RuntimeError("downstream unavailable")
+
+        await bus.subscribe("sale", flaky)
+        await bus.start_processing()
+        await bus.publish("sale", {"n": 1})
+        for _ in range(50):
+            if len(attempts) >= 2:
+                break
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.05)
+        await bus.shutdown()
+
+        assert attempts == [1, 1]
+        pending = await redis.xpending("event_bus:deliveries", "pos-event-bus")
+        assert pending["pending"] == 0
@@ -0,0 +1,138 @@
+"""Unit tests for the deduplicated, indexed file store."""
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.models.file_storage import StoredBlob, StoredFile
+from app.services.file_storage import FileStorage, FileTooLarge, StoredFileResponse
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    for model in (StoredBlob, StoredFile):
+        model.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return FileStorage(str(tmp_path), chunk_size=4)
+
+
+async def _save(storage, db, content, filename="notes.txt", tenant_id="t1", max_size=1024):
+    upload = UploadFile(file=io.BytesIO(content), filename=filename)
+    return await storage.save_upload(
+        db, tenant_id, upload, max_size=max_size, mime_type="text/plain", category="document", uploaded_by="ann@shop"
+    )
+
+
+def _blob(db, tenant_id, content_hash):
+    return db.execute(
+        select(StoredBlob).where(StoredBlob.tenant_id == tenant_id, StoredBlob.content_hash == content_hash)
+    ).scalar_one_or_none()
+
+
+class TestSaveUpload:
+    @pytest.mark.asyncio
+    async def test_streams_and_hashes_content(self, storage, db):
+        content = b"hello chunked world"
+        stored = await _save(storage, db, content)
+
+        assert stored.content_hash == hashlib.sha256(content).hexdigest()
+        assert stored.size_bytes == len(content)
+        assert stored.extension == ".txt"
+        with open(storage.blob_path("t1", stored.content_hash), "rb") as f:
+            assert f.read() == content
+        assert os.listdir(os.path.join(storage.root, "t1", "tmp")) == []
+
+    @pytest.mark.asyncio
+    async def test_identical_content_shares_one_blob(self, storage, db):
+        first = await _save(storage, db, b"same bytes", filename="a.txt")
+        second = await _save(storage, db, b"same bytes", filename="b.txt")
+        other_tenant = await _save(storage, db, b"same bytes", tenant_id="t2")
+
+        assert first.id != second.id
+        assert first.content_hash == second.content_hash
+        assert _blob(db, "t1", first.content_hash).ref_count == 2
+        assert _blob(db, "t2", other_tenant.content_hash).ref_count == 1
+
+    @pytest.mark.asyncio
+    async def test_oversized_upload_stores_nothing(self, storage, db):
+        with pytest.raises(FileTooLarge):
+            await _save(storage, db, b"x" * 20, max_size=10)
+
+        assert db.execute(select(StoredFile)).first() is None
+        assert db.execute(select(StoredBlob)).first() is None
+        assert os.listdir(os.path.join(storage.root, "t1", "tmp")) == []
+
+
+class TestListAndDelete:
+    @pytest.mark.asyncio
+    async def test_cursor_pages_newest_first(self, storage, db):
+        saved = [await _save(storage, db, f"file {i}".encode(), filename=f"{i}.txt") for i in range(5)]
+        await _save(storage, db, b"elsewhere", tenant_id="t2")
+
+        page, cursor = storage.list(db, "t1", limit=2)
+        seen = [stored.id for stored in page]
+        while cursor:
+            page, cursor = storage.list(db, "t1", limit=2, cursor=cursor)
+            seen.extend(stored.id for stored in page)
+
+        assert seen == [stored.id for stored in reversed(saved)]
+        assert storage.count(db, "t1") == 5
+        assert storage.count(db, "t1", category="image") == 0
+
+    @pytest.mark.asyncio
+    async def test_blob_removed_with_last_reference(self, storage, db):
+        first = await _save(storage, db, b"shared")
+        second = await _save(storage, db, b"shared")
+        blob_path = storage.blob_path("t1", first.content_hash)
+
+        assert storage.delete(db, "t1", first.id) is True
+        assert os.path.exists(blob_path)
+        assert _blob(db, "t1", first.content_hash).ref_count == 1
+
+        assert storage.delete(db, "t2", second.id) is False
+        assert storage.delete(db, "t1", second.id) is True
+        assert not os.path.exists(blob_path)
+        assert _blob(db, "t1", first.content_hash) is None
+
+
+class TestStoredFileResponse:
+    def _client(self, path, etag):
+        async def download(request):
+            return StoredFileResponse(path=path, etag=etag, filename="notes.txt", media_type="text/plain")
+
+        return TestClient(Starlette(routes=[Route("/f", download)]))
+
+    def test_range_and_conditional_requests(self, tmp_path):
+        path = tmp_path / "blob"
+        path.write_bytes(b"0123456789")
+        client = self._client(str(path), '"abc"')
+
+        full = client.get("/f")
+        assert full.status_code == 200
+        assert full.headers["etag"] == '"abc"'
+        assert full.headers["accept-ranges"] == "bytes"
+
+        partial = client.get("/f", headers={"range": "bytes=2-5", "if-range": '"abc"'})
+        assert partial.status_code == 206
+        assert partial.content == b"2345"
+
+        stale = client.get("/f", headers={"range": "bytes=2-5", "if-range": '"old"'})
+        assert stale.status_code == 200
+        assert stale.content == b"0123456789"
+
+        assert client.get("/f", headers={"if-none-match": '"abc"'}).status_code == 304
@@ -0,0 +1,145 @@
+"""Unit tests for POS invoice preparation."""
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi import HTTPException
+
+from app.services.pos import invoice_preparation
+from app.services.pos.invoice_preparation import (
+    InvoicePreparationService,
+    invalidate_profile_context,
+)
+
+
+def _adapter_for(routes):
+    """Build an adapter mock whose aproxy_request answers by path."""
+    adapter = MagicMock()
+
+    async def aproxy_request(tenant_id, path, method="GET", params=None, json_data=None):
+        handler = routes[path]
+        return handler(params) if callable(handler) else handler
+
+    adapter.aproxy_request = AsyncMock(side_effect=aproxy_request)
+    return adapter
+
+
+@pytest.fixture(autouse=True)
+def clear_profile_cache():
+    invoice_preparation._profile_context_cache.clear()
+    yield
+    invoice_preparation._profile_context_cache.clear()
+
+
+@pytest.fixture
+def pos_service():
+    service = MagicMock()
+    service.get_pos_profile_details = AsyncMock(return_value={
+        "name": "Main Till",
+        "warehouse": "Stores - T",
+        "company": "Test Co",
+        "payment_accounts": {"Cash": "Cash - T"},
+    })
+    return service
+
+
+@pytest.fixture
+def routes():
+    return {
+        "resource/Company": {"data": [{"name": "Test Co"}]},
+        "resource/Warehouse/Stores - T": {"data": {"name": "Stores - T", "is_group": 0}},
+        "resource/Account": {"data": [
+            {"name": "Cash - T", "account_type": "Cash", "is_group": 0},
+            {"name": "Sales - T", "account_type": "Income", "is_group": 0},
+        ]},
+    }
+
+
+class TestInvoicePreparationService:
+    """Test suite for InvoicePreparationService."""
+
+    @pytest.mark.asyncio
+    async def test_fetch_item_details_uses_one_query(self):
+        """All basket items resolve through a single name-in filter."""
+        def items(params):
+            codes = json.loads(params["filters"])[0][2]
+            return {"data": [{"name": code, "standard_rate": 10.0} for code in codes]}
+
+        adapter = _adapter_for({"resource/Item": items})
+        service = InvoicePreparationService(adapter, "tenant-1", MagicMock())
+
+        codes = [f"ITEM-{i:03d}" for i in range(30)] + ["ITEM-000"]
+        details = await service.fetch_item_details(codes)
+
+        assert len(details) == 30
+        assert adapter.aproxy_request.await_count == 1
+        filters = json.loads(adapter.aproxy_request.await_args.kwargs["params"]["filters"])
+        assert filters[0][:2] == ["name", "in"]
+
+    @pytest.mark.asyncio
+    async def test_fetch_item_details_missing_item_raises_404(self):
+        """Unknown item codes keep the item_not_found error shape."""
+        adapter = _adapter_for({"resource/Item": {"data": [{"name": "ITEM-001"}]}})
+        service = InvoicePreparationService(adapter, "tenant-1", MagicMock())
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.fetch_item_details(["ITEM-001", "ITEM-404"])
+        assert exc_info.value.status_code == 404
+        assert exc_info.value.detail["item_code"] == "ITEM-404"
+
+    @pytest.mark.asyncio
+    async def test_profile_context_is_cached_per_profile(self, routes, pos_service):
+        """A second checkout on the same profile makes no lookups."""
+        adapter = _adapter_for(routes)
+        service = InvoicePreparationService(adapter, "tenant-1", pos_service)
+
+        first = await service.get_profile_context("Main Till", "Tenant Name")
+        calls_after_first = adapter.aproxy_request.await_count
+        second = await service.get_profile_context("Main Till", "Tenant Name")
+
+        assert second is first
+        assert first.company == "Test Co"
+        assert first.warehouse == "Stores - T"
+        assert first.account_names == {"Cash - T", "Sales - T"}
+        assert adapter.aproxy_request.await_count == calls_after_first
+        assert pos_service.get_pos_profile_details.await_count == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("failing_path", ["resource/Company", "resource/Account", "resource/Warehouse/Stores - T"])
+    async def test_degraded_profile_context_is_not_cached(self, routes, pos_service, failing_path):
+        """A context built from a fallback after a failed lookup is used once, then reloaded."""
+        def unavailable(params):
+            raise ConnectionError("ERPNext unavailable")
+
+        routes[failing_path] = unavailable
+        service = InvoicePreparationService(_adapter_for(routes), "tenant-1", pos_service)
+
+        first = await service.get_profile_context("Main Till", "Tenant Name")
+        await service.get_profile_context("Main Till", "Tenant Name")
+
+        assert first.complete is False
+        assert first.warehouse == "Stores - T"
+        assert pos_service.get_pos_profile_details.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidate_profile_context_forces_reload(self, routes, pos_service):
+        """Profile updates drop the cached context."""
+        adapter = _adapter_for(routes)
+        service = InvoicePreparationService(adapter, "tenant-1", pos_service)
+
+        await service.get_profile_context("Main Till", "Tenant Name")
+        invalidate_profile_context("tenant-1", "Main Till")
+        await service.get_profile_context("Main Till", "Tenant Name")
+
+        assert pos_service.get_pos_profile_details.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_missing_profile_maps_to_400(self, routes):
+        """Profile lookup failures surface as pos_profile_not_found."""
+        pos_service = MagicMock()
+        pos_service.get_pos_profile_details = AsyncMock(side_effect=Exception("boom"))
+        service = InvoicePreparationService(_adapter_for(routes), "tenant-1", pos_service)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.get_profile_context("Missing", "Tenant Name")
+        assert exc_info.value.status_code == 400
+        assert exc_info.value.detail["type"] == "pos_profile_not_found"
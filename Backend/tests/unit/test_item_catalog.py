@@ -0,0 +1,139 @@
+"""Unit tests for the POS item catalogue mirror."""
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.cache.item_catalog import ItemCatalogMirror, paginate_items
+
+
+class FakeRedis:
+    """Just enough of redis.asyncio (decode_responses=True) for the mirror."""
+
+    def __init__(self):
+        self.store = {}
+
+    async def hgetall(self, key):
+        return dict(self.store.get(key, {}))
+
+    async def hmget(self, key, fields):
+        data = self.store.get(key, {})
+        return [data.get(f) for f in fields]
+
+    async def hset(self, key, field=None, value=None, mapping=None):
+        data = self.store.setdefault(key, {})
+        if field is not None:
+            data[field] = str(value)
+        for k, v in (mapping or {}).items():
+            data[k] = v if isinstance(v, str) else str(v)
+
+    async def hdel(self, key, *fields):
+        for f in fields:
+            self.store.get(key, {}).pop(f, None)
+
+    async def hlen(self, key):
+        return len(self.store.get(key, {}))
+
+    async def hincrby(self, key, field, amount):
+        data = self.store.setdefault(key, {})
+        data[field] = str(int(data.get(field, 0)) + amount)
+
+    async def rename(self, src, dst):
+        self.store[dst] = self.store.pop(src)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.store.pop(key, None)
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.store:
+            return False
+        self.store[key] = value
+        return True
+
+
+def _item(code, modified, **extra):
+    row = {"name": code, "item_code": code, "item_name": f"Name {code}", "standard_rate": 10,
+           "item_group": "Paint", "disabled": 0, "modified": modified}
+    row.update(extra)
+    return row
+
+
+def _adapter(pages):
+    """Adapter whose Item endpoint returns successive responses from `pages`."""
+    adapter = MagicMock()
+    adapter.aproxy_request = AsyncMock(side_effect=[{"data": page} for page in pages])
+    return adapter
+
+
+class TestItemCatalogMirror:
+    """Test suite for ItemCatalogMirror."""
+
+    @pytest.mark.asyncio
+    async def test_full_sync_pages_past_first_page(self):
+        """Catalogues larger than one page are not truncated."""
+        mirror = ItemCatalogMirror(FakeRedis(), page_size=2)
+        adapter = _adapter([
+            [_item("A", "2024-01-01 00:00:01"), _item("B", "2024-01-01 00:00:02")],
+            [_item("C", "2024-01-01 00:00:03")],
+        ])
+
+        stats = await mirror.sync("t1", adapter)
+
+        assert stats["fetched"] == 3
+        assert len(await mirror.get_items("t1")) == 3
+        second_params = adapter.aproxy_request.await_args_list[1].kwargs["params"]
+        assert second_params["limit_start"] == 2
+        assert (await mirror.get_meta("t1"))["watermark"] == "2024-01-01 00:00:03"
+
+    @pytest.mark.asyncio
+    async def test_delta_sync_uses_watermark_and_drops_disabled(self):
+        """Delta syncs filter on modified and remove disabled items."""
+        mirror = ItemCatalogMirror(FakeRedis())
+        await mirror.sync("t1", _adapter([[_item("A", "2024-01-01"), _item("B", "2024-01-02")]]))
+
+        adapter = _adapter([[_item("B", "2024-01-03", disabled=1), _item("C", "2024-01-04")]])
+        stats = await mirror.sync("t1", adapter)
+
+        filters = json.loads(adapter.aproxy_request.await_args.kwargs["params"]["filters"])
+        assert filters == [["modified", ">=", "2024-01-02"]]
+        assert stats["upserted"] == 1 and stats["removed"] == 1
+        assert [i["item_code"] for i in await mirror.get_items("t1")] == ["A", "C"]
+
+    @pytest.mark.asyncio
+    async def test_version_unchanged_when_nothing_changed(self):
+        """Re-fetching the watermark item does not invalidate client ETags."""
+        mirror = ItemCatalogMirror(FakeRedis())
+        await mirror.sync("t1", _adapter([[_item("A", "2024-01-01")]]))
+        first = await mirror.query("t1")
+
+        await mirror.sync("t1", _adapter([[_item("A", "2024-01-01")]]))
+        assert (await mirror.query("t1"))["etag"] == first["etag"]
+
+        await mirror.sync("t1", _adapter([[_item("A", "2024-01-05", standard_rate=12)]]))
+        assert (await mirror.query("t1"))["etag"] != first["etag"]
+
+    @pytest.mark.asyncio
+    async def test_ensure_fresh_skips_recent_sync(self):
+        """A mirror synced within the interval is served without ERPNext calls."""
+        mirror = ItemCatalogMirror(FakeRedis())
+        await mirror.sync("t1", _adapter([[_item("A", "2024-01-01")]]))
+
+        adapter = _adapter([])
+        assert await mirror.ensure_fresh("t1", adapter) is True
+        adapter.aproxy_request.assert_not_awaited()
+
+        await mirror.mark_stale("t1")
+        adapter = _adapter([[]])
+        await mirror.ensure_fresh("t1", adapter)
+        assert adapter.aproxy_request.await_count == 1
+
+    def test_paginate_items_filters_and_slices(self):
+        """Search, group filter and paging compose; total counts all matches."""
+        items = [{"item_code": f"P-{i}", "item_name": f"Paint {i}", "item_group": "Paint"} for i in range(5)]
+        items.append({"item_code": "B-1", "item_name": "Brush", "item_group": "Tools"})
+
+        result = paginate_items(items, search="paint", page=2, page_size=2)
+
+        assert result["total"] == 5
+        assert [i["item_code"] for i in result["items"]] == ["P-2", "P-3"]
+        assert paginate_items(items, item_group="Tools")["total"] == 1
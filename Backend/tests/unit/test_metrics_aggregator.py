@@ -0,0 +1,113 @@
+"""Unit tests for the dashboard metrics aggregator."""
+import asyncio
+import time
+
+import pytest
+
+from app.config import settings
+from app.services.metrics_aggregator import MetricsAggregator
+
+
+class SlowCollector:
+    """Returns a numbered value after a delay and counts its calls."""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def __call__(self, tenant_id, **params):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("ERPNext unavailable")
+        return {"value": self.calls, **params}
+
+
+@pytest.fixture(autouse=True)
+def _no_jitter(monkeypatch):
+    monkeypatch.setattr(settings, "POS_CACHE_TTL_JITTER", 0)
+
+
+class TestMetricsAggregator:
+    """Test suite for MetricsAggregator."""
+
+    @pytest.mark.asyncio
+    async def test_modules_are_collected_concurrently(self):
+        aggregator = MetricsAggregator()
+        for name in ("a", "b", "c"):
+            aggregator.register(name, SlowCollector(delay=0.1), ttl=30, fallback={})
+
+        started = time.perf_counter()
+        results = await aggregator.collect("t1", ["a", "b", "c"])
+
+        assert time.perf_counter() - started < 0.25
+        assert {result.status for result in results.values()} == {"collected"}
+
+    @pytest.mark.asyncio
+    async def test_slow_or_failing_module_returns_fallback(self):
+        aggregator = MetricsAggregator()
+        aggregator.register("fast", SlowCollector(), ttl=30, fallback={"value": 0})
+        aggregator.register("slow", SlowCollector(delay=0.1), ttl=30, fallback={"value": 0}, timeout=0.05)
+        aggregator.register("broken", SlowCollector(fail=True), ttl=30, fallback={"value": 0})
+
+        results = await aggregator.collect("t1", ["fast", "slow", "broken"])
+
+        assert (results["fast"].status, results["fast"].value["value"]) == ("collected", 1)
+        assert (results["slow"].status, results["slow"].value) == ("timeout", {"value": 0})
+        assert (results["broken"].status, results["broken"].value) == ("error", {"value": 0})
+        await asyncio.sleep(0.1)
+
+    @pytest.mark.asyncio
+    async def test_timed_out_collect_is_cached_for_next_request(self):
+        aggregator = MetricsAggregator()
+        collector = SlowCollector(delay=0.1)
+        aggregator.register("slow", collector, ttl=30, fallback={}, timeout=0.02)
+
+        assert (await aggregator.collect("t1", ["slow"]))["slow"].status == "timeout"
+        await asyncio.sleep(0.15)
+
+        result = (await aggregator.collect("t1", ["slow"]))["slow"]
+        assert (result.status, collector.calls) == ("fresh", 1)
+
+    @pytest.mark.asyncio
+    async def test_stale_value_is_served_while_refreshing(self):
+        aggregator = MetricsAggregator()
+        collector = SlowCollector(delay=0.05)
+        aggregator.register("sales", collector, ttl=0.05, fallback={})
+
+        await aggregator.collect("t1", ["sales"])
+        await asyncio.sleep(0.06)
+
+        stale = (await aggregator.collect("t1", ["sales"]))["sales"]
+        assert (stale.status, stale.value["value"]) == ("stale", 1)
+
+        await asyncio.sleep(0.06)
+        assert (await aggregator.collect("t1", ["sales"]))["sales"].value == {"value": 2}
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_collect(self):
+        aggregator = MetricsAggregator()
+        collector = SlowCollector(delay=0.05)
+        aggregator.register("sales", collector, ttl=30, fallback={}, params=("date_from",))
+
+        await asyncio.gather(*(aggregator.collect("t1", ["sales"], date_from="2026-01-01") for _ in range(5)))
+        await aggregator.collect("t1", ["sales"], date_from="2026-02-01")
+
+        # One call per distinct period; the extra parameter is not passed through
+        assert collector.calls == 2
+        result = (await aggregator.collect("t1", ["sales"], date_from="2026-02-01", other="x"))["sales"]
+        assert result.value == {"value": 2, "date_from": "2026-02-01"}
+
+    @pytest.mark.asyncio
+    async def test_invalidate_drops_tenant_entries(self):
+        aggregator = MetricsAggregator()
+        collector = SlowCollector()
+        aggregator.register("hr", collector, ttl=600, fallback={})
+        await aggregator.collect("t1", ["hr"])
+        await aggregator.collect("t2", ["hr"])
+
+        aggregator.invalidate("t1")
+
+        assert (await aggregator.collect("t1", ["hr"]))["hr"].status == "collected"
+        assert (await aggregator.collect("t2", ["hr"]))["hr"].status == "fresh"
@@ -0,0 +1,113 @@
+"""Unit tests for the durable notification store and push hub."""
+import asyncio
+
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.notifications import Notification, NotificationCounter
+from app.services.notification_service import NotificationHub, NotificationService
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    for model in (Notification, NotificationCounter):
+        model.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+async def _create(service, db, user_id="u1", **kwargs):
+    return await service.create(db, user_id=user_id, title="Low stock", message="Tea is running out", **kwargs)
+
+
+class TestNotificationStore:
+    @pytest.mark.asyncio
+    async def test_counters_follow_changes(self, db):
+        service = NotificationService()
+        first = await _create(service, db)
+        second = await _create(service, db, type="warning")
+        await _create(service, db)
+        await _create(service, db, user_id="u2")
+
+        assert service.counts(db, "u1") == (3, 3)
+        assert service.count(db, "u1", type="warning") == 1
+
+        await service.mark_read(db, "u1", first.id)
+        await service.mark_read(db, "u1", first.id)
+        assert service.counts(db, "u1") == (3, 2)
+
+        assert await service.delete(db, "u1", first.id) is True
+        assert await service.delete(db, "u1", second.id) is True
+        assert await service.delete(db, "u2", second.id) is False
+        assert service.counts(db, "u1") == (1, 1)
+
+        assert await service.mark_all_read(db, "u1") == 1
+        assert service.unread_count(db, "u1") == 0
+        assert await service.clear(db, "u1") == 1
+        assert service.counts(db, "u1") == (0, 0)
+        assert service.counts(db, "u2") == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_cursor_pages_newest_first(self, db):
+        service = NotificationService()
+        created = [await _create(service, db) for _ in range(5)]
+        await service.mark_read(db, "u1", created[4].id)
+
+        page, cursor = service.list(db, "u1", limit=2)
+        seen = [n.id for n in page]
+        while cursor:
+            page, cursor = service.list(db, "u1", limit=2, cursor=cursor)
+            seen.extend(n.id for n in page)
+        assert seen == [n.id for n in reversed(created)]
+
+        unread, _ = service.list(db, "u1", unread_only=True)
+        assert [n.id for n in unread] == [n.id for n in reversed(created[:4])]
+
+
+class TestNotificationHub:
+    @pytest.mark.asyncio
+    async def test_local_delivery_without_redis(self, db):
+        service = NotificationService(NotificationHub())
+        async with service.hub.subscribe("u1") as queue:
+            notification = await _create(service, db)
+            await _create(service, db, user_id="u2")
+            await service.mark_read(db, "u1", notification.id)
+
+            created = queue.get_nowait()
+            assert created["event"] == "notification"
+            assert created["notification"]["id"] == notification.id
+            assert created["unread_count"] == 1
+            assert queue.get_nowait() == {"event": "read", "ids": [notification.id], "unread_count": 0}
+            assert queue.empty()
+        assert service.hub._streams == {}
+
+    @pytest.mark.asyncio
+    async def test_fans_out_across_processes(self):
+        server = FakeServer()
+        worker_a = NotificationHub(FakeAsyncRedis(server=server, decode_responses=True))
+        worker_b = NotificationHub(FakeAsyncRedis(server=server, decode_responses=True))
+        try:
+            async with worker_b.subscribe("u1") as till, worker_b.subscribe("u1") as dashboard:
+                await worker_a.publish("u1", {"event": "read", "all": True, "unread_count": 0})
+                await worker_a.publish("u2", {"event": "read", "all": True, "unread_count": 0})
+
+                assert await asyncio.wait_for(till.get(), 2) == {"event": "read", "all": True, "unread_count": 0}
+                assert await asyncio.wait_for(dashboard.get(), 2) == {"event": "read", "all": True, "unread_count": 0}
+                await asyncio.sleep(0.05)
+                assert till.empty()
+        finally:
+            await worker_b.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_full_queue_drops_events(self):
+        hub = NotificationHub(queue_size=1)
+        async with hub.subscribe("u1") as queue:
+            await hub.publish("u1", {"event": "notification", "n": 1})
+            await hub.publish("u1", {"event": "notification", "n": 2})
+            assert queue.qsize() == 1
+            assert queue.get_nowait()["n"] == 1
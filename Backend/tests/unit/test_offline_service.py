@@ -0,0 +1,251 @@
+"""Unit tests for offline transaction queueing and sync."""
+import asyncio
+import zlib
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import fakeredis
+import pytest
+
+from app.config import settings
+from app.services.pos.offline_service import OfflineService, OfflineTransaction
+
+
+class FakeErpnext:
+    """Records posts; remembers invoices by offline_pos_name like ERPNext would."""
+
+    def __init__(self, delay=0.0, fail_customers=()):
+        self.delay = delay
+        self.fail_customers = set(fail_customers)
+        self.invoices = {}
+        self.posted = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def aproxy_request(self, tenant_id, path, method="GET", params=None, json_data=None):
+        if method == "GET":
+            key = params["filters"].split('"=", "')[1].split('"')[0]
+            return {"data": [{"name": self.invoices[key]}] if key in self.invoices else []}
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        if json_data["customer"] in self.fail_customers:
+            return {}
+        name = f"SINV-{len(self.posted) + 1}"
+        self.posted.append(json_data)
+        self.invoices[json_data["offline_pos_name"]] = name
+        return {"data": {"name": name}}
+
+
+class MemorySpillStore:
+    """In-memory stand-in for the Postgres overflow segment."""
+
+    def __init__(self):
+        self.rows = {}
+
+    async def append(self, transaction):
+        self.rows[transaction.sequence] = zlib.compress(transaction.pack().encode())
+
+    async def read(self, tenant_id, after, limit):
+        return [OfflineTransaction.unpack(self.rows[seq]) for seq in sorted(self.rows) if seq > after][:limit]
+
+    @asynccontextmanager
+    async def claim(self, tenant_id, limit):
+        claimed = sorted(self.rows)[:limit]
+        yield [OfflineTransaction.unpack(self.rows[seq]) for seq in claimed]
+        for seq in claimed:
+            del self.rows[seq]
+
+    async def stats(self, tenant_id):
+        if not self.rows:
+            return 0, None
+        return len(self.rows), OfflineTransaction.unpack(self.rows[min(self.rows)]).created_at.astimezone()
+
+
+def _invoice(profile, customer):
+    return {"customer": customer, "items": [{"item_code": "A", "qty": 1}], "pos_profile_id": profile}
+
+
+def _service(adapter, spill_store=None):
+    return OfflineService(
+        erpnext_adapter=adapter,
+        redis_client=fakeredis.FakeAsyncRedis(decode_responses=True),
+        spill_store=spill_store
+    )
+
+
+class TestOfflineService:
+    """Test suite for OfflineService."""
+
+    @pytest.mark.asyncio
+    async def test_queue_is_fifo_and_synced_entries_are_removed(self):
+        """Pending reads come back oldest first; a successful sync empties the queue."""
+        adapter = FakeErpnext()
+        service = _service(adapter)
+        ids = [await service.queue_transaction("t1", "invoice", _invoice("P1", f"C{n}")) for n in range(3)]
+
+        assert [tx.id for tx in await service.get_pending_transactions("t1")] == ids
+
+        results = await service.sync_pending_transactions("t1")
+        assert results["successful"] == 3
+        assert [invoice["customer"] for invoice in adapter.posted] == ["C0", "C1", "C2"]
+        assert (await service.get_sync_status("t1"))["pending_transactions"] == 0
+        assert await service.redis_client.hlen("offline:tx:t1") == 0
+
+    @pytest.mark.asyncio
+    async def test_already_posted_invoice_is_not_posted_again(self):
+        """An invoice whose idempotency key already exists in ERPNext is reused."""
+        adapter = FakeErpnext()
+        service = _service(adapter)
+        await service.queue_transaction("t1", "invoice", _invoice("P1", "C1"), idempotency_key="till-1-0001")
+        adapter.invoices["till-1-0001"] = "SINV-EXISTING"
+
+        results = await service.sync_pending_transactions("t1")
+
+        assert results["successful"] == 1
+        assert adapter.posted == []
+
+    @pytest.mark.asyncio
+    async def test_requeueing_same_key_is_a_noop(self):
+        adapter = FakeErpnext()
+        service = _service(adapter)
+        first = await service.queue_transaction("t1", "invoice", _invoice("P1", "C1"), idempotency_key="k1")
+        second = await service.queue_transaction("t1", "invoice", _invoice("P1", "C1"), idempotency_key="k1")
+
+        assert first == second
+        assert len(await service.get_pending_transactions("t1")) == 1
+
+    @pytest.mark.asyncio
+    async def test_profiles_sync_in_parallel_in_order(self, monkeypatch):
+        """Different POS profiles overlap; each profile keeps its queue order."""
+        monkeypatch.setattr(settings, "OFFLINE_SYNC_CONCURRENCY", 3)
+        adapter = FakeErpnext(delay=0.02)
+        service = _service(adapter)
+        for n in range(3):
+            for profile in ("P1", "P2", "P3"):
+                await service.queue_transaction("t1", "invoice", _invoice(profile, f"{profile}-{n}"))
+
+        results = await service.sync_pending_transactions("t1")
+
+        assert results["successful"] == 9
+        assert adapter.max_in_flight == 3
+        for profile in ("P1", "P2", "P3"):
+            posted = [i["customer"] for i in adapter.posted if i["pos_profile_id"] == profile]
+            assert posted == [f"{profile}-{n}" for n in range(3)]
+
+    @pytest.mark.asyncio
+    async def test_failure_holds_back_later_sales_of_the_profile(self):
+        """After a failed sale, later sales of that profile wait for the next run."""
+        adapter = FakeErpnext(fail_customers={"P1-0"})
+        service = _service(adapter)
+        for n in range(2):
+            for profile in ("P1", "P2"):
+                await service.queue_transaction("t1", "invoice", _invoice(profile, f"{profile}-{n}"))
+
+        results = await service.sync_pending_transactions("t1")
+
+        assert results["failed"] == 1
+        assert results["skipped"] == 1
+        assert [i["customer"] for i in adapter.posted] == ["P2-0", "P2-1"]
+        [failed, held] = await service.get_pending_transactions("t1")
+        assert failed.retry_count == 1
+        assert held.data["customer"] == "P1-1"
+
+    @pytest.mark.asyncio
+    async def test_exhausted_transactions_are_parked(self):
+        adapter = FakeErpnext(fail_customers={"C1"})
+        service = _service(adapter)
+        await service.queue_transaction("t1", "invoice", _invoice("P1", "C1"))
+
+        for _ in range(3):
+            await service.sync_pending_transactions("t1")
+
+        status = await service.get_sync_status("t1")
+        assert status["pending_transactions"] == 0
+        assert status["failed_transactions"] == 1
+
+
+class TestOfflineQueueDurability:
+    """The hot Redis segment spills instead of dropping transactions."""
+
+    @pytest.mark.asyncio
+    async def test_overflow_spills_and_is_promoted_in_order(self, monkeypatch):
+        monkeypatch.setattr(settings, "OFFLINE_QUEUE_HOT_LIMIT", 2)
+        adapter = FakeErpnext()
+        spill = MemorySpillStore()
+        service = _service(adapter, spill)
+        for n in range(5):
+            await service.queue_transaction("t1", "invoice", _invoice("P1", f"C{n}"))
+
+        assert await service.redis_client.zcard("offline:queue:t1") == 2
+        assert len(spill.rows) == 3
+
+        for _ in range(3):
+            await service.sync_pending_transactions("t1")
+
+        assert [i["customer"] for i in adapter.posted] == [f"C{n}" for n in range(5)]
+        assert spill.rows == {}
+        assert (await service.get_sync_status("t1"))["pending_transactions"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_promotion_keeps_spilled_rows(self, monkeypatch):
+        monkeypatch.setattr(settings, "OFFLINE_QUEUE_HOT_LIMIT", 1)
+        spill = MemorySpillStore()
+        service = _service(FakeErpnext(), spill)
+        for n in range(3):
+            await service.queue_transaction("t1", "invoice", _invoice("P1", f"C{n}"))
+        await service.redis_client.delete("offline:queue:t1")
+
+        def broken_pipeline(*args, **kwargs):
+            raise ConnectionError("redis unavailable")
+
+        monkeypatch.setattr(service.redis_client, "pipeline", broken_pipeline)
+        with pytest.raises(ConnectionError):
+            await service._promote_spilled("t1")
+        assert len(spill.rows) == 2
+
+        monkeypatch.undo()
+        assert await service._promote_spilled("t1") == 1
+        assert len(spill.rows) == 1
+
+    @pytest.mark.asyncio
+    async def test_cursor_reads_page_across_segments(self, monkeypatch):
+        monkeypatch.setattr(settings, "OFFLINE_QUEUE_HOT_LIMIT", 3)
+        service = _service(FakeErpnext(), MemorySpillStore())
+        ids = [await service.queue_transaction("t1", "invoice", _invoice("P1", f"C{n}")) for n in range(5)]
+
+        first = await service.get_pending_transactions("t1", limit=2)
+        second = await service.get_pending_transactions("t1", limit=2, cursor=first[-1].sequence)
+        third = await service.get_pending_transactions("t1", limit=2, cursor=second[-1].sequence)
+
+        assert [tx.id for tx in first + second + third] == ids
+
+    @pytest.mark.asyncio
+    async def test_status_reports_size_and_age(self, monkeypatch):
+        monkeypatch.setattr(settings, "OFFLINE_QUEUE_HOT_LIMIT", 1)
+        service = _service(FakeErpnext(), MemorySpillStore())
+        for n in range(3):
+            await service.queue_transaction("t1", "invoice", _invoice("P1", f"C{n}"))
+
+        status = await service.get_sync_status("t1")
+
+        assert status["pending_transactions"] == 3
+        assert status["hot_transactions"] == 1
+        assert status["spilled_transactions"] == 2
+        assert status["is_over_limit"] is True
+        assert status["oldest_age_seconds"] >= 0
+
+    def test_pack_round_trip(self):
+        transaction = OfflineTransaction(
+            id="tx", tenant_id="t1", transaction_type="invoice", data={"customer": "C1"},
+            created_at=datetime(2026, 1, 2, 3, 4, 5), idempotency_key="k", sequence=7
+        )
+
+        packed = transaction.pack()
+
+        assert len(packed) < len(str(transaction.to_dict()))
+        assert OfflineTransaction.unpack(packed) == transaction
+        assert OfflineTransaction.unpack(zlib.compress(packed.encode())) == transaction
@@ -0,0 +1,111 @@
+"""Unit tests for the two-tier RBAC permission cache."""
+import uuid
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from app.routers import iam
+from app.services.permission_cache import PermissionCache
+from app.services.rbac_service import rbac_service
+
+
+@pytest.fixture
+def redis_tier():
+    """Patch the Redis tier with an in-memory dict."""
+    store = {}
+    with patch("app.services.permission_cache.cache_service") as mock_cache:
+        mock_cache.get_user_permissions_cached.side_effect = lambda u, t: store.get((u, t))
+        mock_cache.set_user_permissions_cached.side_effect = lambda u, t, p, ttl=900: store.__setitem__((u, t), p)
+        mock_cache.invalidate_user_cache.side_effect = lambda u, t: store.pop((u, t), None)
+        mock_cache.store = store
+        yield mock_cache
+
+
+class TestPermissionCache:
+    """Test suite for PermissionCache."""
+
+    def test_local_hit_skips_loader_and_redis(self, redis_tier):
+        """Second lookup is served from the process LRU."""
+        cache = PermissionCache(max_size=10, local_ttl=60)
+        loader = MagicMock(return_value=["crm:leads:view"])
+        user_id, tenant_id = uuid.uuid4(), uuid.uuid4()
+
+        first = cache.get_or_load(user_id, tenant_id, loader)
+        second = cache.get_or_load(user_id, tenant_id, loader)
+
+        assert second is first
+        assert loader.call_count == 1
+        assert redis_tier.get_user_permissions_cached.call_count == 1
+
+    def test_redis_hit_skips_loader(self, redis_tier):
+        """A cold process rebuilds the matcher from Redis."""
+        user_id, tenant_id = uuid.uuid4(), uuid.uuid4()
+        redis_tier.store[(str(user_id), str(tenant_id))] = ["pos:*:view"]
+        loader = MagicMock()
+
+        matcher = PermissionCache(local_ttl=60).get_or_load(user_id, tenant_id, loader)
+
+        assert matcher.matches("pos:items:view")
+        loader.assert_not_called()
+
+    def test_invalidate_forces_reload(self, redis_tier):
+        """Invalidation drops both tiers."""
+        cache = PermissionCache(local_ttl=60)
+        loader = MagicMock(side_effect=[["crm:leads:view"], ["crm:leads:edit"]])
+        user_id, tenant_id = uuid.uuid4(), uuid.uuid4()
+
+        cache.get_or_load(user_id, tenant_id, loader)
+        cache.invalidate(user_id, tenant_id)
+        matcher = cache.get_or_load(user_id, tenant_id, loader)
+
+        assert matcher.matches("crm:leads:edit")
+        assert not matcher.matches("crm:leads:view")
+
+    def test_lru_evicts_oldest(self, redis_tier):
+        """The process tier is bounded."""
+        cache = PermissionCache(max_size=2, local_ttl=60)
+        for _ in range(3):
+            cache.get_or_load(uuid.uuid4(), uuid.uuid4(), lambda: [])
+        assert cache.stats()["local_entries"] == 2
+
+    def test_revoke_role_invalidates_cache(self):
+        """Role mutations drop the affected user's cached permissions."""
+        db = MagicMock()
+        user_id, tenant_id = uuid.uuid4(), uuid.uuid4()
+        with patch.object(rbac_service, "audit_log"), \
+                patch("app.services.rbac_service.permission_cache") as mock_cache:
+            assert rbac_service.revoke_role(db, user_id, tenant_id, uuid.uuid4(), uuid.uuid4()) is True
+        mock_cache.invalidate.assert_called_once_with(user_id, tenant_id)
+
+
+class TestMembershipChangesInvalidateCache:
+    """Tenant ADMIN memberships grant every permission, so membership changes must drop the cached set."""
+
+    @pytest.fixture
+    def admin(self, redis_tier):
+        membership = SimpleNamespace(role="ADMIN", status="ACTIVE")
+        db = MagicMock()
+        db.query.return_value.filter.return_value.first.return_value = membership
+
+        def resolve(db, user_id, tenant_id):
+            return ["crm:leads:create"] if membership.role == "ADMIN" and membership.status == "ACTIVE" else []
+
+        with patch.object(rbac_service, "_resolve_permission_codes", side_effect=resolve):
+            yield db, membership, str(uuid.uuid4()), str(uuid.uuid4())
+
+    def test_demoted_admin_loses_permissions_immediately(self, admin):
+        db, membership, user_id, tenant_id = admin
+        assert rbac_service.has_permission(db, user_id, tenant_id, "crm:leads:create")
+
+        iam.update_user_membership(tenant_id, user_id, iam.UpdateMembershipRequest(role="CASHIER"), db)
+
+        assert not rbac_service.has_permission(db, user_id, tenant_id, "crm:leads:create")
+
+    def test_removed_admin_loses_permissions_immediately(self, admin):
+        db, membership, user_id, tenant_id = admin
+        assert rbac_service.has_permission(db, user_id, tenant_id, "crm:leads:create")
+
+        iam.remove_user_from_tenant(tenant_id, user_id, db)
+        membership.status = "REMOVED"  # the row is gone; the resolver no longer sees it
+
+        assert not rbac_service.has_permission(db, user_id, tenant_id, "crm:leads:create")
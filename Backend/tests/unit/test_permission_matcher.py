@@ -0,0 +1,55 @@
+"""Unit tests for the compiled permission matcher."""
+import fnmatch
+import itertools
+import pytest
+
+from app.services.permission_matcher import ALL_PERMISSIONS, PermissionMatcher, compile_permissions
+from app.services.rbac_service import rbac_service
+
+
+def legacy_match(user_permissions, required):
+    """The fnmatch loop check_permission_match used before compilation."""
+    for user_perm in user_permissions:
+        if user_perm == required:
+            return True
+        if '*' in user_perm and fnmatch.fnmatch(required, user_perm):
+            return True
+    return False
+
+
+class TestPermissionMatcher:
+    """Test suite for PermissionMatcher."""
+
+    @pytest.mark.parametrize("codes,required,expected", [
+        (["crm:leads:view"], "crm:leads:view", True),
+        (["crm:leads:view"], "crm:leads:edit", False),
+        (["crm:*:view"], "crm:contacts:view", True),
+        (["crm:leads:*"], "crm:leads:delete", True),
+        (["*:*:*"], "pos:items:view", True),
+        (["crm:*:view"], "hr:staff:view", False),
+        (["crm:lea*:view"], "crm:leads:view", True),
+        ([ALL_PERMISSIONS], "anything", True),
+        ([], "crm:leads:view", False),
+    ])
+    def test_matches(self, codes, required, expected):
+        """Exact, segment and in-segment wildcards resolve correctly."""
+        assert PermissionMatcher(codes).matches(required) is expected
+        assert rbac_service.check_permission_match(codes, required) is expected
+
+    def test_agrees_with_fnmatch(self):
+        """Every pattern/permission combination matches exactly like fnmatch."""
+        segments = ["crm", "leads", "view", "*", ""]
+        patterns = [":".join(p) for n in (1, 2, 3, 4) for p in itertools.product(segments, repeat=n)]
+        required = [":".join(p) for n in (1, 2, 3, 4) for p in itertools.product(["crm", "leads", "view", ""], repeat=n)]
+
+        for pattern in patterns:
+            matcher = PermissionMatcher([pattern])
+            for perm in required:
+                assert matcher.matches(perm) == legacy_match([pattern], perm), (pattern, perm)
+
+    def test_compile_permissions_is_memoized(self):
+        """The same permission set compiles once."""
+        codes = ["crm:leads:view", "pos:*:*"]
+        assert compile_permissions(codes) is compile_permissions(list(reversed(codes)))
+        matcher = compile_permissions(codes)
+        assert compile_permissions(matcher) is matcher
@@ -0,0 +1,224 @@
+"""Unit tests for the POS response cache middleware."""
+import asyncio
+import json
+
+import fakeredis
+import httpx
+import pytest
+from redis.client import NEVER_DECODE
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from jose import jwt
+
+from app.config import settings
+from app.middleware.pos_cache_middleware import POSCacheMiddleware, _decode_entry, _encode_entry
+from app.services.auth_service import ALGORITHM
+from app.services.cache.pos_cache import POSCacheService
+
+
+def _token(tenant_id="tenant-1", user_id="user-1", **claims):
+    return jwt.encode({"sub": user_id, "tenant_id": tenant_id, **claims}, settings.SECRET_KEY, algorithm=ALGORITHM)
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.fixture
+def app_and_calls(redis):
+    app = FastAPI()
+    calls = {"profiles": 0, "stock": 0}
+
+    @app.get("/api/pos/profiles")
+    async def profiles():
+        calls["profiles"] += 1
+        await asyncio.sleep(0.05)
+        return {"profiles": [{"name": "Main"}], "call": calls["profiles"]}
+
+    @app.get("/api/pos/items/{item_code}/stock")
+    async def stock(item_code: str):
+        calls["stock"] += 1
+        return {"item_code": item_code, "qty": 10 - calls["stock"]}
+
+    @app.get("/api/pos/customers")
+    async def customers(rows: int = 3):
+        calls["customers"] = calls.get("customers", 0) + 1
+
+        async def stream():
+            yield b'{"customers": ['
+            for i in range(rows):
+                yield (b"," if i else b"") + json.dumps({"name": f"Customer {i}", "call": calls["customers"]}).encode()
+            yield b"]}"
+
+        return StreamingResponse(stream(), media_type="application/json")
+
+    @app.get("/api/pos/quick-actions/{profile}")
+    async def quick_actions(profile: str, cache_control: str):
+        calls[profile] = calls.get(profile, 0) + 1
+        return JSONResponse({"call": calls[profile]}, headers={"Cache-Control": cache_control})
+
+    app.add_middleware(POSCacheMiddleware, cache_service=POSCacheService(redis))
+    return app, calls
+
+
+def _client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+class TestPOSCacheMiddleware:
+    """Test suite for POSCacheMiddleware."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_are_coalesced(self, app_and_calls):
+        """A burst of tills missing the same key hits the backend once."""
+        app, calls = app_and_calls
+        headers = {"Authorization": f"Bearer {_token()}"}
+        async with _client(app) as client:
+            responses = await asyncio.gather(*(client.get("/api/pos/profiles", headers=headers) for _ in range(20)))
+
+        assert calls["profiles"] == 1
+        assert all(r.status_code == 200 and r.json()["call"] == 1 for r in responses)
+        statuses = [r.headers["X-Cache-Status"] for r in responses]
+        assert statuses.count("MISS") == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_entry_served_and_refreshed(self, app_and_calls, redis):
+        """Expired-but-stale entries are served immediately and revalidated once."""
+        app, calls = app_and_calls
+        headers = {"Authorization": f"Bearer {_token()}"}
+        async with _client(app) as client:
+            await client.get("/api/pos/profiles", headers=headers)
+
+            [key] = [k async for k in redis.scan_iter("middleware:tenant-1:user-1:*")]
+            entry = _decode_entry(await redis.execute_command("GET", key, **{NEVER_DECODE: []}))
+            entry["fresh_until"] = 0
+            await redis.set(key, _encode_entry(entry))
+
+            stale = await client.get("/api/pos/profiles", headers=headers)
+            assert stale.headers["X-Cache-Status"] == "STALE"
+            assert stale.json()["call"] == 1
+
+            await asyncio.sleep(0.2)
+            fresh = await client.get("/api/pos/profiles", headers=headers)
+
+        assert calls["profiles"] == 2
+        assert fresh.headers["X-Cache-Status"] == "HIT"
+        assert fresh.json()["call"] == 2
+
+    @pytest.mark.asyncio
+    async def test_requests_without_tenant_token_bypass(self, app_and_calls):
+        """Unauthenticated requests are never served from or stored in the cache."""
+        app, calls = app_and_calls
+        async with _client(app) as client:
+            await client.get("/api/pos/profiles", headers={"X-Tenant-ID": "tenant-1"})
+            await client.get("/api/pos/profiles", headers={"X-Tenant-ID": "tenant-1"})
+        assert calls["profiles"] == 2
+
+    def test_ttl_is_jittered(self, redis):
+        """Fresh TTLs spread around the endpoint TTL."""
+        middleware = POSCacheMiddleware(FastAPI(), cache_service=POSCacheService(redis))
+        ttls = {
+            asyncio.run(middleware._cache_response(f"k{i}", [], b"{}", "/api/pos/quick-actions", "t"))["ttl"]
+            for i in range(20)
+        }
+        assert len(ttls) > 1
+        assert all(1800 * 0.9 <= ttl <= 1800 * 1.1 for ttl in ttls)
+
+    @pytest.mark.asyncio
+    async def test_streaming_response_is_teed_and_cached(self, app_and_calls, redis):
+        """StreamingResponse bodies reach the client intact and are cached compressed."""
+        app, calls = app_and_calls
+        headers = {"Authorization": f"Bearer {_token()}"}
+        async with _client(app) as client:
+            first = await client.get("/api/pos/customers?rows=200", headers=headers)
+            second = await client.get("/api/pos/customers?rows=200", headers=headers)
+
+        assert calls["customers"] == 1
+        assert first.headers["X-Cache-Status"] == "MISS"
+        assert second.headers["X-Cache-Status"] == "HIT"
+        assert second.content == first.content
+        assert len(first.json()["customers"]) == 200
+
+        key = "middleware:" + second.headers["X-Cache-Key"]
+        assert key.startswith("middleware:tenant-1:user-1:") and key.endswith(":/api/pos/customers:rows=200")
+        stored = await redis.execute_command("GET", key, **{NEVER_DECODE: []})
+        assert len(stored) < len(first.content)
+
+    @pytest.mark.asyncio
+    async def test_oversized_stream_is_not_cached(self, app_and_calls, monkeypatch):
+        """Bodies above POS_CACHE_MAX_BODY_BYTES stream through uncached."""
+        monkeypatch.setattr(settings, "POS_CACHE_MAX_BODY_BYTES", 1024)
+        app, calls = app_and_calls
+        headers = {"Authorization": f"Bearer {_token()}"}
+        async with _client(app) as client:
+            first = await client.get("/api/pos/customers?rows=100", headers=headers)
+            second = await client.get("/api/pos/customers?rows=100", headers=headers)
+
+        assert calls["customers"] == 2
+        assert len(first.json()["customers"]) == 100
+        assert second.headers["X-Cache-Status"] == "MISS"
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("cache_control", ["private, max-age=300", "no-cache", "no-store"])
+    async def test_non_shareable_responses_are_not_stored(self, app_and_calls, cache_control):
+        """Responses marked private, no-cache or no-store are passed through uncached."""
+        app, calls = app_and_calls
+        headers = {"Authorization": f"Bearer {_token()}"}
+        url = f"/api/pos/quick-actions/main?cache_control={cache_control}"
+        async with _client(app) as client:
+            first = await client.get(url, headers=headers)
+            second = await client.get(url, headers=headers)
+
+        assert calls["main"] == 2
+        assert [first.headers["X-Cache-Status"], second.headers["X-Cache-Status"]] == ["BYPASS", "BYPASS"]
+        assert second.json()["call"] == 2
+
+    @pytest.mark.asyncio
+    async def test_if_none_match_returns_304(self, app_and_calls):
+        """Cached responses carry an ETag that revalidates to 304."""
+        app, calls = app_and_calls
+        headers = {"Authorization": f"Bearer {_token()}"}
+        async with _client(app) as client:
+            first = await client.get("/api/pos/profiles", headers=headers)
+            etag = first.headers["ETag"]
+            cached = await client.get("/api/pos/profiles", headers={**headers, "If-None-Match": etag})
+            forced = await client.get("/api/pos/profiles", headers={**headers, "Cache-Control": "no-cache"})
+
+        assert cached.status_code == 304
+        assert cached.headers["ETag"] == etag
+        assert cached.content == b""
+        assert forced.headers["X-Cache-Status"] == "MISS"
+        assert calls["profiles"] == 2
+
+    @pytest.mark.asyncio
+    async def test_entries_are_not_shared_across_callers(self, app_and_calls):
+        """Another user, or the same user with different roles, never gets someone else's entry."""
+        app, calls = app_and_calls
+        async with _client(app) as client:
+            first = await client.get("/api/pos/profiles", headers={"Authorization": f"Bearer {_token()}"})
+            other_user = await client.get(
+                "/api/pos/profiles", headers={"Authorization": f"Bearer {_token(user_id='user-2')}"}
+            )
+            other_roles = await client.get(
+                "/api/pos/profiles", headers={"Authorization": f"Bearer {_token(roles=['CASHIER'])}"}
+            )
+            again = await client.get("/api/pos/profiles", headers={"Authorization": f"Bearer {_token()}"})
+
+        assert [r.headers["X-Cache-Status"] for r in (first, other_user, other_roles, again)] == [
+            "MISS", "MISS", "MISS", "HIT"
+        ]
+        assert calls["profiles"] == 3
+
+    @pytest.mark.asyncio
+    async def test_endpoints_outside_allow_list_bypass(self, app_and_calls):
+        """Live data such as stock levels is never cached."""
+        app, calls = app_and_calls
+        headers = {"Authorization": f"Bearer {_token()}"}
+        async with _client(app) as client:
+            first = await client.get("/api/pos/items/TEA/stock", headers=headers)
+            second = await client.get("/api/pos/items/TEA/stock", headers=headers)
+
+        assert calls["stock"] == 2
+        assert first.json()["qty"] != second.json()["qty"]
+        assert "X-Cache-Status" not in second.headers
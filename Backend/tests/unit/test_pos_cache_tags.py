@@ -0,0 +1,93 @@
+"""Unit tests for tag-based POS cache invalidation."""
+import fakeredis
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.middleware.pos_cache_middleware import CacheInvalidationMiddleware, _cache_group
+from app.services.cache import pos_cache
+from app.services.cache.pos_cache import POSCacheService
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.fixture
+def cache(redis):
+    return POSCacheService(redis)
+
+
+class TestTagInvalidation:
+    """Test suite for POSCacheService tag sets."""
+
+    @pytest.mark.asyncio
+    async def test_profile_invalidation_is_scoped(self, cache, redis):
+        """Only the profile's entries go; other profiles and tenants stay."""
+        await cache.cache_pos_profile("t1", "P1", {"name": "P1"})
+        await cache.cache_frequent_items("t1", "P1", [{"item_code": "A"}])
+        await cache.cache_quick_actions_data("t1", "P2", {"recent": []})
+        await cache.cache_pos_profile("t2", "P1", {"name": "P1"})
+
+        assert await cache.invalidate_profile_cache("t1", "P1") is True
+
+        assert await cache.get_cached_pos_profile("t1", "P1") is None
+        assert await cache.get_cached_frequent_items("t1", "P1") is None
+        assert await cache.get_cached_quick_actions_data("t1", "P2") == {"recent": []}
+        assert await cache.get_cached_pos_profile("t2", "P1") == {"name": "P1"}
+
+    @pytest.mark.asyncio
+    async def test_tenant_invalidation_removes_entries_and_tags(self, cache, redis):
+        """Tenant-wide invalidation leaves nothing of the tenant behind."""
+        await cache.cache_customers("t1", [{"name": "C1"}])
+        await cache.cache_pos_profile("t1", "P1", {"name": "P1"})
+        await cache.cache_customers("t2", [{"name": "C2"}])
+
+        await cache.invalidate_tenant_cache("t1")
+
+        assert [k for k in await redis.keys("*") if ":t1" in k] == []
+        assert await cache.get_cached_customers("t2") == [{"name": "C2"}]
+
+    @pytest.mark.asyncio
+    async def test_invalidation_does_not_scan_keyspace(self, cache, redis):
+        """Invalidation never issues KEYS."""
+        await cache.cache_customers("t1", [{"name": "C1"}])
+        redis.keys = AsyncMock(side_effect=AssertionError("KEYS used"))
+
+        assert await cache.invalidate_tags("t1", "customers") == 1
+        assert await cache.invalidate_tenant_cache("t1") is True
+
+    @pytest.mark.asyncio
+    async def test_busy_tags_are_pruned_of_expired_entries(self, cache, redis, monkeypatch):
+        """A tag that keeps being written does not keep every key it ever held."""
+        monkeypatch.setattr(pos_cache, "TAG_PRUNE_MIN_SIZE", 10)
+        for n in range(25):
+            await cache.set_tagged(f"middleware:t1:u{n}:/api/pos/customers", 900, "{}", "t1", tags=["middleware:customers"])
+            if n < 24:
+                await redis.delete(f"middleware:t1:u{n}:/api/pos/customers")  # expired
+
+        assert await redis.scard("pos:tag:t1:middleware:customers") < 10
+        assert await redis.sismember("pos:tag:t1:middleware:customers", "middleware:t1:u24:/api/pos/customers")
+        assert await redis.sismember("pos:tag:t1", "pos:tag:t1:middleware:customers")
+
+
+class TestMiddlewareInvalidation:
+    """Test suite for CacheInvalidationMiddleware tag usage."""
+
+    def test_cache_group(self):
+        assert _cache_group("/api/pos/items/ITEM-1") == "items"
+        assert _cache_group("/api/pos/quick-actions") == "quick-actions"
+        assert _cache_group("/api/pos") == "root"
+
+    @pytest.mark.asyncio
+    async def test_customer_write_clears_cached_responses(self, cache, redis):
+        """Customer writes drop both the data cache and cached GET responses."""
+        await cache.cache_customers("t1", [{"name": "C1"}])
+        await cache.set_tagged("middleware:t1:/api/pos/customers", 900, "{}", "t1", tags=["middleware:customers"])
+        await cache.set_tagged("middleware:t1:/api/pos/items", 900, "{}", "t1", tags=["middleware:items"])
+
+        middleware = CacheInvalidationMiddleware(MagicMock(), cache_service=cache)
+        await middleware._invalidate_customer_cache("t1")
+
+        assert await redis.exists("pos:customers:t1", "middleware:t1:/api/pos/customers") == 0
+        assert await redis.exists("middleware:t1:/api/pos/items") == 1
@@ -0,0 +1,87 @@
+"""Unit tests for the per-tenant POS service registry."""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services.pos.pos_service_registry import PosServiceRegistry
+
+
+def _erpnext_transport(calls):
+    """Fake ERPNext: login sets a per-site sid; resources require it."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        site = request.headers["X-Frappe-Site-Name"]
+        if request.url.path == "/api/method/login":
+            calls["logins"].append(site)
+            return httpx.Response(200, json={"message": "Logged In"}, headers={"Set-Cookie": f"sid={site}-sid; Path=/"})
+        calls["cookies"].append(request.headers.get("Cookie"))
+        if request.headers.get("Cookie") != f"sid={site}-sid":
+            return httpx.Response(403, json={"message": "Not permitted"})
+        return httpx.Response(200, json={"data": []})
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.fixture
+def registry():
+    calls = {"logins": [], "cookies": []}
+    registry = PosServiceRegistry(idle_ttl=60, max_instances=2)
+    registry._client = httpx.AsyncClient(transport=_erpnext_transport(calls))
+    registry.calls = calls
+    return registry
+
+
+class TestPosServiceRegistry:
+    """Test suite for PosServiceRegistry."""
+
+    @pytest.mark.asyncio
+    async def test_instances_and_sessions_are_reused(self, registry):
+        """Repeated requests for a tenant log in once."""
+        for _ in range(3):
+            service = registry.get("site-a", company_name="Company A")
+            await service._request("GET", "/api/resource/POS Profile")
+
+        assert registry.get("site-a", company_name="Company A") is service
+        assert registry.calls["logins"] == ["site-a"]
+        stats = registry.stats()
+        assert stats["created"] == 1
+        assert stats["logins_avoided"] == 3
+
+    @pytest.mark.asyncio
+    async def test_sessions_do_not_leak_between_tenants(self, registry):
+        """The shared client never sends one site's cookies to another."""
+        await registry.get("site-a")._request("GET", "/api/resource/Item")
+        await registry.get("site-b")._request("GET", "/api/resource/Item")
+
+        assert registry.calls["logins"] == ["site-a", "site-b"]
+        assert registry.calls["cookies"] == ["sid=site-a-sid", "sid=site-b-sid"]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_first_requests_share_one_login(self, registry):
+        """A burst on a cold tenant performs a single login."""
+        service = registry.get("site-a")
+        await asyncio.gather(*(service._request("GET", "/api/resource/Item") for _ in range(10)))
+        assert registry.calls["logins"] == ["site-a"]
+
+    def test_idle_and_capacity_eviction(self, registry):
+        """Idle tenants and the least recently used tenant are evicted."""
+        first = registry.get("site-a")
+        registry.get("site-b")
+        registry.get("site-c")
+        assert registry.stats()["instances"] == 2
+        assert registry.get("site-a") is not first
+
+        registry._services.update({k: (time.monotonic() - 120, s) for k, (_, s) in registry._services.items()})
+        registry.get("site-d")
+        assert registry.stats()["instances"] == 1
+
+    @pytest.mark.asyncio
+    async def test_aclose_closes_shared_client(self, registry):
+        """Shutdown drops every instance and closes the pool."""
+        client = registry._client
+        registry.get("site-a")
+        await registry.aclose()
+        assert client.is_closed
+        assert registry.stats()["instances"] == 0
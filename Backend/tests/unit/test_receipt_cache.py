@@ -0,0 +1,116 @@
+"""Unit tests for the rendered receipt cache."""
+import fakeredis
+import pytest
+
+from app.config import settings
+from app.routers import pos_receipts
+from app.services.cache.receipt_cache import ReceiptCache
+from app.services.pos.event_bus import Event
+
+
+def _cache():
+    return ReceiptCache(fakeredis.FakeAsyncRedis(decode_responses=True))
+
+
+class FakePosService:
+    def __init__(self, invoice):
+        self.invoice = invoice
+        self.fetches = 0
+
+    async def _request(self, method, endpoint, **kwargs):
+        self.fetches += 1
+        return {"data": dict(self.invoice)}
+
+
+def _invoice(**extra):
+    invoice = {
+        "name": "SINV-1",
+        "modified": "2026-03-02 10:00:00.000001",
+        "docstatus": 1,
+        "company": "Test Company",
+        "items": [{"item_name": "Tea", "qty": 1, "rate": 100.0, "amount": 100.0}],
+        "net_total": 100.0,
+        "grand_total": 100.0,
+    }
+    invoice.update(extra)
+    return invoice
+
+
+class TestReceiptCache:
+    """Test suite for ReceiptCache."""
+
+    @pytest.mark.asyncio
+    async def test_entries_are_keyed_by_invoice_version(self):
+        cache = _cache()
+        await cache.set("t1", "SINV-1", "v1", "thermal", 80, "en", "RECEIPT")
+        await cache.set("t1", "SINV-1", "v1", "pdf", 0, "en", b"%PDF-1.4 binary\x00\xff")
+
+        assert await cache.get("t1", "SINV-1", "v1", "thermal", 80, "en") == "RECEIPT"
+        assert await cache.get("t1", "SINV-1", "v1", "pdf", 0, "en") == b"%PDF-1.4 binary\x00\xff"
+        assert await cache.get("t1", "SINV-1", "v2", "thermal", 80, "en") is None
+        assert await cache.get("t1", "SINV-1", "v1", "thermal", 48, "en") is None
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_entries_are_evicted(self, monkeypatch):
+        monkeypatch.setattr(settings, "RECEIPT_CACHE_MAX_ENTRIES", 2)
+        cache = _cache()
+        await cache.set("t1", "A", "v1", "html", 0, "en", "a")
+        await cache.set("t1", "B", "v1", "html", 0, "en", "b")
+        assert await cache.get("t1", "A", "v1", "html", 0, "en") == "a"
+
+        await cache.set("t1", "C", "v1", "html", 0, "en", "c")
+
+        assert await cache.get("t1", "B", "v1", "html", 0, "en") is None
+        assert await cache.get("t1", "A", "v1", "html", 0, "en") == "a"
+        assert await cache.get("t1", "C", "v1", "html", 0, "en") == "c"
+
+    @pytest.mark.asyncio
+    async def test_amendment_invalidates_the_original(self):
+        cache = _cache()
+        await cache.set("t1", "SINV-1", "v1", "html", 0, "en", "old")
+        await cache.remember_version("t1", "SINV-1", "v1")
+
+        event = Event(
+            id="e1", name="invoice_created", data={"name": "SINV-1-1", "amended_from": "SINV-1"},
+            timestamp=None, source="pos", tenant_id="t1"
+        )
+        await cache.handle_invoice_created(event)
+
+        assert await cache.get("t1", "SINV-1", "v1", "html", 0, "en") is None
+        assert await cache.known_version("t1", "SINV-1") is None
+
+    @pytest.mark.asyncio
+    async def test_without_redis_the_cache_is_bypassed(self):
+        cache = ReceiptCache()
+        await cache.set("t1", "SINV-1", "v1", "html", 0, "en", "x")
+        assert await cache.get("t1", "SINV-1", "v1", "html", 0, "en") is None
+
+
+class TestCachedReceiptRendering:
+    """The receipts router renders once per invoice version."""
+
+    @pytest.mark.asyncio
+    async def test_submitted_reprint_skips_fetch_and_render(self, monkeypatch):
+        monkeypatch.setattr(pos_receipts, "receipt_cache", _cache())
+        pos_service = FakePosService(_invoice())
+        renders = []
+        original = pos_receipts._render_receipt
+        monkeypatch.setattr(pos_receipts, "_render_receipt", lambda *args: renders.append(args) or original(*args))
+
+        first = await pos_receipts._get_rendered_receipt(pos_service, "t1", "SINV-1", "thermal", "en")
+        second = await pos_receipts._get_rendered_receipt(pos_service, "t1", "SINV-1", "thermal", "en")
+
+        assert first == second and "Tea" in first
+        assert (pos_service.fetches, len(renders)) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_draft_is_refetched_and_rerendered_when_modified(self, monkeypatch):
+        monkeypatch.setattr(pos_receipts, "receipt_cache", _cache())
+        pos_service = FakePosService(_invoice(docstatus=0))
+
+        await pos_receipts._get_rendered_receipt(pos_service, "t1", "SINV-1", "html", "en")
+        pos_service.invoice = _invoice(docstatus=0, modified="2026-03-02 11:00:00", company="Renamed Ltd")
+        html = await pos_receipts._get_rendered_receipt(pos_service, "t1", "SINV-1", "html", "en")
+
+        assert pos_service.fetches == 2
+        assert "Renamed Ltd" in html
@@ -0,0 +1,156 @@
+"""Unit tests for report aggregation pushdown, row streaming and export jobs."""
+import asyncio
+import csv
+import io
+import json
+
+import fakeredis
+import pytest
+
+from app.routers import reports
+from app.services.report_jobs import ReportJobManager
+from app.services.report_query import ReportQuery
+
+
+class FakeErpnext:
+    """Keyset-paged Sales Invoice list plus canned aggregate results."""
+
+    def __init__(self, invoices=(), aggregates=None):
+        self.invoices = sorted(invoices, key=lambda inv: inv["name"])
+        self.aggregates = aggregates or {}
+        self.requests = []
+
+    async def aproxy_request(self, tenant_id, path, method="GET", params=None, json_data=None):
+        self.requests.append((path, params))
+        if path == "method/frappe.client.get_list":
+            key = (params["doctype"], params.get("group_by"))
+            return {"data": self.aggregates.get(key, [])}
+        filters = json.loads(params["filters"])
+        after = next((f[2] for f in filters if f[0] == "name" and f[1] == ">"), "")
+        rows = [inv for inv in self.invoices if inv["name"] > after]
+        return {"data": rows[:params["limit_page_length"]]}
+
+
+def _invoices(count):
+    return [
+        {"name": f"SINV-{n:04d}", "posting_date": "2026-03-01", "customer": f"C{n % 3}", "grand_total": 10.0 * n}
+        for n in range(count)
+    ]
+
+
+class TestReportQuery:
+    """Test suite for ReportQuery."""
+
+    @pytest.mark.asyncio
+    async def test_pages_follow_name_cursor(self):
+        erpnext = FakeErpnext(_invoices(5))
+        query = ReportQuery(erpnext, page_size=2)
+
+        pages = [page async for page in query.iter_pages("t1", "Sales Invoice", ["name"], [["docstatus", "=", 1]])]
+
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert [row["name"] for page in pages for row in page] == [f"SINV-{n:04d}" for n in range(5)]
+        last_filters = json.loads(erpnext.requests[-1][1]["filters"])
+        assert last_filters == [["docstatus", "=", 1], ["name", ">", "SINV-0003"]]
+
+    @pytest.mark.asyncio
+    async def test_stream_dataset_as_csv_and_json(self):
+        query = ReportQuery(FakeErpnext(_invoices(3)), page_size=2)
+
+        text = "".join([chunk async for chunk in query.stream_dataset("t1", "sales", "2026-03-01", "2026-03-31")])
+        rows = list(csv.DictReader(io.StringIO(text)))
+        assert [row["name"] for row in rows] == ["SINV-0000", "SINV-0001", "SINV-0002"]
+        assert rows[2]["grand_total"] == "20.0"
+
+        body = "".join([chunk async for chunk in query.stream_dataset("t1", "sales", format="json")])
+        assert [row["customer"] for row in json.loads(body)] == ["C0", "C1", "C2"]
+
+    @pytest.mark.asyncio
+    async def test_sales_report_uses_grouped_aggregates(self, monkeypatch):
+        erpnext = FakeErpnext(aggregates={
+            ("Sales Invoice", None): [{"invoices": 4, "revenue": 464.0, "net_sales": 400.0, "tax": 64.0}],
+            ("Sales Invoice", "customer"): [{"customer": "C1", "invoices": 3, "total": 348.0}],
+        })
+        monkeypatch.setattr(reports, "report_query", ReportQuery(erpnext))
+
+        report = await reports._generate_sales_report("t1", "2026-03-01", "2026-03-31")
+
+        assert report["summary"] == {
+            "total_invoices": 4, "total_revenue": 464.0, "total_net_sales": 400.0,
+            "total_tax": 64.0, "avg_invoice_value": 116.0,
+        }
+        assert report["by_customer"] == [{"customer": "C1", "invoices": 3, "total": 348.0}]
+        # No raw invoice rows were listed
+        assert {path for path, _ in erpnext.requests} == {"method/frappe.client.get_list"}
+        grouped = next(params for _, params in erpnext.requests if params.get("group_by"))
+        assert (grouped["order_by"], grouped["limit_page_length"]) == ("total desc", 10)
+
+    @pytest.mark.asyncio
+    async def test_finance_report_totals_from_groups(self, monkeypatch):
+        erpnext = FakeErpnext(aggregates={
+            ("GL Entry", "voucher_type"): [
+                {"voucher_type": "Sales Invoice", "entries": 6, "total_debit": 300.0, "total_credit": 120.0},
+                {"voucher_type": "Payment Entry", "entries": 2, "total_debit": 50.0, "total_credit": 230.0},
+            ],
+        })
+        monkeypatch.setattr(reports, "report_query", ReportQuery(erpnext))
+
+        report = await reports._generate_finance_report("t1", "2026-03-01", "2026-03-31")
+
+        assert report["summary"] == {
+            "total_entries": 8, "total_debit": 350.0, "total_credit": 350.0, "net_movement": 0.0,
+        }
+        assert report["by_voucher_type"]["Payment Entry"] == {"entries": 2, "total_debit": 50.0, "total_credit": 230.0}
+
+
+class TestReportJobs:
+    """Test suite for ReportJobManager."""
+
+    @pytest.mark.asyncio
+    async def test_job_writes_export_file(self, tmp_path):
+        jobs = ReportJobManager(
+            query=ReportQuery(FakeErpnext(_invoices(5)), page_size=2),
+            redis_client=fakeredis.FakeAsyncRedis(decode_responses=True),
+            export_dir=str(tmp_path),
+        )
+
+        job = await jobs.submit("t1", "sales", "2026-03-01", "2026-03-31", "csv")
+        await asyncio.gather(*jobs._tasks.values())
+
+        status = await jobs.get("t1", job["job_id"])
+        assert (status["status"], status["rows"]) == ("completed", 5)
+        path = jobs.file_path("t1", job["job_id"], "csv")
+        assert status["size"] == (tmp_path / "t1" / f"{job['job_id']}.csv").stat().st_size
+        with open(path) as handle:
+            assert len(list(csv.DictReader(handle))) == 5
+        assert await jobs.get("t2", job["job_id"]) is None
+
+    @pytest.mark.asyncio
+    async def test_failed_job_leaves_no_file(self, tmp_path):
+        class BrokenErpnext:
+            async def aproxy_request(self, *args, **kwargs):
+                raise RuntimeError("ERPNext unavailable")
+
+        jobs = ReportJobManager(
+            query=ReportQuery(BrokenErpnext()),
+            redis_client=fakeredis.FakeAsyncRedis(decode_responses=True),
+            export_dir=str(tmp_path),
+        )
+
+        job = await jobs.submit("t1", "finance", None, None, "json")
+        await asyncio.gather(*jobs._tasks.values())
+
+        status = await jobs.get("t1", job["job_id"])
+        assert (status["status"], status["error"]) == ("failed", "ERPNext unavailable")
+        assert list((tmp_path / "t1").iterdir()) == []
+
+    @pytest.mark.asyncio
+    async def test_unsupported_format_is_rejected(self, tmp_path):
+        jobs = ReportJobManager(
+            query=ReportQuery(FakeErpnext()),
+            redis_client=fakeredis.FakeAsyncRedis(decode_responses=True),
+            export_dir=str(tmp_path),
+        )
+
+        with pytest.raises(ValueError):
+            await jobs.submit("t1", "sales", None, None, "pdf")
@@ -0,0 +1,163 @@
+"""Unit tests for the POS sales fact store."""
+import json
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.models.pos_analytics import PosSalesFact, PosSalesRollup, PosSalesSyncState
+from app.services.pos.event_bus import Event
+from app.services.pos.sales_facts import SalesFactStore
+
+DAY = date(2026, 3, 2)
+
+
+def _store(**kwargs):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    for model in (PosSalesFact, PosSalesRollup, PosSalesSyncState):
+        model.__table__.create(engine)
+    return SalesFactStore(session_factory=sessionmaker(bind=engine), **kwargs)
+
+
+def _invoice(name, modified="2026-03-02 10:00:00", docstatus=1, profile="P1", owner="ann@shop", day="2026-03-02", **extra):
+    invoice = {
+        "name": name,
+        "is_pos": 1,
+        "docstatus": docstatus,
+        "modified": modified,
+        "posting_date": day,
+        "posting_time": "10:15:00",
+        "pos_profile": profile,
+        "owner": owner,
+        "customer": "Walk-in",
+        "net_total": 100.0,
+        "total_taxes_and_charges": 16.0,
+        "grand_total": 116.0,
+        "items": [
+            {"item_code": "TEA", "item_name": "Tea", "qty": 2, "amount": 60.0},
+            {"item_code": "BUN", "item_name": "Bun", "qty": 1, "amount": 40.0},
+        ],
+        "payments": [{"mode_of_payment": "Cash", "amount": 116.0}],
+    }
+    invoice.update(extra)
+    return invoice
+
+
+class FakeErpnext:
+    """Serves Sales Invoice list pages and documents."""
+
+    def __init__(self, invoices, unavailable=()):
+        self.invoices = {inv["name"]: inv for inv in invoices}
+        self.unavailable = set(unavailable)
+        self.fetched = []
+
+    async def aproxy_request(self, tenant_id, path, method="GET", params=None, json_data=None):
+        if path.startswith("resource/Sales Invoice/"):
+            name = path.rsplit("/", 1)[1]
+            self.fetched.append(name)
+            return {} if name in self.unavailable else {"data": self.invoices[name]}
+        filters = json.loads(params["filters"])
+        since = next((f[2] for f in filters if f[0] == "modified"), "")
+        rows = sorted(
+            ({"name": inv["name"], "modified": inv["modified"]} for inv in self.invoices.values() if inv["modified"] >= since),
+            key=lambda row: row["modified"],
+        )
+        start = params["limit_start"]
+        return {"data": rows[start:start + params["limit_page_length"]]}
+
+
+class TestSalesFactStore:
+    """Test suite for SalesFactStore."""
+
+    def test_ingest_builds_rollups(self):
+        store = _store()
+        with store.session_factory() as db:
+            store.ingest(db, "t1", [_invoice("INV-1"), _invoice("INV-2", profile="P2", owner="bob@shop")])
+
+            assert store.summary(db, "t1", DAY, DAY) == {
+                "total_sales": 200.0, "total_transactions": 2, "avg_transaction": 100.0,
+                "total_vat": 32.0, "total_customers": 1,
+            }
+            [tea, bun] = store.top(db, "t1", "item", DAY, DAY)
+            assert (tea["name"], tea["amount"], tea["quantity"], tea["transactions"]) == ("Tea", 120.0, 4.0, 2)
+            assert [c["key"] for c in store.top(db, "t1", "cashier", DAY, DAY)] == ["ann@shop", "bob@shop"]
+            assert store.top(db, "t1", "payment_mode", DAY, DAY, pos_profile="P2")[0]["amount"] == 116.0
+            assert store.series(db, "t1", DAY, DAY, grain="hour") == [
+                {"date": "2026-03-02", "hour": 10, "sales": 200.0, "transactions": 2}
+            ]
+
+    def test_redelivery_amendment_and_cancellation(self):
+        """Duplicates are ignored; newer versions replace their old contribution."""
+        store = _store()
+        with store.session_factory() as db:
+            store.ingest(db, "t1", [_invoice("INV-1")])
+            assert store.ingest(db, "t1", [_invoice("INV-1")]) == 0
+
+            store.ingest(db, "t1", [_invoice("INV-1", modified="2026-03-02 11:00:00", net_total=150.0, day="2026-03-03")])
+            assert store.summary(db, "t1", DAY, DAY)["total_transactions"] == 0
+            assert store.series(db, "t1", DAY, date(2026, 3, 3)) == [
+                {"date": "2026-03-02", "sales": 0.0, "transactions": 0},
+                {"date": "2026-03-03", "sales": 150.0, "transactions": 1},
+            ]
+
+            store.ingest(db, "t1", [_invoice("INV-1", modified="2026-03-02 12:00:00", docstatus=2)])
+            assert store.summary(db, "t1", DAY, date(2026, 3, 3))["total_sales"] == 0
+            assert store.top(db, "t1", "item", DAY, date(2026, 3, 3)) == []
+
+    @pytest.mark.asyncio
+    async def test_invoice_created_event_is_ingested(self):
+        store = _store()
+        event = Event(id="e1", name="invoice_created", data=_invoice("INV-9"), timestamp=None, source="pos", tenant_id="t1")
+
+        await store.handle_invoice_created(event)
+
+        with store.session_factory() as db:
+            assert store.summary(db, "t1", DAY, DAY)["total_transactions"] == 1
+
+    @pytest.mark.asyncio
+    async def test_backfill_follows_modified_watermark(self):
+        erpnext = FakeErpnext([_invoice(f"INV-{n}", modified=f"2026-03-02 10:00:0{n}") for n in range(5)])
+        store = _store(page_size=2)
+
+        stats = await store.backfill("t1", erpnext)
+        assert (stats["listed"], stats["changed"], stats["watermark"]) == (5, 5, "2026-03-02 10:00:04")
+
+        erpnext.fetched.clear()
+        erpnext.invoices["INV-5"] = _invoice("INV-5", modified="2026-03-02 10:00:05")
+        await store.backfill("t1", erpnext)
+
+        # Only the new invoice is fetched; the boundary row is already current
+        assert erpnext.fetched == ["INV-5"]
+        with store.session_factory() as db:
+            assert store.summary(db, "t1", DAY, DAY)["total_transactions"] == 6
+
+    @pytest.mark.asyncio
+    async def test_watermark_stops_at_unfetched_invoice(self):
+        erpnext = FakeErpnext(
+            [_invoice(f"INV-{n}", modified=f"2026-03-02 10:00:0{n}") for n in range(5)], unavailable={"INV-1"}
+        )
+        store = _store(page_size=2)
+
+        stats = await store.backfill("t1", erpnext)
+        assert (stats["changed"], stats["watermark"]) == (4, "2026-03-02 10:00:01")
+
+        erpnext.unavailable.clear()
+        erpnext.fetched.clear()
+        stats = await store.backfill("t1", erpnext)
+
+        assert erpnext.fetched == ["INV-1"]
+        assert stats["watermark"] == "2026-03-02 10:00:04"
+        with store.session_factory() as db:
+            assert store.summary(db, "t1", DAY, DAY)["total_transactions"] == 5
+
+    @pytest.mark.asyncio
+    async def test_ensure_fresh_skips_recent_backfill(self):
+        erpnext = FakeErpnext([_invoice("INV-1")])
+        store = _store()
+
+        assert await store.ensure_fresh("t1", erpnext)
+        assert await store.ensure_fresh("t1", erpnext)
+
+        assert erpnext.fetched == ["INV-1"]
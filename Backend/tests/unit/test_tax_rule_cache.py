@@ -0,0 +1,137 @@
+"""Unit tests for the compiled, per-tenant tax rule cache."""
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services import tax_service as tax_service_module
+from app.services.tax_rule_cache import TaxRuleCache, compile_tax_table
+from app.services.tax_service import TaxService
+
+TENANT = str(uuid.uuid4())
+VAT_ID, LEVY_ID, OLD_ID = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+VAT_STD, VAT_ZERO, LEVY_RATE = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+STANDARD, ZERO_RATED, EMPTY = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+
+def _type(type_id, code, is_compound=False, is_active=True):
+    return SimpleNamespace(
+        id=type_id, code=code, name=code.title(), is_compound=is_compound, is_active=is_active,
+        output_account_id=f"{code} Payable"
+    )
+
+
+def _rate(rate_id, type_id, percentage, is_default=False):
+    return SimpleNamespace(
+        id=rate_id, tax_type_id=type_id, rate_percentage=Decimal(percentage), rate_type="percentage",
+        fixed_amount=None, is_default=is_default
+    )
+
+
+def _table(version=0, **settings):
+    vat, levy, old = _type(VAT_ID, "VAT"), _type(LEVY_ID, "LEVY", is_compound=True), _type(OLD_ID, "OLD", is_active=False)
+    rows = [
+        (vat, _rate(VAT_STD, VAT_ID, "16", is_default=True)),
+        (vat, _rate(VAT_ZERO, VAT_ID, "0")),
+        (levy, _rate(LEVY_RATE, LEVY_ID, "2")),
+        (old, _rate(uuid.uuid4(), OLD_ID, "5", is_default=True)),
+    ]
+    templates = [
+        SimpleNamespace(id=STANDARD, tax_rates=[
+            {"tax_type_id": str(LEVY_ID), "tax_rate_id": str(LEVY_RATE), "priority": 2},
+            {"tax_type_id": str(VAT_ID), "tax_rate_id": str(VAT_STD), "priority": 1},
+        ]),
+        SimpleNamespace(id=ZERO_RATED, tax_rates=[{"tax_type_id": str(VAT_ID), "tax_rate_id": str(VAT_ZERO)}]),
+        SimpleNamespace(id=EMPTY, tax_rates=[]),
+    ]
+    tax_settings = SimpleNamespace(
+        prices_include_tax=False, tax_rounding_method="round", tax_rounding_precision=2,
+        default_item_tax_template_id=None
+    )
+    for name, value in settings.items():
+        setattr(tax_settings, name, value)
+    return compile_tax_table(TENANT, version, tax_settings, rows, templates)
+
+
+class TestCompileTaxTable:
+    def test_template_resolution(self):
+        table = _table()
+
+        assert [r.tax_type.code for r in table.rules_for(str(STANDARD))] == ["VAT", "LEVY"]
+        assert [r.tax_rate.rate_percentage for r in table.rules_for(str(ZERO_RATED).upper())] == [Decimal("0")]
+        # Templates without rates and unknown templates fall back to default rates of active types
+        assert [r.tax_rate.id for r in table.rules_for(str(EMPTY))] == [str(VAT_STD)]
+        assert [r.tax_rate.id for r in table.rules_for(str(uuid.uuid4()))] == [str(VAT_STD)]
+        assert [r.tax_rate.id for r in table.rules_for(None)] == [str(VAT_STD)]
+
+    def test_default_template_from_settings(self):
+        table = _table(default_item_tax_template_id=ZERO_RATED)
+
+        assert [r.tax_rate.id for r in table.rules_for(None)] == [str(VAT_ZERO)]
+        assert [r.tax_rate.id for r in table.rules_for(str(STANDARD))] == [str(VAT_STD), str(LEVY_RATE)]
+
+    def test_table_is_immutable(self):
+        table = _table()
+        with pytest.raises(Exception):
+            table.prices_include_tax = True
+        with pytest.raises(TypeError):
+            table.templates[str(uuid.uuid4())] = ()
+
+
+class TestTaxRuleCache:
+    def test_loads_once_per_tenant_until_invalidated(self):
+        loads = []
+
+        def loader(db, tenant_id, version):
+            loads.append((tenant_id, version))
+            return _table(version)
+
+        cache = TaxRuleCache(max_size=10, ttl=60, loader=loader)
+        first = cache.get(None, TENANT)
+        assert cache.get(None, TENANT) is first
+
+        cache.invalidate(TENANT)
+        assert cache.get(None, TENANT).version == 1
+        assert loads == [(TENANT, 0), (TENANT, 1)]
+        assert cache.stats() == {"hits": 1, "misses": 2, "entries": 1}
+
+    def test_table_loaded_during_invalidation_is_not_cached(self):
+        cache = TaxRuleCache(max_size=10, ttl=60)
+
+        def loader(db, tenant_id, version):
+            cache.invalidate(tenant_id)  # a write lands while the rules load
+            return _table(version)
+
+        cache.loader = loader
+        assert cache.get(None, TENANT).version == 0
+        assert cache.stats()["entries"] == 0
+
+
+class TestTaxServiceBasket:
+    def test_basket_priced_without_queries(self, monkeypatch):
+        cache = TaxRuleCache(max_size=10, ttl=60, loader=lambda db, tenant_id, version: _table(version))
+        monkeypatch.setattr(tax_service_module, "tax_rule_cache", cache)
+        db = MagicMock()
+
+        summary = TaxService(db, TENANT).calculate_invoice_taxes([
+            {"item_code": "TEA", "amount": 100, "tax_template_id": str(STANDARD)},
+            {"item_code": "MILK", "amount": 50, "tax_template_id": str(ZERO_RATED)},
+            {"item_code": "BUN", "amount": 10},
+        ])
+
+        # Compound levy applies on base + VAT: 100 * 2% of 116
+        assert summary.taxes_by_type == {"VAT": Decimal("17.60"), "LEVY": Decimal("2.32")}
+        assert summary.base_total == Decimal("160")
+        assert summary.grand_total == Decimal("179.92")
+        db.query.assert_not_called()
+
+    def test_tax_inclusive_prices(self, monkeypatch):
+        cache = TaxRuleCache(max_size=10, ttl=60, loader=lambda db, tenant_id, version: _table(version))
+        monkeypatch.setattr(tax_service_module, "tax_rule_cache", cache)
+
+        calc = TaxService(MagicMock(), TENANT).calculate_item_taxes("TEA", Decimal("116"), prices_include_tax=True)
+
+        assert calc.base_amount == Decimal("100.00")
+        assert calc.total_tax == Decimal("16.00")
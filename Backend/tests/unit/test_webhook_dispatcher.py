@@ -0,0 +1,142 @@
+"""Unit tests for the shared webhook dispatcher."""
+import asyncio
+import json
+
+import fakeredis
+import httpx
+import pytest
+
+from app.config import settings
+from app.services.plugins.webhook_manager import DeliveryStatus, WebhookEvent, WebhookManager
+from app.services.webhook_dispatcher import (
+    WEBHOOK_RETRY_KEY,
+    WebhookDispatcher,
+    WebhookEndpoint,
+    WebhookJob,
+    sign_payload,
+)
+
+
+def _recording_transport(requests, status_code=200):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(status_code)
+
+    return httpx.MockTransport(handler)
+
+
+def _job(endpoint_id, n):
+    return WebhookJob(endpoint_id=endpoint_id, event="invoice.created", payload={"n": n})
+
+
+class TestWebhookDispatcher:
+    """Test suite for WebhookDispatcher."""
+
+    @pytest.mark.asyncio
+    async def test_events_are_coalesced_into_batches(self):
+        """A batching endpoint gets queued events in one signed request."""
+        requests = []
+        dispatcher = WebhookDispatcher(transport=_recording_transport(requests))
+        dispatcher.register_endpoint(WebhookEndpoint(
+            id="hook", url="http://a.example/hook", secret="secret", batch_size=3, batch_window=0.2
+        ))
+
+        futures = [await dispatcher.submit(_job("hook", n)) for n in range(4)]
+        jobs = await asyncio.gather(*futures)
+        await dispatcher.shutdown()
+
+        assert [job.status for job in jobs] == ["delivered"] * 4
+        assert len(requests) == 2
+        first = json.loads(requests[0].content)
+        assert first["count"] == 3
+        assert [event["n"] for event in first["events"]] == [0, 1, 2]
+        assert requests[0].headers["X-Webhook-Signature"] == sign_payload("secret", requests[0].content.decode())
+
+    @pytest.mark.asyncio
+    async def test_one_pooled_client_per_host(self):
+        """Endpoints on the same host share a client; other hosts get their own."""
+        dispatcher = WebhookDispatcher()
+
+        same = dispatcher.client_for("https://a.example/one")
+        assert dispatcher.client_for("https://a.example:443/two") is same
+        assert dispatcher.client_for("https://b.example/one") is not same
+        await dispatcher.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_history_is_capped(self, monkeypatch):
+        """Only the newest WEBHOOK_HISTORY_SIZE attempts are kept per endpoint."""
+        monkeypatch.setattr(settings, "WEBHOOK_HISTORY_SIZE", 3)
+        dispatcher = WebhookDispatcher(transport=_recording_transport([]))
+        dispatcher.register_endpoint(WebhookEndpoint(id="hook", url="http://a.example/hook", secret="secret"))
+
+        for n in range(5):
+            await (await dispatcher.submit(_job("hook", n)))
+        await dispatcher.shutdown()
+
+        assert [job.payload["n"] for job in await dispatcher.get_history("hook")] == [4, 3, 2]
+
+
+    @pytest.mark.asyncio
+    async def test_retries_for_other_workers_endpoints_stay_queued(self):
+        """A worker only claims retries for endpoints registered on it."""
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        requests = []
+        dispatcher = WebhookDispatcher(redis_client=redis, transport=_recording_transport(requests))
+        dispatcher.register_endpoint(WebhookEndpoint(id="local", url="http://a.example/hook", secret="secret"))
+        foreign = [_job("elsewhere", n) for n in range(120)]
+        await redis.zadd(WEBHOOK_RETRY_KEY, {json.dumps(job.to_dict()): 0 for job in foreign})
+        await redis.zadd(WEBHOOK_RETRY_KEY, {json.dumps(_job("local", 1).to_dict()): 1})
+
+        await dispatcher._requeue_due_retries()
+        await dispatcher.shutdown()
+
+        assert await redis.zcard(WEBHOOK_RETRY_KEY) == 120
+        assert [json.loads(r.content)["n"] for r in requests] == [1]
+
+
+class TestWebhookManagerDispatch:
+    """The plugin WebhookManager delivers through the shared dispatcher."""
+
+    @pytest.mark.asyncio
+    async def test_dispatch_event_reports_first_attempt(self):
+        requests = []
+        manager = WebhookManager(dispatcher=WebhookDispatcher(transport=_recording_transport(requests)))
+        webhook = manager.register_webhook("t1", "orders", "http://a.example/hook", [WebhookEvent.ORDER_CREATED])
+
+        [delivery] = await manager.dispatch_event("t1", WebhookEvent.ORDER_CREATED, {"order": 1})
+        await manager.close()
+        await manager.dispatcher.shutdown()
+
+        assert delivery.status == DeliveryStatus.DELIVERED
+        body = requests[0].content.decode()
+        assert manager.verify_signature(webhook.id, body, requests[0].headers["X-Webhook-Signature"])
+        assert manager.get_delivery_history(webhook.id)[0].id == delivery.id
+        assert manager.get_delivery_stats("t1")["successful"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failures_count_towards_suspension(self):
+        manager = WebhookManager(dispatcher=WebhookDispatcher(transport=_recording_transport([], status_code=500)))
+        webhook = manager.register_webhook("t1", "orders", "http://a.example/hook", [WebhookEvent.ORDER_CREATED])
+
+        [delivery] = await manager.dispatch_event("t1", WebhookEvent.ORDER_CREATED, {"order": 1})
+        await manager.close()
+        await manager.dispatcher.shutdown()
+
+        assert delivery.status == DeliveryStatus.RETRYING
+        assert webhook.consecutive_failures == 1
+
+    @pytest.mark.asyncio
+    async def test_close_detaches_without_stopping_shared_dispatcher(self):
+        requests = []
+        dispatcher = WebhookDispatcher(transport=_recording_transport(requests))
+        dispatcher.register_endpoint(WebhookEndpoint(id="pos", url="http://pos.example/hook", secret="secret"))
+        manager = WebhookManager(dispatcher=dispatcher)
+        webhook = manager.register_webhook("t1", "orders", "http://a.example/hook", [WebhookEvent.ORDER_CREATED])
+
+        await manager.close()
+
+        assert manager._on_attempt not in dispatcher._listeners
+        assert webhook.id not in dispatcher.endpoints
+        # Other users of the dispatcher keep delivering
+        assert (await (await dispatcher.submit(_job("pos", 1)))).status == "delivered"
+        await dispatcher.shutdown()
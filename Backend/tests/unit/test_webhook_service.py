@@ -0,0 +1,160 @@
+"""Unit tests for POS webhook delivery."""
+import asyncio
+import json
+import time
+
+import fakeredis
+import httpx
+import pytest
+
+from app.config import settings
+from app.services.pos.webhook_service import WebhookConfig, WebhookService
+from app.services.webhook_dispatcher import WEBHOOK_RETRY_KEY, WebhookDispatcher
+
+SECRET = "s" * 32
+
+
+def _subscriber_transport(received, slow_hosts=(), failing_hosts=()):
+    """Fake subscribers: record POSTs per host, optionally slowly or with a 500."""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        if request.method == "HEAD":
+            return httpx.Response(200)
+        if host in slow_hosts:
+            await asyncio.sleep(1)
+        received.append((host, json.loads(request.content)["event"]))
+        if host in failing_hosts:
+            return httpx.Response(500, text="boom")
+        return httpx.Response(200)
+
+    return httpx.MockTransport(handler)
+
+
+def _service(received, redis=None, **transport_options):
+    dispatcher = WebhookDispatcher(redis_client=redis, transport=_subscriber_transport(received, **transport_options))
+    return WebhookService(redis_client=redis, dispatcher=dispatcher)
+
+
+async def _register(service, tenant_id, name, host, events=("invoice_created",), **config):
+    return await service.register_webhook(
+        tenant_id, name, WebhookConfig(url=f"http://{host}/hook", secret=SECRET, events=list(events), **config)
+    )
+
+
+async def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+
+class TestWebhookService:
+    """Test suite for WebhookService."""
+
+    @pytest.mark.asyncio
+    async def test_trigger_uses_tenant_event_index(self):
+        """Only enabled webhooks of the tenant subscribed to the event are triggered."""
+        service = _service([])
+        wanted = await _register(service, "t1", "sales", "a.example")
+        await _register(service, "t1", "customers", "b.example", events=["customer_created"])
+        await _register(service, "t2", "sales", "c.example")
+        await _register(service, "t1", "off", "d.example", enabled=False)
+
+        assert await service.trigger_webhook("invoice_created", {"id": 1}, "t1") == [wanted]
+
+        await service.unregister_webhook(wanted)
+        assert await service.trigger_webhook("invoice_created", {"id": 2}, "t1") == []
+
+    @pytest.mark.asyncio
+    async def test_slow_endpoint_does_not_block_others(self):
+        """Each endpoint drains its own queue, so a slow subscriber only delays itself."""
+        received = []
+        service = _service(received, slow_hosts={"slow.example"})
+        await _register(service, "t1", "slow", "slow.example")
+        await _register(service, "t1", "fast", "fast.example")
+        await service.start_processing()
+
+        await service.trigger_webhook("invoice_created", {"id": 1}, "t1")
+        await service.trigger_webhook("invoice_created", {"id": 2}, "t1")
+        await _wait_for(lambda: len(received) == 2, timeout=0.5)
+
+        assert received == [("fast.example", "invoice_created"), ("fast.example", "invoice_created")]
+        await service.shutdown()
+        assert len(received) == 4
+
+    @pytest.mark.asyncio
+    async def test_failures_are_parked_in_redis_with_backoff(self):
+        """A failed delivery is scheduled in the retry set instead of sleeping in the worker."""
+        received = []
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        service = _service(received, redis, failing_hosts={"down.example"})
+        await _register(service, "t1", "down", "down.example")
+        await service.start_processing()
+
+        started = time.time()
+        await service.trigger_webhook("invoice_created", {"id": 1}, "t1")
+        await _wait_for(lambda: received)
+        await service.shutdown()
+
+        [(member, due)] = await redis.zrange(WEBHOOK_RETRY_KEY, 0, -1, withscores=True)
+        assert json.loads(member)["attempt"] == 2
+        # retry_delay 60s, jittered into [30s, 60s]
+        assert started + 30 <= due <= time.time() + 60
+
+    @pytest.mark.asyncio
+    async def test_persisted_retries_are_delivered_after_restart(self):
+        """A new service restores webhooks and sends retries that became due."""
+        received = []
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        first = _service(received, redis, failing_hosts={"flaky.example"})
+        await _register(first, "t1", "flaky", "flaky.example", retry_policy={"max_retries": 3, "retry_delay": 0, "backoff_factor": 2})
+        await first.start_processing()
+        await first.trigger_webhook("invoice_created", {"id": 1}, "t1")
+        await _wait_for(lambda: received)
+        await first.shutdown()
+        assert await redis.zcard(WEBHOOK_RETRY_KEY) == 1
+
+        received.clear()
+        second = _service(received, redis)
+        await second.start_processing()
+        await _wait_for(lambda: received)
+        await second.shutdown()
+
+        assert received == [("flaky.example", "invoice_created")]
+        assert await redis.zcard(WEBHOOK_RETRY_KEY) == 0
+
+    @pytest.mark.asyncio
+    async def test_circuit_opens_after_consecutive_failures(self, monkeypatch):
+        """Once the breaker opens, deliveries are deferred without calling the endpoint."""
+        monkeypatch.setattr(settings, "WEBHOOK_CIRCUIT_FAILURE_THRESHOLD", 2)
+        received = []
+        service = _service(received, failing_hosts={"down.example"})
+        await _register(service, "t1", "down", "down.example")
+        await service.start_processing()
+
+        for n in range(4):
+            await service.trigger_webhook("invoice_created", {"id": n}, "t1")
+        await service.shutdown()
+
+        assert len(received) == 2
+        assert len(service.dispatcher._local_retries) == 4
+        stats = await service.get_webhook_stats("t1")
+        assert stats["open_circuits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_delivery_history_and_stats(self):
+        """Attempts are read back from the dispatcher's capped history."""
+        received = []
+        service = _service(received)
+        webhook_id = await _register(service, "t1", "sales", "a.example")
+        await service.start_processing()
+
+        await service.trigger_webhook("invoice_created", {"id": 1}, "t1")
+        await service.shutdown()
+
+        [delivery] = await service.get_delivery_history(webhook_id)
+        assert delivery.status == "success"
+        assert delivery.payload == {"id": 1}
+        assert delivery.signature.startswith("sha256=")
+        stats = await service.get_webhook_stats("t1")
+        assert stats["deliveries"]["successful"] == 1